@@ -26,6 +26,7 @@ class AnnotationEditTabManager(QWidget):
     delete_single_annotation_requested = pyqtSignal(object)  # annotation
     delete_track_requested = pyqtSignal(int)  # track_id
     propagate_label_requested = pyqtSignal(int, str)  # track_id, new_label
+    interpolate_track_requested = pyqtSignal(int)  # track_id
     
     def __init__(self, app_service: MASAApplicationService, parent=None):
         super().__init__(parent)
@@ -49,6 +50,7 @@ class AnnotationEditTabManager(QWidget):
         self.delete_single_annotation_btn: Optional[QPushButton] = None
         self.delete_track_btn: Optional[QPushButton] = None
         self.propagate_label_btn: Optional[QPushButton] = None
+        self.interpolate_track_btn: Optional[QPushButton] = None
         self.undo_btn: Optional[QPushButton] = None
         self.redo_btn: Optional[QPushButton] = None
         
@@ -170,6 +172,12 @@ class AnnotationEditTabManager(QWidget):
         self.propagate_label_btn.setEnabled(False)
         self.propagate_label_btn.setStyleSheet("background-color: #1976D2; color: white;")
         delete_layout.addWidget(self.propagate_label_btn)
+        
+        self.interpolate_track_btn = QPushButton("Interpolate Track")
+        self.interpolate_track_btn.setEnabled(False)
+        self.interpolate_track_btn.setToolTip("Fill the gaps between the manual keyframes of the selected track")
+        self.interpolate_track_btn.setStyleSheet("background-color: #00897B; color: white;")
+        delete_layout.addWidget(self.interpolate_track_btn)
         edit_layout.addLayout(delete_layout)
         
         edit_group.setLayout(edit_layout)
@@ -260,6 +268,7 @@ class AnnotationEditTabManager(QWidget):
         self.delete_single_annotation_btn.clicked.connect(self._on_delete_single_clicked)
         self.delete_track_btn.clicked.connect(self._on_delete_track_clicked)
         self.propagate_label_btn.clicked.connect(self._on_propagate_label_clicked)
+        self.interpolate_track_btn.clicked.connect(self._on_interpolate_track_clicked)
         
         # Undo/Redo
         self.undo_btn.clicked.connect(self._on_undo_clicked)
@@ -316,6 +325,11 @@ class AnnotationEditTabManager(QWidget):
             if new_label:
                 self.propagate_label_requested.emit(self.current_selected_annotation.object_id, new_label)
                 
+    def _on_interpolate_track_clicked(self):
+        """選択中のトラックのキーフレーム補間"""
+        if self.current_selected_annotation:
+            self.interpolate_track_requested.emit(self.current_selected_annotation.object_id)
+                
     def _on_undo_clicked(self):
         """Undo実行"""
         if self.app_service.undo():
@@ -391,6 +405,8 @@ class AnnotationEditTabManager(QWidget):
             self.delete_track_btn.setEnabled(enabled)
         if self.propagate_label_btn:
             self.propagate_label_btn.setEnabled(enabled)
+        if self.interpolate_track_btn:
+            self.interpolate_track_btn.setEnabled(enabled)
             
     def initialize_label_combo(self, labels: List[str]):
         """ラベルコンボボックスを初期化"""
@@ -0,0 +1,383 @@
+# AnnotationJournal.py
+"""
+Undo/Redo履歴のコンパクトな差分表現と、プロジェクト横の追記型ログ（WAL）
+
+各コマンドの変更は「変更前の行」「変更後の行」をnumpyの構造化配列にまとめた
+バイト列として保持する。ObjectAnnotationのオブジェクトを保持しないため、
+トラック削除のような大きな変更でも1行あたり数十バイトで済む。
+WALには スナップショット / 実行 / Undo / Redo を追記し、起動時に再生して復元する。
+"""
+import os
+import struct
+import zlib
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from DataClass import BoundingBox, ObjectAnnotation
+
+ROW_DTYPE = np.dtype([
+    ("object_id", "<i4"),
+    ("frame_id", "<i4"),
+    ("x1", "<f8"), ("y1", "<f8"), ("x2", "<f8"), ("y2", "<f8"),
+    ("confidence", "<f8"),
+    ("track_confidence", "<f8"),
+    ("label", "<i4"),  # パート内のラベル表のインデックス
+    ("flags", "u1"),
+])
+
+FLAG_MANUAL = 1
+FLAG_BATCH_ADDED = 2
+
+PART_ROWS = 1
+PART_RELABEL_TRACK = 2
+
+
+def _pack_str(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return struct.pack("<I", len(data)) + data
+
+
+def _unpack_str(buffer: memoryview, offset: int) -> Tuple[str, int]:
+    (length,) = struct.unpack_from("<I", buffer, offset)
+    offset += 4
+    return bytes(buffer[offset:offset + length]).decode("utf-8"), offset + length
+
+
+def pack_rows(annotations: Sequence[ObjectAnnotation], labels: Dict[str, int],
+              label: Optional[str] = None, bbox: Optional[BoundingBox] = None) -> np.ndarray:
+    """アノテーションを構造化配列に変換（label/bboxを指定した場合はその値で上書き）"""
+    rows = np.empty(len(annotations), dtype=ROW_DTYPE)
+    for i, annotation in enumerate(annotations):
+        box = bbox if bbox is not None else annotation.bbox
+        row_label = label if label is not None else annotation.label
+        flags = (FLAG_MANUAL if annotation.is_manual else 0) | (FLAG_BATCH_ADDED if annotation.is_batch_added else 0)
+        rows[i] = (
+            annotation.object_id, annotation.frame_id,
+            box.x1, box.y1, box.x2, box.y2, box.confidence,
+            annotation.track_confidence,
+            labels.setdefault(row_label, len(labels)),
+            flags,
+        )
+    return rows
+
+
+def unpack_rows(rows: np.ndarray, labels: List[str]) -> List[ObjectAnnotation]:
+    """構造化配列をObjectAnnotationのリストに戻す"""
+    annotations = []
+    for row in rows.tolist():
+        object_id, frame_id, x1, y1, x2, y2, confidence, track_confidence, label_index, flags = row
+        annotations.append(ObjectAnnotation(
+            object_id=object_id,
+            label=labels[label_index],
+            bbox=BoundingBox(x1, y1, x2, y2, confidence=confidence),
+            frame_id=frame_id,
+            is_manual=bool(flags & FLAG_MANUAL),
+            track_confidence=track_confidence,
+            is_batch_added=bool(flags & FLAG_BATCH_ADDED),
+        ))
+    return annotations
+
+
+class AnnotationDelta:
+    """1コマンド分の変更（複数パート）
+
+    - 行パート: 変更前の行 before と変更後の行 after。(object_id, frame_id) をキーに、
+      適用時は before にのみ存在する行を削除し after の行を追加/上書きする。取り消しはその逆。
+    - トラックのラベル変更パート: 全フレーム分の行を持たず (track_id, 旧ラベル, 新ラベル) だけを保持する。
+    """
+
+    def __init__(self):
+        self.parts: List[tuple] = []
+
+    @classmethod
+    def rows(cls, before: Sequence[ObjectAnnotation] = (), after: Sequence[ObjectAnnotation] = (),
+             before_overrides: Optional[dict] = None, after_overrides: Optional[dict] = None) -> "AnnotationDelta":
+        delta = cls()
+        delta.add_rows(before, after, before_overrides, after_overrides)
+        return delta
+
+    def add_rows(self, before: Sequence[ObjectAnnotation] = (), after: Sequence[ObjectAnnotation] = (),
+                 before_overrides: Optional[dict] = None, after_overrides: Optional[dict] = None):
+        labels: Dict[str, int] = {}
+        before_rows = pack_rows(before, labels, **(before_overrides or {}))
+        after_rows = pack_rows(after, labels, **(after_overrides or {}))
+        label_list = [label for label, _ in sorted(labels.items(), key=lambda item: item[1])]
+        self.parts.append((PART_ROWS, before_rows, after_rows, label_list))
+
+    def add_relabel_track(self, track_id: int, old_label: str, new_label: str):
+        self.parts.append((PART_RELABEL_TRACK, track_id, old_label, new_label))
+
+    def extend(self, other: "AnnotationDelta"):
+        self.parts.extend(other.parts)
+
+    # ===== 適用 =====
+
+    def apply(self, repository) -> int:
+        """変更を適用し、変更した行数を返す"""
+        return sum(self._apply_part(repository, part, forward=True) for part in self.parts)
+
+    def revert(self, repository) -> int:
+        """変更を取り消し、変更した行数を返す"""
+        return sum(self._apply_part(repository, part, forward=False) for part in reversed(self.parts))
+
+    def _apply_part(self, repository, part: tuple, forward: bool) -> int:
+        if part[0] == PART_RELABEL_TRACK:
+            _, track_id, old_label, new_label = part
+            return repository.update_label_by_track_id(track_id, new_label if forward else old_label)
+
+        _, before_rows, after_rows, labels = part
+        if not forward:
+            before_rows, after_rows = after_rows, before_rows
+
+        after_keys = set(zip(after_rows["object_id"].tolist(), after_rows["frame_id"].tolist()))
+        changed = 0
+        for object_id, frame_id in zip(before_rows["object_id"].tolist(), before_rows["frame_id"].tolist()):
+            if (object_id, frame_id) not in after_keys:
+                changed += int(repository.delete_annotation(object_id, frame_id))
+        for annotation in unpack_rows(after_rows, labels):
+            repository.upsert_annotation(annotation)
+            changed += 1
+        return changed
+
+    def added_annotations(self) -> List[ObjectAnnotation]:
+        """行パートの変更後の行をObjectAnnotationとして返す（スナップショットの読み込み用）"""
+        annotations = []
+        for part in self.parts:
+            if part[0] == PART_ROWS:
+                annotations.extend(unpack_rows(part[2], part[3]))
+        return annotations
+
+    # ===== シリアライズ =====
+
+    def to_bytes(self) -> bytes:
+        chunks = [struct.pack("<I", len(self.parts))]
+        for part in self.parts:
+            chunks.append(struct.pack("<B", part[0]))
+            if part[0] == PART_RELABEL_TRACK:
+                _, track_id, old_label, new_label = part
+                chunks.append(struct.pack("<i", track_id))
+                chunks.append(_pack_str(old_label))
+                chunks.append(_pack_str(new_label))
+            else:
+                _, before_rows, after_rows, labels = part
+                chunks.append(struct.pack("<III", len(before_rows), len(after_rows), len(labels)))
+                chunks.extend(_pack_str(label) for label in labels)
+                chunks.append(before_rows.tobytes())
+                chunks.append(after_rows.tobytes())
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnnotationDelta":
+        delta = cls()
+        buffer = memoryview(data)
+        (num_parts,) = struct.unpack_from("<I", buffer, 0)
+        offset = 4
+        for _ in range(num_parts):
+            (kind,) = struct.unpack_from("<B", buffer, offset)
+            offset += 1
+            if kind == PART_RELABEL_TRACK:
+                (track_id,) = struct.unpack_from("<i", buffer, offset)
+                old_label, offset = _unpack_str(buffer, offset + 4)
+                new_label, offset = _unpack_str(buffer, offset)
+                delta.parts.append((PART_RELABEL_TRACK, track_id, old_label, new_label))
+            elif kind == PART_ROWS:
+                num_before, num_after, num_labels = struct.unpack_from("<III", buffer, offset)
+                offset += 12
+                labels = []
+                for _ in range(num_labels):
+                    label, offset = _unpack_str(buffer, offset)
+                    labels.append(label)
+                before_rows = np.frombuffer(buffer, dtype=ROW_DTYPE, count=num_before, offset=offset).copy()
+                offset += before_rows.nbytes
+                after_rows = np.frombuffer(buffer, dtype=ROW_DTYPE, count=num_after, offset=offset).copy()
+                offset += after_rows.nbytes
+                delta.parts.append((PART_ROWS, before_rows, after_rows, labels))
+            else:
+                raise ValueError(f"Unknown delta part type: {kind}")
+        return delta
+
+
+class JournalEntry:
+    """Undo/Redoスタックの1要素（差分はエンコード済みのバイト列で保持）"""
+
+    __slots__ = ("description", "payload")
+
+    def __init__(self, description: str, payload: bytes):
+        self.description = description
+        self.payload = payload
+
+    @classmethod
+    def from_delta(cls, description: str, delta: AnnotationDelta) -> "JournalEntry":
+        return cls(description, delta.to_bytes())
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.payload) + len(self.description)
+
+    def delta(self) -> AnnotationDelta:
+        return AnnotationDelta.from_bytes(self.payload)
+
+    def to_bytes(self) -> bytes:
+        return _pack_str(self.description) + self.payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "JournalEntry":
+        description, offset = _unpack_str(memoryview(data), 0)
+        return cls(description, bytes(data[offset:]))
+
+
+class AnnotationJournal:
+    """アノテーション編集の追記型ログ（WAL）
+
+    レコード形式: [payload長 u32][種別 u8][crc32 u32][payload]
+    クラッシュで末尾が壊れている場合は最後の完全なレコードまでを有効とする。
+    """
+
+    OP_SNAPSHOT = 1  # リポジトリ全体（チェックポイント）
+    OP_EXECUTE = 2  # コマンド実行
+    OP_UNDO = 3
+    OP_REDO = 4
+    OP_PUSH_UNDO = 5  # 適用せずにUndoスタックへ積む（チェックポイント時の履歴）
+    OP_PUSH_REDO = 6  # 適用せずにRedoスタックへ積む（チェックポイント時の履歴）
+    OP_BASE_PROJECT = 7  # プロジェクトファイル（ProjectStore）の保存内容を起点とする
+
+    HEADER = struct.Struct("<IBI")
+    WAL_SUFFIX = ".annotations.wal"
+
+    def __init__(self, path: str, compact_bytes: int = 256 << 20):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self._file = None
+
+    @classmethod
+    def for_project(cls, project_path: str, **kwargs) -> "AnnotationJournal":
+        """プロジェクト（動画）ファイルの横に置くWALを返す"""
+        return cls(f"{project_path}{cls.WAL_SUFFIX}", **kwargs)
+
+    def exists(self) -> bool:
+        """復元可能な記録があるかどうか"""
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def size(self) -> int:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def needs_compaction(self) -> bool:
+        return self.size() > self.compact_bytes
+
+    # ===== 書き込み =====
+
+    def append(self, op: int, payload: bytes = b""):
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(self.HEADER.pack(len(payload), op, zlib.crc32(payload)))
+        self._file.write(payload)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def checkpoint(self, repository, undo_entries: Sequence[JournalEntry] = (),
+                   redo_entries: Sequence[JournalEntry] = (), base_on_project: bool = False):
+        """現在の状態と履歴だけを書いたWALに置き換える（アトミック）
+
+        base_on_project=Trueの場合、現在の状態はプロジェクトファイルに保存済みとして
+        スナップショットの代わりにそれを参照するレコードだけを書く。
+        """
+        self.close()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as f:
+            for op, payload in self._checkpoint_records(repository, undo_entries, redo_entries, base_on_project):
+                f.write(self.HEADER.pack(len(payload), op, zlib.crc32(payload)))
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _checkpoint_records(self, repository, undo_entries, redo_entries,
+                            base_on_project: bool) -> Iterator[Tuple[int, bytes]]:
+        if base_on_project:
+            yield self.OP_BASE_PROJECT, b""
+        else:
+            annotations = [obj for frame in repository.frame_annotations.values() for obj in frame.objects]
+            snapshot = AnnotationDelta.rows(after=annotations)
+            yield self.OP_SNAPSHOT, struct.pack("<I", repository.next_object_id) + snapshot.to_bytes()
+        for entry in undo_entries:
+            yield self.OP_PUSH_UNDO, entry.to_bytes()
+        for entry in redo_entries:
+            yield self.OP_PUSH_REDO, entry.to_bytes()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """WALを削除"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    # ===== 読み込み =====
+
+    def read_records(self) -> Iterator[Tuple[int, bytes]]:
+        """有効なレコードを順に返す（壊れた末尾以降は無視し、ファイルも切り詰める）"""
+        if not os.path.exists(self.path):
+            return
+        valid_end = 0
+        with open(self.path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + self.HEADER.size <= len(data):
+            length, op, crc = self.HEADER.unpack_from(data, offset)
+            start = offset + self.HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            offset = start + length
+            valid_end = offset
+            yield op, payload
+        if valid_end < len(data):
+            print(f"Warning: ignored {len(data) - valid_end} corrupted bytes at the end of {self.path}")
+            with open(self.path, "r+b") as f:
+                f.truncate(valid_end)
+
+    def replay(self, repository, project_store=None) -> Tuple[List[JournalEntry], List[JournalEntry]]:
+        """WALを再生してリポジトリを復元し、(undo_entries, redo_entries) を返す
+
+        差分は (object_id, frame_id) ごとの絶対値なので、プロジェクトファイルが
+        起点より新しい（自動保存済みの）状態でも再生結果は同じになる。
+        """
+        undo_entries: List[JournalEntry] = []
+        redo_entries: List[JournalEntry] = []
+        for op, payload in self.read_records():
+            if op == self.OP_BASE_PROJECT:
+                if project_store is None:
+                    raise RuntimeError(f"{self.path} is based on a project file, but no project is open.")
+                project_store.load(repository)
+                undo_entries.clear()
+                redo_entries.clear()
+            elif op == self.OP_SNAPSHOT:
+                (next_object_id,) = struct.unpack_from("<I", payload, 0)
+                repository.clear()
+                for annotation in AnnotationDelta.from_bytes(payload[4:]).added_annotations():
+                    repository.add_annotation(annotation)
+                repository.next_object_id = max(repository.next_object_id, next_object_id)
+                undo_entries.clear()
+                redo_entries.clear()
+            elif op == self.OP_EXECUTE:
+                entry = JournalEntry.from_bytes(payload)
+                entry.delta().apply(repository)
+                undo_entries.append(entry)
+                redo_entries.clear()
+            elif op == self.OP_UNDO and undo_entries:
+                entry = undo_entries.pop()
+                entry.delta().revert(repository)
+                redo_entries.append(entry)
+            elif op == self.OP_REDO and redo_entries:
+                entry = redo_entries.pop()
+                entry.delta().apply(repository)
+                undo_entries.append(entry)
+            elif op == self.OP_PUSH_UNDO:
+                undo_entries.append(JournalEntry.from_bytes(payload))
+            elif op == self.OP_PUSH_REDO:
+                redo_entries.append(JournalEntry.from_bytes(payload))
+        return undo_entries, redo_entries
@@ -1,7 +1,8 @@
 # AnnotationRepository.py  
-from typing import Dict, List, Optional  
+from typing import Dict, List, Optional, Set, Tuple  
 from DataClass import FrameAnnotation, ObjectAnnotation  
 from ErrorHandler import ErrorHandler  
+from TrackTimelineIndex import TrackTimelineIndex  
   
 class AnnotationRepository:  
     """アノテーションデータの管理専用クラス"""  
@@ -14,6 +15,13 @@ class AnnotationRepository:
         # ラベルキャッシュ  
         self._all_labels_cache = set()  
         self._is_labels_cache_dirty = True  
+          
+        # 前回の保存以降に変更されたフレーム（プロジェクトの差分保存用）  
+        self._dirty_frames: Set[int] = set()  
+        self._needs_full_save = True  
+          
+        # Track IDごとの存在区間（追加・削除のたびに差分更新）  
+        self.track_index = TrackTimelineIndex()  
       
     def add_annotation(self, annotation: ObjectAnnotation) -> ObjectAnnotation:  
         """アノテーションを追加"""  
@@ -30,7 +38,9 @@ class AnnotationRepository:
             annotation.object_id = self.get_next_object_id()  
           
         # アノテーションを追加  
-        self.frame_annotations[frame_id].objects.append(annotation)  
+        self.frame_annotations[frame_id].objects.append(annotation)    
+        self._dirty_frames.add(frame_id)  
+        self.track_index.add(annotation.object_id, frame_id)  
           
         # 手動アノテーションの場合は別途管理  
         if annotation.is_manual:  
@@ -55,11 +65,43 @@ class AnnotationRepository:
         for i, existing_ann in enumerate(self.frame_annotations[frame_id].objects):  
             if existing_ann.object_id == annotation.object_id:  
                 self.frame_annotations[frame_id].objects[i] = annotation  
-                self._is_labels_cache_dirty = True  
+                self._is_labels_cache_dirty = True    
+                self._dirty_frames.add(frame_id)  
                 return True  
           
         return False  
       
+    def find_annotation(self, object_id: int, frame_id: int) -> Optional[ObjectAnnotation]:  
+        """(object_id, frame_id) のアノテーションを取得"""  
+        frame_annotation = self.frame_annotations.get(frame_id)  
+        if frame_annotation:  
+            for annotation in frame_annotation.objects:  
+                if annotation.object_id == object_id:  
+                    return annotation  
+        return None  
+      
+    def upsert_annotation(self, annotation: ObjectAnnotation) -> ObjectAnnotation:  
+        """同じ (object_id, frame_id) があれば内容をその場で上書きし、なければ追加する  
+          
+        既存オブジェクトへの参照（選択中のアノテーションなど）を保つため、手動/自動の種別が  
+        同じ場合は既存オブジェクトのフィールドを書き換える。  
+        """  
+        existing = self.find_annotation(annotation.object_id, annotation.frame_id)  
+        if existing is not None and existing.is_manual == annotation.is_manual:  
+            existing.label = annotation.label  
+            existing.bbox = annotation.bbox  
+            existing.track_confidence = annotation.track_confidence  
+            existing.is_batch_added = annotation.is_batch_added  
+            self._is_labels_cache_dirty = True    
+            self._dirty_frames.add(annotation.frame_id)  
+            return existing  
+          
+        if existing is not None:  
+            self.delete_annotation(annotation.object_id, annotation.frame_id)  
+        if annotation.object_id >= self.next_object_id:  
+            self.next_object_id = annotation.object_id + 1  
+        return self.add_annotation(annotation)  
+      
     def delete_annotation(self, object_id: int, frame_id: int) -> bool:  
         """指定されたアノテーションを削除"""  
         if frame_id not in self.frame_annotations:  
@@ -80,7 +122,9 @@ class AnnotationRepository:
           
         success = len(self.frame_annotations[frame_id].objects) < initial_count  
         if success:  
-            self._is_labels_cache_dirty = True  
+            self._is_labels_cache_dirty = True    
+            self._dirty_frames.add(frame_id)  
+            self.track_index.remove(object_id, frame_id)  
           
         return success  
       
@@ -95,7 +139,9 @@ class AnnotationRepository:
                 obj for obj in frame_annotation.objects   
                 if obj.object_id != track_id  
             ]  
-            deleted_count += (initial_count - len(frame_annotation.objects))  
+            if len(frame_annotation.objects) < initial_count:  
+                deleted_count += (initial_count - len(frame_annotation.objects))  
+                self._dirty_frames.add(frame_id)  
               
             # フレームにアノテーションが残っていなければ、フレーム自体を削除  
             if not frame_annotation.objects:  
@@ -114,6 +160,7 @@ class AnnotationRepository:
           
         if deleted_count > 0:  
             self._is_labels_cache_dirty = True  
+        self.track_index.remove_track(track_id)  
           
         return deleted_count  
       
@@ -121,11 +168,12 @@ class AnnotationRepository:
         """指定されたTrack IDを持つすべてのアノテーションのラベルを更新"""  
         updated_count = 0  
           
-        for frame_annotation in self.frame_annotations.values():  
+        for frame_id, frame_annotation in self.frame_annotations.items():  
             for obj in frame_annotation.objects:  
                 if obj.object_id == track_id:  
                     obj.label = new_label  
                     updated_count += 1  
+                    self._dirty_frames.add(frame_id)  
           
         # manual_annotationsも更新  
         for manual_anns in self.manual_annotations.values():  
@@ -180,6 +228,20 @@ class AnnotationRepository:
         self.manual_annotations.clear()  
         self._all_labels_cache.clear()  
         self._is_labels_cache_dirty = True  
+        self._dirty_frames.clear()  
+        self._needs_full_save = True  
+        self.track_index.clear()  
+  
+    def has_unsaved_changes(self) -> bool:  
+        """前回の保存以降に変更があるかどうか"""  
+        return self._needs_full_save or bool(self._dirty_frames)  
+  
+    def take_dirty_frames(self) -> Tuple[bool, Set[int]]:  
+        """(全体の保存が必要か, 変更されたフレームID) を返し、変更記録をリセットする"""  
+        needs_full_save, dirty_frames = self._needs_full_save, self._dirty_frames  
+        self._needs_full_save = False  
+        self._dirty_frames = set()  
+        return needs_full_save, dirty_frames  
 
     def get_annotations_by_track_id(self, track_id: int) -> List[ObjectAnnotation]:  
         """指定されたトラックIDのアノテーションを全て取得"""  
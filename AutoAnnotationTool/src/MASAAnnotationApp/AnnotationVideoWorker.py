@@ -0,0 +1,50 @@
+# AnnotationVideoWorker.py
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from AnnotationVisualizer import AnnotationVisualizer
+
+class AnnotationVideoWorker(QThread):
+    """アノテーション付き動画の書き出し用ワーカースレッド"""
+
+    progress_updated = pyqtSignal(int, int)  # current_frame, total_frames
+    render_completed = pyqtSignal(str)  # output_path
+    render_cancelled = pyqtSignal()
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, video_manager, annotation_repository, output_path: str,
+                 scale: float = 1.0, num_workers=None):
+        super().__init__()
+        self.visualizer = AnnotationVisualizer()
+        self.video_manager = video_manager
+        self.annotation_repository = annotation_repository
+        self.output_path = output_path
+        self.scale = scale
+        self.num_workers = num_workers
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """書き出しの中断を要求（書きかけの出力は削除される）"""
+        self._cancel_event.set()
+
+    def run(self):
+        try:
+            completed = self.visualizer.create_annotation_video(
+                self.video_manager,
+                self.annotation_repository,
+                self.output_path,
+                scale=self.scale,
+                num_workers=self.num_workers,
+                progress_callback=self.emit_progress,
+                cancel_event=self._cancel_event
+            )
+            if completed:
+                self.render_completed.emit(self.output_path)
+            else:
+                self.render_cancelled.emit()
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+    def emit_progress(self, current, total):
+        self.progress_updated.emit(current, total)
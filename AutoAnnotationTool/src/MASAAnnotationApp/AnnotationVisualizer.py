@@ -2,11 +2,20 @@
 import cv2  
 import numpy as np  
 import colorsys  
-from typing import List, Tuple  
+import os  
+import queue  
+import threading  
+from collections import deque  
+from concurrent.futures import Future, ThreadPoolExecutor  
+from typing import Callable, Deque, List, Optional, Tuple  
 from DataClass import ObjectAnnotation  
+from SequentialFrameReader import SequentialFrameReader  
   
 class AnnotationVisualizer:  
     """アノテーション可視化クラス（改善版）"""  
+  
+    RENDER_QUEUE_PER_WORKER = 2  # 描画スレッドあたりの先読み・書き込み待ちフレーム数  
+    PROGRESS_INTERVAL = 30  # 進捗を通知するフレーム間隔  
       
     def __init__(self):  
         self.colors = self._generate_colors(100)  
@@ -26,9 +35,14 @@ class AnnotationVisualizer:
       
     def draw_annotations(self, frame: np.ndarray, annotations: List[ObjectAnnotation],   
                         show_ids: bool = True, show_confidence: bool = True,  
-                        selected_annotation: ObjectAnnotation = None) -> np.ndarray:  
-        """フレームにアノテーションを描画（選択表示対応）"""  
-        result_frame = frame.copy()  
+                        selected_annotation: ObjectAnnotation = None,
+                        scale: float = 1.0, in_place: bool = False) -> np.ndarray:  
+        """フレームにアノテーションを描画（選択表示対応）
+
+        scaleは縮小済みフレームに描画する場合の元画像座標からの倍率
+        in_place=Trueの場合はコピーせずに渡されたフレームへ直接描画する
+        """  
+        result_frame = frame if in_place else frame.copy()  
           
         for annotation in annotations:  
             color = self.colors[annotation.object_id % len(self.colors)]  
@@ -44,8 +58,8 @@ class AnnotationVisualizer:
                 thickness = 4 if annotation.is_manual else 2  # 手動アノテーションは太い線、それ以外は細い線
               
             # バウンディングボックス座標を整数に変換（四捨五入）  
-            pt1 = (int(round(annotation.bbox.x1)), int(round(annotation.bbox.y1)))  
-            pt2 = (int(round(annotation.bbox.x2)), int(round(annotation.bbox.y2)))  
+            pt1 = (int(round(annotation.bbox.x1 * scale)), int(round(annotation.bbox.y1 * scale)))  
+            pt2 = (int(round(annotation.bbox.x2 * scale)), int(round(annotation.bbox.y2 * scale)))  
               
             # 画像境界内にクリップ  
             h, w = frame.shape[:2]  
@@ -88,40 +102,147 @@ class AnnotationVisualizer:
         return result_frame  
       
     def create_annotation_video(self, video_manager, annotation_repository,   
-                              output_path: str, fps: int = 30):  
-        """アノテーション付き動画を作成"""  
+                              output_path: str, fps: Optional[float] = None,  
+                              scale: float = 1.0, num_workers: Optional[int] = None,  
+                              progress_callback: Optional[Callable[[int, int], None]] = None,  
+                              cancel_event: Optional[threading.Event] = None) -> bool:  
+        """アノテーション付き動画を作成  
+  
+        SequentialFrameReaderで順次デコードし、描画をスレッドプールに分散する。  
+        描画結果は投入順に並んだ有界バッファ（reorder buffer）から取り出し、  
+        専用の書き込みスレッドでフレーム順に書き出す。  
+        cv2の描画・エンコードはGILを解放するため、スレッドで並列化できる。  
+  
+        Args:  
+            fps: 出力FPS（Noneの場合は元動画のFPS）  
+            scale: 出力の縮小率（1.0で元サイズ）  
+            num_workers: 描画スレッド数（Noneの場合はCPU数から決定）  
+            progress_callback: (処理済みフレーム数, 総フレーム数) を受け取るコールバック  
+            cancel_event: セットされると中断し、書きかけの出力を削除する  
+  
+        Returns:  
+            最後まで書き出した場合True（中断・注釈なしの場合False）  
+        """  
         if not annotation_repository.frame_annotations:  
             print("No annotations to visualize")  
-            return  
-          
-        first_frame = video_manager.get_frame(0)  
-        if first_frame is None:  
-            print("Cannot read first frame")  
-            return  
-          
-        height, width = first_frame.shape[:2]  
-          
+            return False  
+  
+        total_frames = video_manager.get_total_frames()  
+        fps = fps or video_manager.get_fps() or 30.0  
+        scale = min(max(scale, 0.01), 1.0)  
+        # 多くのコーデックは偶数サイズを要求する  
+        width = max(2, int(video_manager.get_video_width() * scale) // 2 * 2)  
+        height = max(2, int(video_manager.get_video_height() * scale) // 2 * 2)  
+        scale_x = width / video_manager.get_video_width()  
+        scale_y = height / video_manager.get_video_height()  
+        num_workers = num_workers or max(1, min(8, (os.cpu_count() or 2) - 1))  
+        cancel_event = cancel_event or threading.Event()  
+  
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')  
         out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))  
-          
+        if not out.isOpened():  
+            raise RuntimeError(f"Failed to open video writer: {output_path}")  
+  
+        def resize(frame: np.ndarray) -> np.ndarray:  
+            if frame.shape[1] == width and frame.shape[0] == height:  
+                return frame  
+            return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)  
+  
+        writer = _OrderedVideoWriter(out, queue_size=self.RENDER_QUEUE_PER_WORKER * num_workers)  
+        reader = SequentialFrameReader(  
+            video_manager.video_path, 0, total_frames - 1,  
+            queue_size=self.RENDER_QUEUE_PER_WORKER * num_workers, transform=resize  
+        )  
+        completed = False  
+        processed = 0  
         try:  
-            for frame_id in range(video_manager.get_total_frames()):  
-                frame = video_manager.get_frame(frame_id)  
-                if frame is None:  
-                    continue  
-                  
-                frame_annotation = annotation_repository.get_annotations(frame_id)  
-                if frame_annotation and frame_annotation.objects:  
-                    annotated_frame = self.draw_annotations(frame, frame_annotation.objects)  
-                else:  
-                    annotated_frame = frame  
-                  
-                out.write(annotated_frame)  
-                  
-                if frame_id % 100 == 0:  
-                    print(f"Processed frame {frame_id}/{video_manager.get_total_frames()}")  
-              
-            print(f"Annotated video saved to {output_path}")  
-              
+            with ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix="AnnotationRender") as pool, reader:  
+                pending: Deque[Future] = deque()  
+                max_pending = self.RENDER_QUEUE_PER_WORKER * num_workers  
+                for frame_id, frame in reader:  
+                    if cancel_event.is_set():  
+                        break  
+                    processed = frame_id + 1  
+                    if frame is None:  
+                        continue  
+  
+                    frame_annotation = annotation_repository.get_annotations(frame_id)  
+                    if frame_annotation and frame_annotation.objects:  
+                        # 描画中にUI側でリストが変更されても影響しないようコピーを渡す  
+                        pending.append(pool.submit(  
+                            self._render_frame, frame, list(frame_annotation.objects), scale_x, scale_y  
+                        ))  
+                    else:  
+                        pending.append(_completed_future(frame))  
+  
+                    # 先頭（最も古いフレーム）から順に書き込みスレッドへ渡す  
+                    while len(pending) >= max_pending:  
+                        writer.write(pending.popleft().result())  
+  
+                    if progress_callback and frame_id % self.PROGRESS_INTERVAL == 0:  
+                        progress_callback(processed, total_frames)  
+  
+                while pending and not cancel_event.is_set():  
+                    writer.write(pending.popleft().result())  
+                for future in pending:  
+                    future.cancel()  
+            completed = not cancel_event.is_set()  
         finally:  
-            out.release()  
\ No newline at end of file
+            writer.close()  
+            if not completed and os.path.exists(output_path):  
+                os.remove(output_path)  
+  
+        if completed:  
+            if progress_callback:  
+                progress_callback(total_frames, total_frames)  
+            print(f"Annotated video saved to {output_path}")  
+        return completed  
+  
+    def _render_frame(self, frame: np.ndarray, annotations: List[ObjectAnnotation],  
+                      scale_x: float, scale_y: float) -> np.ndarray:  
+        """描画スレッドで1フレームを描画（デコード済みのフレームは使い回さないのでコピーしない）"""  
+        return self.draw_annotations(frame, annotations, scale=min(scale_x, scale_y), in_place=True)  
+  
+  
+def _completed_future(result) -> Future:  
+    future: Future = Future()  
+    future.set_result(result)  
+    return future  
+  
+  
+class _OrderedVideoWriter:  
+    """受け取った順にcv2.VideoWriterへ書き込む専用スレッド"""  
+  
+    _END = object()  
+  
+    def __init__(self, video_writer, queue_size: int):  
+        self._video_writer = video_writer  
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))  
+        self._error: Optional[Exception] = None  
+        self._thread = threading.Thread(target=self._run, name="AnnotationVideoWriter", daemon=True)  
+        self._thread.start()  
+  
+    def write(self, frame: np.ndarray):  
+        if self._error is not None:  
+            raise self._error  
+        self._queue.put(frame)  
+  
+    def close(self):  
+        """書き込み待ちのフレームを書き切ってVideoWriterを閉じる"""  
+        self._queue.put(self._END)  
+        self._thread.join()  
+        self._video_writer.release()  
+        if self._error is not None:  
+            raise self._error  
+  
+    def _run(self):  
+        while True:  
+            frame = self._queue.get()  
+            if frame is self._END:  
+                return  
+            if self._error is not None:  
+                continue  
+            try:  
+                self._video_writer.write(frame)  
+            except Exception as e:  
+                self._error = e  
@@ -35,6 +35,7 @@ class BasicSettingsTabManager(QWidget):
         self.load_json_btn: Optional[QPushButton] = None
         self.save_masa_json_btn: Optional[QPushButton] = None
         self.save_coco_json_btn: Optional[QPushButton] = None
+        self.save_video_btn: Optional[QPushButton] = None
         self.play_btn: Optional[QPushButton] = None
         self.pause_btn: Optional[QPushButton] = None
         self.export_progress_bar: Optional[QProgressBar] = None
@@ -107,9 +108,13 @@ class BasicSettingsTabManager(QWidget):
         self.save_masa_json_btn.setEnabled(False)
         self.save_coco_json_btn = QPushButton("Save COCO JSON")
         self.save_coco_json_btn.setEnabled(False)
+        self.save_video_btn = QPushButton("Save Video")
+        self.save_video_btn.setToolTip("アノテーションを描画した動画を書き出す")
+        self.save_video_btn.setEnabled(False)
         
         export_layout.addWidget(self.save_masa_json_btn)
         export_layout.addWidget(self.save_coco_json_btn)
+        export_layout.addWidget(self.save_video_btn)
         file_layout.addLayout(export_layout)
         
         file_group.setLayout(file_layout)
@@ -154,6 +159,7 @@ class BasicSettingsTabManager(QWidget):
         self.load_json_btn.clicked.connect(self._on_load_json_clicked)
         self.save_masa_json_btn.clicked.connect(self._on_save_masa_json_clicked)
         self.save_coco_json_btn.clicked.connect(self._on_save_coco_json_clicked)
+        self.save_video_btn.clicked.connect(self._on_save_video_clicked)
         self.play_btn.clicked.connect(self._on_play_clicked)
         self.pause_btn.clicked.connect(self._on_pause_clicked)
         
@@ -185,6 +191,10 @@ class BasicSettingsTabManager(QWidget):
         """COCO JSON保存ボタンクリック"""
         self.export_requested.emit("coco")
         
+    def _on_save_video_clicked(self):
+        """アノテーション付き動画保存ボタンクリック（書き出し中は中断）"""
+        self.export_requested.emit("video")
+        
     def _on_play_clicked(self):
         """再生ボタンクリック"""
         self.play_requested.emit()
@@ -220,6 +230,8 @@ class BasicSettingsTabManager(QWidget):
             self.save_masa_json_btn.setEnabled(True)
         if self.save_coco_json_btn:
             self.save_coco_json_btn.setEnabled(True)
+        if self.save_video_btn:
+            self.save_video_btn.setEnabled(True)
             
     def update_export_progress(self, message: str, progress: int = -1):
         """エクスポート進捗を更新"""
@@ -234,6 +246,11 @@ class BasicSettingsTabManager(QWidget):
                 if message == "":
                     self.export_progress_bar.setVisible(False)
                     
+    def set_video_export_running(self, running: bool):
+        """動画書き出し中はボタンを中断ボタンとして表示"""
+        if self.save_video_btn:
+            self.save_video_btn.setText("Cancel Video" if running else "Save Video")
+            
     def reset_playback_button(self):
         """再生ボタンをリセット（一時停止後）"""
         # 必要に応じて再生ボタンの状態をリセット
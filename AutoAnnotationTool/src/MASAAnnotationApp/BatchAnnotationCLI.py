@@ -0,0 +1,258 @@
+# BatchAnnotationCLI.py
+"""
+GUIを使わずに複数動画をまとめて自動アノテーションするコマンドラインツール
+
+マニフェスト（JSON Lines または JSON配列）の各エントリについて
+動画読み込み → （任意）既存JSON読み込み → テキストプロンプトで追跡 → COCO JSONエクスポート
+を MASAApplicationService 経由で実行する。Qtはインポートしない。
+
+動画はプロセスプールに分配し、各ワーカープロセスは起動時に1つのデバイスを受け取って
+モデルを1回だけ初期化する。動画ごとに状態ファイル（<name>.status.json）を書き出し、
+再実行時は完了済みの動画をスキップする。
+
+マニフェストのエントリ例:
+    {"video": "videos/a.mp4", "prompt": "person . car"}
+    {"video": "videos/b.mp4", "prompt": "dog", "json": "b_seed.json", "name": "b", "score_threshold": 0.3}
+
+使用例:
+    python BatchAnnotationCLI.py --manifest manifest.jsonl --output-dir out --devices cuda:0,cuda:1
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from ErrorHandler import ErrorHandler
+
+STATUS_SUFFIX = ".status.json"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# ワーカープロセスごとの状態（プロセス起動時に初期化）
+_worker_service = None
+_worker_device: Optional[str] = None
+
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """マニフェストを読み込み、各エントリに出力名（name）を補完する"""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if content.lstrip().startswith('['):
+        entries = json.loads(content)
+    else:
+        entries = [json.loads(line) for line in content.splitlines() if line.strip()]
+
+    names = set()
+    for index, entry in enumerate(entries):
+        if "video" not in entry or "prompt" not in entry:
+            raise ValueError(f"Manifest entry {index} requires 'video' and 'prompt'")
+        entry.setdefault("name", os.path.splitext(os.path.basename(entry["video"]))[0])
+        if entry["name"] in names:
+            raise ValueError(f"Duplicate output name '{entry['name']}' in manifest. Set 'name' explicitly.")
+        names.add(entry["name"])
+    return entries
+
+
+def status_path(output_dir: str, name: str) -> str:
+    return os.path.join(output_dir, f"{name}{STATUS_SUFFIX}")
+
+
+def output_path(output_dir: str, name: str) -> str:
+    return os.path.join(output_dir, f"{name}_coco.json")
+
+
+def read_status(output_dir: str, name: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(status_path(output_dir, name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_status(output_dir: str, name: str, status: Dict[str, Any]):
+    """状態ファイルをアトミックに書き換える"""
+    path = status_path(output_dir, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(status, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def is_completed(output_dir: str, entry: Dict[str, Any]) -> bool:
+    """前回の実行で完了済み（状態ファイルと出力の両方がある）か"""
+    status = read_status(output_dir, entry["name"])
+    return (status is not None and status.get("state") == STATUS_DONE
+            and all(os.path.exists(path) for path in status.get("outputs", [])))
+
+
+def _init_worker(device_queue, masa_overrides: Dict[str, Any]):
+    """ワーカープロセスの初期化: デバイスを1つ受け取り、モデルを1回だけ読み込む"""
+    global _worker_service, _worker_device
+    from MASAApplicationService import MASAApplicationService
+
+    ErrorHandler.set_headless(True)
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s [{os.getpid()}] %(levelname)s - %(message)s')
+
+    _worker_device = device_queue.get()
+    _worker_service = MASAApplicationService()
+    for key, value in masa_overrides.items():
+        _worker_service.config_manager.update_config(key, value, config_type="masa")
+    _worker_service.config_manager.update_config("device", _worker_device, config_type="masa")
+    _worker_service.initialize_object_tracker()
+    logging.info(f"Worker ready on {_worker_device}")
+
+
+def process_video(entry: Dict[str, Any], output_dir: str, default_score_threshold: float) -> Dict[str, Any]:
+    """1本の動画を処理して状態を返す（ワーカープロセスで実行）"""
+    service = _worker_service
+    name = entry["name"]
+    status: Dict[str, Any] = {
+        "state": STATUS_RUNNING,
+        "video": entry["video"],
+        "prompt": entry["prompt"],
+        "device": _worker_device,
+        "pid": os.getpid(),
+        "started_at": time.time(),
+    }
+    write_status(output_dir, name, status)
+
+    try:
+        # 前の動画の状態を持ち越さない
+        service.annotation_repository.clear()
+        service.command_manager.clear()
+
+        if not service.load_video(entry["video"]):
+            raise RuntimeError(f"Failed to load video: {entry['video']}")
+        if entry.get("json") and not service.load_json(entry["json"]):
+            raise RuntimeError(f"Failed to load JSON: {entry['json']}")
+
+        last_logged = [time.perf_counter()]
+
+        def log_progress(current: int, total: int):
+            now = time.perf_counter()
+            if now - last_logged[0] >= 10.0 or current == total:
+                last_logged[0] = now
+                logging.info(f"{name}: {current}/{total} frames")
+
+        tracked_count = service.track_video(
+            entry["prompt"],
+            start_frame=entry.get("start_frame", 0),
+            end_frame=entry.get("end_frame"),
+            progress_callback=log_progress
+        )
+
+        score_threshold = entry.get("score_threshold", default_score_threshold)
+        service.update_display_setting("score_threshold", score_threshold)
+        coco_path = output_path(output_dir, name)
+        if not service.export_coco_json(coco_path):
+            raise RuntimeError("COCO export failed (no annotations above the score threshold?)")
+
+        status.update({
+            "state": STATUS_DONE,
+            "tracked_annotations": tracked_count,
+            "total_annotations": service.get_statistics()["total"],
+            "score_threshold": score_threshold,
+            "outputs": [coco_path],
+        })
+    except Exception as e:
+        status.update({
+            "state": STATUS_FAILED,
+            "error": str(e),
+            "traceback": traceback.format_exc(),
+        })
+    finally:
+        if service.video_manager:
+            service.video_manager.release()
+            service.video_manager = None
+
+    status["finished_at"] = time.time()
+    status["elapsed_sec"] = status["finished_at"] - status["started_at"]
+    write_status(output_dir, name, status)
+    return status
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='MASA Annotation Tool (headless batch mode)')
+    parser.add_argument('--manifest', required=True, help='Manifest file (JSON Lines or JSON array)')
+    parser.add_argument('--output-dir', required=True, help='Directory for COCO JSON and status files')
+    parser.add_argument('--devices', default=None,
+                        help='Comma separated devices, e.g. "cuda:0,cuda:1" (default: MASAConfig.device)')
+    parser.add_argument('--workers-per-device', type=int, default=1,
+                        help='Worker processes (= model instances) per device')
+    parser.add_argument('--score-threshold', type=float, default=0.2,
+                        help='Default score threshold for export (overridable per entry)')
+    parser.add_argument('--masa-config', default=None, help='Override MASAConfig.masa_config_path')
+    parser.add_argument('--masa-checkpoint', default=None, help='Override MASAConfig.masa_checkpoint_path')
+    parser.add_argument('--fp16', action='store_true', help='Run inference in fp16')
+    parser.add_argument('--force', action='store_true', help='Reprocess videos that are already done')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    ErrorHandler.set_headless(True)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s - %(message)s')
+
+    entries = load_manifest(args.manifest)
+    os.makedirs(args.output_dir, exist_ok=True)
+    pending = [entry for entry in entries if args.force or not is_completed(args.output_dir, entry)]
+    logging.info(f"{len(entries)} videos in manifest, {len(entries) - len(pending)} already done, "
+                 f"{len(pending)} to process")
+    if not pending:
+        return 0
+
+    masa_overrides: Dict[str, Any] = {}
+    if args.masa_config:
+        masa_overrides["masa_config_path"] = args.masa_config
+    if args.masa_checkpoint:
+        masa_overrides["masa_checkpoint_path"] = args.masa_checkpoint
+    if args.fp16:
+        masa_overrides["fp16"] = True
+
+    if args.devices:
+        devices = [device.strip() for device in args.devices.split(',') if device.strip()]
+    else:
+        from DataClass import MASAConfig
+        devices = [MASAConfig().device]
+    worker_devices = [device for device in devices for _ in range(max(1, args.workers_per_device))]
+    num_workers = min(len(worker_devices), len(pending))
+
+    # CUDAを使うためforkではなくspawnでワーカーを起動する
+    context = multiprocessing.get_context("spawn")
+    device_queue = context.Queue()
+    for device in worker_devices[:num_workers]:
+        device_queue.put(device)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=num_workers, mp_context=context,
+                             initializer=_init_worker, initargs=(device_queue, masa_overrides)) as executor:
+        futures = {
+            executor.submit(process_video, entry, args.output_dir, args.score_threshold): entry
+            for entry in pending
+        }
+        for done_count, future in enumerate(as_completed(futures), 1):
+            entry = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                # ワーカープロセス自体が落ちた場合（モデル初期化失敗など）
+                status = {"state": STATUS_FAILED, "error": str(e)}
+                write_status(args.output_dir, entry["name"], dict(status, video=entry["video"]))
+            if status["state"] != STATUS_DONE:
+                failed += 1
+            logging.info(f"[{done_count}/{len(pending)}] {entry['name']}: {status['state']}"
+                         + (f" ({status['error']})" if status.get("error") else ""))
+
+    logging.info(f"Finished: {len(pending) - failed} done, {failed} failed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
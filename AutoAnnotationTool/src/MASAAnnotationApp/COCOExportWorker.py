@@ -10,23 +10,30 @@ class COCOExportWorker(QThread):
     export_completed = pyqtSignal()  
     error_occurred = pyqtSignal(str)  
       
-    def __init__(self, export_service, frame_annotations, video_path, file_path, video_manager):  
+    def __init__(self, export_service, frame_rows, video_path, file_path, video_manager,  
+                 score_threshold=None, category_names=None, shard_size=None):  
         super().__init__()  
         self.export_service = export_service  
-        self.frame_annotations = frame_annotations  
+        self.frame_rows = frame_rows  # ExportService.snapshot_coco_rows()の結果  
         self.video_path = video_path  
         self.file_path = file_path  
         self.video_manager = video_manager  
+        self.score_threshold = score_threshold  
+        self.category_names = category_names  
+        self.shard_size = shard_size  
       
     def run(self):  
         try:  
             # 進捗付きでエクスポート実行  
             self.export_service.export_coco_with_progress(  
-                self.frame_annotations,  
+                self.frame_rows,  
                 self.video_path,  
                 self.file_path,  
                 self.video_manager,  
-                progress_callback=self.emit_progress  
+                progress_callback=self.emit_progress,  
+                score_threshold=self.score_threshold,  
+                category_names=self.category_names,  
+                shard_size=self.shard_size  
             )  
             self.export_completed.emit()  
         except Exception as e:  
@@ -1,8 +1,10 @@
 # CommandPattern.py  
 from abc import ABC, abstractmethod  
-from typing import Any, List  
+from collections import deque  
+from typing import Any, Deque, List, Optional  
 
 from DataClass import ObjectAnnotation, BoundingBox
+from AnnotationJournal import AnnotationDelta, AnnotationJournal, JournalEntry
 
   
 class Command(ABC):  
@@ -22,6 +24,13 @@ class Command(ABC):
     def get_description(self) -> str:  
         """コマンドの説明を取得"""  
         pass  
+      
+    def to_delta(self) -> Optional[AnnotationDelta]:  
+        """実行後に呼ばれ、履歴に保存するコンパクトな差分を返す  
+          
+        Noneを返すコマンドはオブジェクトのまま履歴に保持され、WALには記録されない。  
+        """  
+        return None  
   
 class AddAnnotationCommand(Command):  
     """アノテーション追加コマンド"""  
@@ -40,6 +49,9 @@ class AddAnnotationCommand(Command):
       
     def get_description(self) -> str:  
         return f"Add annotation {self.annotation.label} at frame {self.annotation.frame_id}"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(after=[self.annotation])  
   
 class DeleteAnnotationCommand(Command):  
     """アノテーション削除コマンド"""  
@@ -58,6 +70,9 @@ class DeleteAnnotationCommand(Command):
       
     def get_description(self) -> str:  
         return f"Delete annotation {self.annotation.label} at frame {self.annotation.frame_id}"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(before=[self.annotation])  
   
 class DeleteTrackCommand(Command):  
     """トラック削除コマンド"""  
@@ -80,6 +95,9 @@ class DeleteTrackCommand(Command):
       
     def get_description(self) -> str:  
         return f"Delete track {self.track_id} ({len(self.deleted_annotations)} annotations)"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(before=self.deleted_annotations)  
   
 class UpdateLabelCommand(Command):  
     """ラベル更新コマンド"""  
@@ -100,6 +118,12 @@ class UpdateLabelCommand(Command):
       
     def get_description(self) -> str:  
         return f"Update label from '{self.old_label}' to '{self.new_label}'"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(  
+            before=[self.annotation], after=[self.annotation],  
+            before_overrides={"label": self.old_label}, after_overrides={"label": self.new_label}  
+        )  
   
 class UpdateLabelByTrackCommand(Command):  
     """トラック単位でのラベル更新コマンド"""  
@@ -121,6 +145,12 @@ class UpdateLabelByTrackCommand(Command):
       
     def get_description(self) -> str:  
         return f"Update track {self.track_id} label from '{self.old_label}' to '{self.new_label}'"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        # 全フレーム分の行は持たず、トラックIDとラベルだけを記録する  
+        delta = AnnotationDelta()  
+        delta.add_relabel_track(self.track_id, self.old_label, self.new_label)  
+        return delta  
   
 class MacroCommand(Command):  
     """複数のコマンドをまとめて実行するマクロコマンド"""  
@@ -144,6 +174,15 @@ class MacroCommand(Command):
       
     def get_description(self) -> str:  
         return self.description  
+      
+    def to_delta(self) -> Optional[AnnotationDelta]:  
+        delta = AnnotationDelta()  
+        for command in self.commands:  
+            child_delta = command.to_delta()  
+            if child_delta is None:  
+                return None  
+            delta.extend(child_delta)  
+        return delta  
 
 class UpdateBoundingBoxCommand(Command):  
     """バウンディングボックス位置・サイズ更新コマンド"""  
@@ -164,24 +203,105 @@ class UpdateBoundingBoxCommand(Command):
       
     def get_description(self) -> str:  
         return f"Update bounding box position for {self.annotation.label} at frame {self.annotation.frame_id}"  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(  
+            before=[self.annotation], after=[self.annotation],  
+            before_overrides={"bbox": self.old_bbox}, after_overrides={"bbox": self.new_bbox}  
+        )  
+  
+class AddAnnotationsCommand(Command):  
+    """複数アノテーションの一括追加コマンド（追跡結果の反映など）"""  
+      
+    def __init__(self, annotation_repository, annotations: List[ObjectAnnotation], description: str = ""):  
+        self.annotation_repository = annotation_repository  
+        self.annotations = annotations  
+        self.description = description or f"Add {len(annotations)} annotations"  
+      
+    def execute(self):  
+        added_count = 0  
+        for annotation in self.annotations:  
+            if self.annotation_repository.add_annotation(annotation):  
+                added_count += 1  
+        return added_count  
+      
+    def undo(self):  
+        deleted_count = 0  
+        for annotation in self.annotations:  
+            if self.annotation_repository.delete_annotation(annotation.object_id, annotation.frame_id):  
+                deleted_count += 1  
+        return deleted_count  
+      
+    def get_description(self) -> str:  
+        return self.description  
+      
+    def to_delta(self) -> AnnotationDelta:  
+        return AnnotationDelta.rows(after=self.annotations)  
 
+class _CommandEntry:  
+    """差分を持たないコマンドを履歴に保持するためのラッパー"""  
+      
+    nbytes = 1024  # 概算サイズ  
+      
+    def __init__(self, command: Command):  
+        self.command = command  
+        self.description = command.get_description()  
+  
 class CommandManager:  
-    """コマンド履歴を管理するマネージャー"""  
+    """コマンド履歴を管理するマネージャー  
+      
+    履歴はコマンドオブジェクトではなくエンコード済みの差分（JournalEntry）で保持し、  
+    合計バイト数がmax_history_bytesを超えたら古いものから破棄する。  
+    WAL（AnnotationJournal）を接続すると、実行・Undo・Redoを追記して再起動時に復元できる。  
+    """  
+      
+    def __init__(self, annotation_repository=None, max_history_bytes: int = 64 << 20):  
+        self.undo_stack: Deque[JournalEntry] = deque()  
+        self.redo_stack: List[JournalEntry] = []  
+        self.max_history_bytes = max_history_bytes  
+        self.history_bytes = 0  
+        self.annotation_repository = annotation_repository  
+        self.journal: Optional[AnnotationJournal] = None  
+        self.project_store = None  
       
-    def __init__(self, max_history_size: int = 100):  
-        self.undo_stack: List[Command] = []  
-        self.redo_stack: List[Command] = []  
-        self.max_history_size = max_history_size  
+    def attach_journal(self, journal: Optional[AnnotationJournal], annotation_repository, project_store=None):  
+        """WALを接続（Noneで切り離し）  
+          
+        project_storeを指定すると、チェックポイント時にプロジェクトへ差分保存し、  
+        WALにはスナップショットの代わりにプロジェクトを起点とするレコードを書く。  
+        """  
+        if self.journal is not None and self.journal is not journal:  
+            self.journal.close()  
+        self.journal = journal  
+        self.annotation_repository = annotation_repository  
+        self.project_store = project_store  
       
     def execute_command(self, command: Command):  
         """コマンドを実行し、履歴に追加"""  
         result = command.execute()  
-        self.undo_stack.append(command)  
-        self.redo_stack.clear()  # 新しいコマンド実行時はredo履歴をクリア  
+        if self.annotation_repository is None:  
+            self.annotation_repository = getattr(command, 'annotation_repository', None)  
+          
+        delta = command.to_delta()  
+        if delta is not None:  
+            entry = JournalEntry.from_delta(command.get_description(), delta)  
+        else:  
+            entry = _CommandEntry(command)  
+          
+        # 新しいコマンド実行時はredo履歴をクリア  
+        for redo_entry in self.redo_stack:  
+            self.history_bytes -= redo_entry.nbytes  
+        self.redo_stack.clear()  
+        self._push_undo(entry)  
           
-        # 履歴サイズ制限  
-        if len(self.undo_stack) > self.max_history_size:  
-            self.undo_stack.pop(0)  
+        if self.journal is not None:  
+            if isinstance(entry, JournalEntry):  
+                self.journal.append(AnnotationJournal.OP_EXECUTE, entry.to_bytes())  
+                if self.journal.needs_compaction():  
+                    self.checkpoint()  
+            else:  
+                # 差分にできない変更はスナップショットとして記録する  
+                self.checkpoint()  
           
         return result  
       
@@ -190,9 +310,15 @@ class CommandManager:
         if not self.undo_stack:  
             return False  
           
-        command = self.undo_stack.pop()  
-        result = command.undo()  
-        self.redo_stack.append(command)  
+        entry = self.undo_stack.pop()  
+        self.redo_stack.append(entry)  
+        if isinstance(entry, _CommandEntry):  
+            result = entry.command.undo()  
+            self.checkpoint()  
+        else:  
+            result = entry.delta().revert(self._require_repository()) or True  
+            if self.journal is not None:  
+                self.journal.append(AnnotationJournal.OP_UNDO)  
         return result  
       
     def redo(self):  
@@ -200,11 +326,62 @@ class CommandManager:
         if not self.redo_stack:  
             return False  
           
-        command = self.redo_stack.pop()  
-        result = command.execute()  
-        self.undo_stack.append(command)  
+        entry = self.redo_stack.pop()  
+        self.undo_stack.append(entry)  
+        if isinstance(entry, _CommandEntry):  
+            result = entry.command.execute()  
+            self.checkpoint()  
+        else:  
+            result = entry.delta().apply(self._require_repository()) or True  
+            if self.journal is not None:  
+                self.journal.append(AnnotationJournal.OP_REDO)  
         return result  
       
+    def _require_repository(self):  
+        if self.annotation_repository is None:  
+            raise RuntimeError("CommandManager has no annotation repository to apply history to.")  
+        return self.annotation_repository  
+      
+    def _push_undo(self, entry):  
+        self.undo_stack.append(entry)  
+        self.history_bytes += entry.nbytes  
+        # 履歴サイズ制限（バイト数）  
+        while self.history_bytes > self.max_history_bytes and len(self.undo_stack) > 1:  
+            self.history_bytes -= self.undo_stack.popleft().nbytes  
+      
+    def checkpoint(self):  
+        """WALを現在の状態と履歴だけに書き直す"""  
+        if self.journal is None or self.annotation_repository is None:  
+            return  
+        # 差分にできない履歴はWALに残せないため、それより前（Redoは後）の履歴は復元対象外になる  
+        undo_entries = self._entries_after_last_command(self.undo_stack)  
+        redo_entries = self._entries_after_last_command(self.redo_stack)  
+        if self.project_store is not None:  
+            self.project_store.save(self.annotation_repository)  
+        self.journal.checkpoint(  
+            self.annotation_repository, undo_entries, redo_entries,  
+            base_on_project=self.project_store is not None  
+        )  
+      
+    @staticmethod  
+    def _entries_after_last_command(entries) -> List[JournalEntry]:  
+        result: List[JournalEntry] = []  
+        for entry in entries:  
+            if isinstance(entry, _CommandEntry):  
+                result.clear()  
+            else:  
+                result.append(entry)  
+        return result  
+      
+    def restore(self, undo_entries: List[JournalEntry], redo_entries: List[JournalEntry]):  
+        """WALから復元した履歴を設定"""  
+        self.clear()  
+        for entry in undo_entries:  
+            self._push_undo(entry)  
+        for entry in redo_entries:  
+            self.redo_stack.append(entry)  
+            self.history_bytes += entry.nbytes  
+      
     def can_undo(self) -> bool:  
         """Undoが可能かどうか"""  
         return len(self.undo_stack) > 0  
@@ -216,16 +393,17 @@ class CommandManager:
     def get_undo_description(self) -> str:  
         """次にUndoされるコマンドの説明を取得"""  
         if self.can_undo():  
-            return self.undo_stack[-1].get_description()  
+            return self.undo_stack[-1].description  
         return ""  
       
     def get_redo_description(self) -> str:  
         """次にRedoされるコマンドの説明を取得"""  
         if self.can_redo():  
-            return self.redo_stack[-1].get_description()  
+            return self.redo_stack[-1].description  
         return ""  
       
     def clear(self):  
         """履歴をクリア"""  
         self.undo_stack.clear()  
-        self.redo_stack.clear()
\ No newline at end of file
+        self.redo_stack.clear()  
+        self.history_bytes = 0  
@@ -2,13 +2,28 @@
 from typing import List, Optional
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QTableWidget, QTableWidgetItem, QHeaderView,
+    QTableView, QHeaderView, QAbstractItemView,
     QComboBox, QCheckBox, QGroupBox, QPushButton
 )
-from PyQt6.QtCore import Qt, pyqtSignal
+from PyQt6.QtCore import Qt, pyqtSignal, QItemSelectionModel
 from PyQt6.QtGui import QFont
 
 from DataClass import ObjectAnnotation, FrameAnnotation
+from ObjectTableModel import ObjectTableColumn, ObjectAnnotationTableModel, ObjectAnnotationFilterProxyModel
+
+ALL_LABELS_TEXT = "すべて"
+
+OBJECT_COLUMNS = [
+    ObjectTableColumn("Track ID", lambda a: str(a.object_id), lambda a: a.object_id),
+    ObjectTableColumn("ラベル", lambda a: a.label, lambda a: a.label, align_center=False),
+    ObjectTableColumn(
+        "座標 (x1,y1,x2,y2)",
+        lambda a: f"({a.bbox.x1:.0f},{a.bbox.y1:.0f},{a.bbox.x2:.0f},{a.bbox.y2:.0f})",
+        lambda a: (a.bbox.x1, a.bbox.y1)
+    ),
+    ObjectTableColumn("信頼度", lambda a: f"{a.bbox.confidence:.3f}", lambda a: a.bbox.confidence),
+    ObjectTableColumn("種別", lambda a: "手動" if a.is_manual else "自動", lambda a: a.is_manual),
+]
 
 
 class CurrentFrameObjectListWidget(QWidget):
@@ -24,6 +39,7 @@ class CurrentFrameObjectListWidget(QWidget):
         self.current_annotations: List[ObjectAnnotation] = []
         self.selected_annotation: Optional[ObjectAnnotation] = None
         self.score_threshold = 0.2  # デフォルトのスコア閾値
+        self.known_labels = set()  # ラベルフィルタに登録済みのラベル
         
         self.setup_ui()
         self._connect_signals()
@@ -54,7 +70,7 @@ class CurrentFrameObjectListWidget(QWidget):
         label_filter_layout = QHBoxLayout()
         label_filter_layout.addWidget(QLabel("ラベル:"))
         self.label_filter_combo = QComboBox()
-        self.label_filter_combo.addItem("すべて")
+        self.label_filter_combo.addItem(ALL_LABELS_TEXT)
         self.label_filter_combo.setEditable(False)
         label_filter_layout.addWidget(self.label_filter_combo)
         filter_layout.addLayout(label_filter_layout)
@@ -88,7 +104,12 @@ class CurrentFrameObjectListWidget(QWidget):
         layout.addWidget(filter_group)
         
         # オブジェクト一覧テーブル
-        self.table = QTableWidget()
+        self.model = ObjectAnnotationTableModel(OBJECT_COLUMNS, self)
+        self.proxy_model = ObjectAnnotationFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.model)
+        self.proxy_model.set_filters(score_threshold=self.score_threshold)
+        self.table = QTableView()
+        self.table.setModel(self.proxy_model)
         self.setup_table()
         layout.addWidget(self.table)
         
@@ -96,11 +117,6 @@ class CurrentFrameObjectListWidget(QWidget):
         
     def setup_table(self):
         """テーブルの初期設定"""
-        # 列の設定
-        columns = ["Track ID", "ラベル", "座標 (x1,y1,x2,y2)", "信頼度", "種別"]
-        self.table.setColumnCount(len(columns))
-        self.table.setHorizontalHeaderLabels(columns)
-        
         # 列幅の調整（ユーザーがマウスで調整可能）
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeMode.Interactive)  # Track ID
@@ -120,22 +136,23 @@ class CurrentFrameObjectListWidget(QWidget):
         header.setMinimumSectionSize(20)  # 最小20px
         
         # テーブルの設定
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SelectionMode.SingleSelection)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
         self.table.setAlternatingRowColors(True)
         self.table.setSortingEnabled(True)
+        self.table.verticalHeader().setVisible(False)
         
         # スタイル設定
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 gridline-color: #d0d0d0;
                 background-color: white;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #4CAF50;
                 color: white;
             }
-            QTableWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #e8f5e8;
             }
             QHeaderView::section {
@@ -148,8 +165,8 @@ class CurrentFrameObjectListWidget(QWidget):
         
     def _connect_signals(self):
         """シグナル接続"""
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)
-        self.table.itemDoubleClicked.connect(self._on_item_double_clicked)
+        self.table.selectionModel().selectionChanged.connect(self._on_selection_changed)
+        self.table.doubleClicked.connect(self._on_item_double_clicked)
         self.label_filter_combo.currentTextChanged.connect(self._apply_filters)
         self.show_manual_cb.stateChanged.connect(self._apply_filters)
         self.show_auto_cb.stateChanged.connect(self._apply_filters)
@@ -165,118 +182,41 @@ class CurrentFrameObjectListWidget(QWidget):
             self.current_annotations = []
             
         self._update_label_filter()
-        self._populate_table()
+        self.model.set_annotations(self.current_annotations)
         self._update_object_count()
         
     def _update_label_filter(self):
-        """ラベルフィルタコンボボックスを更新"""
-        current_selection = self.label_filter_combo.currentText()
-        self.label_filter_combo.blockSignals(True)
-        
-        self.label_filter_combo.clear()
-        self.label_filter_combo.addItem("すべて")
-        
-        # 現在のフレームのラベルを取得
-        labels = set()
-        for annotation in self.current_annotations:
-            labels.add(annotation.label)
-            
-        for label in sorted(labels):
-            self.label_filter_combo.addItem(label)
-            
-        # 以前の選択を復元
-        index = self.label_filter_combo.findText(current_selection)
-        if index >= 0:
-            self.label_filter_combo.setCurrentIndex(index)
-        else:
-            self.label_filter_combo.setCurrentIndex(0)
+        """未登録のラベルだけをラベルフィルタコンボボックスに追加（フレームごとに作り直さない）"""
+        new_labels = {annotation.label for annotation in self.current_annotations} - self.known_labels
+        if not new_labels:
+            return
             
+        self.label_filter_combo.blockSignals(True)
+        for label in sorted(new_labels):
+            # 先頭の「すべて」を除いてソート順を保つ位置に挿入
+            insert_at = 1 + sum(1 for known in self.known_labels if known < label)
+            self.label_filter_combo.insertItem(insert_at, label)
+            self.known_labels.add(label)
         self.label_filter_combo.blockSignals(False)
         
-    def _populate_table(self):
-        """テーブルにデータを設定"""
-        # フィルタリング適用
-        filtered_annotations = self._get_filtered_annotations()
-        
-        self.table.setRowCount(len(filtered_annotations))
-        self.table.setSortingEnabled(False)  # ソートを一時無効化
-        
-        for row, annotation in enumerate(filtered_annotations):
-            # Track ID
-            track_id_item = QTableWidgetItem(str(annotation.object_id))
-            track_id_item.setData(Qt.ItemDataRole.UserRole, annotation)
-            track_id_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            track_id_item.setFlags(track_id_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  # 編集不可
-            self.table.setItem(row, 0, track_id_item)
-            
-            # ラベル
-            label_item = QTableWidgetItem(annotation.label)
-            label_item.setData(Qt.ItemDataRole.UserRole, annotation)
-            label_item.setFlags(label_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  # 編集不可
-            self.table.setItem(row, 1, label_item)
-            
-            # 座標
-            bbox = annotation.bbox
-            coord_text = f"({bbox.x1:.0f},{bbox.y1:.0f},{bbox.x2:.0f},{bbox.y2:.0f})"
-            coord_item = QTableWidgetItem(coord_text)
-            coord_item.setData(Qt.ItemDataRole.UserRole, annotation)
-            coord_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            coord_item.setFlags(coord_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  # 編集不可
-            self.table.setItem(row, 2, coord_item)
-            
-            # 信頼度
-            confidence_text = f"{annotation.bbox.confidence:.3f}"
-            confidence_item = QTableWidgetItem(confidence_text)
-            confidence_item.setData(Qt.ItemDataRole.UserRole, annotation)
-            confidence_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            confidence_item.setFlags(confidence_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  # 編集不可
-            self.table.setItem(row, 3, confidence_item)
-            
-            # 種別
-            type_text = "手動" if annotation.is_manual else "自動"
-            type_item = QTableWidgetItem(type_text)
-            type_item.setData(Qt.ItemDataRole.UserRole, annotation)
-            type_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            type_item.setFlags(type_item.flags() & ~Qt.ItemFlag.ItemIsEditable)  # 編集不可
-            self.table.setItem(row, 4, type_item)
-            
-        self.table.setSortingEnabled(True)  # ソートを再有効化
-        
     def _get_filtered_annotations(self) -> List[ObjectAnnotation]:
-        """フィルタリング適用されたアノテーションリストを取得"""
-        filtered = []
-        
-        selected_label = self.label_filter_combo.currentText()
-        show_manual = self.show_manual_cb.isChecked()
-        show_auto = self.show_auto_cb.isChecked()
-        
-        for annotation in self.current_annotations:
-            # スコア閾値フィルタ
-            if annotation.bbox.confidence < self.score_threshold:
-                continue
-                
-            # ラベルフィルタ
-            if selected_label != "すべて" and annotation.label != selected_label:
-                continue
-                
-            # 種別フィルタ
-            if annotation.is_manual and not show_manual:
-                continue
-            if not annotation.is_manual and not show_auto:
-                continue
-                
-            filtered.append(annotation)
-            
-        return filtered
+        """フィルタリング適用されたアノテーションリストを取得（表示順）"""
+        return [self.proxy_model.annotation_at(row) for row in range(self.proxy_model.rowCount())]
         
     def _apply_filters(self):
         """フィルタを適用してテーブルを更新"""
-        self._populate_table()
+        selected_label = self.label_filter_combo.currentText()
+        self.proxy_model.label = None if selected_label == ALL_LABELS_TEXT else selected_label
+        self.proxy_model.set_filters(
+            score_threshold=self.score_threshold,
+            show_manual=self.show_manual_cb.isChecked(),
+            show_auto=self.show_auto_cb.isChecked()
+        )
         self._update_object_count()
         
     def _update_object_count(self):
         """オブジェクト数表示を更新"""
-        filtered_count = len(self._get_filtered_annotations())
+        filtered_count = self.proxy_model.rowCount()
         total_count = len(self.current_annotations)
         
         if filtered_count == total_count:
@@ -284,17 +224,17 @@ class CurrentFrameObjectListWidget(QWidget):
         else:
             self.object_count_label.setText(f"オブジェクト数: {filtered_count}/{total_count}")
             
-    def _on_selection_changed(self):
+    def _on_selection_changed(self, selected=None, deselected=None):
         """テーブル選択変更時の処理"""
         # 循環呼び出し防止
         if hasattr(self, '_updating_selection') and self._updating_selection:
             return
             
-        selected_items = self.table.selectedItems()
+        selected_rows = self.table.selectionModel().selectedRows()
         
-        if selected_items:
-            # 最初の選択されたアイテムからアノテーションを取得
-            annotation = selected_items[0].data(Qt.ItemDataRole.UserRole)
+        if selected_rows:
+            # 最初の選択された行からアノテーションを取得
+            annotation = self.proxy_model.annotation_at(selected_rows[0].row())
             
             # object_idベースで比較（オブジェクト参照ではなく）
             if (annotation is None or self.selected_annotation is None or 
@@ -305,9 +245,9 @@ class CurrentFrameObjectListWidget(QWidget):
             self.selected_annotation = None
             self.object_selected.emit(None)
             
-    def _on_item_double_clicked(self, item):
+    def _on_item_double_clicked(self, index):
         """アイテムダブルクリック時の処理"""
-        annotation = item.data(Qt.ItemDataRole.UserRole)
+        annotation = self.proxy_model.annotation_at(index.row())
         if annotation:
             self.object_double_clicked.emit(annotation)
             
@@ -322,16 +262,16 @@ class CurrentFrameObjectListWidget(QWidget):
                 self.selected_annotation = None
                 return
                 
-            # テーブル内で該当するアノテーションを検索して選択
-            for row in range(self.table.rowCount()):
-                item = self.table.item(row, 0)  # Track ID列
-                if item:
-                    item_annotation = item.data(Qt.ItemDataRole.UserRole)
-                    if item_annotation and item_annotation.object_id == annotation.object_id:
-                        self.table.selectRow(row)
-                        self.table.scrollToItem(item)
-                        self.selected_annotation = annotation
-                        return
+            # object_id -> 行の索引から該当行を選択
+            row = self.proxy_model.row_of_object(annotation.object_id)
+            if row >= 0:
+                index = self.proxy_model.index(row, 0)
+                self.table.selectionModel().select(
+                    index,
+                    QItemSelectionModel.SelectionFlag.ClearAndSelect | QItemSelectionModel.SelectionFlag.Rows
+                )
+                self.table.scrollTo(index)
+                self.selected_annotation = annotation
         finally:
             self._updating_selection = False
                 
@@ -1,7 +1,9 @@
 # DataClass.py
-import torch  
+import os  
 from dataclasses import dataclass  
-from typing import List, Optional  
+from typing import List, Optional, Sequence, Tuple  
+  
+import numpy as np  
   
 @dataclass  
 class BoundingBox:  
@@ -40,6 +42,15 @@ class BoundingBox:
     def center(self) -> tuple:  
         """中心座標を返す"""  
         return ((self.x1 + self.x2) / 2, (self.y1 + self.y2) / 2)  
+      
+    def iou(self, other: "BoundingBox") -> float:  
+        """他のバウンディングボックスとのIoUを返す"""  
+        inter_w = min(self.x2, other.x2) - max(self.x1, other.x1)  
+        inter_h = min(self.y2, other.y2) - max(self.y1, other.y1)  
+        if inter_w <= 0 or inter_h <= 0:  
+            return 0.0  
+        inter = inter_w * inter_h  
+        return inter / (self.area() + other.area() - inter)  
   
 @dataclass  
 class ObjectAnnotation:  
@@ -95,6 +106,81 @@ class FrameAnnotation:
             if obj.frame_id != self.frame_id:  
                 raise ValueError(f"Object frame_id {obj.frame_id} doesn't match frame {self.frame_id}")  
   
+@dataclass  
+class TrackingSeed:  
+    """複数物体追跡ジョブの追跡対象1つ分（トラックIDとラベル、キーフレームのbbox）"""  
+    track_id: int  
+    label: str  
+    keyframes: List[Tuple[int, BoundingBox]]  # [(frame_id, bbox), ...]  
+      
+    def __post_init__(self):  
+        if not self.label or not self.label.strip():  
+            raise ValueError("Label cannot be empty")  
+        if not self.keyframes:  
+            raise ValueError(f"Tracking seed {self.track_id} has no keyframes")  
+  
+@dataclass  
+class TrackArrays:  
+    """1フレーム分の追跡結果の配列（スコア閾値適用済み、CPU上のnumpy配列）  
+  
+    追跡ワーカーは推論スレッドではこの配列だけを扱い、ObjectAnnotationへの変換は  
+    別スレッドで行う。次フレームの初期値（det_bboxes）としてもそのまま渡せる。  
+    """  
+    bboxes: np.ndarray  # (N, 4) xyxy  
+    scores: np.ndarray  # (N,)  
+    labels: Optional[np.ndarray] = None  # (N,) テキストプロンプト内のラベル位置  
+    instance_ids: Optional[np.ndarray] = None  # (N,) MASAのインスタンスID  
+  
+    def __len__(self) -> int:  
+        return len(self.scores)  
+  
+    def take(self, rows: Sequence[int]) -> "TrackArrays":  
+        """指定行だけを取り出す"""  
+        rows = np.asarray(rows, dtype=np.int64)  
+        return TrackArrays(  
+            bboxes=self.bboxes[rows].reshape(-1, 4),  
+            scores=self.scores[rows],  
+            labels=self.labels[rows] if self.labels is not None else None,  
+            instance_ids=self.instance_ids[rows] if self.instance_ids is not None else None  
+        )  
+  
+    def to_annotations(self, frame_id: int, classes: Sequence[str]) -> List["ObjectAnnotation"]:  
+        """行ごとにObjectAnnotationへ変換（labelsはclassesの位置として解釈）"""  
+        bboxes = self.bboxes.tolist()  
+        scores = self.scores.tolist()  
+        labels = self.labels.tolist() if self.labels is not None else None  
+        instance_ids = self.instance_ids.tolist() if self.instance_ids is not None else None  
+  
+        annotations = []  
+        for i, (x1, y1, x2, y2) in enumerate(bboxes):  
+            score = float(scores[i])  
+            bbox = BoundingBox(  
+                x1=float(x1),  
+                y1=float(y1),  
+                x2=float(x2),  
+                y2=float(y2),  
+                confidence=score  
+            )  
+  
+            # ラベルの取得  
+            label = "unknown"  
+            if labels is not None:  
+                label_idx = int(labels[i])  
+                label = classes[label_idx] if label_idx < len(classes) else f"class_{label_idx}"  
+  
+            # インスタンスIDの取得  
+            object_id = int(instance_ids[i]) if instance_ids is not None else -1  # -1は新規IDを意味  
+  
+            annotations.append(ObjectAnnotation(  
+                object_id=object_id,  
+                label=label,  
+                bbox=bbox,  
+                frame_id=frame_id,  
+                is_manual=False,  # 自動追跡結果  
+                track_confidence=score  
+            ))  
+        return annotations  
+  
 class MASAConfig:  
     """MASA設定クラス（改善版）"""  
     def __init__(self):  
@@ -103,7 +189,7 @@ class MASAConfig:
         self.masa_checkpoint_path = "saved_models/masa_models/gdino_masa.pth"  
         self.det_config_path = None  
         self.det_checkpoint_path = None  
-        self.device = "cuda:0" if torch.cuda.is_available() else "cpu"  
+        self._device: Optional[str] = None  # 未指定なら初回参照時に決定（torchの読み込みを遅らせる）  
         self.score_threshold = 0.2  
         self.unified_mode = True  
         self.detector_type = "mmdet"  
@@ -112,6 +198,22 @@ class MASAConfig:
         self.sam_path = "saved_models/pretrain_weights/sam_vit_h_4b8939.pth"  
         self.sam_type = "vit_h"  
         self.custom_entities = True  
+        # 常駐モデルサーバーのアドレス（"host:port" またはUNIXソケットのパス）。Noneの場合はローカルで推論  
+        self.model_server_address = os.environ.get("MASA_MODEL_SERVER") or None  
+      
+    @property  
+    def device(self) -> str:  
+        if self._device is None:  
+            try:  
+                import torch  
+                self._device = "cuda:0" if torch.cuda.is_available() else "cpu"  
+            except ImportError:  
+                self._device = "cpu"  
+        return self._device  
+      
+    @device.setter  
+    def device(self, value: str):  
+        self._device = value  
       
     def validate(self):  
         """設定の妥当性をチェック"""  
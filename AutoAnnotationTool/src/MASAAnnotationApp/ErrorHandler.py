@@ -1,11 +1,22 @@
 # ErrorHandler.py  
-from PyQt6.QtWidgets import QMessageBox  
 from functools import wraps  
 import logging  
 from typing import Callable, Any  
   
 class ErrorHandler:  
-    """統一されたエラーハンドリング機能"""  
+    """統一されたエラーハンドリング機能  
+  
+    PyQt6はダイアログを表示するときに初めてインポートする。  
+    ヘッドレスモード（バッチ処理など）ではダイアログの代わりにログへ出力し、  
+    handle_with_dialogで捕捉した例外は呼び出し元へ再送出する。  
+    """  
+  
+    headless = False  
+      
+    @staticmethod  
+    def set_headless(enabled: bool = True):  
+        """ヘッドレスモードを切り替え（Qtを使わずにログへ出力する）"""  
+        ErrorHandler.headless = enabled  
       
     @staticmethod  
     def setup_logging():  
@@ -29,6 +40,9 @@ class ErrorHandler:
                     return func(*args, **kwargs)  
                 except Exception as e:  
                     ErrorHandler.log_error(e, func.__name__)  
+                    if ErrorHandler.headless:  
+                        # バッチ処理では失敗を呼び出し元で判定できるようにする  
+                        raise  
                     ErrorHandler.show_error_dialog(str(e), title)  
                     return None  
             return wrapper  
@@ -43,14 +57,26 @@ class ErrorHandler:
     @staticmethod  
     def show_error_dialog(message: str, title: str = "Error"):  
         """エラーダイアログを表示"""  
+        if ErrorHandler.headless:  
+            logging.error(f"{title}: {message}")  
+            return  
+        from PyQt6.QtWidgets import QMessageBox  
         QMessageBox.critical(None, title, message)  
       
     @staticmethod  
     def show_warning_dialog(message: str, title: str = "Warning"):  
         """警告ダイアログを表示"""  
+        if ErrorHandler.headless:  
+            logging.warning(f"{title}: {message}")  
+            return  
+        from PyQt6.QtWidgets import QMessageBox  
         QMessageBox.warning(None, title, message)  
       
     @staticmethod  
     def show_info_dialog(message: str, title: str = "Information"):  
         """情報ダイアログを表示"""  
+        if ErrorHandler.headless:  
+            logging.info(f"{title}: {message}")  
+            return  
+        from PyQt6.QtWidgets import QMessageBox  
         QMessageBox.information(None, title, message)  
\ No newline at end of file
@@ -1,157 +1,196 @@
 # ExportService.py  
-import json  
-import os  
+import os
 from datetime import datetime
-from typing import Dict
-from DataClass import FrameAnnotation  
-from ErrorHandler import ErrorHandler  
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from DataClass import FrameAnnotation
+from ErrorHandler import ErrorHandler
+from StreamingJSONWriter import StreamingJSONWriter
   
+class CocoRow(NamedTuple):
+    """COCO書き出し用に複製した物体アノテーション1件分の値"""
+    track_id: int
+    label: str
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    confidence: float
+    is_manual: bool
+
+
 class ExportService:  
     """アノテーションエクスポート専用クラス"""  
+
+    @staticmethod
+    def snapshot_coco_rows(frame_annotations: Dict[int, FrameAnnotation]) -> Dict[int, List[CocoRow]]:
+        """COCO書き出しに使う値をフレームごとに複製する
+
+        ワーカースレッドでの書き出し中もUIでの編集（bboxの変更やトラック削除による
+        フレームの削除）が可能なため、ワーカー開始前にUIスレッドで呼び出す。
+        """
+        return {
+            frame_id: [
+                CocoRow(obj.object_id, obj.label, obj.bbox.x1, obj.bbox.y1,
+                        obj.bbox.x2, obj.bbox.y2, obj.bbox.confidence, obj.is_manual)
+                for obj in frame_annotation.objects
+            ]
+            for frame_id, frame_annotation in frame_annotations.items() if frame_annotation
+        }
       
-    @ErrorHandler.handle_with_dialog("Export Error")  
-    def export_coco_with_progress(self, frame_annotations, video_path, file_path, video_manager, progress_callback=None):  
-        """進捗付きCOCO JSONエクスポート"""  
-        # COCO形式の基本構造を初期化  
-        coco_data = {  
-            "info": {  
-                "description": "MASA Video Annotation Export",  
-                "version": "1.0",  
-                "year": datetime.now().year,  
-                "contributor": "MASA Annotation Tool",  
-                "date_created": datetime.now().isoformat()  
-            },  
-            "licenses": [],  
-            "images": [],  
-            "annotations": [],  
-            "categories": []  
-        }  
-          
-        # 動画情報を取得  
-        video_width = video_manager.get_video_width()  
-        video_height = video_manager.get_video_height()  
-        total_frames = video_manager.get_total_frames()  
-          
-        # カテゴリ情報を収集  
-        categories = set()  
-        for frame_annotation in frame_annotations.values():  
-            if frame_annotation and frame_annotation.objects:  
-                for annotation in frame_annotation.objects:  
-                    categories.add(annotation.label)  
-          
-        # カテゴリをCOCO形式に変換  
-        category_id_map = {}  
-        for i, category_name in enumerate(sorted(categories), 1):  
-            category_id_map[category_name] = i  
-            coco_data["categories"].append({  
-                "id": i,  
-                "name": category_name,  
-                "supercategory": "object"  
-            })  
-          
-        # 進捗計算用  
-        total_items = len(frame_annotations)  
-        current_item = 0  
-        annotation_id = 1  
-          
-        # フレームごとの処理  
-        for frame_id, frame_annotation in frame_annotations.items():  
-            # 進捗更新  
-            current_item += 1  
-            if progress_callback:  
-                progress_callback(current_item, total_items)  
-              
-            # 画像情報を追加  
-            image_info = {  
-                "id": frame_id,  
-                "width": video_width,  
-                "height": video_height,  
-                "file_name": f"frame_{frame_id:06d}.jpg",  
-                "video_path": video_path,  
-                "frame_id": frame_id  
-            }  
-            coco_data["images"].append(image_info)  
-              
-            # アノテーション情報を追加  
-            if frame_annotation and frame_annotation.objects:  
-                for obj_annotation in frame_annotation.objects:  
-                    # バウンディングボックスをCOCO形式（x, y, width, height）に変換  
-                    bbox_x = obj_annotation.bbox.x1  
-                    bbox_y = obj_annotation.bbox.y1  
-                    bbox_width = obj_annotation.bbox.x2 - obj_annotation.bbox.x1  
-                    bbox_height = obj_annotation.bbox.y2 - obj_annotation.bbox.y1  
-                      
-                    # 面積計算  
-                    area = bbox_width * bbox_height  
-                      
-                    annotation_data = {  
-                        "id": annotation_id,  
-                        "image_id": frame_id,  
-                        "category_id": category_id_map[obj_annotation.label],  
-                        "bbox": [bbox_x, bbox_y, bbox_width, bbox_height],  
-                        "area": area,  
-                        "iscrowd": 0,  
-                        "track_id": obj_annotation.object_id,  
-                        "confidence": obj_annotation.bbox.confidence,  
-                        "is_manual": obj_annotation.is_manual  
-                    }  
-                      
-                    coco_data["annotations"].append(annotation_data)  
-                    annotation_id += 1  
-          
-        # JSONファイルに保存  
-        try:  
-            with open(file_path, 'w', encoding='utf-8') as f:  
-                json.dump(coco_data, f, indent=2, ensure_ascii=False)  
-              
-            # 最終進捗更新  
-            if progress_callback:  
-                progress_callback(total_items, total_items)  
-                  
-        except Exception as e:  
+    @ErrorHandler.handle_with_dialog("Export Error")
+    def export_coco_with_progress(self, frame_rows: Dict[int, List[CocoRow]], video_path, file_path, video_manager, progress_callback=None,
+                                  score_threshold: Optional[float] = None,
+                                  category_names: Optional[Iterable[str]] = None,
+                                  shard_size: Optional[int] = None):
+        """進捗付きCOCO JSONエクスポート（ストリーミング出力）
+
+        frame_rowsはsnapshot_coco_rows()で複製したフレームごとのアノテーション。
+        score_thresholdを指定した場合は閾値未満のアノテーションを書き出し時に除外し、
+        残るアノテーションがないフレームは画像情報も出力しない。
+        category_namesを渡すとカテゴリ収集のための全走査を省略できる
+        （AnnotationRepository.get_all_labels()のキャッシュを想定）。
+        shard_sizeを指定するとNフレームごとに別ファイルへ分割して出力する。
+        """
+        info = {
+            "description": "MASA Video Annotation Export",
+            "version": "1.0",
+            "year": datetime.now().year,
+            "contributor": "MASA Annotation Tool",
+            "date_created": datetime.now().isoformat()
+        }
+
+        # 動画情報を取得
+        video_width = video_manager.get_video_width()
+        video_height = video_manager.get_video_height()
+
+        # カテゴリをCOCO形式に変換
+        if category_names is None:
+            category_names = {row.label for rows in frame_rows.values() for row in rows}
+        category_id_map = {name: i for i, name in enumerate(sorted(set(category_names)), 1)}
+        categories = [
+            {"id": category_id, "name": name, "supercategory": "object"}
+            for name, category_id in category_id_map.items()
+        ]
+
+        # 進捗計算用
+        total_items = len(frame_rows)
+        current_item = 0
+        annotation_id = 1
+
+        def iter_annotations(frame_ids: List[int], images: List[Dict]):
+            """フレーム順にアノテーションを生成し、出力対象の画像情報をimagesに積む"""
+            nonlocal current_item, annotation_id
+            for frame_id in frame_ids:
+                # 進捗更新
+                current_item += 1
+                if progress_callback:
+                    progress_callback(current_item, total_items)
+
+                rows = frame_rows[frame_id]
+                if score_threshold is not None:
+                    rows = [row for row in rows if row.confidence >= score_threshold]
+                    if not rows:
+                        continue
+
+                images.append({
+                    "id": frame_id,
+                    "width": video_width,
+                    "height": video_height,
+                    "file_name": f"frame_{frame_id:06d}.jpg",
+                    "video_path": video_path,
+                    "frame_id": frame_id
+                })
+
+                for row in rows:
+                    bbox_width = row.x2 - row.x1
+                    bbox_height = row.y2 - row.y1
+                    yield {
+                        "id": annotation_id,
+                        "image_id": frame_id,
+                        "category_id": category_id_map[row.label],
+                        "bbox": [row.x1, row.y1, bbox_width, bbox_height],
+                        "area": bbox_width * bbox_height,
+                        "iscrowd": 0,
+                        "track_id": row.track_id,
+                        "confidence": row.confidence,
+                        "is_manual": row.is_manual
+                    }
+                    annotation_id += 1
+
+        try:
+            for shard_path, shard_frame_ids in self._iter_shards(file_path, list(frame_rows.keys()), shard_size):
+                # 画像情報はフレーム数分だけなので、アノテーション出力後にまとめて書き出す
+                images: List[Dict] = []
+                with StreamingJSONWriter(shard_path) as writer:
+                    writer.write_field("info", info)
+                    writer.write_field("licenses", [])
+                    writer.write_field("categories", categories)
+                    writer.write_array("annotations", iter_annotations(shard_frame_ids, images))
+                    writer.write_array("images", images)
+
+            # 最終進捗更新
+            if progress_callback:
+                progress_callback(total_items, total_items)
+
+        except Exception as e:
             raise RuntimeError(f"Failed to save COCO JSON file: {str(e)}")
-      
-    @ErrorHandler.handle_with_dialog("Export Error")  
-    def export_masa_json(self, annotations: Dict[int, FrameAnnotation],   
-                        video_path: str, output_path: str):  
-        """MASA形式のJSONでエクスポート"""  
-        # ラベルマッピングを作成  
-        all_labels = set()  
-        for frame_annotation in annotations.values():  
-            for obj in frame_annotation.objects:  
-                all_labels.add(obj.label)  
-          
-        label_mapping = {str(i): label for i, label in enumerate(sorted(all_labels))}  
-        label_to_id = {label: i for i, label in enumerate(sorted(all_labels))}  
-          
-        annotations_list = []  
-        for frame_annotation in annotations.values():  
-            for obj in frame_annotation.objects:  
-                # xyxy形式からxywh形式に変換  
-                bbox_xywh = obj.bbox.to_xywh()  
-                  
-                annotation_data = {  
-                    "frame_id": obj.frame_id,  
-                    "track_id": obj.object_id,  
-                    "bbox": bbox_xywh,  
-                    "score": obj.bbox.confidence,  
-                    "label": label_to_id.get(obj.label, 0),  
-                    "label_name": obj.label  
-                }  
-                  
-                annotations_list.append(annotation_data)  
-          
-        result_data = {  
-            "video_name": os.path.basename(video_path),  
-            "label_mapping": label_mapping,  
-            "annotations": annotations_list  
-        }  
-          
-        with open(output_path, 'w', encoding='utf-8') as f:  
-            json.dump(result_data, f, indent=2, ensure_ascii=False)  
-          
-        print(f"MASA JSON exported to {output_path}")  
-      
+
+    @ErrorHandler.handle_with_dialog("Export Error")
+    def export_masa_json(self, annotations: Dict[int, FrameAnnotation],
+                        video_path: str, output_path: str,
+                        category_names: Optional[Iterable[str]] = None):
+        """MASA形式のJSONでエクスポート（ストリーミング出力）"""
+        # ラベルマッピングを作成
+        if category_names is None:
+            category_names = self._collect_labels(annotations)
+        sorted_labels = sorted(set(category_names))
+        label_mapping = {str(i): label for i, label in enumerate(sorted_labels)}
+        label_to_id = {label: i for i, label in enumerate(sorted_labels)}
+
+        def iter_annotations():
+            for frame_annotation in annotations.values():
+                for obj in frame_annotation.objects:
+                    yield {
+                        "frame_id": obj.frame_id,
+                        "track_id": obj.object_id,
+                        "bbox": obj.bbox.to_xywh(),  # xyxy形式からxywh形式に変換
+                        "score": obj.bbox.confidence,
+                        "label": label_to_id.get(obj.label, 0),
+                        "label_name": obj.label
+                    }
+
+        with StreamingJSONWriter(output_path) as writer:
+            writer.write_field("video_name", os.path.basename(video_path))
+            writer.write_field("label_mapping", label_mapping)
+            writer.write_array("annotations", iter_annotations())
+
+        print(f"MASA JSON exported to {output_path}")
+
+    def _collect_labels(self, frame_annotations: Dict[int, FrameAnnotation]) -> Set[str]:
+        """全フレームからラベルを収集"""
+        return {
+            obj.label
+            for frame_annotation in frame_annotations.values() if frame_annotation
+            for obj in frame_annotation.objects
+        }
+
+    def _iter_shards(self, file_path: str, frame_ids: List[int],
+                     shard_size: Optional[int]) -> Iterator[Tuple[str, List[int]]]:
+        """出力ファイルパスとそのファイルに含めるフレームIDの組を返す"""
+        if not shard_size or shard_size <= 0:
+            yield file_path, frame_ids
+            return
+
+        shards: Dict[int, List[int]] = {}
+        for frame_id in sorted(frame_ids):
+            shards.setdefault(frame_id // shard_size, []).append(frame_id)
+
+        root, ext = os.path.splitext(file_path)
+        for shard_index, shard_frame_ids in shards.items():
+            start = shard_index * shard_size
+            end = start + shard_size - 1
+            yield f"{root}_{start:06d}-{end:06d}{ext or '.json'}", shard_frame_ids
+
     def import_json(self, json_path: str) -> Dict[int, FrameAnnotation]:  
         """JSONファイルからアノテーションを読み込み"""  
         from JSONLoader import JSONLoader  
@@ -0,0 +1,41 @@
+# InterpolationWorker.py
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class InterpolationWorker(QThread):
+    """キーフレーム補間用ワーカースレッド
+
+    MASAApplicationService.interpolate_track()は補間区間の確認と追跡のフォールバックで
+    モデルを実行するため、UIスレッドから切り離して実行する。
+    """
+
+    progress_updated = pyqtSignal(int, int)  # 処理済み区間数, 全区間数
+    interpolation_completed = pyqtSignal(dict)  # {frame_id: [ObjectAnnotation, ...]}
+    error_occurred = pyqtSignal(str)
+
+    def __init__(self, app_service, track_id: int, method: str = "linear", verify: bool = True,
+                 similarity_threshold: float = 0.5, check_stride: int = 10, parent=None):
+        super().__init__(parent)
+        self.app_service = app_service
+        self.track_id = track_id
+        self.method = method
+        self.verify = verify
+        self.similarity_threshold = similarity_threshold
+        self.check_stride = check_stride
+
+    def run(self):
+        try:
+            results = self.app_service.interpolate_track(
+                self.track_id,
+                method=self.method,
+                verify=self.verify,
+                similarity_threshold=self.similarity_threshold,
+                check_stride=self.check_stride,
+                progress_callback=self.emit_progress
+            )
+            self.interpolation_completed.emit(results)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+
+    def emit_progress(self, current, total):
+        self.progress_updated.emit(current, total)
@@ -46,6 +46,10 @@ class KeyboardShortcutManager:
         self.register_shortcut("R", self._execute_batch_add)
         self.register_shortcut("G", self._jump_to_frame)
         self.register_shortcut("F", self._focus_frame_input)
+        self.register_shortcut("N", self._next_track_frame)
+        self.register_shortcut("Shift+N", self._prev_track_frame)
+        self.register_shortcut("M", self._next_track_gap)
+        self.register_shortcut("Shift+M", self._prev_track_gap)
         self.register_shortcut("Enter", self._handle_enter_key)
     
     def register_shortcut(self, key_combo: str, action: Callable):
@@ -137,6 +141,8 @@ class KeyboardShortcutManager:
             Qt.Key.Key_R: "R",
             Qt.Key.Key_G: "G",
             Qt.Key.Key_F: "F",
+            Qt.Key.Key_N: "N",
+            Qt.Key.Key_M: "M",
         }
         return key_map.get(key, "Unknown")
     
@@ -317,6 +323,22 @@ class KeyboardShortcutManager:
             video_control.frame_input.setFocus()
             video_control.frame_input.selectAll()
     
+    def _next_track_frame(self):
+        """選択中Trackが存在する次のフレーム（N）"""
+        self.main_controller.jump_along_selected_track(forward=True)
+    
+    def _prev_track_frame(self):
+        """選択中Trackが存在する前のフレーム（Shift+N）"""
+        self.main_controller.jump_along_selected_track(forward=False)
+    
+    def _next_track_gap(self):
+        """選択中Trackが途切れている次のフレーム（M）"""
+        self.main_controller.jump_along_selected_track(forward=True, gap=True)
+    
+    def _prev_track_gap(self):
+        """選択中Trackが途切れている前のフレーム（Shift+M）"""
+        self.main_controller.jump_along_selected_track(forward=False, gap=True)
+    
     def _handle_enter_key(self):
         """Enterキー処理"""
         from PyQt6.QtWidgets import QApplication
@@ -353,5 +375,9 @@ class KeyboardShortcutManager:
             "R": "一括追加実行",
             "G": "フレームジャンプ",
             "F": "フレーム入力にフォーカス",
+            "N": "選択中Trackが存在する次のフレーム",
+            "Shift+N": "選択中Trackが存在する前のフレーム",
+            "M": "選択中Trackが途切れている次のフレーム",
+            "Shift+M": "選択中Trackが途切れている前のフレーム",
             "Enter": "ボタンクリック（フォーカス時）"
         }
@@ -0,0 +1,102 @@
+# KeyframeInterpolator.py
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from DataClass import BoundingBox
+
+
+class KeyframeInterpolator:
+    """キーフレーム間のバウンディングボックスをベクトル化して補間するクラス
+
+    - linear: 座標ごとの線形補間
+    - spline: 不等間隔キーフレームに対応した3次エルミートスプライン（Catmull-Rom型の接線）
+      キーフレームが3つ未満の場合は線形補間にフォールバックする
+    """
+
+    METHODS = ("linear", "spline")
+    MIN_BOX_SIZE = 1.0  # 補間後のbboxの最小幅・高さ（ピクセル）
+
+    def __init__(self, method: str = "linear"):
+        if method not in self.METHODS:
+            raise ValueError(f"Unsupported interpolation method: {method}")
+        self.method = method
+
+    def interpolate(self, keyframe_ids: np.ndarray, keyframe_boxes: np.ndarray,
+                    frame_ids: np.ndarray,
+                    image_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """キーフレームのbbox (K, 4) から frame_ids のbbox (N, 4) を計算
+
+        Args:
+            keyframe_ids: キーフレームのフレームID (K,)
+            keyframe_boxes: キーフレームのxyxy座標 (K, 4)
+            frame_ids: 補間したいフレームID (N,)
+            image_size: (width, height)。指定時は画像内にクリップする
+        """
+        keyframe_ids = np.asarray(keyframe_ids, dtype=np.float64)
+        keyframe_boxes = np.asarray(keyframe_boxes, dtype=np.float64).reshape(-1, 4)
+        frame_ids = np.asarray(frame_ids, dtype=np.float64)
+
+        if len(keyframe_ids) == 0:
+            raise ValueError("At least one keyframe is required for interpolation")
+
+        order = np.argsort(keyframe_ids, kind="stable")
+        keyframe_ids = keyframe_ids[order]
+        keyframe_boxes = keyframe_boxes[order]
+
+        if len(keyframe_ids) == 1:
+            boxes = np.repeat(keyframe_boxes, len(frame_ids), axis=0)
+        elif self.method == "linear" or len(keyframe_ids) < 3:
+            boxes = np.stack([
+                np.interp(frame_ids, keyframe_ids, keyframe_boxes[:, i]) for i in range(4)
+            ], axis=1)
+        else:
+            boxes = self._cubic_hermite(keyframe_ids, keyframe_boxes, frame_ids)
+
+        return self._sanitize(boxes, image_size)
+
+    def interpolate_bboxes(self, keyframes: List[Tuple[int, BoundingBox]], frame_ids: List[int],
+                           image_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """(frame_id, BoundingBox) のリストから補間するユーティリティ"""
+        keyframe_ids = np.array([frame_id for frame_id, _ in keyframes])
+        keyframe_boxes = np.array([bbox.to_xyxy() for _, bbox in keyframes])
+        return self.interpolate(keyframe_ids, keyframe_boxes, np.asarray(frame_ids), image_size)
+
+    @staticmethod
+    def find_gaps(keyframe_ids: List[int]) -> List[Tuple[int, int]]:
+        """隣接キーフレーム間で補間が必要な区間 (start_keyframe, end_keyframe) を返す"""
+        sorted_ids = sorted(set(keyframe_ids))
+        return [(a, b) for a, b in zip(sorted_ids[:-1], sorted_ids[1:]) if b - a > 1]
+
+    def _cubic_hermite(self, t: np.ndarray, p: np.ndarray, x: np.ndarray) -> np.ndarray:
+        """不等間隔3次エルミート補間（範囲外は端点の値に固定）"""
+        # 接線: 内側は中心差分、端点は片側差分
+        tangents = np.empty_like(p)
+        tangents[1:-1] = (p[2:] - p[:-2]) / (t[2:] - t[:-2])[:, None]
+        tangents[0] = (p[1] - p[0]) / (t[1] - t[0])
+        tangents[-1] = (p[-1] - p[-2]) / (t[-1] - t[-2])
+
+        x = np.clip(x, t[0], t[-1])
+        idx = np.clip(np.searchsorted(t, x, side="right") - 1, 0, len(t) - 2)
+        h = (t[idx + 1] - t[idx])[:, None]
+        s = ((x - t[idx]) / h[:, 0])[:, None]
+        s2 = s * s
+        s3 = s2 * s
+
+        h00 = 2 * s3 - 3 * s2 + 1
+        h10 = s3 - 2 * s2 + s
+        h01 = -2 * s3 + 3 * s2
+        h11 = s3 - s2
+        return (h00 * p[idx] + h10 * h * tangents[idx]
+                + h01 * p[idx + 1] + h11 * h * tangents[idx + 1])
+
+    def _sanitize(self, boxes: np.ndarray, image_size: Optional[Tuple[int, int]]) -> np.ndarray:
+        """スプラインのオーバーシュート等で不正になったbboxを補正"""
+        boxes = np.maximum(boxes, 0.0)
+        if image_size is not None:
+            width, height = image_size
+            boxes[:, [0, 2]] = np.minimum(boxes[:, [0, 2]], width)
+            boxes[:, [1, 3]] = np.minimum(boxes[:, [1, 3]], height)
+        boxes[:, 2] = np.maximum(boxes[:, 2], boxes[:, 0] + self.MIN_BOX_SIZE)
+        boxes[:, 3] = np.maximum(boxes[:, 3], boxes[:, 1] + self.MIN_BOX_SIZE)
+        return boxes
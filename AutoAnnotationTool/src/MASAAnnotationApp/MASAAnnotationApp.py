@@ -1,4 +1,5 @@
 # MASAAnnotationApp.py  
+import os  
 import sys  
 import argparse  
 from PyQt6.QtWidgets import QApplication  
@@ -15,6 +16,9 @@ class MASAAnnotationApp(QApplication):
           
         self.args = self.parse_args(argv)  
           
+        if self.args.model_server:  
+            os.environ["MASA_MODEL_SERVER"] = self.args.model_server  
+          
         self.main_widget = MASAAnnotationWidget()  
           
         # 引数で指定されたファイルを読み込み  
@@ -31,6 +35,9 @@ class MASAAnnotationApp(QApplication):
         parser = argparse.ArgumentParser(description='MASA Annotation Tool')  
         parser.add_argument('--video', type=str, help='Video file path')  
         parser.add_argument('--json', type=str, help='JSON annotation file path')  
+        parser.add_argument('--model-server', type=str,  
+                            help='MASA model server address ("host:port" or UNIX socket path). '  
+                                 'Falls back to loading the model locally if unreachable')  
           
         return parser.parse_args(argv[1:])  
   
@@ -3,20 +3,23 @@
 ファサードパターンによりリファクタリングされたメインウィジェット  
 依存関係を大幅に削減し、可読性と保守性を向上  
 """  
+import time
 from typing import Optional, List, Tuple, Dict  
 from PyQt6.QtWidgets import QWidget, QPushButton, QApplication, QDialog, QMessageBox, QFileDialog  
 from PyQt6.QtGui import QKeyEvent    
-from PyQt6.QtCore import Qt, QObject, QEvent      
+from PyQt6.QtCore import Qt, QObject, QEvent, QTimer      
       
-from DataClass import BoundingBox, ObjectAnnotation      
+from DataClass import BoundingBox, ObjectAnnotation, TrackingSeed      
 from AnnotationInputDialog import AnnotationInputDialog  
 from VideoPlaybackController import VideoPlaybackController      
-from TrackingWorker import TrackingWorker      
+from TrackingWorker import BaseTrackingWorker, TrackingWorker, MultiObjectTrackingWorker      
 from TrackingResultConfirmDialog import TrackingResultConfirmDialog    
 from ErrorHandler import ErrorHandler  
 from VideoManager import VideoManager  
 from CommandPattern import AddAnnotationCommand, DeleteAnnotationCommand, DeleteTrackCommand, UpdateBoundingBoxCommand, UpdateLabelByTrackCommand  
 from COCOExportWorker import COCOExportWorker  
+from InterpolationWorker import InterpolationWorker  
+from ModelInitializationWorker import ModelInitializationWorker  
   
 # ファサードパターンによる新しいアーキテクチャ  
 from MASAApplicationService import MASAApplicationService  
@@ -42,6 +45,9 @@ class ButtonKeyEventFilter(QObject):
     
 class MASAAnnotationWidget(QWidget):      
     """ファサードパターンによりリファクタリングされたメインウィジェット"""      
+  
+    PLAYBACK_LIST_REFRESH_SEC = 0.25  # 再生中のオブジェクト一覧更新間隔  
+    AUTOSAVE_INTERVAL_MS = 30000  # プロジェクトファイルへの自動保存間隔  
           
     def __init__(self, parent=None):      
         super().__init__(parent)      
@@ -63,12 +69,29 @@ class MASAAnnotationWidget(QWidget):
           
         # 残存する直接管理が必要な要素  
         self.playback_controller: Optional[VideoPlaybackController] = None      
-        self.tracking_worker: Optional[TrackingWorker] = None      
-        self.temp_bboxes_for_batch_add: List[Tuple[int, BoundingBox]] = []      
+        self._last_playback_list_refresh = 0.0  
+        self.tracking_worker: Optional[BaseTrackingWorker] = None      
+        self.interpolation_worker: Optional[InterpolationWorker] = None  
+        self._tracking_progress: Tuple[int, int] = (0, 0)  # current_frame, total_frames  
+        self._tracking_fps = 0.0  
+        self._object_tracking_progress: Dict[int, int] = {}  # {track_id: 追跡できたフレーム数}  
+        self.temp_bboxes_for_batch_add: List[Tuple[int, ObjectAnnotation]] = []      
           
         self.video_manager = None  
   
+        # 変更フレームだけをバックグラウンドでプロジェクトファイルへ保存  
+        self.autosave_timer = QTimer(self)  
+        self.autosave_timer.setInterval(self.AUTOSAVE_INTERVAL_MS)  
+        self.autosave_timer.timeout.connect(self.autosave_project)  
+  
         self.setup_ui()      
+  
+        # MASAモデルをバックグラウンドで読み込む（モデルサーバーがあれば接続のみ）。  
+        # torch / mmdet のインポートと競合しないよう、ウィンドウが表示されてイベントループが回り始めてから開始する  
+        self.model_initialization_worker = ModelInitializationWorker(self.app_service.config_manager)  
+        self.model_initialization_worker.initialization_completed.connect(self.on_model_initialization_completed)  
+        self.model_initialization_worker.initialization_failed.connect(self.on_model_initialization_failed)  
+        QTimer.singleShot(0, self.model_initialization_worker.start)  
         self.setup_connections()  
             
     def setup_ui(self):    
@@ -102,6 +125,7 @@ class MASAAnnotationWidget(QWidget):
         if self.video_manager.load_video():    
             self.playback_controller = VideoPlaybackController(self.video_manager)    
             self.playback_controller.frame_updated.connect(self.on_playback_frame_changed)    
+            self.playback_controller.frame_ready.connect(self.on_playback_frame_ready)    
             self.playback_controller.playback_finished.connect(self.on_playback_finished)    
                 
             self.playback_controller.set_fps(self.video_manager.get_fps())    
@@ -123,9 +147,51 @@ class MASAAnnotationWidget(QWidget):
                 menu_panel.update_video_info(file_path, self.video_manager.get_total_frames())    
                 
             ErrorHandler.show_info_dialog(f"Video loaded: {file_path}", "Success")    
+            self._open_annotation_journal(file_path)  
         else:    
             ErrorHandler.show_error_dialog("Failed to load video file", "Error")    
                 
+    def _open_annotation_journal(self, video_path: str):  
+        """動画横のプロジェクトファイルとWALを開き、前回セッションの編集が残っていれば復元を確認"""  
+        self.autosave_timer.stop()  
+        restored_count = 0  
+        if self.app_service.open_journal(video_path):  
+            reply = QMessageBox.question(  
+                self, "Restore Session",  
+                "前回のセッションの編集履歴が見つかりました。復元しますか？\n"  
+                "（いいえを選択すると最後に保存されたプロジェクトから開始します）",  
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,  
+                QMessageBox.StandardButton.Yes  
+            )  
+            if reply == QMessageBox.StandardButton.Yes:  
+                restored_count = self.app_service.recover_journal()  
+                print(f"Restored {restored_count} annotations from the session journal")  
+            else:  
+                restored_count = self._load_saved_project()  
+        else:  
+            restored_count = self._load_saved_project()  
+  
+        if restored_count:  
+            self.update_annotation_count()  
+            video_preview = self.main_ui_controller.get_video_preview()  
+            if video_preview:  
+                video_preview.update_frame_display()  
+        self.autosave_timer.start()  
+  
+    def _load_saved_project(self) -> int:  
+        """保存済みのプロジェクトファイルがあれば読み込み、WALをその状態から始める"""  
+        self.app_service.annotation_repository.clear()  
+        loaded_count = 0  
+        if self.app_service.has_saved_project():  
+            loaded_count = self.app_service.load_project()  
+            print(f"Loaded {loaded_count} annotations from the project file")  
+        self.app_service.start_new_journal()  
+        return loaded_count  
+  
+    def autosave_project(self):  
+        """前回の保存以降に変更されたフレームをバックグラウンドで保存"""  
+        self.app_service.save_project_async()  
+  
     @ErrorHandler.handle_with_dialog("JSON Load Error")    
     def load_json_annotations(self, file_path: str):    
         """JSONアノテーションファイルを読み込み"""    
@@ -140,6 +206,8 @@ class MASAAnnotationWidget(QWidget):
             for frame_id, frame_ann in loaded_annotations.items():    
                 for obj_ann in frame_ann.objects:    
                     self.app_service.annotation_repository.add_annotation(obj_ann)    
+            # 読み込んだ状態を編集履歴（WAL）の新しい起点とする  
+            self.app_service.start_new_journal()  
                 
             menu_panel = self.main_ui_controller.get_menu_panel()  
             video_preview = self.main_ui_controller.get_video_preview()  
@@ -197,7 +265,8 @@ class MASAAnnotationWidget(QWidget):
                 self.app_service.export_service.export_masa_json(    
                     self.app_service.annotation_repository.frame_annotations,    
                     self.video_manager.video_path,    
-                    file_path    
+                    file_path,    
+                    category_names=self.app_service.annotation_repository.get_all_labels()    
                 )    
             elif format == "coco":    
                 menu_panel = self.main_ui_controller.get_menu_panel()  
@@ -205,15 +274,21 @@ class MASAAnnotationWidget(QWidget):
                     # 進捗表示を開始    
                     menu_panel.update_export_progress("Exporting COCO JSON...")    
                     
-                # スコア閾値でフィルタリングされたアノテーションを作成    
-                filtered_annotations = self._filter_annotations_by_score_threshold()   
-                # ワーカースレッドでエクスポート実行    
+                video_preview = self.main_ui_controller.get_video_preview()  
+                score_threshold = video_preview.score_threshold if video_preview else 0.0  
+                # 書き出し中もUIで編集できるよう、アノテーションはUIスレッドで複製して渡す    
+                frame_rows = self.app_service.export_service.snapshot_coco_rows(    
+                    self.app_service.annotation_repository.frame_annotations    
+                )    
+                # ワーカースレッドでエクスポート実行（スコア閾値は書き出し時に適用）    
                 self.export_worker = COCOExportWorker(    
                     self.app_service.export_service,    
-                    filtered_annotations,  # スコア閾値でフィルタリング済み    
+                    frame_rows,    
                     self.video_manager.video_path,    
                     file_path,    
-                    self.video_manager    
+                    self.video_manager,    
+                    score_threshold=score_threshold,    
+                    category_names=self.app_service.annotation_repository.get_all_labels()    
                 )    
                 self.export_worker.progress_updated.connect(self.on_export_progress)    
                 self.export_worker.export_completed.connect(self.on_export_completed)    
@@ -225,32 +300,6 @@ class MASAAnnotationWidget(QWidget):
   
             ErrorHandler.show_info_dialog(f"Annotations exported to {file_path}", "Export Complete")    
   
-    def _filter_annotations_by_score_threshold(self):    
-        """現在の表示設定のスコア閾値でアノテーションをフィルタリング"""    
-        filtered_frame_annotations = {}    
-        video_preview = self.main_ui_controller.get_video_preview()  
-        score_threshold = video_preview.score_threshold if video_preview else 0.0  
-            
-        for frame_id, frame_annotation in self.app_service.annotation_repository.frame_annotations.items():    
-            if frame_annotation and frame_annotation.objects:    
-                filtered_objects = []    
-                for annotation in frame_annotation.objects:    
-                    # スコア閾値チェック    
-                    if annotation.bbox.confidence >= score_threshold:    
-                        filtered_objects.append(annotation)    
-                    
-                if filtered_objects:    
-                    # 新しいFrameAnnotationオブジェクトを作成    
-                    from DataClass import FrameAnnotation    
-                    filtered_frame_annotation = FrameAnnotation(    
-                        frame_id=frame_annotation.frame_id,    
-                        frame_path=frame_annotation.frame_path,    
-                        objects=filtered_objects    
-                    )    
-                    filtered_frame_annotations[frame_id] = filtered_frame_annotation    
-            
-        return filtered_frame_annotations  
-  
     def on_export_progress(self, current: int, total: int):    
         """エクスポート進捗更新"""    
         progress_percent = (current / total) * 100    
@@ -274,72 +323,177 @@ class MASAAnnotationWidget(QWidget):
   
     @ErrorHandler.handle_with_dialog("Tracking Error")    
     def start_tracking(self,  assigned_track_id: int, assigned_label: str):    
-        """自動追跡を開始"""    
-        if not self.app_service.object_tracker:    
-            ErrorHandler.show_warning_dialog("MASA models are still loading. Please wait.", "Warning")    
-            return    
-          
-        # ObjectTrackerの実際の初期化（まだされていない場合）    
-        if not self.app_service.object_tracker.initialized:    
-            try:    
-                self.app_service.object_tracker.initialize()    
-            except Exception as e:    
-                ErrorHandler.show_error_dialog(f"Failed to initialize MASA models: {str(e)}", "Initialization Error")    
-                return    
+        """自動追跡を開始  
+  
+        一括追加した仮bboxやオブジェクト一覧で選択したトラックが複数ある場合は、  
+        MultiObjectTrackingWorkerで全物体を1パスで追跡する。  
+        """    
+        if self.model_initialization_worker.isRunning():  
+            ErrorHandler.show_warning_dialog("MASA models are still loading. Please wait.", "Warning")  
+            return  
+        if self.tracking_worker and self.tracking_worker.isRunning():  
+            ErrorHandler.show_warning_dialog("Tracking is already running.", "Warning")  
+            return  
   
-        if not self.video_manager:    
-            ErrorHandler.show_warning_dialog("Please load a video file first", "Warning")    
-            return
         video_control = self.main_ui_controller.get_video_control()  
         if not video_control:  
             ErrorHandler.show_warning_dialog("Video control not available", "Warning")  
             return  
+        start_frame, end_frame = video_control.get_selected_range()  
   
-        current_frame = video_control.current_frame  
-        start_frame = current_frame  
-        end_frame = self.video_manager.get_total_frames() - 1  
-  
-        # 現在のフレームから追跡対象のアノテーションを取得  
-        frame_annotation = self.app_service.annotation_repository.get_annotations(current_frame)  
-        if not frame_annotation or not frame_annotation.objects:  
-            ErrorHandler.show_warning_dialog("No annotations found in current frame for tracking", "Warning")  
+        # ObjectTrackerの遅延初期化と動画の読み込み確認  
+        batch_annotations = list(self.temp_bboxes_for_batch_add)  
+        if not self.app_service.start_tracking(assigned_track_id, assigned_label, start_frame, end_frame, batch_annotations):  
             return  
   
-        # 指定されたtrack_idのアノテーションを検索  
-        target_annotation = None  
-        for annotation in frame_annotation.objects:  
-            if annotation.track_id == assigned_track_id:  
-                target_annotation = annotation  
-                break  
-  
-        if not target_annotation:  
-            ErrorHandler.show_warning_dialog(f"No annotation found with track ID {assigned_track_id}", "Warning")  
+        seeds = self._build_tracking_seeds(assigned_track_id, assigned_label, batch_annotations, start_frame, end_frame)  
+        if not seeds:  
+            ErrorHandler.show_warning_dialog(  
+                f"No annotation found with track ID {assigned_track_id} in frames {start_frame}-{end_frame}", "Warning"  
+            )  
             return  
   
-        # 追跡用の初期アノテーションリストを作成  
-        initial_annotations_for_worker = []  
-        initial_annotations_for_worker.append((current_frame, target_annotation.bbox))  
+        if len(seeds) > 1:  
+            # 複数物体はラベルをまとめたプロンプトで各フレームを1回だけ推論する  
+            self.tracking_worker = MultiObjectTrackingWorker(  
+                self.video_manager,  
+                self.app_service.object_tracker,  
+                start_frame,  
+                end_frame,  
+                seeds  
+            )  
+            self.tracking_worker.object_progress_updated.connect(self.on_object_tracking_progress)  
+        else:  
+            seed = seeds[0]  
+            self.tracking_worker = TrackingWorker(  
+                self.video_manager,  
+                self.app_service.annotation_repository,  
+                self.app_service.object_tracker,  
+                start_frame,  
+                end_frame,  
+                initial_annotations=seed.keyframes,  
+                assigned_track_id=seed.track_id,  
+                assigned_label=seed.label,  
+                video_width=self.video_manager.get_video_width(),  
+                video_height=self.video_manager.get_video_height()  
+            )  
+  
+        # 仮bboxはシードとしてワーカーに渡したので破棄する  
+        if batch_annotations:  
+            self.temp_bboxes_for_batch_add.clear()  
   
+        self._tracking_progress = (0, end_frame - start_frame + 1)  
+        self._tracking_fps = 0.0  
+        self._object_tracking_progress = {}  
         menu_panel = self.main_ui_controller.get_menu_panel()  
         if menu_panel:  
-            menu_panel.update_tracking_progress("Starting tracking...")  
-  
-        # TrackingWorkerを作成して実行  
-        self.tracking_worker = TrackingWorker(  
-            self.app_service.object_tracker,  
-            self.video_manager,  
-            initial_annotations_for_worker,  
-            assigned_track_id,  
-            assigned_label,  
-            start_frame,  
-            end_frame  
-        )  
+            menu_panel.update_tracking_progress(f"Starting tracking of {len(seeds)} object(s)...")  
   
         self.tracking_worker.progress_updated.connect(self.on_tracking_progress)  
+        self.tracking_worker.throughput_updated.connect(self.on_tracking_throughput)  
         self.tracking_worker.tracking_completed.connect(self.on_tracking_completed)  
         self.tracking_worker.error_occurred.connect(self.on_tracking_error)  
         self.tracking_worker.start()  
   
+    def _build_tracking_seeds(self, assigned_track_id: int, assigned_label: str,  
+                              batch_annotations: List[Tuple[int, ObjectAnnotation]],  
+                              start_frame: int, end_frame: int) -> List[TrackingSeed]:  
+        """追跡対象のシードを作成  
+  
+        一括追加の仮bboxがあれば1つずつ別の物体とし、先頭にassigned_track_id、  
+        以降に未使用のトラックIDを割り当てる。仮bboxがなければオブジェクト一覧で  
+        選択中のトラック（複数選択時）またはassigned_track_idの範囲内のアノテーションを使う。  
+        """  
+        if batch_annotations:  
+            next_track_id = max(assigned_track_id + 1, self.app_service.annotation_repository.next_object_id)  
+            seeds = []  
+            for index, (frame_id, annotation) in enumerate(batch_annotations):  
+                track_id = assigned_track_id if index == 0 else next_track_id + index - 1  
+                seeds.append(TrackingSeed(  
+                    track_id=track_id,  
+                    label=assigned_label,  
+                    keyframes=[(frame_id, annotation.bbox)]  
+                ))  
+            return seeds  
+  
+        track_ids = [assigned_track_id]  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if menu_panel:  
+            selected_track_ids = menu_panel.get_selected_track_ids()  
+            if len(selected_track_ids) > 1:  
+                track_ids = selected_track_ids  
+        return self.app_service.build_tracking_seeds(track_ids, start_frame, end_frame)  
+  
+    def start_interpolation(self, track_id: int):  
+        """選択中トラックの手動キーフレーム間を補間（確認に失敗した区間のみ追跡）"""  
+        if self.interpolation_worker and self.interpolation_worker.isRunning():  
+            ErrorHandler.show_warning_dialog("Interpolation is already running.", "Warning")  
+            return  
+        if not self.video_manager:  
+            ErrorHandler.show_warning_dialog("Please load a video file first", "Warning")  
+            return  
+  
+        keyframe_count = sum(  
+            1 for annotation in self.app_service.get_annotations_by_track_id(track_id) if annotation.is_manual  
+        )  
+        if keyframe_count < 2:  
+            ErrorHandler.show_warning_dialog(  
+                f"Track {track_id} needs at least 2 manual keyframes for interpolation.", "Warning"  
+            )  
+            return  
+  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if menu_panel:  
+            menu_panel.update_tracking_progress(f"Interpolating track {track_id}...")  
+  
+        # 補間区間の確認にはモデルの読み込みが終わっている場合のみ埋め込みを使う  
+        self.interpolation_worker = InterpolationWorker(  
+            self.app_service,  
+            track_id,  
+            verify=not self.model_initialization_worker.isRunning()  
+        )  
+        self.interpolation_worker.progress_updated.connect(self.on_interpolation_progress)  
+        self.interpolation_worker.interpolation_completed.connect(self.on_interpolation_completed)  
+        self.interpolation_worker.error_occurred.connect(self.on_interpolation_error)  
+        self.interpolation_worker.start()  
+  
+    def on_interpolation_progress(self, current_segment: int, total_segments: int):  
+        """補間進捗更新（区間単位）"""  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if menu_panel:  
+            menu_panel.update_tracking_progress(f"Interpolating... {current_segment}/{total_segments} segments")  
+  
+    def on_interpolation_completed(self, results: Dict[int, List[ObjectAnnotation]]):  
+        """補間完了時の処理（追跡結果と同じ確認ダイアログを使う）"""  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if not results:  
+            if menu_panel:  
+                menu_panel.update_tracking_progress("No frames to interpolate.")  
+            ErrorHandler.show_info_dialog("補間するフレームがありませんでした。", "Interpolation Complete")  
+            return  
+  
+        if menu_panel:  
+            menu_panel.update_tracking_progress("Interpolation completed. Waiting for confirmation...")  
+        added_count = self._confirm_and_add_results(results, "Interpolate track")  
+        if added_count is None:  
+            ErrorHandler.show_info_dialog("補間結果を破棄しました。", "Interpolation Cancelled")  
+            if menu_panel:  
+                menu_panel.update_tracking_progress("Interpolation results discarded.")  
+        else:  
+            ErrorHandler.show_info_dialog(  
+                f"補間が完了しました。{added_count}個のアノテーションを追加しました。",  
+                "Interpolation Complete"  
+            )  
+            if menu_panel:  
+                menu_panel.update_tracking_progress("Interpolation completed and annotations added!")  
+  
+    def on_interpolation_error(self, message: str):  
+        """補間エラー時の処理"""  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if menu_panel:  
+            menu_panel.update_tracking_progress("Interpolation failed.")  
+        ErrorHandler.show_error_dialog(f"Interpolation encountered an error: {message}", "Interpolation Error")  
+  
     def on_playback_frame_changed(self, frame_id: int):  
         """再生フレーム変更時の処理"""  
         video_control = self.main_ui_controller.get_video_control()  
@@ -357,16 +511,73 @@ class MASAAnnotationWidget(QWidget):
             frame_annotation = self.app_service.annotation_repository.get_annotations(frame_id)  
             menu_panel.update_current_frame_objects(frame_id, frame_annotation)  
   
+    def on_playback_frame_ready(self, frame_id: int, frame):  
+        """再生中のフレーム更新（縮小済みフレームを表示し、重い更新は間引く）"""  
+        video_control = self.main_ui_controller.get_video_control()  
+        video_preview = self.main_ui_controller.get_video_preview()  
+  
+        self.app_service.set_current_frame(frame_id)  
+        if video_control:  
+            video_control.set_playback_frame(frame_id)  
+  
+        if video_preview:  
+            video_preview.show_playback_frame(frame_id, frame)  
+            self.playback_controller.set_display_size(video_preview.width(), video_preview.height())  
+  
+        now = time.perf_counter()  
+        if now - self._last_playback_list_refresh >= self.PLAYBACK_LIST_REFRESH_SEC:  
+            self._last_playback_list_refresh = now  
+            self._refresh_frame_info(frame_id)  
+  
+    def _refresh_frame_info(self, frame_id: int):  
+        """フレーム情報とオブジェクト一覧を更新"""  
+        menu_panel = self.main_ui_controller.get_menu_panel()  
+        if menu_panel:  
+            if menu_panel.info_sync_manager and self.video_manager:  
+                menu_panel.info_sync_manager.update_frame_display(frame_id, self.video_manager.get_total_frames())  
+            frame_annotation = self.app_service.annotation_repository.get_annotations(frame_id)  
+            menu_panel.update_current_frame_objects(frame_id, frame_annotation)  
+  
+    def _sync_frame_after_playback(self):  
+        """再生停止後に最終フレームを全解像度で再描画し、一覧を同期"""  
+        video_preview = self.main_ui_controller.get_video_preview()  
+        if self.playback_controller and video_preview:  
+            video_preview.set_frame(self.playback_controller.current_frame)  
+  
     def on_playback_finished(self):  
         """再生完了時の処理"""  
+        self._sync_frame_after_playback()  
         menu_panel = self.main_ui_controller.get_menu_panel()  
         if menu_panel:  
             menu_panel.reset_playback_button()  
   
     def on_tracking_progress(self, current_frame: int, total_frames: int):  
         """追跡進捗更新"""  
-        progress_percent = (current_frame / total_frames) * 100  
+        self._tracking_progress = (current_frame, total_frames)  
+        self._update_tracking_progress_text()  
+  
+    def on_tracking_throughput(self, frames_per_second: float):  
+        """追跡スループット（FPS）更新"""  
+        self._tracking_fps = frames_per_second  
+        self._update_tracking_progress_text()  
+  
+    def on_object_tracking_progress(self, tracked_counts: Dict[int, int]):  
+        """複数物体追跡の物体ごとの進捗更新 {track_id: 追跡できたフレーム数}"""  
+        self._object_tracking_progress = tracked_counts  
+        self._update_tracking_progress_text()  
+  
+    def _update_tracking_progress_text(self):  
+        """フレーム進捗・スループット・物体ごとの追跡フレーム数から進捗表示を更新"""  
+        current_frame, total_frames = self._tracking_progress  
+        progress_percent = (current_frame / total_frames) * 100 if total_frames else 0.0  
         progress_text = f"Tracking... {current_frame}/{total_frames} ({progress_percent:.1f}%)"  
+        if self._tracking_fps > 0:  
+            progress_text += f" {self._tracking_fps:.1f} FPS"  
+        if self._object_tracking_progress:  
+            per_object = ", ".join(  
+                f"#{track_id}: {count}" for track_id, count in self._object_tracking_progress.items()  
+            )  
+            progress_text += f"\nFrames tracked per object: {per_object}"  
         menu_panel = self.main_ui_controller.get_menu_panel()  
         if menu_panel:  
             menu_panel.update_tracking_progress(progress_text)  
@@ -377,24 +588,8 @@ class MASAAnnotationWidget(QWidget):
         if menu_panel:  
             menu_panel.update_tracking_progress("Tracking completed. Waiting for confirmation...")  
   
-        # 確認ダイアログを表示  
-        dialog = TrackingResultConfirmDialog(results, self.video_manager, self)  
-  
-        if dialog.exec() == QDialog.DialogCode.Accepted and dialog.approved:  
-            # ユーザーが承認した場合のみ追加  
-            added_count = 0  
-            final_results_to_add = dialog.tracking_results  
-  
-            for frame_id, annotations in final_results_to_add.items():  
-                for annotation in annotations:  
-                    if self.app_service.annotation_repository.add_annotation(annotation):  
-                        added_count += 1  
-  
-            self.update_annotation_count()  
-            video_preview = self.main_ui_controller.get_video_preview()  
-            if video_preview:  
-                video_preview.update_frame_display()  
-  
+        added_count = self._confirm_and_add_results(results, "Add tracking results")  
+        if added_count is not None:  
             ErrorHandler.show_info_dialog(  
                 f"追跡が完了しました。{added_count}個のアノテーションを追加しました。",  
                 "Tracking Complete"  
@@ -410,6 +605,29 @@ class MASAAnnotationWidget(QWidget):
             if menu_panel:  
                 menu_panel.update_tracking_progress("Tracking results discarded.")  
   
+    def _confirm_and_add_results(self, results: Dict[int, List[ObjectAnnotation]], description: str) -> Optional[int]:  
+        """確認ダイアログで承認された結果を1つのUndo単位として追加（WALにも記録される）  
+  
+        Returns:  
+            追加したアノテーション数（破棄された場合はNone）  
+        """  
+        dialog = TrackingResultConfirmDialog(results, self.video_manager, self)  
+        if dialog.exec() != QDialog.DialogCode.Accepted or not dialog.approved:  
+            return None  
+  
+        # ユーザーが承認した場合のみ追加  
+        final_results_to_add = dialog.tracking_results  
+        added_count = self.app_service.add_annotations(  
+            [annotation for annotations in final_results_to_add.values() for annotation in annotations],  
+            description  
+        )  
+  
+        self.update_annotation_count()  
+        video_preview = self.main_ui_controller.get_video_preview()  
+        if video_preview:  
+            video_preview.update_frame_display()  
+        return added_count  
+  
     def on_tracking_error(self, message: str):  
         """追跡エラー時の処理"""  
         menu_panel = self.main_ui_controller.get_menu_panel()  
@@ -475,12 +693,17 @@ class MASAAnnotationWidget(QWidget):
         if self.playback_controller:  
             video_control = self.main_ui_controller.get_video_control()  
             if video_control:  
+                video_preview = self.main_ui_controller.get_video_preview()  
+                if video_preview:  
+                    self.playback_controller.set_display_size(video_preview.width(), video_preview.height())  
+                self._last_playback_list_refresh = 0.0  
                 self.playback_controller.play(video_control.current_frame)  
   
     def pause_playback(self):  
         """動画再生を一時停止"""  
         if self.playback_controller:  
             self.playback_controller.pause()  
+            self._sync_frame_after_playback()  
             menu_panel = self.main_ui_controller.get_menu_panel()  
             if menu_panel:  
                 menu_panel.reset_playback_button()  
@@ -535,6 +758,8 @@ class MASAAnnotationWidget(QWidget):
   
             # VideoPreviewWidgetの表示も確実に更新  
             video_preview.update_frame_display()  
+            # 選択中Trackの存在区間をタイムラインに表示  
+            self.main_ui_controller.update_timeline()  
   
             # Undo/Redoボタンの状態も更新  
             if menu_panel and hasattr(menu_panel, 'update_undo_redo_buttons'):  
@@ -542,8 +767,9 @@ class MASAAnnotationWidget(QWidget):
         finally:  
             self._updating_selection = False  
   
-    def on_model_initialization_completed(self):  
+    def on_model_initialization_completed(self, object_tracker):  
         """モデル初期化完了時の処理"""  
+        self.app_service.set_object_tracker(object_tracker)  
         print("MASA models loaded successfully")  
         menu_panel = self.main_ui_controller.get_menu_panel()  
         if menu_panel:  
@@ -679,13 +905,32 @@ class MASAAnnotationWidget(QWidget):
   
     def closeEvent(self, event):  
         """アプリケーション終了時の処理"""  
+        # 再生中の場合は先読みスレッドを停止  
+        if self.playback_controller:  
+            self.playback_controller.pause()  
+  
         # VideoManagerのリソースを解放  
         if self.video_manager:  
             self.video_manager.release()  
           
-        # TrackingWorkerが実行中の場合は停止  
+        # モデル読み込み中のスレッドを破棄しないよう終了を待つ  
+        if self.model_initialization_worker.isRunning():  
+            self.model_initialization_worker.wait()  
+  
+        # TrackingWorkerが実行中の場合は中断を要求して終了を待つ  
         if self.tracking_worker and self.tracking_worker.isRunning():  
-            self.tracking_worker.terminate()  
+            self.tracking_worker.cancel()  
             self.tracking_worker.wait()  
+  
+        # キーフレーム補間の実行中であれば終了を待つ  
+        if self.interpolation_worker and self.interpolation_worker.isRunning():  
+            self.interpolation_worker.wait()  
+          
+        # アノテーション付き動画の書き出し中であれば中断  
+        self.main_ui_controller.cancel_video_export()  
+  
+        # プロジェクトファイルへ保存し、編集履歴（WAL）を圧縮して閉じる  
+        self.autosave_timer.stop()  
+        self.app_service.cleanup()  
           
         event.accept()
\ No newline at end of file
@@ -3,18 +3,28 @@
 ファサードパターンによるアプリケーションサービス層
 すべてのビジネスロジックへの単一窓口を提供
 """
-from typing import Optional, Dict, List, Any
+from typing import TYPE_CHECKING, Optional, Dict, List, Any
 from pathlib import Path
 
+import numpy as np
+
 from ConfigManager import ConfigManager
 from AnnotationRepository import AnnotationRepository
-from CommandPattern import CommandManager, AddAnnotationCommand, DeleteAnnotationCommand, DeleteTrackCommand, UpdateLabelCommand, UpdateLabelByTrackCommand, UpdateBoundingBoxCommand
+from CommandPattern import CommandManager, AddAnnotationCommand, AddAnnotationsCommand, DeleteAnnotationCommand, DeleteTrackCommand, UpdateLabelCommand, UpdateLabelByTrackCommand, UpdateBoundingBoxCommand
+from AnnotationJournal import AnnotationJournal
+from ProjectStore import ProjectStore
 from VideoManager import VideoManager
 from ExportService import ExportService
-from ObjectTracker import ObjectTracker
-from DataClass import ObjectAnnotation, BoundingBox, FrameAnnotation
+from RemoteObjectTracker import create_object_tracker
+from KeyframeInterpolator import KeyframeInterpolator
+from SequentialFrameReader import SequentialFrameReader
+from DataClass import ObjectAnnotation, BoundingBox, FrameAnnotation, TrackingSeed
 from ErrorHandler import ErrorHandler
 
+if TYPE_CHECKING:
+    # torch / mmdet を読み込むため実行時にはインポートしない（起動時間短縮）
+    from ObjectTracker import ObjectTracker
+
 
 class MASAApplicationService:
     """アプリケーション層のファサード - すべてのビジネスロジックへの窓口"""
@@ -23,12 +33,13 @@ class MASAApplicationService:
         """サービス層の初期化"""
         self.config_manager = ConfigManager()
         self.annotation_repository = AnnotationRepository()
-        self.command_manager = CommandManager()
+        self.command_manager = CommandManager(self.annotation_repository)
         self.export_service = ExportService()
         
         # Optionalなサービス（遅延初期化）
         self.video_manager: Optional[VideoManager] = None
-        self.object_tracker: Optional[ObjectTracker] = None
+        self.object_tracker: Optional["ObjectTracker"] = None
+        self.project_store: Optional[ProjectStore] = None
         
         # 状態管理
         self._current_label = ""
@@ -93,6 +104,74 @@ class MASAApplicationService:
         command = UpdateBoundingBoxCommand(self.annotation_repository, annotation, old_bbox, new_bbox)  
         return self.command_manager.execute_command(command)
 
+    def add_annotations(self, annotations: List[ObjectAnnotation], description: str = "") -> int:
+        """複数アノテーションを1つのUndo単位として追加（追跡結果の反映など）"""
+        if not annotations:
+            return 0
+        command = AddAnnotationsCommand(self.annotation_repository, annotations, description)
+        return self.command_manager.execute_command(command) or 0
+
+    # ===== 編集履歴（WAL） =====
+    
+    def open_journal(self, project_path: str) -> bool:
+        """プロジェクト横のプロジェクトファイルとWALを開き、前回セッションの記録が残っているかを返す
+        
+        記録が残っている場合はrecover_journal()またはstart_new_journal()を呼ぶこと。
+        """
+        self.close_project()
+        self.project_store = ProjectStore.for_project(project_path)
+        journal = AnnotationJournal.for_project(project_path)
+        self.command_manager.attach_journal(journal, self.annotation_repository, self.project_store)
+        return journal.exists()
+    
+    def recover_journal(self) -> int:
+        """WALを再生してアノテーションと編集履歴を復元し、復元したアノテーション数を返す"""
+        journal = self.command_manager.journal
+        if journal is None:
+            return 0
+        undo_entries, redo_entries = journal.replay(self.annotation_repository, self.project_store)
+        self.command_manager.restore(undo_entries, redo_entries)
+        # 再生済みの記録を1つのスナップショットにまとめる
+        self.command_manager.checkpoint()
+        return self.annotation_repository.get_statistics()["total"]
+    
+    def start_new_journal(self):
+        """現在の状態を起点にWALを書き直す（前回セッションの記録は破棄）"""
+        self.command_manager.clear()
+        self.command_manager.checkpoint()
+    
+    def checkpoint_journal(self):
+        """WALを現在の状態と履歴だけに書き直す"""
+        self.command_manager.checkpoint()
+    
+    # ===== プロジェクトファイル =====
+    
+    def has_saved_project(self) -> bool:
+        """プロジェクトファイルに保存済みのアノテーションがあるか"""
+        return self.project_store is not None and self.project_store.has_annotations()
+    
+    def load_project(self) -> int:
+        """プロジェクトファイルからアノテーションを読み込み、読み込んだ数を返す"""
+        if self.project_store is None:
+            return 0
+        return self.project_store.load(self.annotation_repository)
+    
+    def save_project_async(self) -> bool:
+        """前回の保存以降に変更されたフレームをバックグラウンドで保存（変更がなければFalse）"""
+        if self.project_store is None:
+            return False
+        return self.project_store.save_async(self.annotation_repository)
+    
+    def close_project(self):
+        """WALを圧縮し、プロジェクトファイルへの書き込みを完了させて閉じる"""
+        if self.command_manager.journal:
+            # 次回起動時に復元できるようWALは削除しない
+            self.command_manager.checkpoint()
+            self.command_manager.attach_journal(None, self.annotation_repository)
+        if self.project_store is not None:
+            self.project_store.close()
+            self.project_store = None
+    
     # ===== ファイル操作 =====
     
     @ErrorHandler.handle_with_dialog("Video Load Error")
@@ -120,6 +199,8 @@ class MASAApplicationService:
             for frame_id, frame_ann in loaded_annotations.items():
                 for obj_ann in frame_ann.objects:
                     self.annotation_repository.add_annotation(obj_ann)
+            # 読み込んだ状態を新しい起点とする（以前の履歴は置き換え後の状態に適用できない）
+            self.start_new_journal()
             return True
         return False
     
@@ -138,7 +219,8 @@ class MASAApplicationService:
             self.export_service.export_masa_json(
                 self.annotation_repository.frame_annotations,
                 self.video_manager.video_path,
-                path
+                path,
+                category_names=self.annotation_repository.get_all_labels()
             )
             return True
         except Exception as e:
@@ -146,8 +228,8 @@ class MASAApplicationService:
             return False
     
     @ErrorHandler.handle_with_dialog("Export Error")
-    def export_coco_json(self, path: str, progress_callback=None) -> bool:
-        """COCO形式のJSONをエクスポート"""
+    def export_coco_json(self, path: str, progress_callback=None, shard_size: Optional[int] = None) -> bool:
+        """COCO形式のJSONをエクスポート（shard_size指定時はNフレームごとに分割）"""
         if not self.annotation_repository.frame_annotations:
             ErrorHandler.show_warning_dialog("エクスポートするアノテーションがありません。", "Warning")
             return False
@@ -157,43 +239,24 @@ class MASAApplicationService:
             return False
             
         try:
-            # スコア閾値でフィルタリング
+            # スコア閾値でのフィルタリングは書き出し時に行う
             display_config = self.config_manager.get_full_config(config_type="display")
-            filtered_annotations = self._filter_annotations_by_score_threshold(display_config.score_threshold)
             
             self.export_service.export_coco_with_progress(
-                filtered_annotations,
+                self.export_service.snapshot_coco_rows(self.annotation_repository.frame_annotations),
                 self.video_manager.video_path,
                 path,
                 self.video_manager,
-                progress_callback
+                progress_callback,
+                score_threshold=display_config.score_threshold,
+                category_names=self.annotation_repository.get_all_labels(),
+                shard_size=shard_size
             )
             return True
         except Exception as e:
             ErrorHandler.show_error_dialog(f"エクスポートに失敗しました: {str(e)}", "Export Error")
             return False
     
-    def _filter_annotations_by_score_threshold(self, score_threshold: float) -> Dict[int, FrameAnnotation]:
-        """スコア閾値でアノテーションをフィルタリング"""
-        filtered_frame_annotations = {}
-        
-        for frame_id, frame_annotation in self.annotation_repository.frame_annotations.items():
-            if frame_annotation and frame_annotation.objects:
-                filtered_objects = []
-                for annotation in frame_annotation.objects:
-                    if annotation.bbox.confidence >= score_threshold:
-                        filtered_objects.append(annotation)
-                
-                if filtered_objects:
-                    filtered_frame_annotation = FrameAnnotation(
-                        frame_id=frame_annotation.frame_id,
-                        frame_path=frame_annotation.frame_path,
-                        objects=filtered_objects
-                    )
-                    filtered_frame_annotations[frame_id] = filtered_frame_annotation
-        
-        return filtered_frame_annotations
-    
     # ===== 設定管理 =====
     
     def get_display_config(self):
@@ -245,12 +308,9 @@ class MASAApplicationService:
                       initial_annotations: List[tuple]) -> bool:
         """自動追跡を開始"""
         # ObjectTrackerの初期化（遅延初期化）
-        if not self.object_tracker:
-            self.object_tracker = ObjectTracker(self.get_masa_config())
-            
-        if not self.object_tracker.initialized:
+        if not self.object_tracker or not self.object_tracker.initialized:
             try:
-                self.object_tracker.initialize()
+                self.initialize_object_tracker()
             except Exception as e:
                 ErrorHandler.show_error_dialog(f"MASAモデルの初期化に失敗しました: {str(e)}", "Initialization Error")
                 return False
@@ -262,6 +322,235 @@ class MASAApplicationService:
         # 追跡処理は別途TrackingWorkerで実行される想定
         return True
     
+    def initialize_object_tracker(self) -> "ObjectTracker":
+        """ObjectTrackerを作成してモデルを初期化（作成済みの場合はそのまま返す）
+        
+        model_server_addressが設定されていれば常駐モデルサーバーを使う。
+        """
+        if not self.object_tracker:
+            self.object_tracker = create_object_tracker(self.get_masa_config())
+        if not self.object_tracker.initialized:
+            self.object_tracker.initialize()
+        return self.object_tracker
+    
+    def set_object_tracker(self, object_tracker):
+        """初期化済みのObjectTracker（ModelInitializationWorkerの結果など）を設定"""
+        self.object_tracker = object_tracker
+    
+    def track_video(self, texts: str, start_frame: int = 0, end_frame: Optional[int] = None,
+                    progress_callback=None) -> int:
+        """テキストプロンプトで指定範囲の全物体を検出・追跡し、結果を1つのUndo単位で追加
+        
+        MASAのインスタンスIDは既存のオブジェクトIDと重ならないようにずらして登録する。
+        
+        Returns:
+            追加したアノテーション数
+        """
+        if not self.video_manager:
+            raise RuntimeError("Video is not loaded")
+        object_tracker = self.initialize_object_tracker()
+        
+        total_frames = self.video_manager.get_total_frames()
+        if end_frame is None or end_frame >= total_frames:
+            end_frame = total_frames - 1
+        session = object_tracker.create_session(texts=texts, video_len=total_frames)
+        
+        id_offset = self.annotation_repository.next_object_id
+        annotations: List[ObjectAnnotation] = []
+        with SequentialFrameReader(self.video_manager.video_path, start_frame, end_frame) as reader:
+            for frame_id, frame in reader:
+                if frame is not None:
+                    for annotation in session.track(frame, frame_id):
+                        annotation.object_id += id_offset
+                        annotation.is_manual = False
+                        annotations.append(annotation)
+                if progress_callback:
+                    progress_callback(frame_id - start_frame + 1, end_frame - start_frame + 1)
+        
+        added_count = self.add_annotations(annotations, f"Track '{texts}'")
+        if annotations:
+            self.annotation_repository.next_object_id = max(
+                self.annotation_repository.next_object_id,
+                max(annotation.object_id for annotation in annotations) + 1
+            )
+        return added_count
+    
+    def build_tracking_seeds(self, track_ids: List[int], start_frame: int, end_frame: int) -> List[TrackingSeed]:
+        """既存トラックのアノテーションから複数物体追跡用のシードを作成
+        
+        指定範囲内にアノテーションを持たないトラックは除外する。
+        """
+        seeds = []
+        for track_id in track_ids:
+            annotations = [
+                ann for ann in self.annotation_repository.get_annotations_by_track_id(track_id)
+                if start_frame <= ann.frame_id <= end_frame
+            ]
+            if not annotations:
+                continue
+            annotations.sort(key=lambda ann: ann.frame_id)
+            seeds.append(TrackingSeed(
+                track_id=track_id,
+                label=annotations[0].label,
+                keyframes=[(ann.frame_id, ann.bbox) for ann in annotations]
+            ))
+        return seeds
+    
+    # ===== キーフレーム補間 =====
+    
+    def interpolate_track(self, track_id: int, method: str = "linear", verify: bool = True,
+                          similarity_threshold: float = 0.5, check_stride: int = 10,
+                          progress_callback=None) -> Dict[int, List[ObjectAnnotation]]:
+        """手動キーフレーム間をbbox補間で埋め、確認に失敗した区間のみ追跡で埋める
+        
+        補間した区間はcheck_strideフレームごと（最低1フレーム）にMASAの埋め込みを計算し、
+        両端のキーフレームとのコサイン類似度の最大値がsimilarity_threshold未満であれば
+        その区間だけObjectTrackerで追跡し直す。ObjectTrackerが初期化されていない場合や
+        verify=Falseの場合は確認を行わない。
+        既にこのトラックのアノテーションがあるフレームは結果に含めない。
+        モデルを実行するため、UIからはInterpolationWorker経由で呼び出す。
+        
+        Returns:
+            {frame_id: [ObjectAnnotation]}（追跡結果と同じ形式）
+        
+        Raises:
+            ValueError: check_strideが1未満、または手動キーフレームが2つ未満の場合
+        """
+        if check_stride < 1:
+            raise ValueError(f"check_stride must be >= 1, got {check_stride}")
+        track_annotations = self.annotation_repository.get_annotations_by_track_id(track_id)
+        keyframe_annotations = sorted(
+            (ann for ann in track_annotations if ann.is_manual), key=lambda ann: ann.frame_id
+        )
+        if len(keyframe_annotations) < 2:
+            raise ValueError("補間には2つ以上の手動キーフレームが必要です。")
+        
+        label = keyframe_annotations[0].label
+        keyframes = {ann.frame_id: ann.bbox for ann in keyframe_annotations}
+        existing_frames = {ann.frame_id for ann in track_annotations}
+        interpolator = KeyframeInterpolator(method)
+        gaps = KeyframeInterpolator.find_gaps(list(keyframes.keys()))
+        keyframe_list = sorted(keyframes.items())
+        
+        image_size = None
+        if self.video_manager:
+            image_size = (self.video_manager.get_video_width(), self.video_manager.get_video_height())
+        can_verify = (verify and self.video_manager is not None
+                      and self.object_tracker is not None and self.object_tracker.initialized)
+        reference_embeddings: Dict[int, np.ndarray] = {}
+        
+        results: Dict[int, List[ObjectAnnotation]] = {}
+        tracked_segments = 0
+        for i, (start_frame, end_frame) in enumerate(gaps):
+            frame_ids = np.arange(start_frame + 1, end_frame)
+            boxes = interpolator.interpolate_bboxes(keyframe_list, frame_ids, image_size)
+            
+            segment = None
+            if can_verify and not self._verify_interpolated_segment(
+                    frame_ids, boxes, keyframes, start_frame, end_frame,
+                    reference_embeddings, similarity_threshold, check_stride):
+                segment = self._track_segment(track_id, label, keyframes[start_frame], start_frame, end_frame)
+                tracked_segments += 1
+            
+            if segment is None:
+                confidence = min(keyframes[start_frame].confidence, keyframes[end_frame].confidence)
+                segment = {
+                    int(frame_id): ObjectAnnotation(
+                        object_id=track_id,
+                        label=label,
+                        bbox=BoundingBox(*(float(v) for v in box), confidence=confidence),
+                        frame_id=int(frame_id),
+                        is_manual=False,
+                        track_confidence=confidence
+                    )
+                    for frame_id, box in zip(frame_ids.tolist(), boxes)
+                }
+            
+            for frame_id, annotation in segment.items():
+                if frame_id not in existing_frames:
+                    results[frame_id] = [annotation]
+            
+            if progress_callback:
+                progress_callback(i + 1, len(gaps))
+        
+        print(f"Interpolated track {track_id}: {len(gaps) - tracked_segments}/{len(gaps)} segments "
+              f"by interpolation, {tracked_segments} by tracking")
+        return results
+    
+    def _verify_interpolated_segment(self, frame_ids: np.ndarray, boxes: np.ndarray,
+                                     keyframes: Dict[int, BoundingBox], start_frame: int, end_frame: int,
+                                     reference_embeddings: Dict[int, np.ndarray],
+                                     similarity_threshold: float, check_stride: int) -> bool:
+        """補間bboxの見た目が両端のキーフレームと一致しているかをMASA埋め込みで確認
+        
+        未計算のキーフレームと確認するフレームをSequentialFrameReaderで順に読み、
+        フレームごとのシークを避ける。
+        """
+        total_frames = self.video_manager.get_total_frames()
+        num_frames = len(frame_ids)
+        sample_indices = np.unique(np.r_[np.arange(check_stride - 1, num_frames, check_stride),
+                                         num_frames // 2])
+        sample_index_by_frame = {int(frame_ids[index]): index for index in sample_indices.tolist()}
+        pending_keyframes = {k for k in (start_frame, end_frame) if k not in reference_embeddings}
+        frames_to_read = sorted(set(sample_index_by_frame) | pending_keyframes)
+        
+        sample_embeddings = []
+        with SequentialFrameReader(self.video_manager.video_path, frames_to_read[0], frames_to_read[-1]) as reader:
+            for frame_id, frame in reader:
+                if frame_id in pending_keyframes:
+                    if frame is None:
+                        return False
+                    reference_embeddings[frame_id] = self.object_tracker.compute_embeddings(
+                        frame, np.array([keyframes[frame_id].to_xyxy()]), frame_id, total_frames
+                    )[0]
+                elif frame_id in sample_index_by_frame:
+                    if frame is None:
+                        return False
+                    index = sample_index_by_frame[frame_id]
+                    sample_embeddings.append(self.object_tracker.compute_embeddings(
+                        frame, boxes[index:index + 1], frame_id, total_frames
+                    )[0])
+        # 動画の終端などで読めなかったフレームがあれば確認失敗とする
+        if (len(sample_embeddings) < len(sample_index_by_frame)
+                or any(k not in reference_embeddings for k in (start_frame, end_frame))):
+            return False
+        
+        # 各サンプルについて両端のキーフレームとのコサイン類似度の最大値を確認
+        references = np.stack([reference_embeddings[start_frame], reference_embeddings[end_frame]])
+        similarities = np.stack(sample_embeddings) @ references.T
+        return bool(np.all(similarities.max(axis=1) >= similarity_threshold))
+    
+    def _track_segment(self, track_id: int, label: str, start_bbox: BoundingBox,
+                       start_frame: int, end_frame: int) -> Dict[int, ObjectAnnotation]:
+        """キーフレーム間の区間をObjectTrackerで追跡（前フレームと最も重なる結果を採用）"""
+        session = self.object_tracker.create_session(
+            texts=label, video_len=self.video_manager.get_total_frames()
+        )
+        previous_bbox = start_bbox
+        segment: Dict[int, ObjectAnnotation] = {}
+        with SequentialFrameReader(self.video_manager.video_path, start_frame + 1, end_frame - 1) as reader:
+            for frame_id, frame in reader:
+                if frame is None:
+                    continue
+                seed = ObjectAnnotation(
+                    object_id=track_id,
+                    label=label,
+                    bbox=previous_bbox,
+                    frame_id=frame_id,
+                    is_manual=True,
+                    track_confidence=1.0
+                )
+                tracked = session.track(frame, frame_id, [seed])
+                best = max(tracked, key=lambda ann: ann.bbox.iou(previous_bbox), default=None)
+                if best is None or best.bbox.iou(previous_bbox) <= 0.0:
+                    continue
+                best.object_id = track_id
+                best.label = label
+                best.is_manual = False
+                segment[frame_id] = best
+                previous_bbox = best.bbox
+        return segment
+    
     # ===== データアクセス =====
     
     def get_annotations(self, frame_id: int) -> Optional[FrameAnnotation]:
@@ -272,6 +561,17 @@ class MASAApplicationService:
         """指定トラックIDのアノテーションを取得"""
         return self.annotation_repository.get_annotations_by_track_id(track_id)
     
+    def find_track_frame(self, track_id: int, frame_id: int, forward: bool = True,
+                         gap: bool = False) -> Optional[int]:
+        """Trackが存在する次（前）のフレーム、gap=TrueならTrackが途切れている次（前）のフレームを返す
+
+        AnnotationRepository.track_index の区間を二分探索するため、フレーム数によらず高速。
+        """
+        track_index = self.annotation_repository.track_index
+        if gap:
+            return track_index.next_gap(track_id, frame_id) if forward else track_index.prev_gap(track_id, frame_id)
+        return track_index.next_frame(track_id, frame_id) if forward else track_index.prev_frame(track_id, frame_id)
+    
     def get_all_labels(self) -> List[str]:
         """すべてのラベルを取得"""
         return self.annotation_repository.get_all_labels()
@@ -330,5 +630,11 @@ class MASAApplicationService:
             self.video_manager = None
             
         if self.object_tracker:
-            # ObjectTrackerのクリーンアップが必要であれば実装
+            # モデルサーバーに接続している場合は接続と共有メモリを解放
+            close = getattr(self.object_tracker, "close", None)
+            if close:
+                close()
             self.object_tracker = None
+        
+        # 終了時に変更をプロジェクトファイルへ保存し、WALを圧縮して閉じる
+        self.close_project()
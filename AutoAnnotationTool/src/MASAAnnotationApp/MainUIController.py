@@ -11,6 +11,8 @@ from MASAApplicationService import MASAApplicationService
 from MenuPanel import MenuPanel
 from VideoPreviewWidget import VideoPreviewWidget
 from VideoControlPanel import VideoControlPanel
+from AnnotationVideoWorker import AnnotationVideoWorker
+from ErrorHandler import ErrorHandler
 
 class MainUIController:
     """UIレイアウトの管理とコンポーネントの配置を担当"""
@@ -25,6 +27,8 @@ class MainUIController:
         self.menu_panel: Optional[MenuPanel] = None
         self.video_preview: Optional[VideoPreviewWidget] = None
         self.video_control: Optional[VideoControlPanel] = None
+        self.video_export_worker: Optional[AnnotationVideoWorker] = None
+        self._timeline_key = None  # 密度の帯を最後に計算したときの (索引のrevision, 総フレーム数, bin数)
         
     def setup_main_layout(self):
         """メインレイアウトを構築"""
@@ -98,6 +102,7 @@ class MainUIController:
         self.menu_panel.delete_single_annotation_requested.connect(self._on_delete_annotation_requested)
         self.menu_panel.delete_track_requested.connect(self._on_delete_track_requested)
         self.menu_panel.propagate_label_requested.connect(self._on_propagate_label_requested)
+        self.menu_panel.interpolate_track_requested.connect(self._on_interpolate_track_requested)
         self.menu_panel.play_requested.connect(self._on_play_requested)
         self.menu_panel.pause_requested.connect(self._on_pause_requested)
         self.menu_panel.config_changed.connect(self._on_config_changed)
@@ -143,6 +148,47 @@ class MainUIController:
             current_frame = self.video_control.current_frame  
             frame_annotation = self.app_service.annotation_repository.get_annotations(current_frame)  
             self.menu_panel.update_current_frame_objects(current_frame, frame_annotation)    
+        
+        self.update_timeline()
+    
+    def update_timeline(self):
+        """RangeSliderの密度の帯と選択中Trackの存在区間を更新（索引が変わっていなければ密度は再計算しない）"""
+        if not self.video_control:
+            return
+        video_manager = self.app_service.video_manager
+        total_frames = video_manager.get_total_frames() if video_manager else 0
+        range_slider = self.video_control.range_slider
+        track_index = self.app_service.annotation_repository.track_index
+        
+        timeline_key = (track_index.revision, total_frames, range_slider.timeline_bins())
+        if timeline_key != self._timeline_key:
+            self._timeline_key = timeline_key
+            range_slider.set_density(
+                track_index.density(total_frames, range_slider.timeline_bins()) if total_frames > 0 else None
+            )
+        
+        track_id = self._get_selected_track_id()
+        range_slider.set_track_runs(track_index.get_runs(track_id) if track_id is not None else [])
+    
+    def jump_along_selected_track(self, forward: bool = True, gap: bool = False) -> bool:
+        """選択中のTrackが存在する（gap=Trueなら途切れている）次または前のフレームへ移動"""
+        track_id = self._get_selected_track_id()
+        if track_id is None or not self.video_control:
+            return False
+        target_frame = self.app_service.find_track_frame(
+            track_id, self.video_control.current_frame, forward=forward, gap=gap
+        )
+        if target_frame is None:
+            return False
+        self.video_control.set_current_frame(target_frame)
+        return True
+    
+    def _get_selected_track_id(self) -> Optional[int]:
+        if self.video_preview and hasattr(self.video_preview, 'bbox_editor') and self.video_preview.bbox_editor:
+            selected_annotation = self.video_preview.bbox_editor.selected_annotation
+            if selected_annotation is not None:
+                return selected_annotation.object_id
+        return None
 
     # ===== シグナルハンドラ（アプリケーションサービスへの委譲） =====
     
@@ -171,6 +217,10 @@ class MainUIController:
         from PyQt6.QtWidgets import QFileDialog
         from datetime import datetime
         
+        if format == "video":
+            self._on_video_export_requested()
+            return
+        
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         default_filename = f"annotations_{timestamp}.{format}"
         
@@ -194,6 +244,72 @@ class MainUIController:
             if success and self.menu_panel:
                 self.menu_panel.update_export_progress("Export completed!")
     
+    def _on_video_export_requested(self):
+        """アノテーション付き動画の書き出し要求（書き出し中の場合は中断）"""
+        from PyQt6.QtWidgets import QFileDialog, QInputDialog
+        from datetime import datetime
+        
+        if self.video_export_worker and self.video_export_worker.isRunning():
+            self.video_export_worker.cancel()
+            return
+        
+        video_manager = self.app_service.get_video_manager()
+        if not video_manager or not self.app_service.annotation_repository.frame_annotations:
+            return
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        file_path, _ = QFileDialog.getSaveFileName(
+            self.parent, "Save Annotated Video", f"annotations_{timestamp}.mp4",
+            "MP4 Files (*.mp4);;All Files (*)"
+        )
+        if not file_path:
+            return
+        
+        scales = {"100%": 1.0, "50%": 0.5, "25%": 0.25}
+        scale_text, ok = QInputDialog.getItem(
+            self.parent, "Save Annotated Video", "出力サイズ:", list(scales.keys()), 0, False
+        )
+        if not ok:
+            return
+        
+        self.video_export_worker = AnnotationVideoWorker(
+            video_manager, self.app_service.annotation_repository, file_path, scale=scales[scale_text]
+        )
+        self.video_export_worker.progress_updated.connect(self._on_export_progress)
+        self.video_export_worker.render_completed.connect(self._on_video_export_finished)
+        self.video_export_worker.render_cancelled.connect(self._on_video_export_finished)
+        self.video_export_worker.error_occurred.connect(self._on_video_export_error)
+        self._set_video_export_running(True)
+        if self.menu_panel:
+            self.menu_panel.update_export_progress("Rendering annotated video...")
+        self.video_export_worker.start()
+    
+    def _on_video_export_finished(self, output_path: str = ""):
+        """動画書き出しの完了・中断"""
+        self._set_video_export_running(False)
+        if self.menu_panel:
+            self.menu_panel.update_export_progress(
+                "Export completed!" if output_path else "Video export cancelled"
+            )
+    
+    def _on_video_export_error(self, error_message: str):
+        """動画書き出しエラー"""
+        self._set_video_export_running(False)
+        if self.menu_panel:
+            self.menu_panel.update_export_progress("")
+        ErrorHandler.show_error_dialog(f"Video export failed: {error_message}", "Export Error")
+    
+    def _set_video_export_running(self, running: bool):
+        basic_settings_tab = self.menu_panel.get_basic_settings_tab() if self.menu_panel else None
+        if basic_settings_tab:
+            basic_settings_tab.set_video_export_running(running)
+    
+    def cancel_video_export(self):
+        """動画書き出し中であれば中断して終了を待つ"""
+        if self.video_export_worker and self.video_export_worker.isRunning():
+            self.video_export_worker.cancel()
+            self.video_export_worker.wait()
+    
     def _on_export_progress(self, current: int, total: int):
         """エクスポート進捗更新"""
         if self.menu_panel:
@@ -223,6 +339,7 @@ class MainUIController:
                 self.video_preview.set_mode('batch_add')
                 if self.video_control:
                     self.video_control.range_slider.setVisible(True)
+                    self.update_timeline()
                 self.video_preview.clear_temp_batch_annotations()
             else:
                 self.video_preview.set_mode('view')
@@ -234,20 +351,9 @@ class MainUIController:
         """追跡要求"""
         if not self.video_control:
             return
-            
-        start_frame, end_frame = self.video_control.get_selected_range()
-        
-        # 一時的なバッチアノテーションを取得
-        temp_annotations = []
-        if hasattr(self.parent, 'temp_bboxes_for_batch_add'):
-            temp_annotations = self.parent.temp_bboxes_for_batch_add
-        
-        success = self.app_service.start_tracking(
-            assigned_track_id, assigned_label, start_frame, end_frame, temp_annotations
-        )
-        
-        if success and self.menu_panel:
-            self.menu_panel.update_tracking_progress("Tracking started...")
+        # ワーカースレッドの管理は親ウィジェットに委譲
+        if hasattr(self.parent, 'start_tracking'):
+            self.parent.start_tracking(assigned_track_id, assigned_label)
     
     def _on_label_change_requested(self, annotation, new_label: str):
         """ラベル変更要求"""
@@ -273,6 +379,12 @@ class MainUIController:
         if updated_count > 0:
             self.refresh_display()
     
+    def _on_interpolate_track_requested(self, track_id: int):
+        """キーフレーム補間要求"""
+        # モデルを実行するワーカースレッドの管理は親ウィジェットに委譲
+        if hasattr(self.parent, 'start_interpolation'):
+            self.parent.start_interpolation(track_id)
+    
     def _on_play_requested(self):
         """再生要求"""
         # 再生処理は親ウィジェットに委譲
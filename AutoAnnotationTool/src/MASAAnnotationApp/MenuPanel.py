@@ -31,6 +31,7 @@ class MenuPanel(QWidget):
     delete_single_annotation_requested = pyqtSignal(object)  
     delete_track_requested = pyqtSignal(int)  
     propagate_label_requested = pyqtSignal(int, str)  
+    interpolate_track_requested = pyqtSignal(int)  
       
     play_requested = pyqtSignal()  
     pause_requested = pyqtSignal()  
@@ -142,6 +143,7 @@ class MenuPanel(QWidget):
             self.annotation_edit_tab.delete_single_annotation_requested.connect(self.delete_single_annotation_requested.emit)  
             self.annotation_edit_tab.delete_track_requested.connect(self.delete_track_requested.emit)  
             self.annotation_edit_tab.propagate_label_requested.connect(self.propagate_label_requested.emit)  
+            self.annotation_edit_tab.interpolate_track_requested.connect(self.interpolate_track_requested.emit)  
               
         if self.object_list_tab:  
             # ObjectListTabManagerのシグナル接続  
@@ -196,6 +198,12 @@ class MenuPanel(QWidget):
         if self.info_sync_manager:  
             self.info_sync_manager.sync_object_list_selection(annotation)  
               
+    def get_selected_track_ids(self) -> list:  
+        """オブジェクト一覧で選択中のトラックIDを取得"""  
+        if self.object_list_tab:  
+            return self.object_list_tab.get_selected_track_ids()  
+        return []  
+              
     def update_undo_redo_buttons(self, command_manager):  
         """Undo/Redoボタンの状態を更新"""  
         if self.info_sync_manager:  
@@ -1,11 +1,15 @@
 from PyQt6.QtCore import QThread, pyqtSignal  
 
-from ObjectTracker import ObjectTracker
+from RemoteObjectTracker import create_object_tracker
   
 class ModelInitializationWorker(QThread):  
-    """MASAモデル初期化用のワーカー"""  
+    """MASAモデル初期化用のワーカー  
+  
+    MASAConfig.model_server_address が設定されていれば常駐モデルサーバーに接続し、  
+    接続できない場合はローカルでモデルを読み込む。  
+    """  
       
-    initialization_completed = pyqtSignal(object)  # ObjectTrackerを返す  
+    initialization_completed = pyqtSignal(object)  # ObjectTracker（またはRemoteObjectTracker）を返す  
     initialization_failed = pyqtSignal(str)  # エラーメッセージ  
       
     def __init__(self, config_manager):  
@@ -14,10 +18,11 @@ class ModelInitializationWorker(QThread):
       
     def run(self):  
         try: 
-            object_tracker = ObjectTracker(  
+            object_tracker = create_object_tracker(  
                 self.config_manager.get_full_config(config_type="masa")  
             )  
-            object_tracker.initialize()  # MASAモデルの初期化を実行
+            if not object_tracker.initialized:  
+                raise RuntimeError("MASA model initialization failed")  
             self.initialization_completed.emit(object_tracker)  
         except Exception as e:  
-            self.initialization_failed.emit(str(e))
\ No newline at end of file
+            self.initialization_failed.emit(str(e))
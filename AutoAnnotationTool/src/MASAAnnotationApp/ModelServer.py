@@ -0,0 +1,353 @@
+# ModelServer.py
+"""
+MASAモデルを常駐させ、複数のアノテーションアプリから追跡・埋め込み計算を受け付けるローカルサーバー
+
+アプリを起動するたびにモデルを構築・チェックポイント読み込みする代わりに、
+このサーバーを1つ起動しておけば各ウィンドウは接続するだけで追跡機能を使える（GPUメモリも1つ分）。
+
+- 通信: multiprocessing.connection（UNIXソケット、またはループバックアドレスのTCP）。
+  認証キーはサーバーの初回起動時にランダムに生成し、所有者のみ読み書きできるファイル
+  （既定は ~/.config/masa_annotation/model_server.key）に保存してクライアントと共有する
+- フレーム: クライアントが確保した共有メモリ（multiprocessing.shared_memory）に書き込み、
+  リクエストには名前・形状・dtypeだけを載せる
+- 推論: 1つの推論スレッドが全クライアントのリクエストをまとめて取り出す。
+  埋め込み計算は同じサイズのフレームをまとめ、バックボーン1回の推論でバッチ処理する。
+  追跡はセッションごとのトラッカー状態を順に更新する必要があるためフレーム単位で実行し、
+  同じテキストプロンプトのリクエストを続けて処理する（プロンプト埋め込みのキャッシュを再利用）
+- 追跡状態: セッションごとに専用のトラッカーを持つため、複数クライアントの追跡が混ざらない
+  （単発の追跡も一時的なセッションで実行する）
+
+使用例:
+    python ModelServer.py --address 127.0.0.1:50517 --device cuda:0
+    MASA_MODEL_SERVER=127.0.0.1:50517 python MASAAnnotationApp.py
+"""
+import argparse
+import ipaddress
+import itertools
+import logging
+import os
+import queue
+import secrets
+import stat
+import sys
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Listener
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ErrorHandler import ErrorHandler
+
+DEFAULT_ADDRESS = "127.0.0.1:50517"
+DEFAULT_AUTHKEY_FILE = os.path.join("~", ".config", "masa_annotation", "model_server.key")
+AUTHKEY_FILE_ENV = "MASA_MODEL_SERVER_KEY_FILE"
+
+
+def parse_address(address: str) -> Tuple[Union[str, Tuple[str, int]], str]:
+    """"host:port" はTCP、それ以外はUNIXソケット（Windowsでは名前付きパイプ）として解釈
+
+    TCPはIPv4のループバックアドレス（localhost, 127.0.0.0/8）のみ受け付ける
+    （multiprocessing.connectionのTCPはAF_INETのみ対応）。
+    """
+    if address.startswith("\\\\.\\pipe\\"):
+        return address, "AF_PIPE"
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        host = host or "127.0.0.1"
+        if not _is_loopback(host):
+            raise ValueError(f"The model server only accepts loopback TCP addresses, got {address}")
+        return (host, int(port)), "AF_INET"
+    return address, "AF_UNIX"
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        ip = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return ip.version == 4 and ip.is_loopback
+
+
+def get_authkey_path() -> str:
+    return os.path.expanduser(os.environ.get(AUTHKEY_FILE_ENV) or DEFAULT_AUTHKEY_FILE)
+
+
+def get_authkey(create: bool = False) -> bytes:
+    """認証キーをキーファイルから読み込む
+
+    create=True（サーバー）の場合、ファイルがなければランダムなキーを所有者のみ読み書き
+    できる権限（0600）で作成する。グループや他ユーザーが読めるファイルは使用しない。
+    """
+    path = get_authkey_path()
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # 同時に起動した別のサーバーが作成した
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+            logging.info(f"Created model server key file {path}")
+
+    if os.name == "posix" and stat.S_IMODE(os.stat(path).st_mode) & 0o077:
+        raise PermissionError(f"Model server key file {path} must be readable by its owner only (chmod 600)")
+    with open(path) as f:
+        authkey = f.read().strip()
+    if not authkey:
+        raise ValueError(f"Model server key file {path} is empty")
+    return authkey.encode()
+
+
+def attach_shared_memory(name: str) -> shared_memory.SharedMemory:
+    """クライアントが所有する共有メモリに接続する（解放はクライアント側で行う）"""
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == "posix":
+        # 接続しただけの共有メモリをサーバー終了時に削除しないよう追跡対象から外す
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class _ClientState:
+    """接続中のクライアントごとの状態"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.send_lock = threading.Lock()
+        self.sessions: List[int] = []  # 作成順
+        self._shm: Optional[shared_memory.SharedMemory] = None
+
+    def send(self, response: Dict[str, Any]):
+        with self.send_lock:
+            try:
+                self.connection.send(response)
+            except (OSError, EOFError):
+                pass
+
+    def frame(self, request: Dict[str, Any]) -> np.ndarray:
+        """リクエストに対応する共有メモリ上のフレームを参照する（コピーしない）"""
+        name = request["shm"]
+        if self._shm is None or self._shm.name != name:
+            self.release()
+            self._shm = attach_shared_memory(name)
+        return np.ndarray(request["shape"], dtype=np.dtype(request["dtype"]), buffer=self._shm.buf)
+
+    def release(self):
+        if self._shm is not None:
+            try:
+                self._shm.close()
+            except BufferError:
+                pass
+            self._shm = None
+
+
+class ModelServer:
+    """ObjectTrackerを常駐させて複数クライアントにサービスするサーバー"""
+
+    MAX_BATCH = 16  # 1回にまとめて取り出すリクエスト数
+    MAX_SESSIONS_PER_CLIENT = 4  # 閉じられなかったセッションは古いものから破棄する
+
+    def __init__(self, config, address: str, authkey: bytes):
+        self.config = config
+        self.address = address
+        self.authkey = authkey
+        self.object_tracker = None
+        self._requests: "queue.Queue" = queue.Queue()
+        self._sessions: Dict[int, Any] = {}
+        self._session_ids = itertools.count(1)
+        self._listener: Optional[Listener] = None
+
+    def serve_forever(self):
+        """モデルを読み込み、接続を受け付ける（Ctrl+Cで終了）"""
+        from ObjectTracker import ObjectTracker
+
+        self.object_tracker = ObjectTracker(self.config)
+        self.object_tracker.initialize()
+
+        address, family = parse_address(self.address)
+        if family == "AF_UNIX" and os.path.exists(address):
+            os.remove(address)
+        if family == "AF_UNIX":
+            # 他ユーザーから接続できないよう、ソケットを所有者のみの権限（0600）で作成する
+            previous_umask = os.umask(0o177)
+            try:
+                self._listener = Listener(address, family=family, authkey=self.authkey)
+            finally:
+                os.umask(previous_umask)
+        else:
+            self._listener = Listener(address, family=family, authkey=self.authkey)
+        threading.Thread(target=self._inference_loop, name="ModelServerInference", daemon=True).start()
+        logging.info(f"MASA model server listening on {self.address} ({self.config.device})")
+
+        try:
+            while True:
+                try:
+                    connection = self._listener.accept()
+                except (OSError, EOFError) as e:
+                    # 認証失敗などは個別の接続だけを拒否する
+                    logging.warning(f"Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._receive_loop, args=(_ClientState(connection),),
+                                 name="ModelServerClient", daemon=True).start()
+        finally:
+            self._listener.close()
+            if family == "AF_UNIX" and os.path.exists(address):
+                os.remove(address)
+
+    def _receive_loop(self, client: _ClientState):
+        """クライアントからのリクエストを推論キューに積む"""
+        try:
+            while True:
+                self._requests.put((client, client.connection.recv()))
+        except (EOFError, OSError):
+            pass
+        finally:
+            # 切断時の後始末も推論スレッドで行う（使用中の共有メモリを閉じないため）
+            self._requests.put((client, {"op": "disconnect"}))
+
+    def _inference_loop(self):
+        """全クライアントのリクエストをまとめて取り出し、プロンプトごとに続けて処理する"""
+        while True:
+            batch = [self._requests.get()]
+            while len(batch) < self.MAX_BATCH:
+                try:
+                    batch.append(self._requests.get_nowait())
+                except queue.Empty:
+                    break
+            # 各クライアントは応答を待ってから次を送るため、並べ替えても1クライアント内の順序は崩れない
+            embedding_requests = [item for item in batch if item[1].get("op") == "embeddings"]
+            if len(embedding_requests) > 1:
+                batch = [item for item in batch if item[1].get("op") != "embeddings"]
+                self._handle_embeddings(embedding_requests)
+            batch.sort(key=lambda item: self._prompt_of(item[1]) or "")
+            for client, request in batch:
+                response = self._handle(client, request)
+                if response is not None:
+                    client.send(response)
+
+    def _handle_embeddings(self, items: List[Tuple[_ClientState, Dict[str, Any]]]):
+        """複数クライアントの埋め込み計算をフレームサイズごとにまとめてバッチ推論する"""
+        groups: Dict[Tuple[int, ...], List[Tuple[_ClientState, Dict[str, Any]]]] = {}
+        for client, request in items:
+            groups.setdefault(tuple(request["shape"]), []).append((client, request))
+
+        for group in groups.values():
+            if len(group) == 1:
+                client, request = group[0]
+                client.send(self._handle(client, request))
+                continue
+            try:
+                embeddings = self.object_tracker.compute_embeddings_batch(
+                    [client.frame(request) for client, request in group],
+                    [request["bboxes"] for _, request in group],
+                    [request.get("frame_id", 0) for _, request in group],
+                    [request.get("video_len") for _, request in group]
+                )
+            except Exception as e:
+                # バッチ全体が失敗した場合は1件ずつ処理して、失敗したリクエストだけにエラーを返す
+                ErrorHandler.log_error(e, "ModelServer.embeddings (batched)")
+                for client, request in group:
+                    client.send(self._handle(client, request))
+                continue
+            for (client, _), client_embeddings in zip(group, embeddings):
+                client.send({"ok": True, "embeddings": client_embeddings})
+
+    def _prompt_of(self, request: Dict[str, Any]) -> Optional[str]:
+        session = self._sessions.get(request.get("session_id"))
+        return session.texts if session is not None else request.get("texts")
+
+    def _handle(self, client: _ClientState, request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        op = request.get("op")
+        try:
+            if op == "hello":
+                return {"ok": True, "device": self.config.device, "masa_config_path": self.config.masa_config_path}
+            if op == "open_session":
+                session_id = next(self._session_ids)
+                self._sessions[session_id] = self.object_tracker.create_session(
+                    texts=request.get("texts"), video_len=request.get("video_len"), isolated=True
+                )
+                client.sessions.append(session_id)
+                while len(client.sessions) > self.MAX_SESSIONS_PER_CLIENT:
+                    self._sessions.pop(client.sessions.pop(0), None)
+                return {"ok": True, "session_id": session_id, "classes": self._sessions[session_id].classes}
+            if op == "track":
+                session = self._sessions[request["session_id"]]
+                annotations = session.track(client.frame(request), request["frame_id"],
+                                            request.get("initial_annotations"))
+                return {"ok": True, "annotations": annotations}
+            if op == "track_arrays":
+                session = self._sessions[request["session_id"]]
+                arrays = session.track_arrays(client.frame(request), request["frame_id"],
+                                              request.get("initial_annotations"))
+                return {"ok": True, "arrays": arrays}
+            if op == "track_once":
+                # 共有のトラッカー状態を変更しないよう、一時的な専用セッションで追跡する
+                session = self.object_tracker.create_session(
+                    texts=request.get("texts"), video_len=request.get("video_len"), isolated=True
+                )
+                annotations = session.track(client.frame(request), request["frame_id"],
+                                            request.get("initial_annotations"))
+                return {"ok": True, "annotations": annotations}
+            if op == "embeddings":
+                embeddings = self.object_tracker.compute_embeddings(
+                    client.frame(request), request["bboxes"], request.get("frame_id", 0), request.get("video_len")
+                )
+                return {"ok": True, "embeddings": embeddings}
+            if op == "close_session":
+                self._sessions.pop(request["session_id"], None)
+                if request["session_id"] in client.sessions:
+                    client.sessions.remove(request["session_id"])
+                return {"ok": True}
+            if op == "disconnect":
+                for session_id in client.sessions:
+                    self._sessions.pop(session_id, None)
+                client.sessions.clear()
+                client.release()
+                return None
+            raise ValueError(f"Unknown request: {op}")
+        except Exception as e:
+            ErrorHandler.log_error(e, f"ModelServer.{op}")
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='MASA model server for the annotation tool')
+    parser.add_argument('--address', default=DEFAULT_ADDRESS,
+                        help='"host:port" (loopback TCP) or a UNIX socket path')
+    parser.add_argument('--device', default=None, help='Inference device (default: MASAConfig.device)')
+    parser.add_argument('--masa-config', default=None, help='Override MASAConfig.masa_config_path')
+    parser.add_argument('--masa-checkpoint', default=None, help='Override MASAConfig.masa_checkpoint_path')
+    parser.add_argument('--fp16', action='store_true', help='Run inference in fp16')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    from DataClass import MASAConfig
+
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    ErrorHandler.set_headless(True)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s - %(message)s')
+
+    config = MASAConfig()
+    config.model_server_address = None
+    if args.device:
+        config.device = args.device
+    if args.masa_config:
+        config.masa_config_path = args.masa_config
+    if args.masa_checkpoint:
+        config.masa_checkpoint_path = args.masa_checkpoint
+    if args.fp16:
+        config.fp16 = True
+
+    try:
+        ModelServer(config, args.address, get_authkey(create=True)).serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
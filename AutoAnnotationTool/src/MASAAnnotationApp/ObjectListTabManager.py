@@ -5,16 +5,55 @@ MenuPanelからオブジェクト一覧関連のUIと処理を分離
 """  
 from typing import Optional, List, Dict  
 from PyQt6.QtWidgets import (  
-    QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,  
+    QWidget, QVBoxLayout, QHBoxLayout, QTableView,  
     QHeaderView, QLabel, QSlider, QDoubleSpinBox, QCheckBox, QGroupBox,  
     QAbstractItemView, QPushButton  
 )  
-from PyQt6.QtCore import pyqtSignal, Qt  
+from PyQt6.QtCore import pyqtSignal, Qt, QItemSelectionModel  
 from PyQt6.QtGui import QColor  
   
 from MASAApplicationService import MASAApplicationService  
 from DataClass import ObjectAnnotation, FrameAnnotation  
 from ErrorHandler import ErrorHandler  
+from ObjectTableModel import ObjectTableColumn, ObjectAnnotationTableModel, ObjectAnnotationFilterProxyModel  
+  
+MANUAL_BACKGROUND = QColor("#E8F5E8")  # 薄い緑  
+AUTO_BACKGROUND = QColor("#E3F2FD")  # 薄い青  
+LOW_CONFIDENCE_COLOR = QColor("#F44336")  # 赤  
+MID_CONFIDENCE_COLOR = QColor("#FF9800")  # オレンジ  
+HIGH_CONFIDENCE_COLOR = QColor("#4CAF50")  # 緑  
+MANUAL_FOREGROUND = QColor("#4CAF50")  
+AUTO_FOREGROUND = QColor("#2196F3")  
+  
+def _confidence_color(annotation: ObjectAnnotation) -> QColor:  
+    if annotation.bbox.confidence < 0.5:  
+        return LOW_CONFIDENCE_COLOR  
+    elif annotation.bbox.confidence < 0.8:  
+        return MID_CONFIDENCE_COLOR  
+    return HIGH_CONFIDENCE_COLOR  
+  
+OBJECT_COLUMNS = [  
+    ObjectTableColumn("ID", lambda a: str(a.object_id), lambda a: a.object_id),  
+    ObjectTableColumn(  
+        "Label", lambda a: a.label, lambda a: a.label, align_center=False,  
+        background=lambda a: MANUAL_BACKGROUND if a.is_manual else AUTO_BACKGROUND  
+    ),  
+    ObjectTableColumn(  
+        "Confidence", lambda a: f"{a.bbox.confidence:.3f}", lambda a: a.bbox.confidence,  
+        foreground=_confidence_color  
+    ),  
+    ObjectTableColumn(  
+        "Manual", lambda a: "Yes" if a.is_manual else "No", lambda a: a.is_manual,  
+        foreground=lambda a: MANUAL_FOREGROUND if a.is_manual else AUTO_FOREGROUND  
+    ),  
+    ObjectTableColumn(  
+        "Position", lambda a: f"({a.bbox.x1},{a.bbox.y1})", lambda a: (a.bbox.x1, a.bbox.y1)  
+    ),  
+    ObjectTableColumn(  
+        "Size", lambda a: f"{a.bbox.x2 - a.bbox.x1}×{a.bbox.y2 - a.bbox.y1}",  
+        lambda a: (a.bbox.x2 - a.bbox.x1) * (a.bbox.y2 - a.bbox.y1)  
+    ),  
+]  
   
 class ObjectListTabManager(QWidget):  
     """オブジェクト一覧タブのUI管理とフィルタリング機能"""  
@@ -40,7 +79,9 @@ class ObjectListTabManager(QWidget):
           
         # UI要素  
         self.frame_info_label: Optional[QLabel] = None  
-        self.table: Optional[QTableWidget] = None  
+        self.table: Optional[QTableView] = None  
+        self.model: Optional[ObjectAnnotationTableModel] = None  
+        self.proxy_model: Optional[ObjectAnnotationFilterProxyModel] = None  
         self.score_threshold_slider: Optional[QSlider] = None  
         self.score_threshold_spinbox: Optional[QDoubleSpinBox] = None  
         self.show_manual_checkbox: Optional[QCheckBox] = None  
@@ -127,15 +168,19 @@ class ObjectListTabManager(QWidget):
         table_group = QGroupBox("Objects in Current Frame")  
         table_layout = QVBoxLayout()  
           
-        self.table = QTableWidget()  
-        self.table.setColumnCount(6)  
-        self.table.setHorizontalHeaderLabels([  
-            "ID", "Label", "Confidence", "Manual", "Position", "Size"  
-        ])  
+        self.model = ObjectAnnotationTableModel(OBJECT_COLUMNS, self)  
+        self.proxy_model = ObjectAnnotationFilterProxyModel(self)  
+        self.proxy_model.setSourceModel(self.model)  
+        self.proxy_model.set_filters(  
+            score_threshold=self.score_threshold, show_manual=self.show_manual, show_auto=self.show_auto  
+        )  
+        self.table = QTableView()  
+        self.table.setModel(self.proxy_model)  
           
         # テーブル設定  
         self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)  
-        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)  
+        # 複数物体の一括追跡のためCtrl/Shiftでの複数選択を許可（編集対象は先頭の行）  
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)  
         self.table.setAlternatingRowColors(True)  
         self.table.setSortingEnabled(True)  
           
@@ -161,8 +206,8 @@ class ObjectListTabManager(QWidget):
         self.show_auto_checkbox.toggled.connect(self._on_filter_changed)  
           
         # テーブル操作  
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)  
-        self.table.itemDoubleClicked.connect(self._on_item_double_clicked)  
+        self.table.selectionModel().selectionChanged.connect(self._on_selection_changed)  
+        self.table.doubleClicked.connect(self._on_item_double_clicked)  
           
         # リフレッシュボタン  
         self.refresh_btn.clicked.connect(self._on_refresh_clicked)
@@ -196,24 +241,22 @@ class ObjectListTabManager(QWidget):
           
         self.apply_filters()  
           
-    def _on_selection_changed(self):  
+    def _on_selection_changed(self, selected=None, deselected=None):  
         """テーブル選択変更時の処理"""  
-        selected_items = self.table.selectedItems()  
-        if selected_items:  
-            row = selected_items[0].row()  
-            if 0 <= row < len(self.current_annotations):  
-                annotation = self.current_annotations[row]  
+        selected_rows = self.table.selectionModel().selectedRows()  
+        if selected_rows:  
+            annotation = self.proxy_model.annotation_at(selected_rows[0].row())  
+            if annotation is not None:  
                 self.selected_annotation = annotation  
                 self.object_selected.emit(annotation)  
         else:  
             self.selected_annotation = None  
             self.object_selected.emit(None)  
               
-    def _on_item_double_clicked(self, item):  
+    def _on_item_double_clicked(self, index):  
         """テーブルアイテムダブルクリック時の処理"""  
-        row = item.row()  
-        if 0 <= row < len(self.current_annotations):  
-            annotation = self.current_annotations[row]  
+        annotation = self.proxy_model.annotation_at(index.row())  
+        if annotation is not None:  
             self.object_double_clicked.emit(annotation)  
               
     def _on_refresh_clicked(self):  
@@ -236,111 +279,60 @@ class ObjectListTabManager(QWidget):
             self.frame_info_label.setText(f"Frame: {frame_id} / {total_frames}")  
           
         # アノテーションリストを更新  
+        # リポジトリのリストをコピーせずにモデルへ渡す（表示行のみ描画される）  
         if frame_annotation and frame_annotation.objects:  
-            self.current_annotations = frame_annotation.objects.copy()  
+            self.current_annotations = frame_annotation.objects  
         else:  
             self.current_annotations = []  
-              
-        # フィルタを適用してテーブルを更新  
-        self.apply_filters()  
+        if self.model:  
+            self.model.set_annotations(self.current_annotations)  
+            self._restore_selection()  
           
     def apply_filters(self):  
         """フィルタを適用してテーブルを更新"""  
-        if not self.table:  
+        if not self.proxy_model:  
             return  
               
-        # フィルタリング  
-        filtered_annotations = []  
-        for annotation in self.current_annotations:  
-            # スコア閾値チェック  
-            if annotation.bbox.confidence < self.score_threshold:  
-                continue  
-                  
-            # マニュアル/自動フィルタチェック  
-            if annotation.is_manual and not self.show_manual:  
-                continue  
-            if not annotation.is_manual and not self.show_auto:  
-                continue  
-                  
-            filtered_annotations.append(annotation)  
-              
-        # テーブル更新  
-        self._update_table(filtered_annotations)  
-          
-    def _update_table(self, annotations: List[ObjectAnnotation]):  
-        """テーブルを更新"""  
-        self.table.setRowCount(len(annotations))  
-          
-        for row, annotation in enumerate(annotations):  
-            # ID  
-            id_item = QTableWidgetItem(str(annotation.object_id))  
-            id_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  
-            self.table.setItem(row, 0, id_item)  
-              
-            # Label  
-            label_item = QTableWidgetItem(annotation.label)  
-            if annotation.is_manual:  
-                label_item.setBackground(QColor("#E8F5E8"))  # 薄い緑  
-            else:  
-                label_item.setBackground(QColor("#E3F2FD"))  # 薄い青  
-            self.table.setItem(row, 1, label_item)  
-              
-            # Confidence  
-            conf_item = QTableWidgetItem(f"{annotation.bbox.confidence:.3f}")  
-            conf_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  
-            if annotation.bbox.confidence < 0.5:  
-                conf_item.setForeground(QColor("#F44336"))  # 赤  
-            elif annotation.bbox.confidence < 0.8:  
-                conf_item.setForeground(QColor("#FF9800"))  # オレンジ  
-            else:  
-                conf_item.setForeground(QColor("#4CAF50"))  # 緑  
-            self.table.setItem(row, 2, conf_item)  
-              
-            # Manual  
-            manual_item = QTableWidgetItem("Yes" if annotation.is_manual else "No")  
-            manual_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  
-            if annotation.is_manual:  
-                manual_item.setForeground(QColor("#4CAF50"))  
-            else:  
-                manual_item.setForeground(QColor("#2196F3"))  
-            self.table.setItem(row, 3, manual_item)  
-              
-            # Position  
-            bbox = annotation.bbox  
-            pos_text = f"({bbox.x1},{bbox.y1})"  
-            pos_item = QTableWidgetItem(pos_text)  
-            pos_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  
-            self.table.setItem(row, 4, pos_item)  
-              
-            # Size  
-            width = bbox.x2 - bbox.x1  
-            height = bbox.y2 - bbox.y1  
-            size_text = f"{width}×{height}"  
-            size_item = QTableWidgetItem(size_text)  
-            size_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)  
-            self.table.setItem(row, 5, size_item)  
-              
-        # 現在の選択を維持  
+        self.proxy_model.set_filters(  
+            score_threshold=self.score_threshold, show_manual=self.show_manual, show_auto=self.show_auto  
+        )  
+        self._restore_selection()  
+          
+    def _restore_selection(self):  
+        """現在の選択を維持"""  
         if self.selected_annotation:  
-            self.select_annotation(self.selected_annotation)
+            self.select_annotation(self.selected_annotation)  
+              
     def select_annotation(self, annotation: Optional[ObjectAnnotation]):  
         """指定されたアノテーションを選択"""  
         if not annotation or not self.table:  
             return  
+        if annotation.frame_id != self.current_frame_id:  
+            return  
               
-        # テーブル内で該当する行を探す  
-        for row in range(self.table.rowCount()):  
-            id_item = self.table.item(row, 0)  
-            if id_item and int(id_item.text()) == annotation.object_id:  
-                # 該当する行の最初のフレームのアノテーションIDが一致するかチェック  
-                if row < len(self.current_annotations):  
-                    table_annotation = self.current_annotations[row]  
-                    if (table_annotation.object_id == annotation.object_id and   
-                        table_annotation.frame_id == annotation.frame_id):  
-                        self.table.selectRow(row)  
-                        self.selected_annotation = annotation  
-                        break  
+        # object_id -> 行の索引から該当行を選択  
+        row = self.proxy_model.row_of_object(annotation.object_id)  
+        if row >= 0:  
+            index = self.proxy_model.index(row, 0)  
+            self.table.selectionModel().select(  
+                index,  
+                QItemSelectionModel.SelectionFlag.ClearAndSelect | QItemSelectionModel.SelectionFlag.Rows  
+            )  
+            self.table.scrollTo(index)  
+            self.selected_annotation = annotation  
                           
+    def get_selected_track_ids(self) -> List[int]:  
+        """選択中の行のトラックIDを重複なく表示順で取得"""  
+        if not self.table or not self.table.selectionModel():  
+            return []  
+        rows = sorted(index.row() for index in self.table.selectionModel().selectedRows())  
+        track_ids = []  
+        for row in rows:  
+            annotation = self.proxy_model.annotation_at(row)  
+            if annotation is not None and annotation.object_id not in track_ids:  
+                track_ids.append(annotation.object_id)  
+        return track_ids  
+          
     def get_selected_annotation(self) -> Optional[ObjectAnnotation]:  
         """選択中のアノテーションを取得"""  
         return self.selected_annotation  
@@ -376,7 +368,7 @@ class ObjectListTabManager(QWidget):
         """現在表示中のアノテーション数を取得"""  
         return {  
             "total": len(self.current_annotations),  
-            "filtered": self.table.rowCount() if self.table else 0,  
+            "filtered": self.proxy_model.rowCount() if self.proxy_model else 0,  
             "manual": sum(1 for ann in self.current_annotations if ann.is_manual),  
             "auto": sum(1 for ann in self.current_annotations if not ann.is_manual)  
         }  
@@ -0,0 +1,165 @@
+# ObjectTableModel.py
+"""
+オブジェクト一覧テーブル用のモデル/プロキシモデル
+AnnotationRepositoryのフレームごとのオブジェクトリストを直接参照し、
+表示中の行のセルだけを必要に応じて生成する（QTableWidgetItemを作らない）
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, QSortFilterProxyModel, Qt
+from PyQt6.QtGui import QColor
+
+from DataClass import ObjectAnnotation
+
+
+@dataclass
+class ObjectTableColumn:
+    """テーブル列の定義"""
+    header: str
+    text: Callable[[ObjectAnnotation], str]
+    sort_key: Callable[[ObjectAnnotation], Any]
+    align_center: bool = True
+    foreground: Optional[Callable[[ObjectAnnotation], Optional[QColor]]] = None
+    background: Optional[Callable[[ObjectAnnotation], Optional[QColor]]] = None
+
+
+class ObjectAnnotationTableModel(QAbstractTableModel):
+    """ObjectAnnotationのリストを表示するテーブルモデル"""
+
+    ANNOTATION_ROLE = Qt.ItemDataRole.UserRole
+    SORT_ROLE = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, columns: List[ObjectTableColumn], parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self._annotations: List[ObjectAnnotation] = []
+        self._row_by_object_id: Optional[Dict[int, int]] = None
+
+    def set_annotations(self, annotations: List[ObjectAnnotation]):
+        """表示するアノテーションを差し替える（コピーせずに参照する）"""
+        self.beginResetModel()
+        self._annotations = annotations
+        self._row_by_object_id = None
+        self.endResetModel()
+
+    def refresh(self):
+        """参照中のリストが外部で変更された場合に再描画する"""
+        self.set_annotations(self._annotations)
+
+    def annotations(self) -> List[ObjectAnnotation]:
+        return self._annotations
+
+    def annotation_at(self, row: int) -> Optional[ObjectAnnotation]:
+        if 0 <= row < len(self._annotations):
+            return self._annotations[row]
+        return None
+
+    def row_of_object(self, object_id: int) -> int:
+        """object_idに対応する行を返す（存在しない場合は-1）"""
+        if self._row_by_object_id is None:
+            self._row_by_object_id = {
+                annotation.object_id: row for row, annotation in enumerate(self._annotations)
+            }
+        return self._row_by_object_id.get(object_id, -1)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._annotations)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.columns)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            if 0 <= section < len(self.columns):
+                return self.columns[section].header
+        return super().headerData(section, orientation, role)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        annotation = self.annotation_at(index.row())
+        if annotation is None:
+            return None
+        column = self.columns[index.column()]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return column.text(annotation)
+        if role == self.ANNOTATION_ROLE:
+            return annotation
+        if role == self.SORT_ROLE:
+            return column.sort_key(annotation)
+        if role == Qt.ItemDataRole.TextAlignmentRole and column.align_center:
+            return Qt.AlignmentFlag.AlignCenter
+        if role == Qt.ItemDataRole.ForegroundRole and column.foreground is not None:
+            return column.foreground(annotation)
+        if role == Qt.ItemDataRole.BackgroundRole and column.background is not None:
+            return column.background(annotation)
+        return None
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+        # 編集不可
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+
+class ObjectAnnotationFilterProxyModel(QSortFilterProxyModel):
+    """スコア閾値・ラベル・手動/自動でフィルタリングし、数値でソートするプロキシモデル"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.score_threshold = 0.0
+        self.label: Optional[str] = None  # Noneの場合はすべてのラベル
+        self.show_manual = True
+        self.show_auto = True
+        self.setSortRole(ObjectAnnotationTableModel.SORT_ROLE)
+
+    def set_filters(self, score_threshold: Optional[float] = None,
+                    show_manual: Optional[bool] = None, show_auto: Optional[bool] = None):
+        """フィルタ条件を更新（指定されたものだけ変更）"""
+        if score_threshold is not None:
+            self.score_threshold = score_threshold
+        if show_manual is not None:
+            self.show_manual = show_manual
+        if show_auto is not None:
+            self.show_auto = show_auto
+        self.invalidateFilter()
+
+    def set_label_filter(self, label: Optional[str]):
+        """ラベルフィルタを設定（Noneですべて表示）"""
+        self.label = label
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        annotation = self.sourceModel().annotation_at(source_row)
+        if annotation is None:
+            return False
+        if annotation.bbox.confidence < self.score_threshold:
+            return False
+        if self.label is not None and annotation.label != self.label:
+            return False
+        if annotation.is_manual and not self.show_manual:
+            return False
+        if not annotation.is_manual and not self.show_auto:
+            return False
+        return True
+
+    def annotation_at(self, proxy_row: int) -> Optional[ObjectAnnotation]:
+        """プロキシ側の行のアノテーションを取得"""
+        source_index = self.mapToSource(self.index(proxy_row, 0))
+        if not source_index.isValid():
+            return None
+        return self.sourceModel().annotation_at(source_index.row())
+
+    def row_of_object(self, object_id: int) -> int:
+        """object_idに対応するプロキシ側の行を返す（非表示・存在しない場合は-1）"""
+        source_row = self.sourceModel().row_of_object(object_id)
+        if source_row < 0:
+            return -1
+        proxy_index = self.mapFromSource(self.sourceModel().index(source_row, 0))
+        return proxy_index.row() if proxy_index.isValid() else -1
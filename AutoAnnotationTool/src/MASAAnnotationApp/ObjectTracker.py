@@ -1,10 +1,11 @@
 # ObjectTracker.py  
+import copy
 import os
 import sys
 import numpy as np  
 import torch  
-from typing import List, Optional, Union  
-from DataClass import MASAConfig, ObjectAnnotation, BoundingBox  
+from typing import Dict, List, Optional, Tuple, Union  
+from DataClass import MASAConfig, ObjectAnnotation, BoundingBox, TrackArrays  
 from ErrorHandler import ErrorHandler  
   
 # MM関連のインポート  
@@ -15,8 +16,7 @@ from mmcv.ops.nms import batched_nms
 # MASAの機能をインポート  
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))))  
 import masa  
-from masa.apis import inference_masa, init_masa, inference_detector, build_test_pipeline  
-from masa.models.sam import SamPredictor, sam_model_registry  
+from masa.apis import inference_masa, init_masa, inference_detector, build_test_pipeline, inference_masa_embeddings_batch  
   
 class ObjectTracker:  
     """MASA を使用した物体追跡クラス（改善版）"""  
@@ -29,6 +29,8 @@ class ObjectTracker:
         self.test_pipeline = None  
         self.masa_test_pipeline = None  
         self.initialized = False  
+        # (with_text, detector_type) -> Compose のキャッシュ  
+        self._masa_pipeline_cache: Dict[Tuple[bool, str], Compose] = {}  
       
     @ErrorHandler.handle_with_dialog("MASA Initialization Error")  
     def initialize(self):  
@@ -65,64 +67,170 @@ class ObjectTracker:
             self.test_pipeline = Compose(self.det_model.cfg.test_dataloader.dataset.pipeline)  
           
         # MASAテストパイプラインの構築  
-        self.masa_test_pipeline = build_test_pipeline(self.masa_model.cfg)  
+        self.masa_test_pipeline = self.get_masa_test_pipeline(with_text=False)  
           
         # SAMの初期化（必要に応じて）  
         if self.config.sam_mask:  
+            # SAMはマスク出力時のみ使うため、使わない場合はインポートしない  
+            from masa.models.sam import SamPredictor, sam_model_registry  
             sam_model = sam_model_registry[self.config.sam_type](self.config.sam_path)  
             self.sam_predictor = SamPredictor(sam_model.to(self.config.device))  
           
         self.initialized = True  
         print("MASA models initialized successfully.")  
       
+    def get_masa_test_pipeline(self, with_text: bool) -> Compose:  
+        """MASAテストパイプラインを取得（(with_text, detector_type)ごとにメモ化）  
+  
+        パイプラインはテキストプロンプトの有無と検出器の種類のみで決まり、  
+        ラベル文字列には依存しないため、追跡対象が変わっても再構築しない。  
+        """  
+        key = (with_text, self.config.detector_type)  
+        pipeline = self._masa_pipeline_cache.get(key)  
+        if pipeline is None:  
+            pipeline = build_test_pipeline(  
+                self.masa_model.cfg,  
+                with_text=with_text,  
+                detector_type=self.config.detector_type  
+            )  
+            self._masa_pipeline_cache[key] = pipeline  
+        return pipeline  
+  
+    def create_session(self, texts: str = None, video_len: Optional[int] = None,  
+                       isolated: bool = False) -> "TrackingSession":  
+        """追跡1回分のセッションを作成（トラッカー状態・プロンプト・パイプラインを保持）  
+  
+        isolated=Trueの場合はセッション専用のトラッカーを持ち、  
+        複数のセッションを交互に進めても追跡状態が混ざらない（モデルサーバー用）。  
+        """  
+        if not self.initialized:  
+            self.initialize()  
+        return TrackingSession(self, texts=texts, video_len=video_len, isolated=isolated)  
+  
+    def reset_model_state(self):  
+        """トラッカーのメモリとテキストプロンプトのキャッシュをリセット"""  
+        tracker = getattr(self.masa_model, 'tracker', None)  
+        if tracker is not None:  
+            tracker.reset()  
+  
+        # GroundingDINO系の検出器はテキスト埋め込みをプロンプト単位でキャッシュしている  
+        detector = getattr(self.masa_model, 'detector', None)  
+        if detector is not None and hasattr(detector, 'track_text_prompt'):  
+            detector.track_text_prompt = None  
+            detector.track_text_dict = None  
+  
+    def compute_embeddings(self, frame: np.ndarray, bboxes: np.ndarray, frame_id: int = 0,  
+                           video_len: Optional[int] = None) -> np.ndarray:  
+        """指定bbox (N, 4, xyxy) のMASA追跡用埋め込みをL2正規化して返す (N, C)  
+  
+        検出ヘッドは実行せず、バックボーン・MASAアダプタ・track_headのみを使う。  
+        """  
+        return self.compute_embeddings_batch([frame], [bboxes], [frame_id], [video_len])[0]  
+  
+    def compute_embeddings_batch(self, frames: List[np.ndarray], bboxes: List[np.ndarray],  
+                                 frame_ids: List[int],  
+                                 video_lens: List[Optional[int]]) -> List[np.ndarray]:  
+        """複数フレームの埋め込みをバックボーン1回の推論でまとめて計算する（モデルサーバー用）  
+  
+        フレームはデータ前処理で最大サイズにパディングされるため、同じサイズのフレームをまとめること。  
+        """  
+        if not self.initialized:  
+            self.initialize()  
+  
+        bbox_tensors = [torch.as_tensor(np.asarray(b, dtype=np.float32).reshape(-1, 4), device=self.config.device)  
+                        for b in bboxes]  
+        embeds_list = inference_masa_embeddings_batch(  
+            self.masa_model,  
+            frames,  
+            bbox_tensors,  
+            test_pipeline=self.get_masa_test_pipeline(with_text=False),  
+            frame_ids=frame_ids,  
+            video_lens=[video_len if video_len is not None else frame_id + 1  
+                        for frame_id, video_len in zip(frame_ids, video_lens)],  
+            fp16=self.config.fp16  
+        )  
+        return [torch.nn.functional.normalize(embeds.float(), dim=1).cpu().numpy() for embeds in embeds_list]  
+  
     @ErrorHandler.handle_with_dialog("Object Tracking Error")  
     def track_objects(self, frame: np.ndarray, frame_id: int,  
                     initial_annotations: List[ObjectAnnotation] = None,  
-                    texts: str = None) -> List[ObjectAnnotation]:  
+                    texts: str = None,  
+                    video_len: Optional[int] = None) -> List[ObjectAnnotation]:  
         """  
         フレーム内の物体を追跡  
+  
+        単発の呼び出し用。連続したフレームを追跡する場合は create_session() を使用すること。  
         """  
         if not self.initialized:  
             self.initialize()  
-          
-        # MASAテストパイプラインの再構築（テキストプロンプト対応）  
-        if texts is not None:  
-            self.masa_test_pipeline = build_test_pipeline(  
-                self.masa_model.cfg,  
-                with_text=True,  
-                detector_type=self.config.detector_type  
-            )  
-          
-        det_bboxes_from_initial = None  
-        det_labels_from_initial = None  
-        if initial_annotations:  
-            bboxes_list = []  
-            labels_list = []  
-              
-            # MASAモデルの入力形式に合わせるため、ラベルを数値IDに変換する必要がある  
-            # ここでは、textsが単一のラベル名であることを前提とし、そのラベルIDを0とする  
-            # 実際のMASAモデルのラベルマッピングに応じて調整が必要  
-            label_to_id = {texts: 0} if texts else {}  
-              
-            for ann in initial_annotations:  
-                # bboxはxyxy形式で、スコアを結合してxyxy+scoreの5次元テンソルにする  
-                bbox_tensor = torch.tensor([ann.bbox.x1, ann.bbox.y1, ann.bbox.x2, ann.bbox.y2, ann.bbox.confidence],  
-                                           dtype=torch.float32, device=self.config.device)  
-                bboxes_list.append(bbox_tensor)  
-                labels_list.append(torch.tensor(label_to_id.get(ann.label, 0), dtype=torch.long, device=self.config.device))  
-              
-            if bboxes_list:  
-                det_bboxes_from_initial = torch.stack(bboxes_list)  
-                det_labels_from_initial = torch.stack(labels_list)  
-          
+  
+        test_pipeline = self.get_masa_test_pipeline(with_text=texts is not None)  
+        return self._track_frame(frame, frame_id, initial_annotations, texts,  
+                                 test_pipeline, video_len)  
+  
+    def _track_frame(self, frame: np.ndarray, frame_id: int,  
+                     initial_annotations: Optional[List[ObjectAnnotation]],  
+                     texts: Optional[str], test_pipeline: Compose,  
+                     video_len: Optional[int],  
+                     label_names: Optional[List[str]] = None) -> List[ObjectAnnotation]:  
+        """1フレーム分の推論を実行してObjectAnnotationに変換"""  
+        arrays = self._track_frame_arrays(frame, frame_id, initial_annotations, texts,  
+                                          test_pipeline, video_len, label_names)  
+        return self._arrays_to_annotations(arrays, frame_id, texts, label_names)  
+  
+    def _initial_detections(self, initial_annotations: Union[List[ObjectAnnotation], TrackArrays, None],  
+                            texts: Optional[str],  
+                            label_names: Optional[List[str]]) -> Tuple[Optional[torch.Tensor], Optional[torch.Tensor]]:  
+        """初期アノテーションをMASAの入力形式 (xyxy+scoreの5次元, ラベルID) のテンソルにする"""  
+        if initial_annotations is None or len(initial_annotations) == 0:  
+            return None, None  
+  
+        if isinstance(initial_annotations, TrackArrays):  
+            # 前フレームの追跡結果などの配列はラベルIDを持っているのでそのまま使う  
+            bboxes = np.concatenate([initial_annotations.bboxes.reshape(-1, 4),  
+                                     initial_annotations.scores.reshape(-1, 1)], axis=1)  
+            labels = (initial_annotations.labels if initial_annotations.labels is not None  
+                      else np.zeros(len(initial_annotations), dtype=np.int64))  
+            return (torch.as_tensor(bboxes, dtype=torch.float32, device=self.config.device),  
+                    torch.as_tensor(labels, dtype=torch.long, device=self.config.device))  
+  
+        # MASAモデルの入力形式に合わせるため、ラベルを数値IDに変換する必要がある  
+        # テキストプロンプト内の位置をラベルIDとする（見つからない場合は0）  
+        if label_names is None:  
+            label_names = texts.split(' . ') if texts else []  
+        label_to_id = {label: i for i, label in enumerate(label_names)}  
+  
+        # bboxはxyxy形式で、スコアを結合してxyxy+scoreの5次元テンソルにする  
+        det_bboxes = torch.tensor(  
+            [[ann.bbox.x1, ann.bbox.y1, ann.bbox.x2, ann.bbox.y2, ann.bbox.confidence]  
+             for ann in initial_annotations],  
+            dtype=torch.float32, device=self.config.device)  
+        det_labels = torch.tensor(  
+            [label_to_id.get(ann.label, 0) for ann in initial_annotations],  
+            dtype=torch.long, device=self.config.device)  
+        return det_bboxes, det_labels  
+  
+    def _track_frame_arrays(self, frame: np.ndarray, frame_id: int,  
+                            initial_annotations: Union[List[ObjectAnnotation], TrackArrays, None],  
+                            texts: Optional[str], test_pipeline: Compose,  
+                            video_len: Optional[int],  
+                            label_names: Optional[List[str]] = None) -> TrackArrays:  
+        """1フレーム分の推論を実行し、結果を配列のまま返す（ObjectAnnotationへの変換はしない）"""  
+        if video_len is None:  
+            video_len = frame_id + 1  
+  
+        det_bboxes_from_initial, det_labels_from_initial = self._initial_detections(  
+            initial_annotations, texts, label_names  
+        )  
+  
         # MASAによる推論実行  
         if self.config.unified_mode:  
             track_result = inference_masa(  
                 self.masa_model,  
                 frame,  
                 frame_id=frame_id,  
-                video_len=1000,  # 仮の値、実際にはVideoManagerから取得  
-                test_pipeline=self.masa_test_pipeline,  
+                video_len=video_len,  
+                test_pipeline=test_pipeline,  
                 text_prompt=texts,  
                 custom_entities=True if texts else False,  
                 det_bboxes=det_bboxes_from_initial,  
@@ -140,7 +248,7 @@ class ObjectTracker:
                     test_pipeline=self.test_pipeline,  
                     fp16=self.config.fp16  
                 )  
-              
+  
             # NMS処理  
             det_bboxes, keep_idx = batched_nms(  
                 boxes=result.pred_instances.bboxes,  
@@ -149,85 +257,130 @@ class ObjectTracker:
                 class_agnostic=True,  
                 nms_cfg=dict(type='nms', iou_threshold=0.5, class_agnostic=True, split_thr=100000)  
             )  
-              
+  
             det_bboxes = torch.cat([  
                 det_bboxes,  
                 result.pred_instances.scores[keep_idx].unsqueeze(1)  
             ], dim=1)  
             det_labels = result.pred_instances.labels[keep_idx]  
-              
+  
             # initial_annotationsが存在する場合は、既存の検出結果と結合する  
             if det_bboxes_from_initial is not None and det_labels_from_initial is not None:  
                 det_bboxes = torch.cat([det_bboxes_from_initial, det_bboxes], dim=0)  
                 det_labels = torch.cat([det_labels_from_initial, det_labels], dim=0)  
-              
+  
             track_result = inference_masa(  
                 self.masa_model,  
                 frame,  
                 frame_id=frame_id,  
-                video_len=1000,  # 仮の値、実際にはVideoManagerから取得  
-                test_pipeline=self.masa_test_pipeline,  
+                video_len=video_len,  
+                test_pipeline=test_pipeline,  
                 det_bboxes=det_bboxes,  
                 det_labels=det_labels,  
                 fp16=self.config.fp16,  
                 show_fps=False  
             )  
-          
-        annotations = self._convert_track_result_to_annotations(  
-            track_result, frame_id, texts  
-        )  
-          
-        return annotations  
-      
-    def _convert_track_result_to_annotations(self, track_result, frame_id: int,  
-                                           texts: str = None) -> List[ObjectAnnotation]:  
-        """追跡結果をObjectAnnotationに変換"""  
-        annotations = []  
-          
+  
+        return self._track_result_to_arrays(track_result)  
+  
+    def _track_result_to_arrays(self, track_result) -> TrackArrays:  
+        """追跡結果をスコア閾値で絞り込み、CPU上の配列にする  
+  
+        テンソルは要素ごとにfloat()するとその都度GPU同期が発生するため、  
+        フィールドごとにまとめてCPUへ転送する。  
+        """  
+        empty = TrackArrays(bboxes=np.zeros((0, 4), dtype=np.float32), scores=np.zeros(0, dtype=np.float32))  
         if not track_result or len(track_result) == 0:  
-            return annotations  
+            return empty  
           
         pred_instances = track_result[0].pred_track_instances  
+        if len(pred_instances.bboxes) == 0:  
+            return empty  
           
-        for i in range(len(pred_instances.bboxes)):  
-            bbox_tensor = pred_instances.bboxes[i]  
-            bbox = BoundingBox(  
-                x1=float(bbox_tensor[0]),  
-                y1=float(bbox_tensor[1]),  
-                x2=float(bbox_tensor[2]),  
-                y2=float(bbox_tensor[3]),  
-                confidence=float(pred_instances.scores[i])  
-            )  
-              
-            # ラベルの取得  
-            label = "unknown"  
-            if hasattr(pred_instances, 'labels') and i < len(pred_instances.labels):  
-                label_idx = int(pred_instances.labels[i])  
-                if texts:  
-                    label_names = texts.split(' . ')  
-                    label = label_names[label_idx] if label_idx < len(label_names) else f"class_{label_idx}"  
-                else:  
-                    # MASAモデルのクラス名があればそれを使用  
-                    if hasattr(self.masa_model, 'dataset_meta') and 'classes' in self.masa_model.dataset_meta:  
-                        classes = self.masa_model.dataset_meta['classes']  
-                        label = classes[label_idx] if label_idx < len(classes) else f"class_{label_idx}"  
-                    else:  
-                        label = f"class_{label_idx}"  
-              
-            # インスタンスIDの取得  
-            object_id = int(pred_instances.instances_id[i]) if hasattr(pred_instances, 'instances_id') else -1 # -1は新規IDを意味  
-              
-            annotation = ObjectAnnotation(  
-                object_id=object_id,  
-                label=label,  
-                bbox=bbox,  
-                frame_id=frame_id,  
-                is_manual=False, # 自動追跡結果  
-                track_confidence=float(pred_instances.scores[i])  
+        # スコア閾値でのフィルタリングを先にまとめて行う  
+        scores = pred_instances.scores.detach().cpu().numpy()  
+        keep = np.flatnonzero(scores >= self.config.score_threshold)  
+        labels = None  
+        if hasattr(pred_instances, 'labels'):  
+            labels = pred_instances.labels.detach().cpu().numpy()[keep]  
+        instance_ids = None  
+        if hasattr(pred_instances, 'instances_id'):  
+            instance_ids = pred_instances.instances_id.detach().cpu().numpy()[keep]  
+        return TrackArrays(  
+            bboxes=pred_instances.bboxes.detach().cpu().numpy()[keep].reshape(-1, 4),  
+            scores=scores[keep],  
+            labels=labels,  
+            instance_ids=instance_ids  
+        )  
+  
+    def get_label_classes(self, texts: Optional[str] = None,  
+                          label_names: Optional[List[str]] = None) -> List[str]:  
+        """追跡結果のラベルIDに対応するラベル名の一覧"""  
+        if texts:  
+            return label_names if label_names is not None else texts.split(' . ')  
+        if hasattr(self.masa_model, 'dataset_meta') and 'classes' in self.masa_model.dataset_meta:  
+            # MASAモデルのクラス名があればそれを使用  
+            return list(self.masa_model.dataset_meta['classes'])  
+        return []  
+  
+    def _arrays_to_annotations(self, arrays: TrackArrays, frame_id: int, texts: Optional[str] = None,  
+                               label_names: Optional[List[str]] = None) -> List[ObjectAnnotation]:  
+        """追跡結果の配列をObjectAnnotationに変換"""  
+        return arrays.to_annotations(frame_id, self.get_label_classes(texts, label_names))  
+  
+  
+class TrackingSession:  
+    """1回の追跡処理（連続フレーム）で使い回す状態をまとめたセッション  
+  
+    テストパイプライン・テキストプロンプト・動画長をフレーム間で保持し、  
+    開始時にトラッカーのメモリとプロンプト埋め込みのキャッシュをリセットする。  
+    同一プロンプトのテキスト埋め込みは検出器側で保持されるため、  
+    2フレーム目以降のオーバーヘッドはモデルのforwardのみとなる。  
+    """  
+  
+    def __init__(self, object_tracker: ObjectTracker, texts: str = None,  
+                 video_len: Optional[int] = None, isolated: bool = False):  
+        self.object_tracker = object_tracker  
+        self.texts = texts  
+        self.label_names = texts.split(' . ') if texts else []  
+        self.video_len = video_len  
+        self.test_pipeline = object_tracker.get_masa_test_pipeline(with_text=texts is not None)  
+        self.frames_processed = 0  
+        self.tracker = None  
+        self.classes = object_tracker.get_label_classes(texts, self.label_names)  
+  
+        # 前回の追跡結果やプロンプトが持ち越されないようにする  
+        object_tracker.reset_model_state()  
+        if isolated:  
+            shared_tracker = getattr(object_tracker.masa_model, 'tracker', None)  
+            if shared_tracker is not None:  
+                self.tracker = copy.deepcopy(shared_tracker)  
+  
+    def track(self, frame: np.ndarray, frame_id: int,  
+              initial_annotations: List[ObjectAnnotation] = None) -> List[ObjectAnnotation]:  
+        """1フレーム分の追跡を実行"""  
+        return self.to_annotations(self.track_arrays(frame, frame_id, initial_annotations), frame_id)  
+  
+    def track_arrays(self, frame: np.ndarray, frame_id: int,  
+                     initial_annotations: Union[List[ObjectAnnotation], TrackArrays, None] = None) -> TrackArrays:  
+        """1フレーム分の追跡を実行し、結果を配列のまま返す（変換は to_annotations() で行う）"""  
+        masa_model = self.object_tracker.masa_model  
+        shared_tracker = None  
+        if self.tracker is not None:  
+            # セッション専用のトラッカーに差し替えて推論する  
+            shared_tracker = masa_model.tracker  
+            masa_model.tracker = self.tracker  
+        try:  
+            arrays = self.object_tracker._track_frame_arrays(  
+                frame, frame_id, initial_annotations, self.texts,  
+                self.test_pipeline, self.video_len, self.label_names  
             )  
-              
-            # 信頼度スコアでフィルタリング  
-            if annotation.bbox.confidence >= self.config.score_threshold:  
-                annotations.append(annotation)  
-          
-        return annotations
\ No newline at end of file
+        finally:  
+            if shared_tracker is not None:  
+                masa_model.tracker = shared_tracker  
+        self.frames_processed += 1  
+        return arrays  
+  
+    def to_annotations(self, arrays: TrackArrays, frame_id: int) -> List[ObjectAnnotation]:  
+        """track_arrays() の結果をObjectAnnotationに変換（推論スレッド以外から呼び出してよい）"""  
+        return arrays.to_annotations(frame_id, self.classes)  
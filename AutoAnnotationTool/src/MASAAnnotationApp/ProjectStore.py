@@ -0,0 +1,200 @@
+# ProjectStore.py
+"""
+アノテーションのネイティブプロジェクト形式（SQLite）
+
+フレームごとのアノテーションを AnnotationJournal と同じ構造化配列のBLOBとして保持し、
+前回の保存以降に変更されたフレームだけを書き込む。書き込みは専用スレッドで順番に行い、
+UIスレッドでは変更フレームのパックだけを行う。
+MASA JSON / COCO JSON は従来どおり明示的なエクスポートとして残す。
+"""
+import queue
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from AnnotationJournal import ROW_DTYPE, pack_rows, unpack_rows
+
+
+@dataclass
+class ProjectChanges:
+    """1回の保存で書き込む内容（UIスレッドで作成し、書き込みスレッドに渡す）"""
+    full_rewrite: bool
+    frames: Dict[int, Optional[bytes]]  # frame_id -> パック済みの行（Noneは削除）
+    new_labels: List[Tuple[int, str]] = field(default_factory=list)
+    next_object_id: int = 1
+
+
+class ProjectStore:
+    """SQLiteによる差分保存プロジェクトファイル"""
+
+    PROJECT_SUFFIX = ".masaproj"
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._label_ids: Dict[str, int] = {}
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self.last_error: Optional[Exception] = None
+        self.last_save_info = ""
+        self._force_full_rewrite = False  # 書き込み失敗時は次回すべて書き直す
+        self._initialize()
+
+    @classmethod
+    def for_project(cls, project_path: str) -> "ProjectStore":
+        """プロジェクト（動画）ファイルの横に置くプロジェクトファイルを開く"""
+        return cls(f"{project_path}{cls.PROJECT_SUFFIX}")
+
+    def _initialize(self):
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute("PRAGMA mmap_size=268435456")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS labels (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS frames (frame_id INTEGER PRIMARY KEY, rows BLOB NOT NULL)"
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', ?)",
+                (str(self.SCHEMA_VERSION),)
+            )
+            for label_id, name in self._connection.execute("SELECT id, name FROM labels"):
+                self._label_ids[name] = label_id
+
+    # ===== 読み込み =====
+
+    def has_annotations(self) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM frames LIMIT 1").fetchone() is not None
+
+    def load(self, repository) -> int:
+        """プロジェクトの内容でリポジトリを置き換え、読み込んだアノテーション数を返す"""
+        self.flush()
+        with self._lock:
+            blobs = [blob for (blob,) in self._connection.execute("SELECT rows FROM frames ORDER BY frame_id")]
+            next_object_id = self._connection.execute(
+                "SELECT value FROM meta WHERE key = 'next_object_id'"
+            ).fetchone()
+
+        labels = [""] * (max(self._label_ids.values(), default=-1) + 1)
+        for name, label_id in self._label_ids.items():
+            labels[label_id] = name
+
+        rows = np.frombuffer(b"".join(blobs), dtype=ROW_DTYPE)
+        repository.clear()
+        for annotation in unpack_rows(rows, labels):
+            repository.add_annotation(annotation)
+        if next_object_id is not None:
+            repository.next_object_id = max(repository.next_object_id, int(next_object_id[0]))
+        # 読み込んだ状態は保存済み
+        repository.take_dirty_frames()
+        return len(rows)
+
+    # ===== 保存 =====
+
+    def collect_changes(self, repository) -> Optional[ProjectChanges]:
+        """前回の保存以降の変更をパックする（UIスレッドで呼ぶ）。変更がなければNone"""
+        if not repository.has_unsaved_changes() and not self._force_full_rewrite:
+            return None
+        full_rewrite, dirty_frames = repository.take_dirty_frames()
+        if self._force_full_rewrite:
+            self._force_full_rewrite = False
+            full_rewrite = True
+        frame_ids = repository.frame_annotations.keys() if full_rewrite else dirty_frames
+
+        known_labels = len(self._label_ids)
+        frames: Dict[int, Optional[bytes]] = {}
+        for frame_id in frame_ids:
+            frame_annotation = repository.frame_annotations.get(frame_id)
+            if frame_annotation and frame_annotation.objects:
+                frames[frame_id] = pack_rows(frame_annotation.objects, self._label_ids).tobytes()
+            else:
+                frames[frame_id] = None
+
+        new_labels = [(label_id, name) for name, label_id in self._label_ids.items() if label_id >= known_labels]
+        return ProjectChanges(full_rewrite, frames, new_labels, repository.next_object_id)
+
+    def save_async(self, repository) -> bool:
+        """変更をパックして書き込みスレッドに渡す。変更がなければFalse"""
+        changes = self.collect_changes(repository)
+        if changes is None:
+            return False
+        self._ensure_writer()
+        self._queue.put(changes)
+        return True
+
+    def save(self, repository):
+        """変更を書き込み、完了まで待つ"""
+        self.save_async(repository)
+        self.flush()
+
+    def flush(self):
+        """書き込み待ちの変更がすべて書き込まれるまで待つ"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self):
+        """書き込みを完了させて閉じる"""
+        self.flush()
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            self._connection.close()
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._run_writer, name="ProjectStoreWriter", daemon=True)
+            self._writer.start()
+
+    def _run_writer(self):
+        while True:
+            changes = self._queue.get()
+            try:
+                if changes is None:
+                    return
+                start = time.perf_counter()
+                self.write_changes(changes)
+                self.last_save_info = (
+                    f"Saved {len(changes.frames)} frames in {(time.perf_counter() - start) * 1000:.1f} ms"
+                )
+            except Exception as e:
+                self.last_error = e
+                self._force_full_rewrite = True
+                print(f"Project save failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def write_changes(self, changes: ProjectChanges):
+        """パック済みの変更を1トランザクションで書き込む"""
+        with self._lock, self._connection:
+            if changes.new_labels:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO labels (id, name) VALUES (?, ?)", changes.new_labels
+                )
+            if changes.full_rewrite:
+                self._connection.execute("DELETE FROM frames")
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO frames (frame_id, rows) VALUES (?, ?)",
+                [(frame_id, rows) for frame_id, rows in changes.frames.items() if rows is not None]
+            )
+            self._connection.executemany(
+                "DELETE FROM frames WHERE frame_id = ?",
+                [(frame_id,) for frame_id, rows in changes.frames.items() if rows is None]
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_object_id', ?)",
+                (str(changes.next_object_id),)
+            )
@@ -1,18 +1,22 @@
 # 改善されたRangeSlider.py  
-from typing import Tuple
+from typing import List, Optional, Tuple
+import numpy as np
 from PyQt6.QtWidgets import QWidget  
 from PyQt6.QtCore import Qt, pyqtSignal, QPoint, QRect  
 from PyQt6.QtGui import QPainter, QPen, QBrush, QColor  
   
 class RangeSlider(QWidget):  
-    """範囲選択可能なスライダーウィジェット（改善版）"""  
+    """範囲選択可能なスライダーウィジェット（改善版）  
+  
+    上端にアノテーションの密度（各位置に存在するTrack数）の帯と、選択中Trackの存在区間を描画する。  
+    """  
       
     range_changed = pyqtSignal(int, int)  # start_frame, end_frame  
     current_frame_changed = pyqtSignal(int)  # ドラッグ中のフレーム変更用シグナル  
       
     def __init__(self, parent=None):  
         super().__init__(parent)  
-        self.setMinimumHeight(40)  
+        self.setMinimumHeight(52)  
         self.setMinimumWidth(300)  
           
         self.minimum = 0  
@@ -28,6 +32,11 @@ class RangeSlider(QWidget):
         self.handle_width = 12  
         self.handle_height = 20  
         self.track_height = 6  
+        self.strip_height = 8  
+          
+        # タイムライン表示（set_density / set_track_runs で設定）  
+        self.density: Optional[np.ndarray] = None  # 0〜1に正規化した密度（タイムラインを等分したbinごと）  
+        self.track_runs: List[Tuple[int, int]] = []  # 選択中Trackの (開始, 終了) フレーム  
           
     def set_range(self, minimum: int, maximum: int):  
         """スライダーの範囲を設定"""  
@@ -50,6 +59,26 @@ class RangeSlider(QWidget):
         """現在の選択範囲を取得"""  
         return (self.start_value, self.end_value)  
       
+    def set_density(self, density: Optional[np.ndarray]):  
+        """密度の帯を設定（binごとの値。最大値で正規化して描画する）"""  
+        if density is None or len(density) == 0:  
+            self.density = None  
+        else:  
+            density = np.asarray(density, dtype=np.float32)  
+            peak = float(density.max())  
+            # 16段階に量子化して同じ濃さの列をまとめて塗れるようにする  
+            self.density = np.ceil(density / peak * 16) / 16 if peak > 0 else density  
+        self.update()  
+      
+    def set_track_runs(self, runs: List[Tuple[int, int]]):  
+        """選択中Trackの存在区間を設定（空リストで非表示）"""  
+        self.track_runs = list(runs)  
+        self.update()  
+      
+    def timeline_bins(self) -> int:  
+        """密度の帯の横幅（ピクセル数 = 計算すべきbin数）"""  
+        return max(1, self.width() - self.handle_width)  
+      
     def _value_to_pixel(self, value: int) -> int:  
         """値をピクセル位置に変換"""  
         if self.maximum == self.minimum:  
@@ -174,6 +203,7 @@ class RangeSlider(QWidget):
             self.track_height  
         )  
         painter.fillRect(track_rect, QColor(200, 200, 200))  
+        self._paint_timeline(painter)  
           
         range_rect = self._get_range_rect()  
         painter.fillRect(range_rect, QColor(100, 150, 255))  
@@ -188,4 +218,35 @@ class RangeSlider(QWidget):
           
         painter.setPen(QPen(QColor(0, 0, 0)))  
         painter.drawText(10, self.height() - 5, f"Start: {self.start_value}")  
-        painter.drawText(self.width() - 80, self.height() - 5, f"End: {self.end_value}")  
\ No newline at end of file
+        painter.drawText(self.width() - 80, self.height() - 5, f"End: {self.end_value}")  
+  
+    def _paint_timeline(self, painter: QPainter):  
+        """密度の帯と選択中Trackの存在区間を上端に描画"""  
+        left = self.handle_width // 2  
+        width = self.width() - self.handle_width  
+        if width <= 0:  
+            return  
+          
+        if self.density is not None:  
+            bins = len(self.density)  
+            # ピクセル列ごとに対応するbinの値で色の濃さを決める  
+            columns = (np.arange(width) * bins // width).clip(0, bins - 1)  
+            levels = self.density[columns]  
+            x = 0  
+            while x < width:  
+                # 同じ値が続く列はまとめて塗る  
+                level = levels[x]  
+                run_end = x + 1  
+                while run_end < width and levels[run_end] == level:  
+                    run_end += 1  
+                if level > 0:  
+                    painter.fillRect(QRect(left + x, 2, run_end - x, self.strip_height),  
+                                     QColor(255, 140, 0, int(60 + 195 * float(level))))  
+                x = run_end  
+          
+        if self.track_runs:  
+            y = 2 + self.strip_height  
+            for start, end in self.track_runs:  
+                x1 = self._value_to_pixel(start)  
+                x2 = self._value_to_pixel(end)  
+                painter.fillRect(QRect(x1, y, max(1, x2 - x1 + 1), 3), QColor(46, 160, 67))  
@@ -0,0 +1,174 @@
+# RemoteObjectTracker.py
+"""
+ModelServerに接続してObjectTrackerと同じインターフェースで追跡・埋め込み計算を行うクライアント
+
+torch / mmcv / masa をインポートしないため、サーバーが起動していればアプリ側でのモデル読み込みは不要。
+フレームは共有メモリに書き込み、ソケットにはメタデータだけを送る。
+"""
+import logging
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from DataClass import ObjectAnnotation, TrackArrays
+from ModelServer import get_authkey, parse_address
+
+
+class RemoteObjectTracker:
+    """ModelServer上の常駐モデルを使うObjectTracker互換クラス"""
+
+    def __init__(self, config, address: Optional[str] = None):
+        self.config = config
+        self.address = address or config.model_server_address
+        self.initialized = False
+        self.server_device: Optional[str] = None
+        self._connection = None
+        self._lock = threading.Lock()  # 1接続につき1リクエストずつ（応答を待ってから次を送る）
+        self._shm: Optional[shared_memory.SharedMemory] = None
+
+    def initialize(self):
+        """サーバーに接続する（接続できない場合は例外）"""
+        if self.initialized:
+            return
+        address, family = parse_address(self.address)
+        self._connection = Client(address, family=family, authkey=get_authkey())
+        response = self._request({"op": "hello"})
+        self.server_device = response.get("device")
+        self.initialized = True
+        print(f"Connected to MASA model server at {self.address} ({self.server_device})")
+
+    def create_session(self, texts: str = None, video_len: Optional[int] = None) -> "RemoteTrackingSession":
+        """サーバー側に専用のトラッカーを持つ追跡セッションを作成"""
+        if not self.initialized:
+            self.initialize()
+        response = self._request({"op": "open_session", "texts": texts, "video_len": video_len})
+        return RemoteTrackingSession(self, response["session_id"], texts, response.get("classes", []))
+
+    def reset_model_state(self):
+        """サーバー側のトラッカーはセッションごとに独立しているため何もしない"""
+
+    def track_objects(self, frame: np.ndarray, frame_id: int,
+                      initial_annotations: List[ObjectAnnotation] = None,
+                      texts: str = None,
+                      video_len: Optional[int] = None) -> List[ObjectAnnotation]:
+        """単発の追跡（連続したフレームを追跡する場合は create_session() を使用すること）"""
+        if not self.initialized:
+            self.initialize()
+        response = self._request({
+            "op": "track_once", "frame_id": frame_id, "initial_annotations": initial_annotations,
+            "texts": texts, "video_len": video_len
+        }, frame)
+        return response["annotations"]
+
+    def compute_embeddings(self, frame: np.ndarray, bboxes: np.ndarray, frame_id: int = 0,
+                           video_len: Optional[int] = None) -> np.ndarray:
+        """指定bbox (N, 4, xyxy) のMASA追跡用埋め込みをL2正規化して返す (N, C)"""
+        if not self.initialized:
+            self.initialize()
+        response = self._request({
+            "op": "embeddings", "bboxes": np.asarray(bboxes, dtype=np.float32).reshape(-1, 4),
+            "frame_id": frame_id, "video_len": video_len
+        }, frame)
+        return response["embeddings"]
+
+    def close(self):
+        """接続と共有メモリを解放"""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+                self._shm = None
+            self.initialized = False
+
+    def _request(self, request: Dict[str, Any], frame: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        with self._lock:
+            if self._connection is None:
+                raise RuntimeError("Not connected to the MASA model server")
+            if frame is not None:
+                request.update(self._write_frame(frame))
+            self._connection.send(request)
+            response = self._connection.recv()
+        if not response.get("ok"):
+            raise RuntimeError(f"MASA model server error: {response.get('error')}")
+        return response
+
+    def _write_frame(self, frame: np.ndarray) -> Dict[str, Any]:
+        """フレームを共有メモリに書き込み、リクエストに載せるメタデータを返す"""
+        frame = np.ascontiguousarray(frame)
+        if self._shm is None or self._shm.size < frame.nbytes:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            self._shm = shared_memory.SharedMemory(create=True, size=frame.nbytes)
+        np.ndarray(frame.shape, dtype=frame.dtype, buffer=self._shm.buf)[...] = frame
+        return {"shm": self._shm.name, "shape": frame.shape, "dtype": frame.dtype.str}
+
+
+class RemoteTrackingSession:
+    """サーバー側のTrackingSessionに対応するクライアント側のセッション"""
+
+    def __init__(self, remote_tracker: RemoteObjectTracker, session_id: int, texts: Optional[str],
+                 classes: Optional[List[str]] = None):
+        self.remote_tracker = remote_tracker
+        self.session_id = session_id
+        self.texts = texts
+        self.classes = classes or []
+        self.frames_processed = 0
+
+    def track(self, frame: np.ndarray, frame_id: int,
+              initial_annotations: List[ObjectAnnotation] = None) -> List[ObjectAnnotation]:
+        """1フレーム分の追跡を実行"""
+        response = self.remote_tracker._request({
+            "op": "track", "session_id": self.session_id, "frame_id": frame_id,
+            "initial_annotations": initial_annotations
+        }, frame)
+        self.frames_processed += 1
+        return response["annotations"]
+
+    def track_arrays(self, frame: np.ndarray, frame_id: int,
+                     initial_annotations: Union[List[ObjectAnnotation], TrackArrays, None] = None) -> TrackArrays:
+        """1フレーム分の追跡を実行し、結果を配列のまま返す（変換は to_annotations() で行う）"""
+        response = self.remote_tracker._request({
+            "op": "track_arrays", "session_id": self.session_id, "frame_id": frame_id,
+            "initial_annotations": initial_annotations
+        }, frame)
+        self.frames_processed += 1
+        return response["arrays"]
+
+    def to_annotations(self, arrays: TrackArrays, frame_id: int) -> List[ObjectAnnotation]:
+        """track_arrays() の結果をObjectAnnotationに変換"""
+        return arrays.to_annotations(frame_id, self.classes)
+
+    def close(self):
+        """サーバー側のセッションを破棄"""
+        try:
+            self.remote_tracker._request({"op": "close_session", "session_id": self.session_id})
+        except (RuntimeError, OSError, EOFError):
+            pass
+
+
+def create_object_tracker(config):
+    """設定に応じてObjectTrackerを作成し初期化する
+
+    model_server_addressが設定されていればModelServerへの接続を試み、
+    接続できない場合はローカルでモデルを読み込む。
+    """
+    if config.model_server_address:
+        remote_tracker = RemoteObjectTracker(config)
+        try:
+            remote_tracker.initialize()
+            return remote_tracker
+        except (OSError, EOFError, RuntimeError, ValueError) as e:
+            logging.warning(f"MASA model server {config.model_server_address} is not available ({e}). "
+                            f"Loading the model locally.")
+
+    from ObjectTracker import ObjectTracker
+    object_tracker = ObjectTracker(config)
+    object_tracker.initialize()
+    return object_tracker
@@ -0,0 +1,127 @@
+# SequentialFrameReader.py
+import queue
+import threading
+from typing import Callable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class SequentialFrameReader:
+    """指定範囲のフレームを別スレッドで順次デコードし、有界キューで受け渡すクラス
+
+    VideoManager.get_frame()はフレームごとにシークするため、連続したフレームを
+    処理する場合はこのクラスで先読みすることでデコードと後段の処理を並行させる。
+    専用のcv2.VideoCaptureを開くので、VideoManagerのロックとは競合しない。
+    transformを指定した場合はデコードスレッド上でフレームに適用する（再生用の縮小など）。
+    """
+
+    _END = object()
+
+    def __init__(self, video_path: str, start_frame: int, end_frame: int,
+                 queue_size: int = 8,
+                 transform: Optional[Callable[[np.ndarray], np.ndarray]] = None):
+        self.video_path = video_path
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.transform = transform
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+        self._finished = False
+
+    def start(self) -> "SequentialFrameReader":
+        """デコードスレッドを開始"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="SequentialFrameReader", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """デコードを中断してスレッドの終了を待つ"""
+        self._stop_event.set()
+        # キューが満杯でブロックしているスレッドを解放する
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "SequentialFrameReader":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        self.stop()
+        return False
+
+    def __iter__(self) -> Iterator[Tuple[int, Optional[np.ndarray]]]:
+        """(frame_id, frame) を順に返す。読み込めなかったフレームはNoneになる"""
+        self.start()
+        while True:
+            item = self._queue.get()
+            if item is self._END:
+                break
+            yield item
+        if self._error is not None:
+            raise self._error
+
+    @property
+    def finished(self) -> bool:
+        """poll()で終端まで読み切ったかどうか"""
+        return self._finished
+
+    def poll(self) -> Optional[Tuple[int, Optional[np.ndarray]]]:
+        """ブロックせずに次の (frame_id, frame) を取得する。未デコードまたは終端の場合はNone"""
+        if self._finished:
+            return None
+        try:
+            item = self._queue.get_nowait()
+        except queue.Empty:
+            return None
+        if item is self._END:
+            self._finished = True
+            if self._error is not None:
+                raise self._error
+            return None
+        return item
+
+    def _run(self):
+        video_reader = cv2.VideoCapture(self.video_path)
+        try:
+            if not video_reader.isOpened():
+                raise RuntimeError(f"Failed to open video: {self.video_path}")
+
+            if self.start_frame > 0:
+                video_reader.set(cv2.CAP_PROP_POS_FRAMES, self.start_frame)
+
+            for frame_id in range(self.start_frame, self.end_frame + 1):
+                if self._stop_event.is_set():
+                    break
+                ret, frame = video_reader.read()
+                if not ret:
+                    frame = None
+                    # 読み込みに失敗した場合は次のフレームへ明示的にシークし直す
+                    video_reader.set(cv2.CAP_PROP_POS_FRAMES, frame_id + 1)
+                elif self.transform is not None:
+                    frame = self.transform(frame)
+                if not self._put((frame_id, frame)):
+                    break
+        except Exception as e:
+            self._error = e
+        finally:
+            video_reader.release()
+            self._put(self._END)
+
+    def _put(self, item) -> bool:
+        """停止要求があるまでキューへの投入を試みる"""
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,73 @@
+# StreamingJSONWriter.py
+import json
+import os
+from typing import Any, Iterable
+
+
+class StreamingJSONWriter:
+    """トップレベルのJSONオブジェクトを逐次書き出すライタ
+
+    配列要素を1件ずつコンパクトな区切り文字でエンコードして書き出すため、
+    全データを辞書として保持せずに巨大なJSONを出力できる。
+    書き込みは一時ファイルに行い、正常終了時のみ出力先に置き換える。
+    """
+
+    SEPARATORS = (',', ':')
+
+    def __init__(self, file_path: str, buffer_size: int = 1 << 20):
+        self.file_path = file_path
+        self.buffer_size = buffer_size
+        self._tmp_path = f"{file_path}.tmp"
+        self._file = None
+        self._has_field = False
+        self._encode = json.JSONEncoder(separators=self.SEPARATORS, ensure_ascii=False).encode
+
+    def __enter__(self) -> "StreamingJSONWriter":
+        self._file = open(self._tmp_path, 'w', encoding='utf-8', buffering=self.buffer_size)
+        self._file.write('{')
+        self._has_field = False
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        try:
+            if exc_type is None:
+                self._file.write('}')
+        finally:
+            self._file.close()
+            self._file = None
+
+        if exc_type is None:
+            os.replace(self._tmp_path, self.file_path)
+        elif os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+        return False
+
+    def write_field(self, key: str, value: Any):
+        """スカラー値または小さなオブジェクトをフィールドとして書き出す"""
+        self._write_key(key)
+        self._file.write(self._encode(value))
+
+    def write_array(self, key: str, items: Iterable[Any]) -> int:
+        """イテラブルの要素を配列として逐次書き出し、書き出した件数を返す"""
+        self._write_key(key)
+        write = self._file.write
+        encode = self._encode
+
+        write('[')
+        count = 0
+        for item in items:
+            if count:
+                write(',')
+            write(encode(item))
+            count += 1
+        write(']')
+        return count
+
+    def _write_key(self, key: str):
+        if self._file is None:
+            raise RuntimeError("StreamingJSONWriter is not opened. Use it as a context manager.")
+        if self._has_field:
+            self._file.write(',')
+        self._file.write(self._encode(key))
+        self._file.write(':')
+        self._has_field = True
@@ -0,0 +1,189 @@
+# TrackTimelineIndex.py
+"""
+Track IDごとにアノテーションが存在するフレームを区間（ランレングス）で保持する索引
+
+AnnotationRepositoryの追加・削除に合わせて差分更新されるため、
+「このTrackが次に現れるフレーム」「このTrackが途切れる次のフレーム」を
+frame_annotations全体を走査せずに二分探索（O(log 区間数)）で求められる。
+区間は Track ごとに開始フレーム・終了フレーム（両端を含む）の昇順リストで持つ。
+"""
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+
+class _TrackRuns:
+    """1つのTrackの区間リスト（互いに重ならず、隣接もしない）"""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self):
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+
+    def find(self, frame_id: int) -> int:
+        """frame_id以下で始まる最後の区間の位置（無ければ-1）"""
+        return bisect_right(self.starts, frame_id) - 1
+
+    def contains(self, frame_id: int) -> bool:
+        i = self.find(frame_id)
+        return i >= 0 and self.ends[i] >= frame_id
+
+    def add(self, frame_id: int) -> bool:
+        i = self.find(frame_id)
+        if i >= 0 and self.ends[i] >= frame_id:
+            return False
+        joins_left = i >= 0 and self.ends[i] == frame_id - 1
+        joins_right = i + 1 < len(self.starts) and self.starts[i + 1] == frame_id + 1
+        if joins_left and joins_right:
+            self.ends[i] = self.ends[i + 1]
+            del self.starts[i + 1]
+            del self.ends[i + 1]
+        elif joins_left:
+            self.ends[i] = frame_id
+        elif joins_right:
+            self.starts[i + 1] = frame_id
+        else:
+            self.starts.insert(i + 1, frame_id)
+            self.ends.insert(i + 1, frame_id)
+        return True
+
+    def remove(self, frame_id: int) -> bool:
+        i = self.find(frame_id)
+        if i < 0 or self.ends[i] < frame_id:
+            return False
+        start, end = self.starts[i], self.ends[i]
+        if start == end:
+            del self.starts[i]
+            del self.ends[i]
+        elif frame_id == start:
+            self.starts[i] = frame_id + 1
+        elif frame_id == end:
+            self.ends[i] = frame_id - 1
+        else:
+            self.ends[i] = frame_id - 1
+            self.starts.insert(i + 1, frame_id + 1)
+            self.ends.insert(i + 1, end)
+        return True
+
+
+class TrackTimelineIndex:
+    """Track IDごとの存在区間の索引"""
+
+    def __init__(self):
+        self._runs: Dict[int, _TrackRuns] = {}
+        # 変更のたびに増える（表示側で再計算が必要かの判定用）
+        self.revision = 0
+
+    def add(self, track_id: int, frame_id: int):
+        runs = self._runs.get(track_id)
+        if runs is None:
+            runs = self._runs[track_id] = _TrackRuns()
+        if runs.add(frame_id):
+            self.revision += 1
+
+    def remove(self, track_id: int, frame_id: int):
+        runs = self._runs.get(track_id)
+        if runs is not None and runs.remove(frame_id):
+            if not runs.starts:
+                del self._runs[track_id]
+            self.revision += 1
+
+    def remove_track(self, track_id: int):
+        if self._runs.pop(track_id, None) is not None:
+            self.revision += 1
+
+    def clear(self):
+        self._runs.clear()
+        self.revision += 1
+
+    # ===== 参照 =====
+
+    def track_ids(self) -> List[int]:
+        return sorted(self._runs)
+
+    def contains(self, track_id: int, frame_id: int) -> bool:
+        runs = self._runs.get(track_id)
+        return runs is not None and runs.contains(frame_id)
+
+    def get_runs(self, track_id: int) -> List[Tuple[int, int]]:
+        """[(開始フレーム, 終了フレーム), ...]（両端を含む）"""
+        runs = self._runs.get(track_id)
+        return list(zip(runs.starts, runs.ends)) if runs is not None else []
+
+    def get_span(self, track_id: int) -> Optional[Tuple[int, int]]:
+        """Trackの最初と最後のフレーム"""
+        runs = self._runs.get(track_id)
+        return (runs.starts[0], runs.ends[-1]) if runs is not None else None
+
+    def next_frame(self, track_id: int, frame_id: int) -> Optional[int]:
+        """frame_idより後でTrackが存在する最初のフレーム"""
+        runs = self._runs.get(track_id)
+        if runs is None:
+            return None
+        i = runs.find(frame_id)
+        if i >= 0 and runs.ends[i] > frame_id:
+            return frame_id + 1
+        return runs.starts[i + 1] if i + 1 < len(runs.starts) else None
+
+    def prev_frame(self, track_id: int, frame_id: int) -> Optional[int]:
+        """frame_idより前でTrackが存在する最後のフレーム"""
+        runs = self._runs.get(track_id)
+        if runs is None:
+            return None
+        i = runs.find(frame_id - 1)
+        return min(runs.ends[i], frame_id - 1) if i >= 0 else None
+
+    def next_gap(self, track_id: int, frame_id: int) -> Optional[int]:
+        """frame_idより後で、Trackの最初と最後のフレームの間にある欠落フレームの先頭"""
+        runs = self._runs.get(track_id)
+        if runs is None:
+            return None
+        candidate = max(frame_id + 1, runs.starts[0])
+        i = runs.find(candidate)
+        if i >= 0 and runs.ends[i] >= candidate:
+            candidate = runs.ends[i] + 1
+        return candidate if candidate < runs.ends[-1] else None
+
+    def prev_gap(self, track_id: int, frame_id: int) -> Optional[int]:
+        """frame_idより前で、Trackの最初と最後のフレームの間にある欠落フレームの末尾"""
+        runs = self._runs.get(track_id)
+        if runs is None:
+            return None
+        candidate = min(frame_id - 1, runs.ends[-1])
+        i = runs.find(candidate)
+        if i >= 0 and runs.ends[i] >= candidate:
+            candidate = runs.starts[i] - 1
+        return candidate if candidate > runs.starts[0] else None
+
+    # ===== タイムライン表示用 =====
+
+    def object_counts(self, total_frames: int, track_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """フレームごとの存在Track数 (total_frames,)（区間数 + フレーム数に比例する計算量）"""
+        if total_frames <= 0:
+            return np.zeros(0, dtype=np.int64)
+        selected = self._runs.keys() if track_ids is None else track_ids
+        starts: List[int] = []
+        ends: List[int] = []
+        for track_id in selected:
+            runs = self._runs.get(track_id)
+            if runs is not None:
+                starts.extend(runs.starts)
+                ends.extend(runs.ends)
+        # 区間の開始で+1、終了の次で-1した差分を累積する
+        starts_array = np.clip(np.asarray(starts, dtype=np.int64), 0, total_frames)
+        ends_array = np.clip(np.asarray(ends, dtype=np.int64) + 1, 0, total_frames)
+        diff = (np.bincount(starts_array, minlength=total_frames + 1)
+                - np.bincount(ends_array, minlength=total_frames + 1))
+        return np.cumsum(diff[:-1])
+
+    def density(self, total_frames: int, bins: int, track_ids: Optional[Iterable[int]] = None) -> np.ndarray:
+        """タイムラインをbins個に分割した各区間の平均存在Track数 (bins,)"""
+        counts = self.object_counts(total_frames, track_ids)
+        if bins <= 0 or counts.size == 0:
+            return np.zeros(max(bins, 0), dtype=np.float32)
+        edges = np.linspace(0, counts.size, bins + 1).astype(np.int64)
+        sums = np.add.reduceat(np.r_[counts, 0], np.minimum(edges[:-1], counts.size))
+        widths = np.maximum(np.diff(edges), 1)
+        return (sums / widths).astype(np.float32)
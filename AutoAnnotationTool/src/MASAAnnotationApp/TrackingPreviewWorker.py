@@ -0,0 +1,97 @@
+# TrackingPreviewWorker.py
+"""
+追跡結果確認ダイアログ用のバックグラウンドワーカー
+
+- PreviewFrameLoader: スライダーで要求された最新のフレームだけをデコードする（途中の要求は読み飛ばす）
+- FilmstripWorker: 選択中のTrackから間引いたフレームのサムネイルを作成する
+"""
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from AnnotationVisualizer import AnnotationVisualizer
+from DataClass import ObjectAnnotation
+
+
+class PreviewFrameLoader(QThread):
+    """最新の要求フレームをデコードして返すワーカー（スクラブ中はUIスレッドでデコードしない）"""
+
+    frame_loaded = pyqtSignal(int, object)  # frame_id, np.ndarray（読み込めなかった場合はNone）
+
+    def __init__(self, video_manager):
+        super().__init__()
+        self.video_manager = video_manager
+        self._condition = threading.Condition()
+        self._requested: Optional[int] = None
+        self._stopped = False
+
+    def request(self, frame_id: int):
+        """フレームのデコードを要求（未処理の要求は置き換える）"""
+        with self._condition:
+            self._requested = frame_id
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._requested is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                frame_id, self._requested = self._requested, None
+            self.frame_loaded.emit(frame_id, self.video_manager.get_frame(frame_id))
+
+
+class FilmstripWorker(QThread):
+    """Trackのフレームを等間隔に間引き、アノテーションを描画したサムネイルを作成するワーカー"""
+
+    thumbnail_ready = pyqtSignal(int, int, int, object)  # track_id, index, frame_id, RGB np.ndarray
+
+    def __init__(self, video_manager, track_id: int, frame_annotations: Dict[int, List[ObjectAnnotation]],
+                 frame_ids: Sequence[int], thumbnail_height: int = 72):
+        super().__init__()
+        self.video_manager = video_manager
+        self.track_id = track_id
+        self.frame_annotations = frame_annotations
+        self.frame_ids = list(frame_ids)
+        self.thumbnail_height = thumbnail_height
+        self.visualizer = AnnotationVisualizer()
+        self._cancel_event = threading.Event()
+
+    @staticmethod
+    def sample_frame_ids(frame_ids: Sequence[int], count: int) -> List[int]:
+        """昇順のframe_idsから最初と最後を含めて最大count個を等間隔に選ぶ"""
+        if len(frame_ids) <= count:
+            return list(frame_ids)
+        indices = np.linspace(0, len(frame_ids) - 1, count).round().astype(int)
+        return [frame_ids[i] for i in np.unique(indices)]
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def run(self):
+        for index, frame_id in enumerate(self.frame_ids):
+            if self._cancel_event.is_set():
+                return
+            frame = self.video_manager.get_frame(frame_id)
+            if frame is None:
+                continue
+            height, width = frame.shape[:2]
+            scale = self.thumbnail_height / height
+            thumbnail = cv2.resize(frame, (max(1, int(round(width * scale))), self.thumbnail_height),
+                                   interpolation=cv2.INTER_AREA)
+            thumbnail = self.visualizer.draw_annotations(
+                thumbnail, self.frame_annotations.get(frame_id, []),
+                show_ids=False, show_confidence=False, scale=scale, in_place=True
+            )
+            self.thumbnail_ready.emit(self.track_id, index, frame_id,
+                                      np.ascontiguousarray(cv2.cvtColor(thumbnail, cv2.COLOR_BGR2RGB)))
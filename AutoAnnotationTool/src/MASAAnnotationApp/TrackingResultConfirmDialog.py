@@ -4,14 +4,23 @@ from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,  
     QSlider, QFrame, QSizePolicy, QListWidget, QListWidgetItem, QMessageBox, QCheckBox  
 )  
-from PyQt6.QtCore import Qt  
-from PyQt6.QtGui import QPixmap, QImage  
+from PyQt6.QtCore import Qt, QSize  
+from PyQt6.QtGui import QPixmap, QImage, QIcon  
 from typing import Dict, List, Optional  
 from DataClass import ObjectAnnotation  
 from AnnotationVisualizer import AnnotationVisualizer  
+from TrackingPreviewWorker import PreviewFrameLoader, FilmstripWorker  
   
 class TrackingResultConfirmDialog(QDialog):  
-    """Track IDごとに選択・非選択できる追跡結果確認ダイアログ"""  
+    """Track IDごとに選択・非選択できる追跡結果確認ダイアログ  
+  
+    (track_id, frame_id) の索引を最初に1回だけ作り、スライダー操作ごとの検索を辞書参照にする。  
+    フレームはVideoManagerのデコード済みキャッシュを使い、無い場合はバックグラウンドでデコードする。  
+    選択中のTrackは間引いたフレームのサムネイル（フィルムストリップ）をバックグラウンドで作成する。  
+    """  
+  
+    FILMSTRIP_SIZE = 12  
+    THUMBNAIL_HEIGHT = 72  
   
     def __init__(self, tracking_results: Dict[int, List[ObjectAnnotation]],  
                  video_manager, parent=None):  
@@ -29,9 +38,21 @@ class TrackingResultConfirmDialog(QDialog):
                 if ann.object_id not in self.grouped_tracking_results:  
                     self.grouped_tracking_results[ann.object_id] = []  
                 self.grouped_tracking_results[ann.object_id].append(ann)  
+        # (track_id, frame_id) -> アノテーションの索引  
+        self.track_frame_index: Dict[int, Dict[int, List[ObjectAnnotation]]] = {}  
+        for track_id, ann_list in self.grouped_tracking_results.items():  
+            frame_index = self.track_frame_index.setdefault(track_id, {})  
+            for ann in ann_list:  
+                frame_index.setdefault(ann.frame_id, []).append(ann)  
         # Track IDごとの選択状態  
         self.track_selected: Dict[int, bool] = {track_id: True for track_id in self.grouped_tracking_results.keys()}  
   
+        self.preview_loader = PreviewFrameLoader(video_manager)  
+        self.preview_loader.frame_loaded.connect(self.on_preview_frame_loaded)  
+        self.preview_loader.start()  
+        self.filmstrip_worker: Optional[FilmstripWorker] = None  
+        self.filmstrip_track_id: Optional[int] = None  
+  
         self.setup_ui()  
         if self.grouped_tracking_results:  
             self.track_list_widget.setCurrentRow(0)  
@@ -103,6 +124,17 @@ class TrackingResultConfirmDialog(QDialog):
         self.preview_widget.setScaledContents(True)  
         self.preview_widget.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)  
         preview_layout.addWidget(self.preview_widget)  
+  
+        # 選択中Trackのフィルムストリップ（クリックでそのフレームへ移動）  
+        self.filmstrip_widget = QListWidget()  
+        self.filmstrip_widget.setViewMode(QListWidget.ViewMode.IconMode)  
+        self.filmstrip_widget.setFlow(QListWidget.Flow.LeftToRight)  
+        self.filmstrip_widget.setWrapping(False)  
+        self.filmstrip_widget.setMovement(QListWidget.Movement.Static)  
+        self.filmstrip_widget.setIconSize(QSize(self.THUMBNAIL_HEIGHT * 16 // 9, self.THUMBNAIL_HEIGHT))  
+        self.filmstrip_widget.setFixedHeight(self.THUMBNAIL_HEIGHT + 40)  
+        self.filmstrip_widget.itemClicked.connect(self.on_filmstrip_item_clicked)  
+        preview_layout.addWidget(self.filmstrip_widget)  
         frame_control_layout = QHBoxLayout()  
         frame_control_layout.addWidget(QLabel("フレーム:"))  
         all_frame_ids = sorted({fid for fid in self.tracking_results})  
@@ -137,8 +169,50 @@ class TrackingResultConfirmDialog(QDialog):
         self.setLayout(layout)  
   
     def on_track_list_selection_changed(self):  
+        self.update_filmstrip()  
         self.update_preview()  
   
+    def update_filmstrip(self):  
+        """選択中Trackのサムネイル作成をバックグラウンドで開始（前のTrackの作成は中断）"""  
+        track_id = self.get_selected_track_id()  
+        if track_id == self.filmstrip_track_id:  
+            return  
+        self._stop_filmstrip_worker()  
+        self.filmstrip_widget.clear()  
+        self.filmstrip_track_id = track_id  
+        if track_id is None or track_id not in self.track_frame_index:  
+            return  
+  
+        frame_annotations = self.track_frame_index[track_id]  
+        frame_ids = FilmstripWorker.sample_frame_ids(sorted(frame_annotations), self.FILMSTRIP_SIZE)  
+        for frame_id in frame_ids:  
+            item = QListWidgetItem(str(frame_id))  
+            item.setData(Qt.ItemDataRole.UserRole, frame_id)  
+            self.filmstrip_widget.addItem(item)  
+  
+        self.filmstrip_worker = FilmstripWorker(  
+            self.video_manager, track_id, frame_annotations, frame_ids, self.THUMBNAIL_HEIGHT  
+        )  
+        self.filmstrip_worker.thumbnail_ready.connect(self.on_thumbnail_ready)  
+        self.filmstrip_worker.start()  
+  
+    def on_thumbnail_ready(self, track_id: int, index: int, frame_id: int, thumbnail: np.ndarray):  
+        if track_id != self.filmstrip_track_id or index >= self.filmstrip_widget.count():  
+            return  
+        height, width = thumbnail.shape[:2]  
+        q_image = QImage(thumbnail.data, width, height, 3 * width, QImage.Format.Format_RGB888).copy()  
+        self.filmstrip_widget.item(index).setIcon(QIcon(QPixmap.fromImage(q_image)))  
+  
+    def on_filmstrip_item_clicked(self, item: QListWidgetItem):  
+        self.frame_slider.setValue(item.data(Qt.ItemDataRole.UserRole))  
+  
+    def _stop_filmstrip_worker(self):  
+        if self.filmstrip_worker is not None:  
+            self.filmstrip_worker.cancel()  
+            self.filmstrip_worker.thumbnail_ready.disconnect(self.on_thumbnail_ready)  
+            self.filmstrip_worker.wait()  
+            self.filmstrip_worker = None  
+  
     def on_track_item_check_changed(self, item: QListWidgetItem):  
         track_id = item.data(Qt.ItemDataRole.UserRole)  
         checked = item.checkState() == Qt.CheckState.Checked  
@@ -166,10 +240,7 @@ class TrackingResultConfirmDialog(QDialog):
         self.current_frame_id = frame_id  
         self.frame_info_label.setText(f"Frame: {frame_id}")  
   
-        # Track IDでフィルタ  
-        annotations = []  
-        if track_id is not None and track_id in self.grouped_tracking_results:  
-            annotations = [ann for ann in self.grouped_tracking_results[track_id] if ann.frame_id == frame_id]  
+        annotations = self._get_annotations(track_id, frame_id)  
   
         # 詳細  
         if annotations:  
@@ -181,13 +252,30 @@ class TrackingResultConfirmDialog(QDialog):
             info_text = f"Track ID {track_id} | フレーム {frame_id}: アノテーションなし"  
         self.annotation_info_label.setText(info_text)  
   
-        # プレビュー  
-        frame = self.video_manager.get_frame(frame_id)  
+        # プレビュー（キャッシュに無いフレームはバックグラウンドでデコードし、届いた時点で描画）  
+        frame = self.video_manager.get_cached_frame(frame_id)  
+        if frame is None:  
+            self.preview_loader.request(frame_id)  
+            return  
+        self.render_preview(frame, annotations)  
+  
+    def _get_annotations(self, track_id: Optional[int], frame_id: int) -> List[ObjectAnnotation]:  
+        if track_id is None:  
+            return []  
+        return self.track_frame_index.get(track_id, {}).get(frame_id, [])  
+  
+    def on_preview_frame_loaded(self, frame_id: int, frame: Optional[np.ndarray]):  
+        # スクラブ中に古くなった要求の結果は捨てる  
+        if frame_id != self.current_frame_id:  
+            return  
         if frame is None:  
             self.preview_widget.setText("フレームを読み込めませんでした")  
             return  
+        self.render_preview(frame, self._get_annotations(self.get_selected_track_id(), frame_id))  
+  
+    def render_preview(self, frame: np.ndarray, annotations: List[ObjectAnnotation]):  
         annotated_frame = self.visualizer.draw_annotations(  
-            frame.copy(),  
+            frame,  
             annotations,  
             show_ids=True,  
             show_confidence=True,  
@@ -228,4 +316,10 @@ class TrackingResultConfirmDialog(QDialog):
   
     def reject_results(self):  
         self.approved = False  
-        self.reject()
\ No newline at end of file
+        self.reject()  
+  
+    def done(self, result: int):  
+        """承認・破棄・ウィンドウを閉じた場合のいずれでもワーカーを停止する"""  
+        self._stop_filmstrip_worker()  
+        self.preview_loader.stop()  
+        super().done(result)  
@@ -1,55 +1,146 @@
 # TrackingWorker.py  
+import time  
+from concurrent.futures import Future, ThreadPoolExecutor  
 from PyQt6.QtCore import QThread, pyqtSignal  
-from typing import List, Tuple, Optional, Dict  
+from typing import TYPE_CHECKING, Callable, Iterator, List, Tuple, Optional, Dict  
 import numpy as np  
-from DataClass import ObjectAnnotation, BoundingBox  
-from ObjectTracker import ObjectTracker  
+from DataClass import ObjectAnnotation, BoundingBox, TrackArrays, TrackingSeed  
 from AnnotationRepository import AnnotationRepository  
 from ErrorHandler import ErrorHandler  
+from SequentialFrameReader import SequentialFrameReader  
+
+if TYPE_CHECKING:  
+    from ObjectTracker import ObjectTracker  
+  
+class BaseTrackingWorker(QThread):  
+    """追跡ワーカーの共通処理  
+  
+    デコードスレッドでフレームを順次先読みして有界キューに積み、  
+    このワーカースレッドでは推論のみを行い、ObjectAnnotationへの変換は変換スレッドに回すことで  
+    デコード・GPU処理・変換を並行させる。  
+    """  
   
-class TrackingWorker(QThread):  
-    """自動追跡処理用ワーカースレッド（改善版）"""  
-      
     progress_updated = pyqtSignal(int, int)  # current_frame, total_frames  
+    throughput_updated = pyqtSignal(float)  # frames per second  
     tracking_completed = pyqtSignal(dict)  # {frame_id: [ObjectAnnotation, ...]}  
     error_occurred = pyqtSignal(str)  
+  
+    PREFETCH_FRAMES = 8  # デコード済みフレームの先読み数  
+    THROUGHPUT_INTERVAL_SEC = 0.5  # スループット通知の最小間隔  
+    PROGRESS_INTERVAL = 30  # 進捗を通知するフレーム間隔  
+  
+    def __init__(self, video_manager, object_tracker: "ObjectTracker",  
+                 start_frame: int, end_frame: int, parent=None):  
+        super().__init__(parent)  
+        self.video_manager = video_manager  
+        self.object_tracker = object_tracker  
+        self.start_frame = start_frame  
+        self.end_frame = end_frame  
+        self.frames_per_second = 0.0  
+        self._cancel_requested = False  
+        self._converter: Optional[ThreadPoolExecutor] = None  
+        self._pending: Dict[int, Future] = {}  
+  
+    @ErrorHandler.handle_with_dialog("Tracking Worker Error")  
+    def run(self):  
+        try:  
+            self.object_tracker.initialize()  
+            tracked_annotations_by_frame = self.process_tracking_with_progress()  
+            self.tracking_completed.emit(tracked_annotations_by_frame)  
+        except Exception as e:  
+            self.error_occurred.emit(str(e))  
+            ErrorHandler.log_error(e, f"{type(self).__name__}.run")  
+  
+    def process_tracking_with_progress(self) -> Dict[int, List[ObjectAnnotation]]:  
+        raise NotImplementedError  
+  
+    def cancel(self):  
+        """追跡の中断を要求（処理済みフレームの結果はtracking_completedで通知される）"""  
+        self._cancel_requested = True  
+  
+    def is_cancel_requested(self) -> bool:  
+        return self._cancel_requested  
+  
+    def should_emit_progress(self, processed: int, total_frames: int) -> bool:  
+        """進捗シグナルは PROGRESS_INTERVAL フレームごと（と最初・最後のフレーム）に間引く"""  
+        return processed == 1 or processed == total_frames or processed % self.PROGRESS_INTERVAL == 0  
+  
+    def submit_conversion(self, frame_id: int, convert: Callable[[], List[ObjectAnnotation]]):  
+        """推論結果のObjectAnnotationへの変換を変換スレッドに投入"""  
+        if self._converter is None:  
+            self._converter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="TrackConvert")  
+        self._pending[frame_id] = self._converter.submit(convert)  
+  
+    def collect_conversions(self) -> Dict[int, List[ObjectAnnotation]]:  
+        """投入済みの変換結果を {frame_id: [ObjectAnnotation, ...]} にまとめる"""  
+        results = {}  
+        try:  
+            for frame_id, future in self._pending.items():  
+                try:  
+                    results[frame_id] = future.result()  
+                except Exception as e:  
+                    ErrorHandler.log_error(e, f"Converting frame {frame_id}")  
+                    self.error_occurred.emit(f"Error converting frame {frame_id}: {e}")  
+        finally:  
+            self._pending = {}  
+            if self._converter is not None:  
+                self._converter.shutdown(wait=True)  
+                self._converter = None  
+        return results  
+  
+    def iter_frames(self) -> Iterator[Tuple[int, Optional[np.ndarray]]]:  
+        """先読みしたフレームを (frame_id, frame) で順に返し、進捗とスループットを通知"""  
+        total_frames = self.end_frame - self.start_frame + 1  
+        reader = SequentialFrameReader(  
+            self.video_manager.video_path, self.start_frame, self.end_frame,  
+            queue_size=self.PREFETCH_FRAMES  
+        )  
+  
+        start_time = time.perf_counter()  
+        last_notified = start_time  
+        processed = 0  
+        try:  
+            for frame_id, frame in reader:  
+                if self._cancel_requested:  
+                    break  
+                if self.should_emit_progress(processed + 1, total_frames):  
+                    self.progress_updated.emit(processed + 1, total_frames)  
+                yield frame_id, frame  
+                processed += 1  
+  
+                now = time.perf_counter()  
+                self.frames_per_second = processed / max(now - start_time, 1e-6)  
+                if now - last_notified >= self.THROUGHPUT_INTERVAL_SEC:  
+                    self.throughput_updated.emit(self.frames_per_second)  
+                    last_notified = now  
+        finally:  
+            reader.stop()  
+            self.throughput_updated.emit(self.frames_per_second)  
+            print(f"{type(self).__name__}: {processed}/{total_frames} frames at {self.frames_per_second:.2f} FPS")  
+  
+  
+class TrackingWorker(BaseTrackingWorker):  
+    """自動追跡処理用ワーカースレッド（改善版）"""  
       
     def __init__(self, video_manager, annotation_repository: AnnotationRepository,  
-                 object_tracker: ObjectTracker,  
+                 object_tracker: "ObjectTracker",  
                  start_frame: int, end_frame: int,  
                  initial_annotations: List[Tuple[int, BoundingBox]],  
                  assigned_track_id: int,  
                  assigned_label: str,  
                  video_width: int, video_height: int,
                  parent=None):  
-        super().__init__(parent)  
-        self.video_manager = video_manager  
+        super().__init__(video_manager, object_tracker, start_frame, end_frame, parent)  
         self.annotation_repository = annotation_repository  
-        self.object_tracker = object_tracker  
-        self.start_frame = start_frame  
-        self.end_frame = end_frame  
         self.initial_annotations = initial_annotations  
         self.assigned_track_id = assigned_track_id  
         self.assigned_label = assigned_label  
         self.max_used_track_id = assigned_track_id # 追跡中に使用された最大IDを記録  
         self.video_width = video_width  
         self.video_height = video_height  
-          
-    @ErrorHandler.handle_with_dialog("Tracking Worker Error")  
-    def run(self):  
-        try:  
-            self.object_tracker.initialize()  
-            tracked_annotations_by_frame = self.process_tracking_with_progress()  
-            self.tracking_completed.emit(tracked_annotations_by_frame)  
-        except Exception as e:  
-            self.error_occurred.emit(str(e))  
-            ErrorHandler.log_error(e, "TrackingWorker.run")  
       
     def process_tracking_with_progress(self) -> Dict[int, List[ObjectAnnotation]]:  
         """進捗報告付きの追跡処理（単一物体版）"""  
-        results = {}  
-        total_frames = self.end_frame - self.start_frame + 1  
-          
         text_prompt = self.assigned_label  
           
         # 単一物体なので、すべての初期アノテーションに統一されたIDを付与  
@@ -69,52 +160,61 @@ class TrackingWorker(QThread):
                 )  
             )  
           
-        # 前フレームの追跡結果を保持  
-        previous_frame_annotations = []  
+        # パイプライン・プロンプト・トラッカー状態をフレーム間で保持するセッション  
+        session = self.object_tracker.create_session(  
+            texts=text_prompt,  
+            video_len=self.video_manager.get_total_frames()  
+        )  
           
-        for i, frame_id in enumerate(range(self.start_frame, self.end_frame + 1)):  
-            self.progress_updated.emit(i + 1, total_frames)  
-              
-            frame_image = self.video_manager.get_frame(frame_id)  
-            if frame_image is None:  
-                ErrorHandler.show_warning_dialog(f"Frame {frame_id} could not be read. Skipping.", "Frame Read Warning")  
-                continue  
-              
-            try:  
-                # 現在フレームの初期アノテーションを取得  
-                current_frame_initial_annotations = initial_object_annotations_map.get(frame_id, [])  
-                  
-                # 前フレームの結果がある場合は、それを優先的に使用  
-                # これにより物体の連続性が保たれる  
-                if previous_frame_annotations:  
-                    current_frame_initial_annotations = previous_frame_annotations  
-                  
-                tracked_annotations = self.object_tracker.track_objects(  
-                    frame=frame_image,  
-                    frame_id=frame_id,  
-                    initial_annotations=current_frame_initial_annotations,  
-                    texts=text_prompt  
-                )  
-                  
-                final_annotations_for_frame = []  
-                for ann in tracked_annotations:  
-                    # 単一物体なので、IDは常に統一  
-                    ann.object_id = ann.object_id + self.assigned_track_id  
-                    ann.label = self.assigned_label  
-                    ann.is_manual = True  
-                    final_annotations_for_frame.append(ann)  
-                  
-                results[frame_id] = final_annotations_for_frame  
-                  
-                # 次フレームのために現在の結果を保存  
-                previous_frame_annotations = final_annotations_for_frame.copy()  
+        # 前フレームの追跡結果（配列）を保持  
+        previous_frame_arrays: Optional[TrackArrays] = None  
+          
+        try:  
+            for frame_id, frame_image in self.iter_frames():  
+                if frame_image is None:  
+                    ErrorHandler.log_error(RuntimeError(f"Frame {frame_id} could not be read. Skipping."), "TrackingWorker")  
+                    continue  
                   
-            except Exception as e:  
-                ErrorHandler.log_error(e, f"Tracking frame {frame_id}")  
-                self.error_occurred.emit(f"Error tracking frame {frame_id}: {e}")  
-                continue  
+                try:  
+                    # 前フレームの結果がある場合は、それを優先的に使用  
+                    # これにより物体の連続性が保たれる（単一ラベルなのでラベルIDは常に0）  
+                    if previous_frame_arrays is not None and len(previous_frame_arrays) > 0:  
+                        current_frame_initial = TrackArrays(  
+                            bboxes=previous_frame_arrays.bboxes,  
+                            scores=previous_frame_arrays.scores,  
+                            labels=np.zeros(len(previous_frame_arrays), dtype=np.int64)  
+                        )  
+                    else:  
+                        current_frame_initial = initial_object_annotations_map.get(frame_id, [])  
+                      
+                    tracked_arrays = session.track_arrays(  
+                        frame=frame_image,  
+                        frame_id=frame_id,  
+                        initial_annotations=current_frame_initial  
+                    )  
+                    previous_frame_arrays = tracked_arrays  
+                    self.submit_conversion(  
+                        frame_id, lambda arrays=tracked_arrays, fid=frame_id: self._to_final_annotations(session, arrays, fid)  
+                    )  
+                      
+                except Exception as e:  
+                    ErrorHandler.log_error(e, f"Tracking frame {frame_id}")  
+                    self.error_occurred.emit(f"Error tracking frame {frame_id}: {e}")  
+                    continue  
+        finally:  
+            results = self.collect_conversions()  
                   
-        return results
+        return results  
+  
+    def _to_final_annotations(self, session, arrays: TrackArrays, frame_id: int) -> List[ObjectAnnotation]:  
+        """追跡結果を割り当てたトラックID・ラベルのアノテーションに変換（変換スレッドで実行）"""  
+        final_annotations_for_frame = session.to_annotations(arrays, frame_id)  
+        for ann in final_annotations_for_frame:  
+            # 単一物体なので、IDは常に統一  
+            ann.object_id = ann.object_id + self.assigned_track_id  
+            ann.label = self.assigned_label  
+            ann.is_manual = True  
+        return final_annotations_for_frame
 
     def normalize_bbox_coords(self, x1: int, y1: int, x2: int, y2: int) -> BoundingBox:  
         """  
@@ -136,4 +236,171 @@ class TrackingWorker(QThread):
         norm_x2 = max(0.0, min(1.0, norm_x2))  
         norm_y2 = max(0.0, min(1.0, norm_y2))  
           
-        return BoundingBox(norm_x1, norm_y1, norm_x2, norm_y2)  
\ No newline at end of file
+        return BoundingBox(norm_x1, norm_y1, norm_x2, norm_y2)
+  
+  
+class MultiObjectTrackingWorker(BaseTrackingWorker):  
+    """複数物体を1パスで追跡するワーカースレッド  
+  
+    全シードのラベルを1つのテキストプロンプトにまとめ、各フレームの推論を1回だけ実行し、  
+    結果をMASAのインスタンスIDとIoUでシードのトラックIDに振り分ける。  
+    """  
+  
+    object_progress_updated = pyqtSignal(dict)  # {track_id: 追跡できたフレーム数}  
+  
+    # 未対応付けの検出結果をシードに割り当てる際のIoU閾値  
+    MATCH_IOU_THRESHOLD = 0.3  
+  
+    def __init__(self, video_manager, object_tracker: "ObjectTracker",  
+                 start_frame: int, end_frame: int,  
+                 seeds: List[TrackingSeed],  
+                 parent=None):  
+        super().__init__(video_manager, object_tracker, start_frame, end_frame, parent)  
+        self.seeds = seeds  
+  
+        # ラベルを重複なく出現順に並べてプロンプトにする  
+        self.labels: List[str] = list(dict.fromkeys(seed.label for seed in seeds))  
+        self.text_prompt = ' . '.join(self.labels)  
+  
+    def process_tracking_with_progress(self) -> Dict[int, List[ObjectAnnotation]]:  
+        """進捗報告付きの追跡処理（複数物体・1パス版）"""  
+        seeds_by_id = {seed.track_id: seed for seed in self.seeds}  
+        label_ids = {label: i for i, label in enumerate(self.labels)}  
+        seed_label_ids = {seed.track_id: label_ids[seed.label] for seed in self.seeds}  
+  
+        # シードごとのキーフレーム {track_id: {frame_id: BoundingBox}}  
+        keyframes = {seed.track_id: dict(seed.keyframes) for seed in self.seeds}  
+        # シードごとの直近のbbox [x1, y1, x2, y2, score]（キーフレームまたは前フレームの追跡結果）  
+        last_boxes: Dict[int, np.ndarray] = {}  
+        # MASAのインスタンスID -> シードのトラックID  
+        instance_to_track: Dict[int, int] = {}  
+        tracked_counts = {seed.track_id: 0 for seed in self.seeds}  
+        total_frames = self.end_frame - self.start_frame + 1  
+        processed = 0  
+  
+        session = self.object_tracker.create_session(  
+            texts=self.text_prompt,  
+            video_len=self.video_manager.get_total_frames()  
+        )  
+  
+        try:  
+            for frame_id, frame_image in self.iter_frames():  
+                processed += 1  
+                if frame_image is None:  
+                    ErrorHandler.log_error(RuntimeError(f"Frame {frame_id} could not be read"), "MultiObjectTrackingWorker")  
+                    continue  
+  
+                try:  
+                    # キーフレームがあればそれを優先し、なければ前フレームの結果を初期値とする  
+                    for track_id, seed_keyframes in keyframes.items():  
+                        if frame_id in seed_keyframes:  
+                            bbox = seed_keyframes[frame_id]  
+                            last_boxes[track_id] = np.array(  
+                                [bbox.x1, bbox.y1, bbox.x2, bbox.y2, bbox.confidence], dtype=np.float32  
+                            )  
+  
+                    track_ids = list(last_boxes)  
+                    initial = TrackArrays(  
+                        bboxes=np.array([last_boxes[t][:4] for t in track_ids], dtype=np.float32).reshape(-1, 4),  
+                        scores=np.array([last_boxes[t][4] for t in track_ids], dtype=np.float32),  
+                        labels=np.array([seed_label_ids[t] for t in track_ids], dtype=np.int64)  
+                    )  
+  
+                    tracked_arrays = session.track_arrays(  
+                        frame=frame_image,  
+                        frame_id=frame_id,  
+                        initial_annotations=initial  
+                    )  
+  
+                    routed = self._route_to_seeds(tracked_arrays, last_boxes, instance_to_track, seed_label_ids)  
+                    for track_id, row in routed.items():  
+                        last_boxes[track_id] = np.append(  
+                            tracked_arrays.bboxes[row], tracked_arrays.scores[row]  
+                        ).astype(np.float32)  
+                        tracked_counts[track_id] += 1  
+  
+                    routed_track_ids = list(routed)  
+                    routed_arrays = tracked_arrays.take([routed[t] for t in routed_track_ids])  
+                    self.submit_conversion(  
+                        frame_id,  
+                        lambda arrays=routed_arrays, ids=routed_track_ids, fid=frame_id:  
+                            self._to_seed_annotations(session, arrays, ids, fid, seeds_by_id)  
+                    )  
+                    if self.should_emit_progress(processed, total_frames):  
+                        self.object_progress_updated.emit(dict(tracked_counts))  
+  
+                except Exception as e:  
+                    ErrorHandler.log_error(e, f"Tracking frame {frame_id}")  
+                    self.error_occurred.emit(f"Error tracking frame {frame_id}: {e}")  
+                    continue  
+        finally:  
+            results = self.collect_conversions()  
+            self.object_progress_updated.emit(dict(tracked_counts))  
+  
+        return results  
+  
+    @staticmethod  
+    def _to_seed_annotations(session, arrays: TrackArrays, track_ids: List[int], frame_id: int,  
+                             seeds_by_id: Dict[int, TrackingSeed]) -> List[ObjectAnnotation]:  
+        """振り分け済みの追跡結果をシードのトラックID・ラベルのアノテーションに変換（変換スレッドで実行）"""  
+        annotations = session.to_annotations(arrays, frame_id)  
+        for track_id, ann in zip(track_ids, annotations):  
+            ann.object_id = track_id  
+            ann.label = seeds_by_id[track_id].label  
+            ann.is_manual = True  
+        return annotations  
+  
+    @staticmethod  
+    def _box_iou(box: np.ndarray, boxes: np.ndarray) -> np.ndarray:  
+        """1つのbbox (x1, y1, x2, y2) と複数bboxのIoU（BoundingBox.iou()の配列版）"""  
+        ix1 = np.maximum(box[0], boxes[:, 0])  
+        iy1 = np.maximum(box[1], boxes[:, 1])  
+        ix2 = np.minimum(box[2], boxes[:, 2])  
+        iy2 = np.minimum(box[3], boxes[:, 3])  
+        inter = np.clip(ix2 - ix1, 0, None) * np.clip(iy2 - iy1, 0, None)  
+        area = (box[2] - box[0]) * (box[3] - box[1])  
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])  
+        union = area + areas - inter  
+        return np.where(union > 0, inter / np.maximum(union, 1e-12), 0.0)  
+  
+    def _route_to_seeds(self, tracked: TrackArrays,  
+                        last_boxes: Dict[int, np.ndarray],  
+                        instance_to_track: Dict[int, int],  
+                        seed_label_ids: Dict[int, int]) -> Dict[int, int]:  
+        """追跡結果の行をシードのトラックIDに振り分ける（1シードにつき1行）"""  
+        routed: Dict[int, int] = {}  
+        unmatched: List[int] = []  
+        scores = tracked.scores  
+        instance_ids = tracked.instance_ids.tolist() if tracked.instance_ids is not None else [-1] * len(tracked)  
+        labels = tracked.labels.tolist() if tracked.labels is not None else [None] * len(tracked)  
+  
+        # 既に対応付いているインスタンスIDはそのまま振り分ける（スコアの高い方を採用）  
+        for row, instance_id in enumerate(instance_ids):  
+            track_id = instance_to_track.get(instance_id)  
+            if track_id is None:  
+                unmatched.append(row)  
+            elif track_id not in routed or scores[row] > scores[routed[track_id]]:  
+                routed[track_id] = row  
+  
+        # 残りは同じラベルのシードと直近bboxのIoUで貪欲に対応付ける  
+        candidates = []  
+        if unmatched:  
+            unmatched_rows = np.asarray(unmatched)  
+            for track_id, box in last_boxes.items():  
+                if track_id in routed:  
+                    continue  
+                ious = self._box_iou(box, tracked.bboxes[unmatched_rows])  
+                for row, iou in zip(unmatched, ious.tolist()):  
+                    if labels[row] == seed_label_ids[track_id] and iou >= self.MATCH_IOU_THRESHOLD:  
+                        candidates.append((iou, track_id, row))  
+  
+        used_rows = set()  
+        for iou, track_id, row in sorted(candidates, key=lambda c: c[0], reverse=True):  
+            if track_id in routed or row in used_rows:  
+                continue  
+            routed[track_id] = row  
+            used_rows.add(row)  
+            if instance_ids[row] >= 0:  
+                instance_to_track[instance_ids[row]] = track_id  
+  
+        return routed  
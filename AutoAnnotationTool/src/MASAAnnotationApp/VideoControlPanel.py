@@ -98,6 +98,16 @@ class VideoControlPanel(QWidget):
         if not hasattr(self, '_playback_updating'):  
             self.frame_changed.emit(frame_id)  
               
+    def set_playback_frame(self, frame_id: int):  
+        """再生中のフレーム位置を反映（frame_changedは発行しない）"""  
+        self.current_frame = frame_id  
+        self.frame_slider.blockSignals(True)  
+        try:  
+            self.frame_slider.setValue(frame_id)  
+        finally:  
+            self.frame_slider.blockSignals(False)  
+        self.update_frame_info()  
+          
     def on_frame_changed(self, frame_id: int):  
         """フレーム変更イベント（手動操作時）"""  
         # 再生制御がある場合は一時停止  
@@ -2,11 +2,19 @@
 import cv2  
 import numpy as np  
 import threading
+from collections import OrderedDict
 from typing import Optional  
 from ErrorHandler import ErrorHandler  
   
 class VideoManager:  
-    """動画管理専用クラス"""  
+    """動画管理専用クラス  
+  
+    デコード済みフレームをLRUキャッシュ（合計バイト数で上限）に保持し、  
+    プレビューや確認ダイアログなどから同じフレームを繰り返し要求されてもデコードし直さない。  
+    キャッシュしたフレームは読み取り専用（描画する場合はコピーすること）。  
+    """  
+  
+    FRAME_CACHE_BYTES = 256 * 1024 * 1024  
       
     def __init__(self, video_path: str):  
         self.video_path = video_path  
@@ -14,6 +22,9 @@ class VideoManager:
         self.total_frames = 0  
         self.fps = 30.0  
         self.lock = threading.Lock()
+        self._frame_cache: "OrderedDict[int, np.ndarray]" = OrderedDict()  
+        self._frame_cache_bytes = 0  
+        self._next_frame_id = -1  # 次のread()で得られるフレーム（連続読み出しならシークしない）  
       
     @ErrorHandler.handle_with_dialog("Video Loading Error")  
     def load_video(self) -> bool:  
@@ -40,11 +51,35 @@ class VideoManager:
             return None  
         
         with self.lock: # ロックを取得
-            self.video_reader.set(cv2.CAP_PROP_POS_FRAMES, frame_id)  
+            frame = self._frame_cache.get(frame_id)  
+            if frame is not None:  
+                self._frame_cache.move_to_end(frame_id)  
+                return frame  
+            if frame_id != self._next_frame_id:  
+                self.video_reader.set(cv2.CAP_PROP_POS_FRAMES, frame_id)  
             ret, frame = self.video_reader.read()  
             if not ret:  
+                self._next_frame_id = -1  
                 return None  
+            self._next_frame_id = frame_id + 1  
+            self._cache_frame(frame_id, frame)  
             return frame
+  
+    def get_cached_frame(self, frame_id: int) -> Optional[np.ndarray]:  
+        """キャッシュ済みのフレームだけを返す（デコードしない）"""  
+        with self.lock:  
+            frame = self._frame_cache.get(frame_id)  
+            if frame is not None:  
+                self._frame_cache.move_to_end(frame_id)  
+            return frame  
+  
+    def _cache_frame(self, frame_id: int, frame: np.ndarray):  
+        frame.flags.writeable = False  
+        self._frame_cache[frame_id] = frame  
+        self._frame_cache_bytes += frame.nbytes  
+        while self._frame_cache_bytes > self.FRAME_CACHE_BYTES and len(self._frame_cache) > 1:  
+            _, evicted = self._frame_cache.popitem(last=False)  
+            self._frame_cache_bytes -= evicted.nbytes  
       
     def get_fps(self) -> float:  
         """FPSを取得"""  
@@ -69,6 +104,10 @@ class VideoManager:
 
     def release(self):  
         """リソースを解放"""  
-        if self.video_reader:  
-            self.video_reader.release()  
-            self.video_reader = None  
\ No newline at end of file
+        with self.lock:  
+            if self.video_reader:  
+                self.video_reader.release()  
+                self.video_reader = None  
+            self._frame_cache.clear()  
+            self._frame_cache_bytes = 0  
+            self._next_frame_id = -1  
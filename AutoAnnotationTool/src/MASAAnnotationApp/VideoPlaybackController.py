@@ -1,66 +1,156 @@
-# 改善されたVideoPlaybackController.py  
-from PyQt6.QtCore import QTimer, pyqtSignal, QObject  
-from ErrorHandler import ErrorHandler  
-  
-class VideoPlaybackController(QObject):  
-    """動画再生制御クラス（改善版）"""  
-      
-    frame_updated = pyqtSignal(int)  # 再生中のフレーム更新  
-    playback_finished = pyqtSignal()  # 再生完了  
-      
-    def __init__(self, video_manager):  
-        super().__init__()  
-        self.video_manager = video_manager  
-        self.timer = QTimer()  
-        self.timer.timeout.connect(self.next_frame)  
-          
-        self.current_frame = 0  
-        self.is_playing = False  
-        self.fps = 30.0  # デフォルトFPS  
-          
-    def set_fps(self, fps: float):  
-        """FPSを設定"""  
-        self.fps = fps  
-        if self.is_playing:  
-            self.timer.setInterval(int(1000 / fps))  
-      
-    @ErrorHandler.handle_with_dialog("Playback Error")  
-    def play(self, start_frame: int = None):  
-        """再生開始"""  
-        if start_frame is not None:  
-            self.current_frame = start_frame  
-          
-        if not self.is_playing:  
-            self.is_playing = True  
-            self.timer.start(int(1000 / self.fps))  
-      
-    def pause(self):  
-        """一時停止"""  
-        if self.is_playing:  
-            self.is_playing = False  
-            self.timer.stop()  
-      
-    def stop(self):  
-        """停止"""  
-        if self.is_playing:  
-            self.timer.stop()  
-            self.is_playing = False  
-        self.current_frame = 0  
-        self.frame_updated.emit(self.current_frame)  
+# 改善されたVideoPlaybackController.py
+import time
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QObject
+from ErrorHandler import ErrorHandler
+from SequentialFrameReader import SequentialFrameReader
+
+class VideoPlaybackController(QObject):
+    """動画再生制御クラス（改善版）
+
+    再生中は SequentialFrameReader で表示サイズに縮小済みのフレームを先読みし、
+    壁時計基準で表示すべきフレームを決める。描画が追いつかない場合は
+    途中のフレームを読み捨てて（フレームドロップ）元動画のFPSを維持する。
+    """
+
+    frame_updated = pyqtSignal(int)  # 再生中のフレーム更新
+    frame_ready = pyqtSignal(int, object)  # 再生中のフレーム更新（frame_id, 縮小済みフレーム）
+    playback_finished = pyqtSignal()  # 再生完了
+
+    BUFFER_FRAMES = 16  # 先読みするフレーム数
+
+    def __init__(self, video_manager):
+        super().__init__()
+        self.video_manager = video_manager
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.next_frame)
+
+        self.current_frame = 0
+        self.is_playing = False
+        self.fps = 30.0  # デフォルトFPS
+
+        self.display_size: Optional[Tuple[int, int]] = None  # (width, height)
+        self.dropped_frames = 0
+        self._reader: Optional[SequentialFrameReader] = None
+        self._clock_start = 0.0
+        self._clock_start_frame = 0
+
+    def set_fps(self, fps: float):
+        """FPSを設定"""
+        self.fps = fps
+        if self.is_playing:
+            self.timer.setInterval(self._frame_interval_ms())
+            self._reset_clock()
+
+    def set_display_size(self, width: int, height: int):
+        """先読み時の縮小先サイズを設定（デコードスレッドから参照される）"""
+        if width > 0 and height > 0:
+            self.display_size = (width, height)
+
+    @ErrorHandler.handle_with_dialog("Playback Error")
+    def play(self, start_frame: int = None):
+        """再生開始"""
+        if start_frame is not None:
+            self.current_frame = start_frame
+
+        if not self.is_playing:
+            self.is_playing = True
+            self.dropped_frames = 0
+            self._start_reader(self.current_frame + 1)
+            self.timer.start(self._frame_interval_ms())
+
+    def pause(self):
+        """一時停止"""
+        if self.is_playing:
+            self.is_playing = False
+            self.timer.stop()
+            self._stop_reader()
+            if self.dropped_frames:
+                print(f"Playback: dropped {self.dropped_frames} frames to keep {self.fps:.1f} FPS")
+
+    def stop(self):
+        """停止"""
+        if self.is_playing:
+            self.timer.stop()
+            self.is_playing = False
+            self._stop_reader()
+        self.current_frame = 0
+        self.frame_updated.emit(self.current_frame)
         self.playback_finished.emit() # 再生終了シグナルも発行
-      
-    def next_frame(self):  
-        """次のフレームに進む"""  
-        if self.video_manager and self.current_frame < self.video_manager.get_total_frames() - 1:  
-            self.current_frame += 1  
-            self.frame_updated.emit(self.current_frame)  
-        else:  
-            # 再生完了  
-            self.pause()  
-            self.playback_finished.emit()  
-      
-    def set_frame(self, frame_id: int):  
-        """フレーム位置を設定"""  
-        self.current_frame = max(0, min(frame_id, self.video_manager.get_total_frames() - 1))  
-        if not self.is_playing:  
-            self.frame_updated.emit(self.current_frame)  
\ No newline at end of file
+
+    def next_frame(self):
+        """壁時計に合わせて表示すべきフレームまで進む"""
+        if not self.is_playing or self._reader is None:
+            return
+
+        target_frame = self._clock_start_frame + int((time.perf_counter() - self._clock_start) * self.fps)
+        if target_frame <= self.current_frame:
+            return
+
+        latest = None
+        consumed = 0
+        while True:
+            item = self._reader.poll()
+            if item is None:
+                break
+            consumed += 1
+            if item[1] is not None:
+                latest = item
+            if item[0] >= target_frame:
+                break
+
+        if latest is not None:
+            self.dropped_frames += consumed - 1
+            self.current_frame = latest[0]
+            self.frame_ready.emit(latest[0], latest[1])
+
+        if self._reader.finished:
+            # 再生完了
+            self.pause()
+            self.playback_finished.emit()
+
+    def set_frame(self, frame_id: int):
+        """フレーム位置を設定"""
+        self.current_frame = max(0, min(frame_id, self.video_manager.get_total_frames() - 1))
+        if self.is_playing:
+            # 再生中のシークは先読みをやり直す
+            self._stop_reader()
+            self._start_reader(self.current_frame + 1)
+        else:
+            self.frame_updated.emit(self.current_frame)
+
+    def _frame_interval_ms(self) -> int:
+        return max(1, int(1000 / self.fps))
+
+    def _reset_clock(self):
+        self._clock_start = time.perf_counter()
+        self._clock_start_frame = self.current_frame
+
+    def _start_reader(self, start_frame: int):
+        total_frames = self.video_manager.get_total_frames() if self.video_manager else 0
+        self._reader = SequentialFrameReader(
+            self.video_manager.video_path, start_frame, total_frames - 1,
+            queue_size=self.BUFFER_FRAMES, transform=self._scale_for_display
+        ).start()
+        self._reset_clock()
+
+    def _stop_reader(self):
+        if self._reader is not None:
+            self._reader.stop()
+            self._reader = None
+
+    def _scale_for_display(self, frame: np.ndarray) -> np.ndarray:
+        """表示サイズに収まるよう縮小（デコードスレッドで実行）"""
+        display_size = self.display_size
+        if display_size is None:
+            return frame
+        height, width = frame.shape[:2]
+        scale = min(display_size[0] / width, display_size[1] / height)
+        if scale >= 1.0:
+            return frame
+        return cv2.resize(frame, (max(1, int(width * scale)), max(1, int(height * scale))),
+                          interpolation=cv2.INTER_AREA)
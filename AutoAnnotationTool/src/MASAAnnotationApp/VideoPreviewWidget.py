@@ -154,6 +154,26 @@ class VideoPreviewWidget(QLabel):
           
         self.bbox_editor.set_coordinate_transform(self.coordinate_transform)  
           
+        annotations_to_show = self._collect_annotations_to_show()  
+          
+        # アノテーションを描画  
+        if annotations_to_show:  
+            self.current_frame = self.visualizer.draw_annotations(  
+                self.current_frame, annotations_to_show,  
+                show_ids=self.show_ids,  
+                show_confidence=self.show_confidence,  
+                selected_annotation=self.bbox_editor.selected_annotation  
+            )  
+          
+        # 編集モードまたはBatchAddModeの場合、選択オーバーレイを描画  
+        current_mode = self.mode_manager.current_mode_name  
+        if current_mode in ['edit', 'batch_add']:  
+            self.current_frame = self.bbox_editor.draw_selection_overlay(self.current_frame)  
+              
+        self._display_frame_on_widget(self.current_frame)
+          
+    def _collect_annotations_to_show(self) -> List[ObjectAnnotation]:  
+        """現在のモードと表示設定に応じて表示するアノテーションを選択"""  
         annotations_to_show = []  
           
         # モードに応じてアノテーションを選択  
@@ -174,23 +194,45 @@ class VideoPreviewWidget(QLabel):
             # BatchAddMode: 一時的なバッチアノテーションのみ表示  
             annotations_to_show.extend([  
                 ann for ann in self.temp_batch_annotations if ann.frame_id == self.current_frame_id  
-            ])  
+            ])
           
-        # アノテーションを描画  
+        return annotations_to_show  
+  
+    def show_playback_frame(self, frame_id: int, frame: np.ndarray):  
+        """再生中の縮小済みフレームを表示（シーク・全解像度描画を行わない軽量パス）"""  
+        if not self.video_manager or not self.annotation_repository or frame is None:  
+            return  
+          
+        self.current_frame_id = frame_id  
+        if not self.original_width:  
+            self.original_width = self.video_manager.get_video_width() or frame.shape[1]  
+            self.original_height = self.video_manager.get_video_height() or frame.shape[0]  
+        scale = frame.shape[1] / self.original_width  
+          
+        annotations_to_show = self._collect_annotations_to_show()  
         if annotations_to_show:  
-            self.current_frame = self.visualizer.draw_annotations(  
-                self.current_frame, annotations_to_show,  
+            frame = self.visualizer.draw_annotations(  
+                frame, annotations_to_show,  
                 show_ids=self.show_ids,  
                 show_confidence=self.show_confidence,  
-                selected_annotation=self.bbox_editor.selected_annotation  
+                selected_annotation=self.bbox_editor.selected_annotation,  
+                scale=scale  
             )  
+        self.current_frame = frame  
           
-        # 編集モードまたはBatchAddModeの場合、選択オーバーレイを描画  
-        current_mode = self.mode_manager.current_mode_name  
-        if current_mode in ['edit', 'batch_add']:  
-            self.current_frame = self.bbox_editor.draw_selection_overlay(self.current_frame)  
-              
-        self._display_frame_on_widget(self.current_frame)
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)  
+        h, w, ch = rgb_frame.shape  
+        qt_image = QImage(rgb_frame.data, w, h, ch * w, QImage.Format.Format_RGB888)  
+        pixmap = QPixmap.fromImage(qt_image)  
+          
+        widget_size = self.size()  
+        if abs(pixmap.width() - widget_size.width()) > 1 and abs(pixmap.height() - widget_size.height()) > 1:  
+            # 先読み時の縮小サイズと表示サイズが合わない場合（小さい動画・ウィンドウサイズ変更）のみQt側で拡縮する  
+            pixmap = pixmap.scaled(  
+                widget_size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.FastTransformation  
+            )  
+          
+        self.setPixmap(pixmap)  
           
     def _display_frame_on_widget(self, frame: np.ndarray):  
         """フレームをウィジェットに表示"""  
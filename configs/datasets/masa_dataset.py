@@ -75,9 +75,20 @@ train_dataloader = dict(
                     ann_file='data/sam/sam_annotations/jsons/sa1b_coco_fmt_500k_bbox_anno.json',
                     data_prefix=dict(img='data/sam/batch0/'),
                     serialize_data=True,
+                    # With a columnar data list written by the converter
+                    # (tools/format_conversion/convert_sam_2_cocofmt.py
+                    # --formats columnar --config <this config>):
+                    # ann_file='',
+                    # columnar_cache='data/sam/sam_annotations/jsons/sa1b_columnar',
                     pipeline=[
                         dict(type='LoadImageFromFile'),
                         dict(type='LoadMatchAnnotations'), ]
+                    # With an image cache (tools/build_image_cache.py):
+                    # pipeline=[
+                    #     dict(type='LoadMatchAnnotations'),
+                    #     dict(type='LoadImageFromCache',
+                    #          cache_dir='data/sam/image_cache_1024',
+                    #          img_prefix='data/sam/batch0/'), ]
                 )
             ]
     ),
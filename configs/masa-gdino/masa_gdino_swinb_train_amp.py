@@ -0,0 +1,26 @@
+_base_ = ['./masa_gdino_swinb_train.py']
+
+# Mixed precision training with activation checkpointing in the MASA adapter,
+# to fit larger batches at 1024x1024. The deformable convolutions, the
+# track embeddings and their losses stay in fp32.
+model = dict(
+    masa_adapter=[
+        dict(
+            type='FPN',
+            in_channels=[256, 512, 1024],
+            out_channels=256,
+            norm_cfg=dict(type='SyncBN', requires_grad=True),
+            num_outs=5),
+        dict(
+            type='DeformFusion',
+            in_channels=256,
+            out_channels=256,
+            num_blocks=3,
+            with_cp=True,
+            fp32_dcn=True)
+    ],
+    track_head=dict(fp32_embed=True))
+
+# Use dtype='float16' (with the default dynamic loss scaling) on GPUs
+# without bf16 support.
+optim_wrapper = dict(type='AmpOptimWrapper', dtype='bfloat16')
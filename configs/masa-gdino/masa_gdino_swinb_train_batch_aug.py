@@ -0,0 +1,44 @@
+_base_ = ['./masa_gdino_swinb_train.py']
+
+# Run the SA-1B augmentations on the GPU: the dataloader only samples and
+# packs the frames, MasaTrackDataPreprocessor applies the batch transforms
+# (same arguments as the per-sample transforms in masa_dataset.py).
+# GPU training only: on the CPU the batch transforms are about 10x slower than
+# the per-sample pipeline (946 ms vs 10.3 s for 8 frames in
+# tools/check_batch_transforms.py), use masa_gdino_swinb_train.py there.
+img_scale = (1024, 1024)
+
+model = dict(
+    data_preprocessor=dict(
+        type='MasaTrackDataPreprocessor',
+        batch_transforms=[
+            dict(type='BatchSeqRandomAffine'),
+            dict(
+                type='BatchSeqMixUp',
+                img_scale=img_scale,
+                ratio_range=(0.8, 1.6),
+                pad_val=114.0,
+                bbox_clip_border=False),
+            dict(type='BatchYOLOXHSVRandomAug'),
+            dict(
+                type='BatchRandomResize',
+                scale=img_scale,
+                ratio_range=(0.1, 2.0),
+                keep_ratio=True,
+                clip_object_border=False),
+            dict(type='BatchRandomCrop', crop_size=img_scale, bbox_clip_border=False),
+            dict(type='BatchRandomFlip', prob=0.5),
+            dict(type='BatchPad', size=img_scale, pad_val=114),
+            dict(type='BatchFilterMatchAnnotations', min_gt_bbox_wh=(1, 1), keep_empty=False),
+        ]))
+
+train_pipeline = [
+    dict(
+        type='MixUniformRefFrameSample',
+        num_ref_imgs=1,
+        frame_range=0,
+        filter_key_img=False),
+    dict(type='PackMatchInputs')
+]
+
+train_dataloader = dict(dataset=dict(pipeline=train_pipeline))
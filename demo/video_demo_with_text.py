@@ -22,7 +22,6 @@ from mmcv.ops.nms import batched_nms
 
 import masa
 from masa.apis import inference_masa, init_masa, inference_detector, build_test_pipeline
-from masa.models.sam import SamPredictor, sam_model_registry
 from utils import filter_and_update_tracks
 
 import warnings
@@ -179,6 +178,7 @@ def main():
         test_pipeline = Compose(det_model.cfg.test_dataloader.dataset.pipeline)
 
     if args.sam_mask:
+        from masa.models.sam import SamPredictor, sam_model_registry
         print('Loading SAM model...')
         device = args.device
         sam_model = sam_model_registry[args.sam_type](args.sam_path)
@@ -1,3 +1,17 @@
-from .datasets import *  # noqa
-from .models import *  # noqa
-from .visualization import *  # noqa
+# Models, datasets and transforms are imported (and registered) lazily:
+# ``masa.<Name>`` imports the defining module on first access, and
+# ``masa.registry.register_modules`` / ``register_all_modules`` import the
+# modules a config refers to. Importing ``masa`` itself is cheap.
+from . import datasets, models, visualization
+from .registry import lazy_dir, lazy_exports, register_all_modules, register_modules
+
+_EXPORTS = {
+    name: f".{package.__name__.rsplit('.', 1)[-1]}"
+    for package in (datasets, models, visualization)
+    for name in package.__all__
+}
+
+__all__ = ["register_modules", "register_all_modules", *_EXPORTS]
+
+__getattr__ = lazy_exports(__name__, _EXPORTS, globals())
+__dir__ = lazy_dir(globals(), __all__)
@@ -1,9 +1,12 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from .masa_inference import (build_test_pipeline, inference_detector,
-                             inference_masa, init_masa)
+                             inference_masa, inference_masa_embeddings,
+                             inference_masa_embeddings_batch, init_masa)
 
 __all__ = [
     "inference_masa",
+    "inference_masa_embeddings",
+    "inference_masa_embeddings_batch",
     "init_masa",
     "inference_detector",
     "build_test_pipeline",
@@ -2,7 +2,7 @@ import copy
 import time
 import warnings
 from pathlib import Path
-from typing import Optional, Sequence, Union
+from typing import List, Optional, Sequence, Union
 
 import numpy as np
 import torch
@@ -19,6 +19,8 @@ from mmengine.model.utils import revert_sync_batchnorm
 from mmengine.registry import init_default_scope
 from mmengine.runner import autocast, load_checkpoint
 
+from ..registry import register_modules
+
 ImagesType = Union[str, np.ndarray, Sequence[str], Sequence[np.ndarray]]
 
 
@@ -71,6 +73,8 @@ def init_masa(
     if scope is not None:
         init_default_scope(config.get("default_scope", "mmdet"))
 
+    # the visualizer is built from model.cfg by the callers
+    register_modules([config.model, config.get("visualizer")])
     model = MODELS.build(config.model)
     model = revert_sync_batchnorm(model)
     if checkpoint is None:
@@ -155,6 +159,7 @@ def inference_detector(
             # in module unregistered error if not prefixed with mmdet.
             test_pipeline[0].type = "mmdet.LoadImageFromNDArray"
 
+        register_modules(test_pipeline)
         test_pipeline = Compose(test_pipeline)
 
     if model.data_preprocessor.device.type == "cpu":
@@ -260,6 +265,98 @@ def inference_masa(
             return result
 
 
+def inference_masa_embeddings(
+    model: nn.Module,
+    img: np.ndarray,
+    bboxes: torch.Tensor,
+    test_pipeline: Compose,
+    frame_id: int = 0,
+    video_len: int = 1,
+    fp16=False,
+) -> torch.Tensor:
+    """Compute MASA track embeddings of given boxes on a single image.
+
+    Only the backbone, the MASA adapter and the track head are run, so this
+    is much cheaper than a full detection + tracking step.
+
+    Args:
+        model (nn.Module): The loaded masa model.
+        img (np.ndarray): Loaded image.
+        bboxes (Tensor): of shape (N, 4) in (x1, y1, x2, y2) format, in
+            original image coordinates.
+        test_pipeline (:obj:`Compose`): Test pipeline built by
+            :func:`build_test_pipeline` without text.
+        frame_id (int): frame id.
+        video_len (int): demo video length.
+
+    Returns:
+        Tensor: of shape (N, C), the track embeddings of the boxes.
+    """
+    return inference_masa_embeddings_batch(
+        model, [img], [bboxes], test_pipeline, [frame_id], [video_len], fp16=fp16
+    )[0]
+
+
+def inference_masa_embeddings_batch(
+    model: nn.Module,
+    imgs: List[np.ndarray],
+    bboxes: List[torch.Tensor],
+    test_pipeline: Compose,
+    frame_ids: List[int],
+    video_lens: List[int],
+    fp16=False,
+) -> List[torch.Tensor]:
+    """Compute MASA track embeddings of given boxes on several images with a
+    single backbone forward.
+
+    The images are padded to the largest one by the data preprocessor, so
+    images of the same size give the same embeddings as
+    :func:`inference_masa_embeddings`.
+
+    Args:
+        model (nn.Module): The loaded masa model.
+        imgs (list[np.ndarray]): Loaded images.
+        bboxes (list[Tensor]): Boxes of each image, of shape (N_i, 4) in
+            (x1, y1, x2, y2) format, in original image coordinates.
+        test_pipeline (:obj:`Compose`): Test pipeline built by
+            :func:`build_test_pipeline` without text.
+        frame_ids (list[int]): frame id of each image.
+        video_lens (list[int]): video length of each image.
+
+    Returns:
+        list[Tensor]: of shape (N_i, C), the track embeddings of the boxes of
+        each image.
+    """
+    batch = []
+    for img, frame_id, video_len in zip(imgs, frame_ids, video_lens):
+        data = dict(
+            img=[img.astype(np.float32)],
+            frame_id=[frame_id],
+            ori_shape=[img.shape[:2]],
+            img_id=[frame_id + 1],
+            ori_video_length=[video_len],
+        )
+        batch.append(test_pipeline(data))
+
+    with torch.no_grad():
+        data = default_collate(batch)
+        data = model.data_preprocessor(data, False)
+        inputs = data["inputs"]
+        batch_imgs = inputs[:, 0].contiguous()
+
+        rescaled_bboxes = []
+        for img_bboxes, data_sample in zip(bboxes, data["data_samples"]):
+            img_bboxes = img_bboxes.to(batch_imgs.device, dtype=torch.float32)
+            scale_factor = img_bboxes.new_tensor(
+                data_sample[0].metainfo["scale_factor"]
+            ).repeat((1, 2))
+            rescaled_bboxes.append(img_bboxes * scale_factor)
+        with autocast(enabled=fp16):
+            feats = model.extract_masa_feats(batch_imgs)
+            embeds = model.track_head.predict(feats, rescaled_bboxes)
+    return list(embeds.split([len(b) for b in rescaled_bboxes]))
+
+
 def build_test_pipeline(
     cfg: ConfigType, with_text=False, detector_type="mmdet"
 ) -> ConfigType:
@@ -273,6 +370,7 @@ def build_test_pipeline(
          ConfigType: new test_pipeline
     """
     # remove the "LoadImageFromFile" and "LoadTrackAnnotations" in pipeline
+    register_modules(cfg.inference_pipeline)
     transform_broadcaster = cfg.inference_pipeline[0].copy()
     if detector_type == "yolo-world":
         kept_transform = []
@@ -1,19 +1,30 @@
 # Copyright (c) Tencent Inc. All rights reserved.
-from .bdd_masa_dataset import BDDVideoDataset
-from .dataset_wrappers import SeqMultiImageMixDataset
-from .evaluation import *  # NOQA
-from .masa_dataset import MASADataset
-from .pipelines import *  # NOQA
-from .rsconcat_dataset import RandomSampleConcatDataset
-from .tao_masa_dataset import Taov1Dataset, Taov05Dataset
-from .utils import yolow_collate
+from ..registry import lazy_dir, lazy_exports
 
-__all__ = [
-    "yolow_collate",
-    "RandomSampleConcatDataset",
-    "MASADataset",
-    "SeqMultiImageMixDataset",
-    "Taov05Dataset",
-    "Taov1Dataset",
-    "BDDVideoDataset",
-]
+# name -> submodule; imported on first access (see masa.registry)
+_EXPORTS = {
+    "yolow_collate": ".utils",
+    "RandomSampleConcatDataset": ".rsconcat_dataset",
+    "MASADataset": ".masa_dataset",
+    "SeqMultiImageMixDataset": ".dataset_wrappers",
+    "Taov05Dataset": ".tao_masa_dataset",
+    "Taov1Dataset": ".tao_masa_dataset",
+    "BDDVideoDataset": ".bdd_masa_dataset",
+    "TaoTETAMetric": ".evaluation",
+    "BDDTETAMetric": ".evaluation",
+    "MasaTransformBroadcaster": ".pipelines",
+    "MixUniformRefFrameSample": ".pipelines",
+    "PackMatchInputs": ".pipelines",
+    "SeqMosaic": ".pipelines",
+    "SeqMixUp": ".pipelines",
+    "SeqCopyPaste": ".pipelines",
+    "SeqRandomAffine": ".pipelines",
+    "LoadMatchAnnotations": ".pipelines",
+    "LoadImageFromCache": ".pipelines",
+    "ImageCache": ".image_cache",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__ = lazy_exports(__name__, _EXPORTS, globals())
+__dir__ = lazy_dir(globals(), __all__)
@@ -0,0 +1,421 @@
+import os
+import os.path as osp
+import pickle
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from filelock import FileLock
+
+# Mask encodings of the ``mask_kind`` column.
+MASK_NONE = 0
+MASK_RLE_STR = 1  # {'size': [h, w], 'counts': str}
+MASK_RLE_BYTES = 2  # {'size': [h, w], 'counts': bytes}
+MASK_PICKLED = 3  # anything else (polygons, uncompressed RLE, ...)
+
+IMAGE_KEYS = ('img_path', 'img_id', 'seg_map_path', 'height', 'width',
+              'instances')
+INSTANCE_KEYS = ('ignore_flag', 'bbox', 'bbox_label', 'mask', 'instance_id')
+
+
+def _build_string_table(
+        values: Sequence[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    lengths = np.fromiter((len(value) for value in values),
+                          dtype=np.int64,
+                          count=len(values))
+    offsets = np.zeros(len(values) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    blob = np.frombuffer(b''.join(values), dtype=np.uint8)
+    return blob, offsets
+
+
+class ColumnarDataList:
+    """A read-only, numpy backed replacement of a detection ``data_list``.
+
+    ``BaseDataset`` keeps one dict (or one pickle, with ``serialize_data``)
+    per image; every worker that touches them pays for the deserialization
+    and, because of reference counting, gradually copies the pages it reads.
+    This class stores the same information as a handful of flat arrays:
+
+    - per image: ``img_id``, ``height``, ``width``, ``inst_offsets`` and the
+      ``img_path`` / ``seg_map_path`` string tables (utf-8 blob + offsets);
+    - per instance: ``bbox`` (float32), ``bbox_label``, ``ignore_flag``,
+      ``instance_id``, and the mask (kind, ``size`` and a byte blob with the
+      RLE counts or, for other formats, a pickle).
+
+    The arrays are saved as ``.npy`` files in a cache directory and loaded
+    with ``mmap_mode='r'``, so the dataset starts in seconds, the pages are
+    shared through the page cache by all workers, and an item's dict is only
+    built when it is requested. Pickling the list (spawned workers) sends
+    the cache path, not the arrays.
+
+    ``cache_dir`` is a symlink to the directory of the current build; a
+    rebuild writes a new directory and swaps the link, so a list opened
+    before keeps reading its own build.
+
+    Image level keys other than :data:`IMAGE_KEYS` (e.g. ``text``) must have
+    the same value for every image; they are stored once.
+
+    Args:
+        cache_dir (str): Directory holding the arrays.
+    """
+
+    VERSION = 1
+    META_FILE = 'meta.pkl'
+
+    def __init__(self, cache_dir: str):
+        # Resolve the link once: the arrays are loaded lazily and must come
+        # from the build whose meta was read, even if it is replaced.
+        self.cache_dir = osp.realpath(cache_dir)
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        with open(osp.join(cache_dir, self.META_FILE), 'rb') as f:
+            meta = pickle.load(f)
+        self.signature = meta['signature']
+        self.constants: Dict[str, Any] = meta['constants']
+        self.columns: List[str] = meta['columns']
+        self._length: int = meta['length']
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_arrays'] = None
+        return state
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        if self._arrays is None:
+            # Plain ndarray views of the maps: slicing an ``np.memmap``
+            # is several times slower.
+            self._arrays = {
+                name: np.asarray(
+                    np.load(
+                        osp.join(self.cache_dir, f'{name}.npy'),
+                        mmap_mode='r'))
+                for name in self.columns
+            }
+        return self._arrays
+
+    @staticmethod
+    def _string(blob: np.ndarray, offsets: np.ndarray, idx: int) -> str:
+        return blob[offsets[idx]:offsets[idx + 1]].tobytes().decode('utf-8')
+
+    def __getitem__(self, idx: int) -> dict:
+        if idx < 0:
+            idx += self._length
+        if not 0 <= idx < self._length:
+            raise IndexError(f'index {idx} out of range for '
+                             f'{self._length} images')
+        arrays = self.arrays
+
+        data_info = dict(
+            img_path=self._string(arrays['img_path_blob'],
+                                  arrays['img_path_offsets'], idx),
+            img_id=int(arrays['img_id'][idx]),
+            seg_map_path=None,
+            height=int(arrays['height'][idx]),
+            width=int(arrays['width'][idx]))
+        if 'seg_map_path_blob' in arrays:
+            data_info['seg_map_path'] = self._string(
+                arrays['seg_map_path_blob'], arrays['seg_map_path_offsets'],
+                idx) or None
+        data_info.update(self.constants)
+
+        start, end = arrays['inst_offsets'][idx:idx + 2].tolist()
+        bboxes = arrays['bbox'][start:end].tolist()
+        labels = arrays['bbox_label'][start:end].tolist()
+        ignore_flags = arrays['ignore_flag'][start:end].tolist()
+        instance_ids = arrays['instance_id'][start:end].tolist()
+        mask_kinds = arrays['mask_kind'][start:end].tolist()
+        # One read for the masks of the whole image.
+        mask_offsets = arrays['mask_offsets'][start:end + 1].tolist()
+        mask_data = arrays['mask_blob'][
+            mask_offsets[0]:mask_offsets[-1]].tobytes()
+        mask_sizes = None
+        instances = []
+        for i in range(end - start):
+            instance = dict(
+                ignore_flag=ignore_flags[i],
+                bbox=bboxes[i],
+                bbox_label=labels[i])
+            kind = mask_kinds[i]
+            if kind != MASK_NONE:
+                data = mask_data[mask_offsets[i] -
+                                 mask_offsets[0]:mask_offsets[i + 1] -
+                                 mask_offsets[0]]
+                if kind == MASK_PICKLED:
+                    instance['mask'] = pickle.loads(data)
+                else:
+                    if mask_sizes is None:
+                        mask_sizes = arrays['mask_size'][start:end].tolist()
+                    instance['mask'] = dict(
+                        size=mask_sizes[i],
+                        counts=data.decode('utf-8')
+                        if kind == MASK_RLE_STR else data)
+            instance['instance_id'] = instance_ids[i]
+            instances.append(instance)
+        data_info['instances'] = instances
+        return data_info
+
+    @classmethod
+    def load(cls,
+             cache_dir: str,
+             signature: Optional[Any] = None) -> Optional['ColumnarDataList']:
+        """Open a cache, or return None if it is missing, unreadable or was
+        built for another ``signature``."""
+        try:
+            data_list = cls(cache_dir)
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+            return None
+        if data_list.signature != (cls.VERSION, signature):
+            return None
+        return data_list
+
+    @staticmethod
+    def lock(cache_dir: str) -> FileLock:
+        """An inter-process lock for building ``cache_dir``.
+
+        DDP ranks and independent jobs may all find the cache missing; the
+        first one to take the lock builds it and the others should
+        :meth:`load` it again once they hold the lock.
+        """
+        cache_dir = osp.abspath(cache_dir)
+        os.makedirs(osp.dirname(cache_dir), exist_ok=True)
+        return FileLock(f'{cache_dir}.lock')
+
+    @classmethod
+    def build(cls,
+              data_list: Sequence[dict],
+              cache_dir: str,
+              signature: Optional[Any] = None) -> 'ColumnarDataList':
+        """Convert ``data_list`` and save it to ``cache_dir``.
+
+        The arrays are written to a new directory that ``cache_dir`` is
+        switched to once complete, so a reader never sees a partial cache.
+
+        Raises:
+            ValueError: If an item has keys that cannot be stored.
+        """
+        with ColumnarDataListWriter(cache_dir, signature) as writer:
+            for info in data_list:
+                writer.append(info)
+            return writer.close()
+
+
+def _encode_mask(mask: Any) -> Tuple[int, Optional[Sequence[int]], bytes]:
+    """The ``mask_kind``, ``mask_size`` and blob bytes of a mask."""
+    if mask is None:
+        return MASK_NONE, None, b''
+    if (isinstance(mask, dict) and set(mask) == {'size', 'counts'}
+            and isinstance(mask['counts'], (str, bytes))):
+        counts = mask['counts']
+        if isinstance(counts, str):
+            return MASK_RLE_STR, mask['size'], counts.encode('utf-8')
+        return MASK_RLE_BYTES, mask['size'], counts
+    return MASK_PICKLED, None, pickle.dumps(mask, pickle.HIGHEST_PROTOCOL)
+
+
+class ColumnarDataListWriter:
+    """Write a :class:`ColumnarDataList` one item at a time.
+
+    The columns are appended to raw files every ``chunk_size`` images and
+    turned into ``.npy`` files by :meth:`close`, so the memory use does not
+    grow with the length of the data list. Used by
+    :meth:`ColumnarDataList.build` and by the SA-1B converter
+    (``tools/format_conversion/convert_sam_2_cocofmt.py``).
+
+    Everything is written to a temporary directory that becomes a new build
+    directory (``<cache_dir>.<time>-<random id>``) in :meth:`close`, and
+    ``cache_dir`` is then atomically switched to a symlink to it. Previous
+    builds are left in place because other processes may still be reading
+    them; delete them once no job uses them. Used as a context manager, the
+    writer removes the temporary directory if an error interrupts it.
+
+    Args:
+        cache_dir (str): Output directory.
+        signature (optional): Stored with the arrays, see
+            :meth:`ColumnarDataList.load`.
+        chunk_size (int): Number of images buffered between two writes.
+            Defaults to 4096.
+    """
+
+    # name -> (dtype, shape of one row); in the order of the columns.
+    COLUMNS = {
+        'img_id': (np.int64, ()),
+        'height': (np.int32, ()),
+        'width': (np.int32, ()),
+        'inst_offsets': (np.int64, ()),
+        'bbox': (np.float32, (4, )),
+        'bbox_label': (np.int32, ()),
+        'ignore_flag': (np.uint8, ()),
+        'instance_id': (np.int64, ()),
+        'mask_kind': (np.uint8, ()),
+        'mask_size': (np.int32, (2, )),
+        'img_path_blob': (np.uint8, ()),
+        'img_path_offsets': (np.int64, ()),
+        'seg_map_path_blob': (np.uint8, ()),
+        'seg_map_path_offsets': (np.int64, ()),
+        'mask_blob': (np.uint8, ()),
+        'mask_offsets': (np.int64, ()),
+    }
+
+    def __init__(self,
+                 cache_dir: str,
+                 signature: Optional[Any] = None,
+                 chunk_size: int = 4096):
+        self.cache_dir = osp.abspath(cache_dir)
+        self.signature = signature
+        self.chunk_size = chunk_size
+        self.constants: Optional[Dict[str, Any]] = None
+        self._length = 0
+        self._num_instances = 0
+        # End of every blob so far, i.e. the last value of its offsets.
+        self._blob_ends = dict(img_path=0, seg_map_path=0, mask=0)
+
+        self.tmp_dir = f'{self.cache_dir}.{os.getpid()}.tmp'
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self._files = {
+            name: open(osp.join(self.tmp_dir, f'{name}.raw'), 'wb')
+            for name in self.COLUMNS
+        }
+        self._buffers: Dict[str, list] = {name: [] for name in self.COLUMNS}
+        for name in ('inst_offsets', 'img_path_offsets',
+                     'seg_map_path_offsets', 'mask_offsets'):
+            self._buffers[name].append(0)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __enter__(self) -> 'ColumnarDataListWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+
+    def _append_blob(self, name: str, data: bytes) -> None:
+        self._blob_ends[name] += len(data)
+        self._buffers[f'{name}_blob'].append(data)
+        self._buffers[f'{name}_offsets'].append(self._blob_ends[name])
+
+    def append(self, info: dict) -> None:
+        """Add the data info of one image.
+
+        Raises:
+            ValueError: If the item has keys that cannot be stored.
+        """
+        extra = {
+            key: value
+            for key, value in info.items() if key not in IMAGE_KEYS
+        }
+        if self.constants is None:
+            self.constants = extra
+        elif extra != self.constants:
+            raise ValueError(
+                f'Image level keys {sorted(extra)} differ between images '
+                'and cannot be stored in a columnar data list')
+        buffers = self._buffers
+        buffers['img_id'].append(info['img_id'])
+        buffers['height'].append(info['height'])
+        buffers['width'].append(info['width'])
+        self._append_blob('img_path', info['img_path'].encode('utf-8'))
+        self._append_blob('seg_map_path',
+                          (info.get('seg_map_path') or '').encode('utf-8'))
+        for instance in info['instances']:
+            unknown = set(instance) - set(INSTANCE_KEYS)
+            if unknown:
+                raise ValueError(
+                    f'Instance keys {sorted(unknown)} cannot be stored '
+                    'in a columnar data list')
+            buffers['bbox'].append(instance['bbox'])
+            buffers['bbox_label'].append(instance['bbox_label'])
+            buffers['ignore_flag'].append(instance['ignore_flag'])
+            buffers['instance_id'].append(instance['instance_id'])
+            kind, size, data = _encode_mask(instance.get('mask'))
+            buffers['mask_kind'].append(kind)
+            buffers['mask_size'].append(size if size is not None else (0, 0))
+            self._append_blob('mask', data)
+            self._num_instances += 1
+        buffers['inst_offsets'].append(self._num_instances)
+        self._length += 1
+        if self._length % self.chunk_size == 0:
+            self._flush()
+
+    def _flush(self) -> None:
+        for name, (dtype, shape) in self.COLUMNS.items():
+            values = self._buffers[name]
+            if not values:
+                continue
+            if name.endswith('_blob'):
+                self._files[name].write(b''.join(values))
+            else:
+                np.asarray(values, dtype=dtype).reshape(
+                    -1, *shape).tofile(self._files[name])
+            values.clear()
+
+    def close(self) -> ColumnarDataList:
+        """Write the remaining items and the ``.npy`` files, and move them to
+        ``cache_dir``.
+
+        Returns:
+            ColumnarDataList: The written data list.
+        """
+        self._flush()
+        columns = list(self.COLUMNS)
+        if self._blob_ends['seg_map_path'] == 0:
+            columns.remove('seg_map_path_blob')
+            columns.remove('seg_map_path_offsets')
+        for name, (dtype, shape) in self.COLUMNS.items():
+            raw_path = self._files[name].name
+            self._files[name].close()
+            if name in columns:
+                dtype = np.dtype(dtype)
+                row_size = dtype.itemsize * int(np.prod(shape))
+                num_rows = osp.getsize(raw_path) // row_size
+                with open(osp.join(self.tmp_dir, f'{name}.npy'), 'wb') as f, \
+                        open(raw_path, 'rb') as raw:
+                    np.lib.format.write_array_header_1_0(
+                        f,
+                        dict(
+                            descr=np.lib.format.dtype_to_descr(dtype),
+                            fortran_order=False,
+                            shape=(num_rows, ) + shape))
+                    shutil.copyfileobj(raw, f, 16 * 2**20)
+            os.remove(raw_path)
+
+        with open(osp.join(self.tmp_dir, ColumnarDataList.META_FILE),
+                  'wb') as f:
+            pickle.dump(
+                dict(
+                    signature=(ColumnarDataList.VERSION, self.signature),
+                    constants=self.constants or {},
+                    columns=columns,
+                    length=self._length), f, pickle.HIGHEST_PROTOCOL)
+        build_dir = f'{self.cache_dir}.{time.strftime("%Y%m%d%H%M%S")}-' \
+            f'{uuid.uuid4().hex[:8]}'
+        os.replace(self.tmp_dir, build_dir)
+        self._publish(build_dir)
+        return ColumnarDataList(self.cache_dir)
+
+    def _publish(self, build_dir: str) -> None:
+        """Point ``cache_dir`` at ``build_dir`` without removing anything a
+        reader may have open."""
+        if osp.isdir(self.cache_dir) and not osp.islink(self.cache_dir):
+            # A cache written as a plain directory: move it aside, its files
+            # stay valid for the processes that have them open.
+            os.replace(self.cache_dir, f'{build_dir}.old')
+        link = f'{self.cache_dir}.{os.getpid()}.link'
+        if osp.lexists(link):
+            os.remove(link)
+        os.symlink(osp.basename(build_dir), link)
+        os.replace(link, self.cache_dir)
+
+    def abort(self) -> None:
+        """Drop everything written so far."""
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
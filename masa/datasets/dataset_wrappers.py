@@ -9,6 +9,11 @@ from mmdet.datasets.base_video_dataset import BaseVideoDataset
 from mmdet.registry import DATASETS, TRANSFORMS
 from mmengine.dataset import BaseDataset, force_full_init
 
+from .pipelines.copy_on_write import (
+    IN_PLACE_TRANSFORMS,
+    cow_copy,
+    guard_in_place_transforms,
+)
 from .rsconcat_dataset import RandomSampleJointVideoConcatDataset
 
 
@@ -58,7 +63,7 @@ class SeqMultiImageMixDataset:
             if isinstance(transform, dict):
                 self.pipeline_types.append(transform["type"])
                 transform = TRANSFORMS.build(transform)
-                self.pipeline.append(transform)
+                self.pipeline.append(guard_in_place_transforms(transform))
             else:
                 raise TypeError("pipeline must be a dict")
 
@@ -169,7 +174,7 @@ class SeqMultiImageMixDataset:
             indexes = transform.get_indexes(self.dataset)
             if not isinstance(indexes, collections.abc.Sequence):
                 indexes = [indexes]
-            mix_results = [copy.deepcopy(self.dataset[index]) for index in indexes]
+            mix_results = [self.dataset[index] for index in indexes]
             if None not in mix_results:
                 if t_type == "SeqMosaic":
                     results["mosaic_mix_results"] = [mix_results] * num_samples
@@ -191,7 +196,9 @@ class SeqMultiImageMixDataset:
 
     def __getitem__(self, idx):
         while True:
-            results = copy.deepcopy(self.dataset[idx])
+            # Loaded samples are fresh dicts owned by this call; transforms
+            # get copy-on-write snapshots (see ``_apply_transform``).
+            results = self.dataset[idx]
 
             for (transform, transform_type) in zip(self.pipeline, self.pipeline_types):
                 if (
@@ -214,9 +221,7 @@ class SeqMultiImageMixDataset:
                         indexes = transform.get_indexes(self.dataset)
                         if not isinstance(indexes, collections.abc.Sequence):
                             indexes = [indexes]
-                        mix_results = [
-                            copy.deepcopy(self.dataset[index]) for index in indexes
-                        ]
+                        mix_results = [self.dataset[index] for index in indexes]
                         if None not in mix_results:
                             results["mix_results"] = mix_results
                             break
@@ -231,7 +236,7 @@ class SeqMultiImageMixDataset:
                     # To confirm the results passed the training pipeline
                     # of the wrapper is not None.
                     try:
-                        updated_results = transform(copy.deepcopy(results))
+                        updated_results = self._apply_transform(transform, results)
                     except Exception as e:
                         print(
                             "Error occurred while running pipeline",
@@ -261,6 +266,20 @@ class SeqMultiImageMixDataset:
 
             return results
 
+    def _apply_transform(self, transform, results):
+        """Run ``transform`` without modifying ``results``.
+
+        ``results`` must stay intact in case the transform fails and is
+        retried, so the transform gets a copy-on-write snapshot whose arrays
+        are shared read-only. The known in-place transforms get their own
+        copy of the arrays they write: here at the top level, through
+        ``EnsureWritable`` inside wrappers (see
+        ``guard_in_place_transforms``). Any other write into a shared array
+        raises instead of modifying ``results``.
+        """
+        private_keys = IN_PLACE_TRANSFORMS.get(type(transform).__name__, ())
+        return transform(cow_copy(results, private_keys=private_keys))
+
     def update_skip_type_keys(self, skip_type_keys):
         """Update skip_type_keys. It is called by an external hook.
 
@@ -289,7 +308,7 @@ class SeqRandomMultiImageVideoMixDataset(SeqMultiImageMixDataset):
             if isinstance(transform, dict):
                 self.video_pipeline_types.append(transform["type"])
                 transform = TRANSFORMS.build(transform)
-                self.video_pipeline.append(transform)
+                self.video_pipeline.append(guard_in_place_transforms(transform))
             else:
                 raise TypeError("pipeline must be a dict")
 
@@ -309,9 +328,9 @@ class SeqRandomMultiImageVideoMixDataset(SeqMultiImageMixDataset):
             if not isinstance(indexes, collections.abc.Sequence):
                 indexes = [indexes]
             if sample_video:
-                mix_results = [copy.deepcopy(self.dataset[0]) for index in indexes]
+                mix_results = [self.dataset[0] for index in indexes]
             else:
-                mix_results = [copy.deepcopy(self.dataset[1]) for index in indexes]
+                mix_results = [self.dataset[1] for index in indexes]
 
             if None not in mix_results:
                 if t_type == "SeqMosaic":
@@ -336,12 +355,12 @@ class SeqRandomMultiImageVideoMixDataset(SeqMultiImageMixDataset):
             else:
                 sample_video = False
             if sample_video:
-                results = copy.deepcopy(self.dataset[0])
+                results = self.dataset[0]
                 pipeline = self.video_pipeline
                 pipeline_type = self.video_pipeline_types
 
             else:
-                results = copy.deepcopy(self.dataset[1])
+                results = self.dataset[1]
                 pipeline = self.pipeline
                 pipeline_type = self.pipeline_types
                 # if results['img_id'][0] != results['img_id'][1]:
@@ -370,9 +389,7 @@ class SeqRandomMultiImageVideoMixDataset(SeqMultiImageMixDataset):
                         indexes = transform.get_indexes(self.dataset)
                         if not isinstance(indexes, collections.abc.Sequence):
                             indexes = [indexes]
-                        mix_results = [
-                            copy.deepcopy(self.dataset[index]) for index in indexes
-                        ]
+                        mix_results = [self.dataset[index] for index in indexes]
                         if None not in mix_results:
                             results["mix_results"] = mix_results
                             break
@@ -387,7 +404,7 @@ class SeqRandomMultiImageVideoMixDataset(SeqMultiImageMixDataset):
                     # To confirm the results passed the training pipeline
                     # of the wrapper is not None.
                     try:
-                        updated_results = transform(copy.deepcopy(results))
+                        updated_results = self._apply_transform(transform, results)
                     except Exception as e:
                         print(
                             "Error occurred while running pipeline",
@@ -0,0 +1,187 @@
+import os
+import os.path as osp
+import pickle
+import warnings
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import h5py
+import numpy as np
+
+
+class HDF5RecordReader:
+    """Read pickled records stored as datasets of one HDF5 file.
+
+    The file is opened lazily and once per process: the handles are dropped
+    when the reader is pickled (e.g. sent to a spawned dataloader worker) and
+    reopened when the process id changes (forked workers), so every worker
+    owns its own handles.
+
+    Records written as contiguous, uncompressed byte datasets (``np.void``
+    scalars or 1-byte arrays) are read with ``os.pread`` through a
+    ``key -> (offset, size)`` index, bypassing the per-record h5py lookups.
+    The index is built once by walking the file and cached next to it
+    (``<file>.offsets.pkl``, invalidated when the file changes). Other
+    records fall back to h5py.
+
+    Args:
+        path (str): Path of the HDF5 file.
+        index_path (str, optional): Where to cache the offset index.
+            Defaults to ``<path>.offsets.pkl``.
+        use_offsets (bool): Whether to read through the offset index.
+            Defaults to True.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self,
+                 path: str,
+                 index_path: Optional[str] = None,
+                 use_offsets: bool = True):
+        self.path = path
+        self.index_path = index_path or path + '.offsets.pkl'
+        # Raw reads need os.pread (not available on Windows).
+        self.use_offsets = use_offsets and hasattr(os, 'pread')
+        self._offsets: Optional[Dict[str, Tuple[int, int]]] = None
+        self._pid: Optional[int] = None
+        self._h5: Optional[h5py.File] = None
+        self._fd: Optional[int] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_pid=None, _h5=None, _fd=None)
+        return state
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        # Only close handles opened by this process; a forked child must not
+        # close the parent's file.
+        if self._pid == os.getpid():
+            if self._h5 is not None:
+                self._h5.close()
+            if self._fd is not None:
+                os.close(self._fd)
+        self._pid, self._h5, self._fd = None, None, None
+
+    def _ensure_open(self):
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._h5 = h5py.File(self.path, 'r')
+        self._fd = os.open(self.path, os.O_RDONLY)
+        if self.use_offsets and self._offsets is None:
+            self._offsets = self._load_or_build_index()
+
+    @property
+    def offsets(self) -> Dict[str, Tuple[int, int]]:
+        """``key -> (file offset, size)`` of the records readable raw."""
+        self._ensure_open()
+        return self._offsets or {}
+
+    def _file_signature(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _load_or_build_index(self) -> Dict[str, Tuple[int, int]]:
+        signature = self._file_signature()
+        if osp.exists(self.index_path):
+            try:
+                with open(self.index_path, 'rb') as f:
+                    cached = pickle.load(f)
+                if (cached.get('version') == self.INDEX_VERSION
+                        and cached.get('signature') == signature):
+                    return cached['offsets']
+            except (OSError, pickle.UnpicklingError, EOFError, KeyError,
+                    AttributeError):
+                pass
+
+        offsets = self._build_index()
+        try:
+            tmp_path = f'{self.index_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(
+                    dict(
+                        version=self.INDEX_VERSION,
+                        signature=signature,
+                        offsets=offsets), f, pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            warnings.warn(f'Could not cache the HDF5 offset index to '
+                          f'{self.index_path}: {e}')
+        return offsets
+
+    def _build_index(self) -> Dict[str, Tuple[int, int]]:
+        base = self._h5.userblock_size
+        offsets = {}
+
+        def visit(name, obj):
+            if not isinstance(obj, h5py.Dataset):
+                return
+            if obj.chunks is not None or obj.compression is not None:
+                return
+            if obj.dtype.kind != 'V' and obj.dtype.itemsize != 1:
+                return
+            offset = obj.id.get_offset()
+            size = obj.id.get_storage_size()
+            if offset is not None and size == obj.size * obj.dtype.itemsize:
+                offsets[name] = (base + offset, size)
+
+        self._h5.visititems(visit)
+        return offsets
+
+    def read(self, key: str) -> bytes:
+        """Read the raw bytes of one record."""
+        self._ensure_open()
+        entry = self._offsets.get(key) if self._offsets else None
+        if entry is not None:
+            offset, size = entry
+            return os.pread(self._fd, size, offset)
+        return self._read_h5(key)
+
+    def _read_h5(self, key: str) -> bytes:
+        data = self._h5[key][()]
+        return data.tobytes() if isinstance(data,
+                                            (np.ndarray, np.void)) else data
+
+    def read_many(self,
+                  keys: Sequence[str],
+                  max_gap: int = 64 * 1024) -> List[bytes]:
+        """Read many records at once, in the order of ``keys``.
+
+        Indexed records are sorted by offset and neighbouring ones (at most
+        ``max_gap`` bytes apart) are fetched with a single read.
+        """
+        self._ensure_open()
+        results: List[Optional[bytes]] = [None] * len(keys)
+        indexed = []
+        for i, key in enumerate(keys):
+            entry = self._offsets.get(key) if self._offsets else None
+            if entry is None:
+                results[i] = self._read_h5(key)
+            else:
+                indexed.append((entry[0], entry[1], i))
+        indexed.sort()
+
+        start = 0
+        while start < len(indexed):
+            end = start + 1
+            span_end = indexed[start][0] + indexed[start][1]
+            while end < len(indexed) and indexed[end][0] - span_end <= max_gap:
+                span_end = max(span_end, indexed[end][0] + indexed[end][1])
+                end += 1
+            span_start = indexed[start][0]
+            buffer = os.pread(self._fd, span_end - span_start, span_start)
+            for offset, size, i in indexed[start:end]:
+                results[i] = buffer[offset - span_start:offset - span_start +
+                                    size]
+            start = end
+        return results
+
+    def load(self, key: str):
+        """Read and unpickle one record."""
+        return pickle.loads(self.read(key))
+
+    def load_many(self, keys: Sequence[str]) -> list:
+        """Read and unpickle many records (see :meth:`read_many`)."""
+        return [pickle.loads(data) for data in self.read_many(keys)]
@@ -0,0 +1,199 @@
+import os
+import os.path as osp
+import pickle
+from multiprocessing import Pool
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def load_resized(path: str,
+                 max_size: Optional[int]) -> Tuple[np.ndarray, Tuple[int, int]]:
+    """Decode an image (BGR) and shrink it so that its long side is at most
+    ``max_size``.
+
+    Returns:
+        tuple: The image and its original ``(h, w)``.
+    """
+    img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise FileNotFoundError(f'cannot read image {path}')
+    return resize_to_max_size(img, max_size), img.shape[:2]
+
+
+def resize_to_max_size(img: np.ndarray, max_size: Optional[int]) -> np.ndarray:
+    """Shrink ``img`` so that its long side is at most ``max_size``."""
+    height, width = img.shape[:2]
+    if max_size is None or max(height, width) <= max_size:
+        return img
+    scale = max_size / max(height, width)
+    size = (int(width * scale + 0.5), int(height * scale + 0.5))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def _load_item(args):
+    key, path, max_size = args
+    try:
+        img, ori_shape = load_resized(path, max_size)
+    except FileNotFoundError:
+        return key, None, None
+    return key, np.ascontiguousarray(img), ori_shape
+
+
+class ImageCache:
+    """A read-only store of decoded images.
+
+    Training on SA-1B decodes every (large) JPEG again in every epoch, and the
+    mixing wrappers decode several of them per sample. The cache keeps the
+    images already decoded and shrunk to the training scale (long side
+    ``max_size``) as raw uint8 pixels in one file, ``images.bin``, next to a
+    few ``.npy`` index arrays (offsets, cached and original shapes, keys).
+    Both are memory-mapped, so reading an image is a copy out of the page
+    cache, shared by all workers; pickling the cache (spawned workers) only
+    sends its path.
+
+    Build it with :meth:`build` (see ``tools/build_image_cache.py``) and read
+    it with the ``LoadImageFromCache`` transform.
+
+    Args:
+        cache_dir (str): Directory holding the cache.
+    """
+
+    VERSION = 1
+    META_FILE = 'meta.pkl'
+    DATA_FILE = 'images.bin'
+    COLUMNS = ('offsets', 'shapes', 'ori_shapes', 'key_blob', 'key_offsets')
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        with open(osp.join(cache_dir, self.META_FILE), 'rb') as f:
+            meta = pickle.load(f)
+        if meta['version'] != self.VERSION:
+            raise ValueError(f'image cache {cache_dir} has version '
+                             f'{meta["version"]}, expected {self.VERSION}')
+        self.max_size: Optional[int] = meta['max_size']
+        self._length: int = meta['length']
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._data: Optional[np.ndarray] = None
+        self._index: Optional[Dict[str, int]] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_arrays=None, _data=None, _index=None)
+        return state
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.index
+
+    @property
+    def arrays(self) -> Dict[str, np.ndarray]:
+        if self._arrays is None:
+            self._arrays = {
+                name: np.asarray(
+                    np.load(
+                        osp.join(self.cache_dir, f'{name}.npy'),
+                        mmap_mode='r'))
+                for name in self.COLUMNS
+            }
+            self._data = np.memmap(
+                osp.join(self.cache_dir, self.DATA_FILE),
+                dtype=np.uint8,
+                mode='r')
+        return self._arrays
+
+    @property
+    def index(self) -> Dict[str, int]:
+        """``key -> position``, built on first use in every process."""
+        if self._index is None:
+            arrays = self.arrays
+            blob = arrays['key_blob'].tobytes()
+            offsets = arrays['key_offsets'].tolist()
+            keys = (blob[offsets[i]:offsets[i + 1]].decode('utf-8')
+                    for i in range(self._length))
+            self._index = {key: i for i, key in enumerate(keys)}
+        return self._index
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """Read an image.
+
+        Returns:
+            tuple | None: A writable copy of the cached (h, w, 3) BGR image
+            and the ``(h, w)`` of the original image, or None if ``key`` is
+            not cached.
+        """
+        idx = self.index.get(key)
+        if idx is None:
+            return None
+        arrays = self.arrays
+        start, end = arrays['offsets'][idx:idx + 2].tolist()
+        height, width = arrays['shapes'][idx].tolist()
+        img = self._data[start:end].reshape(height, width, 3).copy()
+        return img, tuple(arrays['ori_shapes'][idx].tolist())
+
+    @classmethod
+    def build(cls,
+              cache_dir: str,
+              items: Sequence[Tuple[str, str]],
+              max_size: Optional[int] = 1024,
+              num_workers: int = 0,
+              progress: Optional[callable] = None) -> 'ImageCache':
+        """Decode, shrink and store images.
+
+        Args:
+            cache_dir (str): Output directory, created if needed.
+            items (Sequence[tuple[str, str]]): ``(key, path)`` of every
+                image. Unreadable images are skipped.
+            max_size (int, optional): Long side of the cached images; smaller
+                images are kept as they are. None keeps every image at full
+                size. Defaults to 1024.
+            num_workers (int): Decoding processes. Defaults to 0.
+            progress (callable, optional): Called with the number of images
+                processed so far.
+
+        Returns:
+            ImageCache: The cache.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        meta_path = osp.join(cache_dir, cls.META_FILE)
+        if osp.exists(meta_path):
+            os.remove(meta_path)
+        keys, offsets, shapes, ori_shapes = [], [0], [], []
+        tasks = ((key, path, max_size) for key, path in items)
+
+        def write(results: Iterable):
+            with open(osp.join(cache_dir, cls.DATA_FILE), 'wb') as f:
+                for i, (key, img, ori_shape) in enumerate(results):
+                    if img is not None:
+                        f.write(img.data)
+                        keys.append(key.encode('utf-8'))
+                        offsets.append(offsets[-1] + img.nbytes)
+                        shapes.append(img.shape[:2])
+                        ori_shapes.append(ori_shape)
+                    if progress is not None:
+                        progress(i + 1)
+
+        if num_workers > 0:
+            with Pool(num_workers) as pool:
+                write(pool.imap(_load_item, tasks, chunksize=16))
+        else:
+            write(map(_load_item, tasks))
+
+        key_lengths = np.array([len(key) for key in keys], dtype=np.int64)
+        arrays = dict(
+            offsets=np.array(offsets, dtype=np.int64),
+            shapes=np.array(shapes, dtype=np.int32).reshape(-1, 2),
+            ori_shapes=np.array(ori_shapes, dtype=np.int32).reshape(-1, 2),
+            key_blob=np.frombuffer(b''.join(keys), dtype=np.uint8),
+            key_offsets=np.concatenate(([0], np.cumsum(key_lengths))))
+        for name, array in arrays.items():
+            np.save(osp.join(cache_dir, f'{name}.npy'), array)
+        # The meta file is written last: a cache without it is incomplete.
+        with open(meta_path, 'wb') as f:
+            pickle.dump(
+                dict(version=cls.VERSION, max_size=max_size,
+                     length=len(keys)), f)
+        return cls(cache_dir)
@@ -1,11 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import copy
 import logging
+import os
 import os.path as osp
-import pickle
-from typing import List, Union
+from typing import List, Optional, Union
 
-import h5py
 import tqdm
 from mmdet.datasets.api_wrappers import COCO
 from mmdet.datasets.base_det_dataset import BaseDetDataset
@@ -13,10 +12,35 @@ from mmdet.registry import DATASETS
 from mmengine.fileio import get_local_path
 from mmengine.logging import print_log
 
+from .columnar_data_list import ColumnarDataList
+from .hdf5_reader import HDF5RecordReader
+
 
 @DATASETS.register_module()
 class MASADataset(BaseDetDataset):
-    """Dataset for COCO."""
+    """Dataset for COCO.
+
+    Args:
+        anno_hdf5_path (str, optional): HDF5 file with the annotations of
+            each image under ``<file_name>.pkl`` (as written by
+            ``tools/format_conversion/convert_sam_2_cocofmt.py``). When set,
+            :meth:`load_data_list` reads the annotations from it in batches
+            and ``ann_file`` only needs the images and categories.
+            Defaults to None.
+        img_prefix (str, optional): Unused, kept for config compatibility.
+        columnar_cache (str, optional): Directory of a
+            :class:`ColumnarDataList` cache. When set, the parsed and
+            filtered data list is stored there as memory-mapped numpy
+            arrays (built on the first run, reused while the annotation
+            file and the dataset settings are unchanged) and each item is
+            built on access, instead of keeping one dict or pickle per
+            image in every worker. Concurrent ranks and jobs build it once,
+            under a file lock. ``serialize_data`` is ignored. With an
+            empty ``ann_file``, the cache is prebuilt (e.g. by
+            ``tools/format_conversion/convert_sam_2_cocofmt.py``) and only
+            used if it was built with the same dataset settings. Defaults
+            to None.
+    """
 
     METAINFO = {
         "classes": ("object"),
@@ -26,21 +50,39 @@ class MASADataset(BaseDetDataset):
     COCOAPI = COCO
     # ann_id is unique in coco dataset.
     ANN_ID_UNIQUE = True
-
-    def __init__(self, anno_hdf5_path=None, img_prefix=None, *args, **kwargs):
+    # Number of images whose HDF5 annotations are read at once.
+    HDF5_READ_BATCH = 1024
+
+    def __init__(
+        self,
+        anno_hdf5_path=None,
+        img_prefix=None,
+        *args,
+        columnar_cache: Optional[str] = None,
+        **kwargs,
+    ):
 
         self.anno_hdf5_path = anno_hdf5_path
         self.img_prefix = img_prefix
+        self.columnar_cache = columnar_cache
+        # Opened on first use, once per (worker) process.
+        self._hdf5_readers = {}
         super().__init__(*args, **kwargs)
 
+    def _get_hdf5_reader(self, hdf5_file_path) -> HDF5RecordReader:
+        reader = self._hdf5_readers.get(hdf5_file_path)
+        if reader is None:
+            reader = self._hdf5_readers[hdf5_file_path] = HDF5RecordReader(
+                hdf5_file_path)
+        return reader
+
     def read_dicts_from_hdf5(self, hdf5_file_path, pkl_file_path):
-        with h5py.File(hdf5_file_path, "r") as hf:
-            # Retrieve the dataset corresponding to the specified .pkl file path
-            dataset = hf[pkl_file_path]
-            binary_data = dataset[()]
         # Deserialize the binary data and load the list of dictionaries
-        list_of_dicts = pickle.loads(binary_data)
-        return list_of_dicts
+        return self._get_hdf5_reader(hdf5_file_path).load(pkl_file_path)
+
+    def read_many_dicts_from_hdf5(self, hdf5_file_path, pkl_file_paths):
+        """Load the records of many ``.pkl`` keys with batched reads."""
+        return self._get_hdf5_reader(hdf5_file_path).load_many(pkl_file_paths)
 
     def get_ann_info(self, img_info):
         """Get COCO annotation by index.
@@ -68,6 +110,98 @@ class MASADataset(BaseDetDataset):
             ann_info = self.coco.load_anns(ann_ids)
             return ann_info
 
+    def get_ann_infos(self, img_infos: List[dict]) -> List[Optional[list]]:
+        """Get the annotations of many images, batching the HDF5 reads.
+
+        Args:
+            img_infos (list[dict]): Image infos.
+
+        Returns:
+            list: Annotation info of each image.
+        """
+        if self.anno_hdf5_path is None:
+            return [self.get_ann_info(img_info) for img_info in img_infos]
+        keys = [img_info["file_name"].replace(".jpg", ".pkl") for img_info in img_infos]
+        return self.read_many_dicts_from_hdf5(self.anno_hdf5_path, keys)
+
+    def columnar_signature(self) -> tuple:
+        """Everything the cached data list depends on.
+
+        With an empty ``ann_file`` (a prebuilt cache), only the dataset
+        settings.
+        """
+        local_ann_file = osp.abspath(self.ann_file) if self.ann_file else None
+        stat = os.stat(local_ann_file) if local_ann_file and osp.exists(local_ann_file) else None
+        hdf5_file = osp.abspath(self.anno_hdf5_path) if self.anno_hdf5_path else None
+        hdf5_stat = os.stat(hdf5_file) if hdf5_file and osp.exists(hdf5_file) else None
+        return (
+            local_ann_file,
+            (stat.st_size, stat.st_mtime_ns) if stat else None,
+            hdf5_file,
+            (hdf5_stat.st_size, hdf5_stat.st_mtime_ns) if hdf5_stat else None,
+            tuple(sorted(self.data_prefix.items())),
+            repr(self.filter_cfg),
+            repr(self._indices),
+            self.test_mode,
+            self.return_classes,
+            self.seg_map_suffix,
+            repr(self.metainfo.get("classes")),
+            self.proposal_file,
+        )
+
+    def full_init(self) -> None:
+        """Load the data list, from the columnar cache if
+        ``columnar_cache`` is set."""
+        if self._fully_initialized:
+            return
+        if self.columnar_cache is None:
+            super().full_init()
+            return
+
+        signature = self.columnar_signature()
+        data_list = ColumnarDataList.load(self.columnar_cache, signature)
+        if data_list is None and not self.ann_file:
+            raise ValueError(
+                f"The columnar cache {self.columnar_cache} is missing or was "
+                "built with other dataset settings (data_prefix, filter_cfg, "
+                "classes, ...). Rebuild it with "
+                "tools/format_conversion/convert_sam_2_cocofmt.py --config "
+                "<this config> --formats columnar, or set ann_file."
+            )
+        if data_list is None:
+            # Every rank and dataloader process gets here on the first run;
+            # only the first to take the lock builds, the others load its
+            # result.
+            with ColumnarDataList.lock(self.columnar_cache):
+                data_list = ColumnarDataList.load(self.columnar_cache, signature)
+                if data_list is None:
+                    data_list = self._build_columnar_cache(signature)
+        self.data_list = data_list
+        # Items are built from the arrays; there is nothing to serialize.
+        self.serialize_data = False
+        self._fully_initialized = True
+
+    def _build_columnar_cache(self, signature: tuple) -> ColumnarDataList:
+        print_log(
+            f"Building the columnar data list cache {self.columnar_cache}",
+            logger="current",
+        )
+        self.data_list = self.load_data_list()
+        if self.proposal_file is not None:
+            self.load_proposals()
+        self.data_list = self.filter_data()
+        if self._indices is not None:
+            self.data_list = self._get_unserialized_subset(self._indices)
+        return ColumnarDataList.build(self.data_list, self.columnar_cache, signature)
+
+    def get_data_info(self, idx: int) -> dict:
+        if not isinstance(self.data_list, ColumnarDataList):
+            return super().get_data_info(idx)
+        # A freshly built dict: no deepcopy needed.
+        data_info = self.data_list[idx]
+        data_info["sample_idx"] = idx if idx >= 0 else len(self) + idx
+        return data_info
+
     def __getitem__(self, idx: int) -> dict:
         """Get the idx-th image and data information of dataset after
         ``self.pipeline``, and ``full_init`` will be called if the dataset has
@@ -133,7 +267,24 @@ class MASADataset(BaseDetDataset):
         with get_local_path(
             self.ann_file, backend_args=self.backend_args
         ) as local_path:
-            self.coco = self.COCOAPI(local_path)
+            coco = self.COCOAPI(local_path)
+        return self.load_coco_data_list(coco)
+
+    def load_coco_data_list(self, coco: COCO, verbose: bool = True) -> List[dict]:
+        """Parse the images of a loaded COCO api object.
+
+        Also used by ``tools/format_conversion/convert_sam_2_cocofmt.py`` on
+        each shard of SA-1B, so that its columnar output is parsed exactly
+        like ``ann_file``.
+
+        Args:
+            coco (COCO): The annotations.
+            verbose (bool): Whether to show the progress.
+
+        Returns:
+            List[dict]: A list of annotation.
+        """
+        self.coco = coco
         # The order of returned `cat_ids` will not
         # change with the order of the `classes`
         self.cat_ids = self.coco.get_cat_ids(cat_names=self.metainfo["classes"])
@@ -141,21 +292,38 @@ class MASADataset(BaseDetDataset):
         self.cat_img_map = copy.deepcopy(self.coco.cat_img_map)
 
         img_ids = self.coco.get_img_ids()
+        # Look the images and their annotations up in the COCO index
+        # directly instead of three API calls (and list copies) per image.
+        imgs = self.coco.imgs
+        img_to_anns = self.coco.imgToAnns
         data_list = []
         total_ann_ids = []
-        print("Loading data list...")
-        for img_id in tqdm.tqdm(img_ids):
-            raw_img_info = self.coco.load_imgs([img_id])[0]
-            raw_img_info["img_id"] = img_id
-            ann_ids = self.coco.get_ann_ids(img_ids=[img_id])
-            raw_ann_info = self.coco.load_anns(ann_ids)
+        if verbose:
+            print("Loading data list...")
+        progress = tqdm.tqdm(total=len(img_ids), disable=not verbose)
+        for start in range(0, len(img_ids), self.HDF5_READ_BATCH):
+            raw_img_infos = [
+                imgs[img_id] for img_id in img_ids[start : start + self.HDF5_READ_BATCH]
+            ]
+            if self.anno_hdf5_path is not None:
+                # One batched read (sorted by file offset) per chunk.
+                raw_ann_infos = self.get_ann_infos(raw_img_infos)
+            else:
+                raw_ann_infos = [
+                    img_to_anns.get(raw_img_info["id"], [])
+                    for raw_img_info in raw_img_infos
+                ]
+            for raw_img_info, raw_ann_info in zip(raw_img_infos, raw_ann_infos):
+                raw_img_info["img_id"] = raw_img_info["id"]
 
-            total_ann_ids.extend(ann_ids)
+                total_ann_ids.extend(ann["id"] for ann in raw_ann_info)
 
-            parsed_data_info = self.parse_data_info(
-                {"raw_ann_info": raw_ann_info, "raw_img_info": raw_img_info}
-            )
-            data_list.append(parsed_data_info)
+                parsed_data_info = self.parse_data_info(
+                    {"raw_ann_info": raw_ann_info, "raw_img_info": raw_img_info}
+                )
+                data_list.append(parsed_data_info)
+            progress.update(len(raw_img_infos))
+        progress.close()
         if self.ANN_ID_UNIQUE:
             assert len(set(total_ann_ids)) == len(
                 total_ann_ids
@@ -2,7 +2,7 @@ from .formatting import PackMatchInputs
 from .framesample import MixUniformRefFrameSample
 from .transforms import SeqCopyPaste, SeqMixUp, SeqMosaic, SeqRandomAffine
 from .wrappers import MasaTransformBroadcaster
-from .loading import LoadMatchAnnotations
+from .loading import LoadImageFromCache, LoadMatchAnnotations
 
 __all__ = [
     "MasaTransformBroadcaster",
@@ -13,5 +13,6 @@ __all__ = [
     "SeqCopyPaste",
     "SeqRandomAffine",
     "PackMatchInputs",
-    "LoadMatchAnnotations"
+    "LoadMatchAnnotations",
+    "LoadImageFromCache",
 ]
@@ -0,0 +1,132 @@
+"""Copy-on-write snapshots of pipeline results.
+
+The mixing dataset wrappers used to ``copy.deepcopy`` every loaded sample,
+every mix sample and the whole ``results`` dict before each transform, so
+one training sample copied its decoded images and masks many times over.
+
+:func:`cow_copy` copies only the containers (dicts, lists, tuples) and the
+small box tensors, and shares every ``np.ndarray`` with the source after
+marking it read-only. A transform that assigns new arrays (as almost all of
+them do) never pays for a copy. The transforms known to write into their
+input arrays are listed in :data:`IN_PLACE_TRANSFORMS`: inside a wrapper
+(broadcaster, ``Compose``), :func:`guard_in_place_transforms` puts an
+:class:`EnsureWritable` in front of them, which copies the arrays they
+write only if these are still shared; at the top level the caller passes
+their keys to :func:`cow_copy` as ``private_keys``. Any other transform that
+writes into a shared array fails on the read-only flag instead of modifying
+the source.
+"""
+import copy
+from typing import Sequence
+
+import numpy as np
+from mmcv.transforms import BaseTransform
+from mmdet.structures.bbox import BaseBoxes
+from mmdet.structures.mask import BaseInstanceMasks
+
+_IMMUTABLE_TYPES = (type(None), bool, int, float, complex, str, bytes, np.generic)
+
+
+def cow_copy(obj, copy_arrays: bool = False, private_keys: Sequence[str] = ()):
+    """Copy ``obj`` sharing its arrays read-only.
+
+    Args:
+        obj: A results dict, or any value stored in one.
+        copy_arrays (bool): Copy the arrays too instead of sharing them.
+            Unlike ``copy.deepcopy`` this never aliases two arrays in the
+            copy, even if they were the same object in ``obj``.
+            Defaults to False.
+        private_keys (Sequence[str]): Keys of the ``obj`` dict whose arrays
+            are copied (writable) instead of shared. Defaults to ().
+
+    Returns:
+        A copy of ``obj`` whose containers and boxes can be modified
+        without affecting ``obj``.
+    """
+    if isinstance(obj, np.ndarray):
+        if copy_arrays:
+            return obj.copy()
+        obj.flags.writeable = False
+        return obj
+    if isinstance(obj, _IMMUTABLE_TYPES):
+        return obj
+    if isinstance(obj, dict):
+        # copy.copy keeps the dict type (e.g. defaultdict and its factory).
+        new = copy.copy(obj)
+        for key, value in obj.items():
+            new[key] = cow_copy(value, copy_arrays or key in private_keys)
+        return new
+    if type(obj) is list:
+        return [cow_copy(value, copy_arrays) for value in obj]
+    if type(obj) is tuple:
+        return tuple(cow_copy(value, copy_arrays) for value in obj)
+    if isinstance(obj, BaseBoxes):
+        # Box ops work in place (``rescale_``, ``flip_``, ...) and the
+        # tensors are small, so boxes are always cloned.
+        return obj.clone()
+    if isinstance(obj, BaseInstanceMasks):
+        new = copy.copy(obj)
+        new.masks = cow_copy(obj.masks, copy_arrays)
+        return new
+    return copy.deepcopy(obj)
+
+
+# Transforms that write into an input array in place -> the results keys of
+# the arrays they write.
+IN_PLACE_TRANSFORMS = {
+    # cv2.cvtColor(..., dst=img)
+    "YOLOXHSVRandomAug": ("img",),
+}
+
+
+class EnsureWritable(BaseTransform):
+    """Replace the shared (read-only) arrays of ``keys`` by copies.
+
+    Arrays created by an earlier transform are writable and kept as they
+    are.
+
+    Args:
+        keys (Sequence[str]): Results keys of the arrays.
+    """
+
+    def __init__(self, keys: Sequence[str]):
+        self.keys = tuple(keys)
+
+    def transform(self, results: dict) -> dict:
+        for key in self.keys:
+            if key in results:
+                results[key] = _writable(results[key])
+        return results
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(keys={self.keys})"
+
+
+def _writable(value):
+    if isinstance(value, np.ndarray):
+        return value if value.flags.writeable else value.copy()
+    if type(value) is list:
+        return [_writable(item) for item in value]
+    return value
+
+
+def guard_in_place_transforms(transform):
+    """Put an :class:`EnsureWritable` in front of every transform listed in
+    :data:`IN_PLACE_TRANSFORMS` held by ``transform`` (broadcasters,
+    ``Compose``, ...), at any depth. ``transform`` is modified in place.
+
+    Returns:
+        ``transform``.
+    """
+    transforms = getattr(transform, "transforms", None)
+    if isinstance(transforms, list):
+        guarded = []
+        for sub_transform in transforms:
+            keys = IN_PLACE_TRANSFORMS.get(type(sub_transform).__name__)
+            if keys:
+                guarded.append(EnsureWritable(keys))
+            guarded.append(guard_in_place_transforms(sub_transform))
+        transforms[:] = guarded
+    elif transforms is not None:
+        guard_in_place_transforms(transforms)
+    return transform
@@ -1,5 +1,4 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-import copy
 import random
 from collections import defaultdict
 from typing import Dict, List, Optional, Union
@@ -7,6 +6,8 @@ from typing import Dict, List, Optional, Union
 from mmdet.datasets.transforms.frame_sampling import BaseFrameSample
 from mmdet.registry import TRANSFORMS
 
+from .copy_on_write import cow_copy
+
 
 @TRANSFORMS.register_module(force=True)
 class MixUniformRefFrameSample(BaseFrameSample):
@@ -138,7 +139,8 @@ class MixUniformRefFrameSample(BaseFrameSample):
         final_data_info = defaultdict(list)
         # for data in frames_anns:
         for index in sampled_inds:
-            data = copy.deepcopy(frames_anns[index])
+            # Frames sampled from a single image share its arrays read-only.
+            data = cow_copy(frames_anns[index])
             # copy the info in video-level into img-level
             for key in self.collect_video_keys:
                 if key == "video_length":
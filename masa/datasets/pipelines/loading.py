@@ -1,9 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+from typing import Optional
+
+import mmcv
 import numpy as np
 import torch
+from mmcv.transforms import LoadImageFromFile
 from mmdet.datasets.transforms.loading import LoadAnnotations
 from mmdet.registry import TRANSFORMS
-from mmdet.structures.bbox import get_box_type
+from mmdet.structures.bbox import BaseBoxes, get_box_type
+
+from ..image_cache import ImageCache, resize_to_max_size
 
 
 @TRANSFORMS.register_module(force=True)
@@ -156,3 +163,110 @@ class LoadMatchAnnotations(LoadAnnotations):
         repr_str += f"imdecode_backend='{self.imdecode_backend}', "
         repr_str += f"file_client_args={self.file_client_args})"
         return repr_str
+
+
+@TRANSFORMS.register_module(force=True)
+class LoadImageFromCache(LoadImageFromFile):
+    """Load an image from an :class:`ImageCache` instead of decoding it.
+
+    Cached images are shrunk to the long side the cache was built with
+    (``tools/build_image_cache.py``), so the annotations already loaded in
+    ``results`` (``gt_bboxes``, ``gt_masks``, ``gt_seg_map``) are scaled to
+    the cached image: put this transform after ``LoadMatchAnnotations``.
+    ``ori_shape`` keeps the size of the original image.
+
+    Images missing from the cache are decoded from ``img_path`` and shrunk
+    the same way.
+
+    Required Keys:
+
+    - img_path
+
+    Modified Keys:
+
+    - img
+    - img_shape
+    - ori_shape
+    - gt_bboxes (optional)
+    - gt_masks (optional)
+    - gt_seg_map (optional)
+
+    Args:
+        cache_dir (str): Directory of the :class:`ImageCache`.
+        img_prefix (str): Prefix of ``img_path`` that is not part of the cache
+            keys, i.e. the ``--img-prefix`` the cache was built with.
+            Defaults to ''.
+        **kwargs: Arguments of ``LoadImageFromFile``, used for the images
+            that are not cached.
+    """
+
+    def __init__(self, cache_dir: str, img_prefix: str = "", **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.cache_dir = cache_dir
+        self.img_prefix = img_prefix
+        self.cache = ImageCache(cache_dir)
+
+    def _key(self, img_path: str) -> str:
+        if not self.img_prefix:
+            return img_path
+        return osp.relpath(img_path, self.img_prefix)
+
+    def transform(self, results: dict) -> Optional[dict]:
+        """Load the image and scale the annotations to it.
+
+        Args:
+            results (dict): Result dict from :obj:``mmcv.BaseDataset``.
+
+        Returns:
+            dict: The dict contains the loaded image and meta information.
+        """
+        cached = self.cache.get(self._key(results["img_path"]))
+        if cached is None:
+            results = super().transform(results)
+            if results is None:
+                return None
+            img = resize_to_max_size(results["img"], self.cache.max_size)
+            ori_shape = results["ori_shape"]
+        else:
+            img, ori_shape = cached
+            if self.to_float32:
+                img = img.astype(np.float32)
+
+        results["img"] = img
+        results["img_shape"] = img.shape[:2]
+        results["ori_shape"] = ori_shape
+        self._rescale_annotations(results, ori_shape, img.shape[:2])
+        return results
+
+    @staticmethod
+    def _rescale_annotations(
+        results: dict, ori_shape: tuple, img_shape: tuple
+    ) -> None:
+        if tuple(ori_shape) == tuple(img_shape):
+            return
+        w_scale = img_shape[1] / ori_shape[1]
+        h_scale = img_shape[0] / ori_shape[0]
+        gt_bboxes = results.get("gt_bboxes")
+        if isinstance(gt_bboxes, BaseBoxes):
+            gt_bboxes.rescale_((w_scale, h_scale))
+        elif gt_bboxes is not None:
+            results["gt_bboxes"] = gt_bboxes * np.array(
+                [w_scale, h_scale, w_scale, h_scale], dtype=gt_bboxes.dtype
+            )
+        if results.get("gt_masks") is not None:
+            results["gt_masks"] = results["gt_masks"].resize(img_shape)
+        if results.get("gt_seg_map") is not None:
+            results["gt_seg_map"] = mmcv.imresize(
+                results["gt_seg_map"],
+                (img_shape[1], img_shape[0]),
+                interpolation="nearest",
+            )
+
+    def __repr__(self) -> str:
+        repr_str = self.__class__.__name__
+        repr_str += f"(cache_dir='{self.cache_dir}', "
+        repr_str += f"img_prefix='{self.img_prefix}', "
+        repr_str += f"to_float32={self.to_float32}, "
+        repr_str += f"color_type='{self.color_type}', "
+        repr_str += f"imdecode_backend='{self.imdecode_backend}')"
+        return repr_str
@@ -260,10 +260,11 @@ class SeqMosaic(BaseTransform):
 
         loc_strs = ("top_left", "top_right", "bottom_left", "bottom_right")
         for i, loc in enumerate(loc_strs):
+            # The patches are only read; the boxes are cloned below.
             if loc == "top_left":
-                results_patch = copy.deepcopy(results)
+                results_patch = results
             else:
-                results_patch = copy.deepcopy(results["mosaic_mix_results"][i - 1])
+                results_patch = results["mosaic_mix_results"][i - 1]
 
             img_i = results_patch["img"]
             h_i, w_i = img_i.shape[:2]
@@ -284,7 +285,7 @@ class SeqMosaic(BaseTransform):
             mosaic_img[y1_p:y2_p, x1_p:x2_p] = img_i[y1_c:y2_c, x1_c:x2_c]
 
             # adjust coordinate
-            gt_bboxes_i = results_patch["gt_bboxes"]
+            gt_bboxes_i = results_patch["gt_bboxes"].clone()
             gt_bboxes_labels_i = results_patch["gt_bboxes_labels"]
             gt_ignore_flags_i = results_patch["gt_ignore_flags"]
             gt_instances_ids_i = results_patch.get("gt_instances_ids", None)
@@ -535,7 +536,9 @@ class SeqMixUp(BaseTransform):
             # empty bbox
             return results
 
-        retrieve_results = copy.deepcopy(results["mixup_mix_results"][0])
+        # The mix sample may be shared with other frames: only its boxes are
+        # modified, so only they are copied.
+        retrieve_results = results["mixup_mix_results"][0]
         retrieve_img = retrieve_results["img"]
 
         jit_factor = random.uniform(*self.ratio_range)
@@ -603,7 +606,7 @@ class SeqMixUp(BaseTransform):
         ]
 
         # 6. adjust bbox
-        retrieve_gt_bboxes = retrieve_results["gt_bboxes"]
+        retrieve_gt_bboxes = retrieve_results["gt_bboxes"].clone()
         retrieve_gt_bboxes.rescale_([scale_ratio, scale_ratio])
         if self.bbox_clip_border:
             retrieve_gt_bboxes.clip_([origin_h, origin_w])
@@ -861,12 +864,12 @@ class SeqCopyPaste(BaseTransform):
         assert (
             num_images == 1
         ), f"CopyPaste only supports processing 2 images, got {num_images}"
+        # The source sample may be shared with other frames and is only read
+        # by ``_copy_paste``; a shallow copy keeps ``_select_object`` from
+        # replacing its annotations.
+        selected_results = copy.copy(results["copypaste_mix_results"][0])
         if self.selected:
-            selected_results = copy.deepcopy(
-                self._select_object(results["copypaste_mix_results"][0])
-            )
-        else:
-            selected_results = copy.deepcopy(results["copypaste_mix_results"][0])
+            selected_results = self._select_object(selected_results)
 
         return self._copy_paste(results, selected_results)
 
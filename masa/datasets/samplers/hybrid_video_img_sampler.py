@@ -1,6 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import math
-import random
 from typing import Iterator, Optional, Sized
 
 import numpy as np
@@ -38,6 +37,9 @@ class HybridVideoImgSampler(Sampler):
             group. Defaults to None.
     """
 
+    # Number of indices decoded at a time while iterating.
+    chunk_size = 4096
+
     def __init__(self, dataset: Sized, seed: Optional[int] = None,) -> None:
         rank, world_size = get_dist_info()
         self.rank = rank
@@ -49,7 +51,13 @@ class HybridVideoImgSampler(Sampler):
             self.seed = seed
 
         self.dataset = dataset
-        self.indices = []
+        # The sampled indices are numbered 0..num_indices-1: first
+        # ``num_images`` image indices, then the frames of every video entry,
+        # entry ``i`` covering ``offsets[i]:offsets[i + 1]``. They are turned
+        # into ``img_ind`` / ``(video_ind, frame_ind)`` only when yielded.
+        self.num_images = 0
+        self._video_ids = []
+        self._video_lens = []
         # Hard code here to handle different dataset wrapper
         if isinstance(self.dataset, ConcatDataset):
             cat_datasets = self.dataset.datasets
@@ -60,14 +68,7 @@ class HybridVideoImgSampler(Sampler):
             assert not self.test_mode, "'ConcatDataset' should not exist in "
             "test mode"
             for dataset in cat_datasets:
-                num_videos = len(dataset)
-                for video_ind in range(num_videos):
-                    self.indices.extend(
-                        [
-                            (video_ind, frame_ind)
-                            for frame_ind in range(dataset.get_len_per_video(video_ind))
-                        ]
-                    )
+                self._add_videos(dataset, range(len(dataset)))
         elif isinstance(self.dataset, ClassBalancedDataset):
             ori_dataset = self.dataset.dataset
             assert isinstance(
@@ -76,17 +77,11 @@ class HybridVideoImgSampler(Sampler):
             self.test_mode = ori_dataset.test_mode
             assert not self.test_mode, "'ClassBalancedDataset' should not "
             "exist in test mode"
-            video_indices = self.dataset.repeat_indices
-            for index in video_indices:
-                self.indices.extend(
-                    [
-                        (index, frame_ind)
-                        for frame_ind in range(ori_dataset.get_len_per_video(index))
-                    ]
-                )
+            self._add_videos(ori_dataset, self.dataset.repeat_indices)
         elif isinstance(self.dataset, BaseVideoDataset):
             self.test_mode = self.dataset.test_mode
             num_videos = len(self.dataset)
+            self._add_videos(self.dataset, range(num_videos))
 
             if self.test_mode:
                 # in test mode, the images belong to the same video must be put
@@ -96,29 +91,9 @@ class HybridVideoImgSampler(Sampler):
                         f"only {num_videos} videos loaded,"
                         f"but {self.world_size} gpus were given."
                     )
-                chunks = np.array_split(list(range(num_videos)), self.world_size)
-                for videos_inds in chunks:
-                    indices_chunk = []
-                    for video_ind in videos_inds:
-                        indices_chunk.extend(
-                            [
-                                (video_ind, frame_ind)
-                                for frame_ind in range(
-                                    self.dataset.get_len_per_video(video_ind)
-                                )
-                            ]
-                        )
-                    self.indices.append(indices_chunk)
-            else:
-                for video_ind in range(num_videos):
-                    self.indices.extend(
-                        [
-                            (video_ind, frame_ind)
-                            for frame_ind in range(
-                                self.dataset.get_len_per_video(video_ind)
-                            )
-                        ]
-                    )
+                videos_inds = np.array_split(np.arange(num_videos), self.world_size)[
+                    self.rank
+                ]
         else:
             assert isinstance(self.dataset, SeqMultiImageMixDataset), (
                 "HybridVideoImgSampler is only supported in BaseVideoDataset or "
@@ -135,75 +110,84 @@ class HybridVideoImgSampler(Sampler):
                     self.dataset.dataset, _ConcatDataset
                 ), "HybridVideoImgSampler is only supported in _ConcatDataset"
                 cat_datasets = self.dataset.dataset.datasets
+                # As in ``SeqMultiImageMixDataset.generate_indices``, the last
+                # video dataset and the last image dataset are sampled.
+                video_dataset = None
                 for dataset in cat_datasets:
                     self.test_mode = dataset.test_mode
                     assert not self.test_mode, "'ConcatDataset' should not exist in "
                     "test mode"
                     if isinstance(dataset, BaseVideoDataset):
-                        num_videos = len(dataset)
-                        video_indices = []
-                        for video_ind in range(num_videos):
-                            video_indices.extend(
-                                [
-                                    (video_ind, frame_ind)
-                                    for frame_ind in range(
-                                        dataset.get_len_per_video(video_ind)
-                                    )
-                                ]
-                            )
+                        video_dataset = dataset
                     elif isinstance(dataset, BaseDetDataset):
-                        img_indices = []
-                        num_imgs = len(dataset)
-                        for img_ind in range(num_imgs):
-                            img_indices.extend([img_ind])
-                ###### special process to make debug task easier #####
-                def alternate_merge(list1, list2):
-                    # Create a new list to hold the merged elements
-                    merged_list = []
-
-                    # Get the length of the shorter list
-                    min_length = min(len(list1), len(list2))
-
-                    # Append elements alternately from both lists
-                    for i in range(min_length):
-                        merged_list.append(list1[i])
-                        merged_list.append(list2[i])
-
-                    # Append the remaining elements from the longer list
-                    if len(list1) > len(list2):
-                        merged_list.extend(list1[min_length:])
-                    else:
-                        merged_list.extend(list2[min_length:])
-
-                    return merged_list
+                        self.num_images = len(dataset)
+                if video_dataset is not None:
+                    self._add_videos(video_dataset, range(len(video_dataset)))
 
-                self.indices = alternate_merge(img_indices, video_indices)
+        self._video_ids = np.asarray(self._video_ids, dtype=np.int32)
+        self._offsets = np.zeros(len(self._video_lens) + 1, dtype=np.int64)
+        np.cumsum(self._video_lens, out=self._offsets[1:])
+        del self._video_lens
+        self.num_indices = self.num_images + int(self._offsets[-1])
+        assert self.num_indices < 2**31, "indices are stored as int32"
 
         if self.test_mode:
-            self.num_samples = len(self.indices[self.rank])
-            self.total_size = sum([len(index_list) for index_list in self.indices])
+            self._rank_range = (
+                int(self._offsets[videos_inds[0]]),
+                int(self._offsets[videos_inds[-1] + 1]),
+            )
+            self.num_samples = self._rank_range[1] - self._rank_range[0]
+            self.total_size = self.num_indices
         else:
-            self.num_samples = int(math.ceil(len(self.indices) * 1.0 / self.world_size))
+            self.num_samples = int(math.ceil(self.num_indices * 1.0 / self.world_size))
             self.total_size = self.num_samples * self.world_size
 
+    def _add_videos(self, dataset: BaseVideoDataset, video_inds) -> None:
+        """Append one index entry per video in ``video_inds``."""
+        for video_ind in video_inds:
+            self._video_ids.append(video_ind)
+            self._video_lens.append(dataset.get_len_per_video(video_ind))
+
+    def _decode(self, indices: np.ndarray) -> Iterator:
+        """Yield the dataset indices for a chunk of flat indices."""
+        indices = indices.astype(np.int64)
+        items = indices.tolist()
+        is_frame = indices >= self.num_images
+        if is_frame.any():
+            frames = indices[is_frame] - self.num_images
+            entries = np.searchsorted(self._offsets, frames, side="right") - 1
+            pairs = zip(
+                self._video_ids[entries].tolist(),
+                (frames - self._offsets[entries]).tolist(),
+            )
+            for pos, pair in zip(np.flatnonzero(is_frame).tolist(), pairs):
+                items[pos] = pair
+        yield from items
+
     def __iter__(self) -> Iterator:
         if self.test_mode:
             # in test mode, the order of frames can not be shuffled.
-            indices = self.indices[self.rank]
-        else:
-            # deterministically shuffle based on epoch
-            rng = random.Random(self.epoch + self.seed)
-            indices = rng.sample(self.indices, len(self.indices))
-
-            # add extra samples to make it evenly divisible
-            indices += indices[: (self.total_size - len(indices))]
-            assert len(indices) == self.total_size
-
-            # subsample
-            indices = indices[self.rank : self.total_size : self.world_size]
-            assert len(indices) == self.num_samples
-
-        return iter(indices)
+            start, end = self._rank_range
+            for begin in range(start, end, self.chunk_size):
+                yield from self._decode(
+                    np.arange(begin, min(begin + self.chunk_size, end))
+                )
+            return
+
+        # deterministically shuffle based on epoch
+        rng = np.random.default_rng(self.epoch + self.seed)
+        perm = np.arange(self.num_indices, dtype=np.int32)
+        rng.shuffle(perm)
+        # add extra samples to make it evenly divisible (wrapping around to
+        # the start of the permutation) and subsample; only this rank's
+        # share is kept.
+        positions = np.arange(self.rank, self.total_size, self.world_size)
+        indices = perm[positions % self.num_indices]
+        del perm, positions
+        assert len(indices) == self.num_samples
+
+        for begin in range(0, self.num_samples, self.chunk_size):
+            yield from self._decode(indices[begin : begin + self.chunk_size])
 
     def __len__(self):
         return self.num_samples
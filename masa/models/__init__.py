@@ -1,7 +1,31 @@
-from .detectors import *  # noqa
-from .losses import *  # noqa
-from .mot import *  # noqa
-from .necks import *  # noqa
-from .roi_heads import MasaTrackHead
-from .sam import *
-from .tracker import *
+from ..registry import lazy_dir, lazy_exports
+
+# name -> submodule; imported on first access (see masa.registry)
+_EXPORTS = {
+    "GroundingDINO": ".detectors",
+    "DeticMasa": ".detectors",
+    "GroundingDINOMasa": ".detectors",
+    "SamMasa": ".detectors",
+    "MasaTrackDataPreprocessor": ".data_preprocessors",
+    "BatchCompose": ".data_preprocessors",
+    "UnbiasedContrastLoss": ".losses",
+    "MASA": ".mot",
+    "DeformFusion": ".necks",
+    "SimpleFPN": ".necks",
+    "MasaTrackHead": ".roi_heads",
+    "Sam": ".sam",
+    "ImageEncoderViT": ".sam",
+    "MaskDecoder": ".sam",
+    "PromptEncoder": ".sam",
+    "TwoWayTransformer": ".sam",
+    "SamAutomaticMaskGenerator": ".sam",
+    "SamPredictor": ".sam",
+    "sam_model_registry": ".sam",
+    "MasaBDDTracker": ".tracker",
+    "MasaTaoTracker": ".tracker",
+}
+
+__all__ = list(_EXPORTS)
+
+__getattr__ = lazy_exports(__name__, _EXPORTS, globals())
+__dir__ = lazy_dir(globals(), __all__)
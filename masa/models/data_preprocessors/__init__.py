@@ -0,0 +1,18 @@
+from .batch_transforms import (BatchCompose, BatchFilterMatchAnnotations,
+                               BatchPad, BatchRandomCrop, BatchRandomFlip,
+                               BatchRandomResize, BatchSeqMixUp,
+                               BatchSeqRandomAffine, BatchYOLOXHSVRandomAug)
+from .track_data_preprocessor import MasaTrackDataPreprocessor
+
+__all__ = [
+    "BatchCompose",
+    "BatchFilterMatchAnnotations",
+    "BatchPad",
+    "BatchRandomCrop",
+    "BatchRandomFlip",
+    "BatchRandomResize",
+    "BatchSeqMixUp",
+    "BatchSeqRandomAffine",
+    "BatchYOLOXHSVRandomAug",
+    "MasaTrackDataPreprocessor",
+]
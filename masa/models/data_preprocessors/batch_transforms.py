@@ -0,0 +1,786 @@
+"""Batched counterparts of the MASA training transforms.
+
+The SA-1B training pipeline (``configs/datasets/masa_dataset.py``) runs
+SeqRandomAffine, SeqMixUp, YOLOXHSVRandomAug, RandomResize, RandomCrop,
+RandomFlip, Pad and FilterMatchAnnotations on every frame with numpy and
+OpenCV inside the dataloader workers. The transforms here do the same work
+on a collated batch of frames with tensor ops on the batch's device (see
+:class:`MasaTrackDataPreprocessor`). They are meant for the GPU: on the CPU
+the dense resampling is about 10x slower than OpenCV per sample.
+
+A batch transform takes the arguments of the per-sample transform it
+mirrors and draws its random parameters through an instance of that
+transform, one frame after the other and in pipeline order
+(:class:`BatchCompose`). Under the same numpy seed both therefore pick the
+same parameters: boxes come out the same and images differ only by
+interpolation rounding (OpenCV interpolates uint8 images with fixed-point
+weights). ``tools/check_batch_transforms.py`` compares the two.
+
+Differences to the per-sample pipeline:
+
+- SeqMixUp mixes in the raw image of another sample of the batch instead of
+  an extra sample loaded by the dataset wrapper.
+- A sample is not resampled when RandomCrop leaves no box or
+  FilterMatchAnnotations(keep_empty=True) removes every box; the frame is
+  kept without boxes.
+- Instance masks are not supported.
+
+Consecutive resize, crop, flip and pad transforms only compose a pending
+per-frame coordinate map; the image is resampled once, when a transform
+needs the pixels or at the end of :class:`BatchCompose`.
+"""
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from mmcv.image import rescale_size
+from mmdet.registry import MODELS, TRANSFORMS
+from mmengine.structures import InstanceData
+from numpy import random
+from torch import Tensor
+
+
+def _pixel_grid(height: int, width: int, device) -> Tuple[Tensor, Tensor]:
+    """Pixel-centre coordinates ``(x, y)`` of a ``height x width`` image."""
+    ys = torch.arange(height, device=device, dtype=torch.float32)
+    xs = torch.arange(width, device=device, dtype=torch.float32)
+    ys, xs = torch.meshgrid(ys, xs, indexing="ij")
+    return xs, ys
+
+
+def _sample(img: Tensor, src_x: Tensor, src_y: Tensor) -> Tensor:
+    """Bilinearly sample ``img`` (B, C, H, W) at pixel coordinates.
+
+    ``src_x`` and ``src_y`` are (B, h, w) in the OpenCV convention (pixel
+    ``i`` covers ``[i - 0.5, i + 0.5]``); samples outside the image are 0.
+    """
+    height, width = img.shape[-2:]
+    grid = torch.stack(
+        ((2 * src_x + 1) / width - 1, (2 * src_y + 1) / height - 1), dim=-1
+    )
+    return F.grid_sample(
+        img, grid, mode="bilinear", padding_mode="zeros", align_corners=False
+    )
+
+
+def _shape_tensor(shapes: Sequence[Tuple[int, int]], device) -> Tensor:
+    return torch.as_tensor(shapes, dtype=torch.float32, device=device).view(-1, 2)
+
+
+def _outside(shapes: Tensor, height: int, width: int) -> Tensor:
+    """(B, 1, height, width) mask of the pixels beyond each frame's shape."""
+    device = shapes.device
+    rows = torch.arange(height, device=device).view(1, -1, 1)
+    cols = torch.arange(width, device=device).view(1, 1, -1)
+    outside = (rows >= shapes[:, 0].view(-1, 1, 1)) | (
+        cols >= shapes[:, 1].view(-1, 1, 1)
+    )
+    return outside.unsqueeze(1)
+
+
+def _fill_value(value, img: Tensor) -> Tensor:
+    """A pad value (number or per-channel sequence) as a (1, C, 1, 1) tensor."""
+    value = torch.as_tensor(value, dtype=img.dtype, device=img.device)
+    return value.expand(img.size(1)).view(1, -1, 1, 1)
+
+
+def _new_canvas(img: Tensor, shapes: Sequence[Tuple[int, int]]) -> Tuple[int, int]:
+    """Canvas size holding every frame of ``shapes``."""
+    return max(s[0] for s in shapes), max(s[1] for s in shapes)
+
+
+def _get_boxes(instances: InstanceData, device) -> Tensor:
+    if "bboxes" in instances:
+        return instances.bboxes
+    return torch.zeros((0, 4), device=device)
+
+
+def _cat_boxes(
+    instances_list: Sequence[InstanceData], device
+) -> Tuple[Tensor, Tensor, List[int]]:
+    """Concatenate the boxes of all frames.
+
+    Returns:
+        tuple: The (K, 4) boxes, the (K,) frame index of every box and the
+        number of boxes per frame.
+    """
+    boxes = [_get_boxes(instances, device) for instances in instances_list]
+    counts = [len(b) for b in boxes]
+    frame_inds = torch.repeat_interleave(
+        torch.arange(len(boxes), device=device),
+        torch.as_tensor(counts, device=device, dtype=torch.long),
+    )
+    return torch.cat(boxes).float(), frame_inds, counts
+
+
+def _update_instances(
+    instances_list: Sequence[InstanceData],
+    boxes: Tensor,
+    counts: List[int],
+    keep: Optional[Tensor] = None,
+) -> List[InstanceData]:
+    """Put transformed boxes back into new per-frame InstanceData."""
+    results = []
+    frame_boxes = boxes.split(counts)
+    frame_keep = keep.split(counts) if keep is not None else [None] * len(counts)
+    for instances, bboxes, k in zip(instances_list, frame_boxes, frame_keep):
+        if "bboxes" not in instances:
+            results.append(instances)
+            continue
+        new = InstanceData(metainfo=instances.metainfo)
+        for key, value in instances.items():
+            new[key] = bboxes if key == "bboxes" else value
+        results.append(new[k] if k is not None else new)
+    return results
+
+
+def _clip(boxes: Tensor, shapes: Tensor) -> Tensor:
+    """Clip boxes to the (K, 2) ``(h, w)`` image shapes."""
+    max_xy = shapes.flip(-1).repeat(1, 2)
+    return torch.minimum(boxes.clamp(min=0), max_xy)
+
+
+def _is_inside(boxes: Tensor, shapes: Tensor) -> Tensor:
+    """Same test as ``HorizontalBoxes.is_inside``."""
+    height, width = shapes[:, 0], shapes[:, 1]
+    return (
+        (boxes[:, 0] < width)
+        & (boxes[:, 1] < height)
+        & (boxes[:, 2] > 0)
+        & (boxes[:, 3] > 0)
+    )
+
+
+def _flip(boxes: Tensor, shapes: Tensor, directions: Sequence) -> Tensor:
+    """Flip boxes like ``HorizontalBoxes.flip_``; ``None`` keeps a box."""
+    flipped = boxes.clone()
+    for direction in ("horizontal", "vertical", "diagonal"):
+        mask = torch.as_tensor(
+            [d == direction for d in directions], dtype=torch.bool, device=boxes.device
+        )
+        if not mask.any():
+            continue
+        sel = boxes[mask]
+        height, width = shapes[mask, 0:1], shapes[mask, 1:2]
+        if direction in ("horizontal", "diagonal"):
+            sel = torch.cat(
+                (width - sel[:, 2:3], sel[:, 1:2], width - sel[:, 0:1], sel[:, 3:4]), 1
+            )
+        if direction in ("vertical", "diagonal"):
+            sel = torch.cat(
+                (sel[:, 0:1], height - sel[:, 3:4], sel[:, 2:3], height - sel[:, 1:2]), 1
+            )
+        flipped[mask] = sel
+    return flipped
+
+
+def _map_boxes(results: dict, func) -> None:
+    """Apply ``func(boxes, frame_inds) -> (boxes, keep)`` to every frame's
+    ``gt_instances`` and ``ignored_instances`` in one call each."""
+    device = results["img"].device
+    for key in ("gt_instances", "ignored_instances"):
+        if key not in results:
+            continue
+        boxes, frame_inds, counts = _cat_boxes(results[key], device)
+        boxes, keep = func(boxes, frame_inds)
+        results[key] = _update_instances(results[key], boxes, counts, keep)
+
+
+def realize(results: dict) -> dict:
+    """Resample ``results['img']`` through the pending coordinate map.
+
+    The pending map (``results['warp']``) maps every output pixel of a frame
+    to a pixel of the current canvas (``inv``). Source coordinates are
+    clamped to the frame's source shape, which reproduces the replicated
+    border of ``cv2.resize``; output pixels beyond ``content_shape`` (the
+    area added by padding) get the ``fill`` value.
+    """
+    warp = results.pop("warp", None)
+    if warp is None:
+        return results
+    img = results["img"]
+    height, width = _new_canvas(img, results["img_shape"])
+    xs, ys = _pixel_grid(height, width, img.device)
+    points = torch.stack((xs, ys, torch.ones_like(xs))).view(3, -1)
+    src = (warp["inv"] @ points).view(-1, 3, height, width)
+    src_shape = warp["src_shape"]
+    src_x = torch.minimum(src[:, 0].clamp(min=0), (src_shape[:, 1] - 1).view(-1, 1, 1))
+    src_y = torch.minimum(src[:, 1].clamp(min=0), (src_shape[:, 0] - 1).view(-1, 1, 1))
+    out = _sample(img, src_x, src_y).round_().clamp_(0, 255)
+    fill = warp["fill"] if warp["fill"] is not None else 0
+    out = torch.where(
+        _outside(warp["content_shape"], height, width), _fill_value(fill, out), out
+    )
+    results["img"] = out
+    return results
+
+
+def _compose_warp(results: dict, inv: Tensor, content_shape: Tensor) -> None:
+    """Append a coordinate map to the pending warp of ``results``.
+
+    Args:
+        inv (Tensor): (B, 3, 3) maps from the new frame to the current one.
+        content_shape (Tensor): (B, 2) shapes of the frames after the map.
+    """
+    warp = results.get("warp")
+    if warp is None:
+        img = results["img"]
+        eye = torch.eye(3, device=img.device).expand(img.size(0), 3, 3)
+        shapes = _shape_tensor(results["img_shape"], img.device)
+        warp = dict(inv=eye, src_shape=shapes, content_shape=shapes, fill=None)
+    warp["inv"] = warp["inv"] @ inv
+    warp["content_shape"] = content_shape
+    results["warp"] = warp
+
+
+class BatchTransform:
+    """Base class of the batched transforms.
+
+    Subclasses set ``sample_type``, the per-sample transform they mirror, and
+    implement :meth:`get_params` and :meth:`transform`.
+
+    Args:
+        **kwargs: The arguments of the per-sample transform, which is built
+            to draw the random parameters.
+    """
+
+    sample_type: str = None
+
+    def __init__(self, **kwargs):
+        self.sample_transform = TRANSFORMS.build(dict(type=self.sample_type, **kwargs))
+
+    def get_params(self, frame: dict):
+        """Draw the random parameters of one frame.
+
+        Called in the order the per-sample pipeline would run. ``frame``
+        holds the ``img_shape`` the frame has at this point of the pipeline
+        (to be updated if the transform changes it) and, for SeqMixUp, the
+        ``mix_img_shape`` and ``mix_num_boxes`` of its mix image.
+        """
+        raise NotImplementedError
+
+    def transform(self, results: dict, params: list) -> dict:
+        """Apply the transform to all frames of ``results``."""
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self.sample_transform!r})"
+
+
+@MODELS.register_module()
+class BatchSeqRandomAffine(BatchTransform):
+    """Batched ``SeqRandomAffine``: one perspective warp for all frames."""
+
+    sample_type = "SeqRandomAffine"
+
+    def get_params(self, frame: dict) -> np.ndarray:
+        st = self.sample_transform
+        height = frame["img_shape"][0] + st.border[1] * 2
+        width = frame["img_shape"][1] + st.border[0] * 2
+        frame["img_shape"] = (height, width)
+        return st._get_random_homography_matrix(height, width)
+
+    def transform(self, results: dict, params: list) -> dict:
+        st = self.sample_transform
+        results = realize(results)
+        img = results["img"]
+        device = img.device
+        out_shapes = [
+            (h + st.border[1] * 2, w + st.border[0] * 2) for h, w in results["img_shape"]
+        ]
+        matrix = torch.as_tensor(np.stack(params), dtype=torch.float32, device=device)
+
+        fill = _fill_value(st.border_val, img)
+        img = torch.where(
+            _outside(_shape_tensor(results["img_shape"], device), *img.shape[-2:]),
+            fill,
+            img,
+        )
+        height, width = _new_canvas(img, out_shapes)
+        xs, ys = _pixel_grid(height, width, device)
+        points = torch.stack((xs, ys, torch.ones_like(xs))).view(3, -1)
+        inv = torch.linalg.inv(matrix.double()).float()
+        src = (inv @ points).view(-1, 3, height, width)
+        src_x, src_y = src[:, 0] / src[:, 2], src[:, 1] / src[:, 2]
+        results["img"] = (_sample(img - fill, src_x, src_y) + fill).round_().clamp_(0, 255)
+        results["img_shape"] = out_shapes
+
+        box_shapes = _shape_tensor(out_shapes, device)
+
+        def warp_boxes(boxes, frame_inds):
+            if len(boxes) == 0:
+                return boxes, None
+            x1, y1, x2, y2 = boxes.unbind(-1)
+            corners = torch.cat(
+                (
+                    torch.stack((x1, y1, x2, y1, x1, y2, x2, y2), -1).view(-1, 4, 2),
+                    boxes.new_ones(len(boxes), 4, 1),
+                ),
+                -1,
+            )
+            projected = corners @ matrix[frame_inds].transpose(1, 2)
+            projected = projected[..., :2] / projected[..., 2:3]
+            boxes = torch.cat(
+                (projected.min(dim=1).values, projected.max(dim=1).values), -1
+            )
+            shapes = box_shapes[frame_inds]
+            if st.bbox_clip_border:
+                boxes = _clip(boxes, shapes)
+            return boxes, _is_inside(boxes, shapes)
+
+        _map_boxes(results, warp_boxes)
+        return results
+
+
+@MODELS.register_module()
+class BatchSeqMixUp(BatchTransform):
+    """Batched ``SeqMixUp``.
+
+    The mix image of each frame is a raw frame of the batch
+    (``results['mix_img']``, selected by ``results['mix_inds']``).
+    """
+
+    sample_type = "SeqMixUp"
+
+    def get_params(self, frame: dict) -> Optional[dict]:
+        st = self.sample_transform
+        if frame["mix_num_boxes"] == 0:
+            return None
+        jit_factor = random.uniform(*st.ratio_range)
+        is_flip = random.uniform(0, 1) > st.flip_ratio
+
+        mix_h, mix_w = frame["mix_img_shape"]
+        dyn_w, dyn_h = st.dynamic_scale
+        scale_ratio = min(dyn_h / mix_h, dyn_w / mix_w)
+        resized = (int(mix_h * scale_ratio), int(mix_w * scale_ratio))
+        origin_h, origin_w = int(dyn_h * jit_factor), int(dyn_w * jit_factor)
+
+        target_h, target_w = frame["img_shape"]
+        padded_h, padded_w = max(origin_h, target_h), max(origin_w, target_w)
+        y_offset = x_offset = 0
+        if padded_h > target_h:
+            y_offset = random.randint(0, padded_h - target_h)
+        if padded_w > target_w:
+            x_offset = random.randint(0, padded_w - target_w)
+        return dict(
+            scale_ratio=scale_ratio * jit_factor,
+            flip=is_flip,
+            resized=resized,
+            origin=(origin_h, origin_w),
+            offset=(x_offset, y_offset),
+        )
+
+    def transform(self, results: dict, params: list) -> dict:
+        st = self.sample_transform
+        sel = [i for i, p in enumerate(params) if p is not None]
+        if not sel:
+            return results
+        results = realize(results)
+        img = results["img"]
+        device = img.device
+        params = [params[i] for i in sel]
+        mix_inds = [results["mix_inds"][i] for i in sel]
+        fill = _fill_value(st.pad_val, img)
+
+        def as_tensor(values):
+            return torch.as_tensor(values, dtype=torch.float32, device=device)
+
+        # 1. Keep-ratio resize of the mix images onto a dynamic_scale canvas
+        # (uint8, rounded).
+        dyn_w, dyn_h = st.dynamic_scale
+        mix_shape = as_tensor([results["mix_img_shape"][i] for i in mix_inds])
+        resized = as_tensor([p["resized"] for p in params])
+        xs, ys = _pixel_grid(dyn_h, dyn_w, device)
+        scale = mix_shape / resized
+        src_x = (xs + 0.5) * scale[:, 1].view(-1, 1, 1) - 0.5
+        src_y = (ys + 0.5) * scale[:, 0].view(-1, 1, 1) - 0.5
+        src_x = torch.minimum(src_x.clamp(min=0), (mix_shape[:, 1] - 1).view(-1, 1, 1))
+        src_y = torch.minimum(src_y.clamp(min=0), (mix_shape[:, 0] - 1).view(-1, 1, 1))
+        mix_img = results["mix_img"][mix_inds]
+        out = _sample(mix_img, src_x, src_y).round_().clamp_(0, 255)
+        out = torch.where(_outside(resized, dyn_h, dyn_w), fill, out)
+
+        # 2. Jitter resize, flip, pad and crop to the frame (float, truncated).
+        target_shapes = [results["img_shape"][i] for i in sel]
+        height, width = _new_canvas(img, target_shapes)
+        origin = as_tensor([p["origin"] for p in params])
+        offset = as_tensor([p["offset"] for p in params])
+        is_flip = torch.as_tensor([p["flip"] for p in params], device=device)
+        xs, ys = _pixel_grid(height, width, device)
+        px = xs + offset[:, 0].view(-1, 1, 1)
+        py = ys + offset[:, 1].view(-1, 1, 1)
+        origin_w, origin_h = origin[:, 1].view(-1, 1, 1), origin[:, 0].view(-1, 1, 1)
+        inside = (px < origin_w) & (py < origin_h)
+        px = torch.where(is_flip.view(-1, 1, 1), origin_w - 1 - px, px)
+        src_x = (px + 0.5) * (dyn_w / origin_w) - 0.5
+        src_y = (py + 0.5) * (dyn_h / origin_h) - 0.5
+        src_x = src_x.clamp(0, dyn_w - 1)
+        src_y = src_y.clamp(0, dyn_h - 1)
+        cropped = _sample(out, src_x, src_y)
+        cropped = torch.where(inside.unsqueeze(1), cropped, fill).floor_()
+
+        # 3. Blend.
+        img = img.clone()
+        sel_t = torch.as_tensor(sel, device=device)
+        img[sel_t, :, :height, :width] = (
+            0.5 * img[sel_t, :, :height, :width] + 0.5 * cropped
+        ).floor_()
+        results["img"] = img
+
+        # 4. Boxes: bring the mix boxes into the frame, append them and drop
+        # the boxes outside of the frame.
+        scale_ratio = as_tensor([p["scale_ratio"] for p in params])
+        directions = ["horizontal" if p["flip"] else None for p in params]
+        target = as_tensor(target_shapes)
+        sel_set = set(sel)
+        for key in ("gt_instances", "ignored_instances"):
+            if key not in results:
+                continue
+            mix_key = f"mix_{key}"
+            mix_instances = [results[mix_key][i] for i in mix_inds]
+            boxes, frame_inds, counts = _cat_boxes(mix_instances, device)
+            boxes = boxes * scale_ratio[frame_inds].view(-1, 1)
+            if st.bbox_clip_border:
+                boxes = _clip(boxes, origin[frame_inds])
+            boxes = _flip(
+                boxes, origin[frame_inds], [directions[i] for i in frame_inds.tolist()]
+            )
+            boxes = boxes - offset[frame_inds].repeat(1, 2)
+            if st.bbox_clip_border:
+                boxes = _clip(boxes, target[frame_inds])
+            mix_instances = _update_instances(mix_instances, boxes, counts)
+
+            frames = list(results[key])
+            for j, i in enumerate(sel):
+                if len(mix_instances[j]) and "bboxes" in frames[i]:
+                    frames[i] = InstanceData.cat([frames[i], mix_instances[j]])
+                elif len(mix_instances[j]):
+                    frames[i] = mix_instances[j]
+            results[key] = frames
+
+        frame_shapes = _shape_tensor(results["img_shape"], device)
+
+        def filter_inside(boxes, frame_inds):
+            keep = _is_inside(boxes, frame_shapes[frame_inds])
+            # SeqMixUp returns before filtering for frames it did not mix.
+            mixed = torch.as_tensor(
+                [i in sel_set for i in range(len(frame_shapes))], device=device
+            )
+            return boxes, keep | ~mixed[frame_inds]
+
+        _map_boxes(results, filter_inside)
+        return results
+
+
+# OpenCV's uint8 HSV conversion (``hsv_shift == 12``).
+_HSV_SHIFT = 12
+
+
+def _bgr_to_hsv(img: Tensor) -> Tensor:
+    """``cv2.cvtColor(img, cv2.COLOR_BGR2HSV)`` for uint8-valued images."""
+    b, g, r = img.long().unbind(1)
+    v = torch.maximum(torch.maximum(b, g), r)
+    vmin = torch.minimum(torch.minimum(b, g), r)
+    diff = v - vmin
+
+    table = torch.arange(256, dtype=torch.float64, device=img.device)
+    sdiv = torch.where(table > 0, torch.round((255 << _HSV_SHIFT) / table), table)
+    hdiv = torch.where(table > 0, torch.round((180 << _HSV_SHIFT) / (6 * table)), table)
+    half = 1 << (_HSV_SHIFT - 1)
+
+    s = (diff * sdiv.long()[v] + half) >> _HSV_SHIFT
+    h = torch.where(
+        v == r, g - b, torch.where(v == g, b - r + 2 * diff, r - g + 4 * diff)
+    )
+    h = (h * hdiv.long()[diff] + half) >> _HSV_SHIFT
+    h = torch.where(h < 0, h + 180, h)
+    return torch.stack((h, s, v), 1)
+
+
+def _hsv_to_bgr(hsv: Tensor) -> Tensor:
+    """``cv2.cvtColor(img, cv2.COLOR_HSV2BGR)`` for uint8-valued images."""
+    h, s, v = hsv.float().unbind(1)
+    s = s * (1.0 / 255.0)
+    v = v * (1.0 / 255.0)
+    h = h * (6.0 / 180.0)
+    h = torch.where(h >= 6, h - 6, h)
+    sector = h.floor()
+    h = h - sector
+    tab = torch.stack((v, v * (1 - s), v * (1 - s * h), v * (1 - s * (1 - h))), 1)
+    sector_data = torch.as_tensor(
+        [[1, 3, 0], [1, 0, 2], [3, 0, 1], [0, 2, 1], [0, 1, 3], [2, 1, 0]],
+        device=hsv.device,
+    )
+    index = sector_data[sector.long().clamp_(0, 5)].permute(0, 3, 1, 2)
+    bgr = tab.gather(1, index)
+    bgr = torch.where((s == 0).unsqueeze(1), v.unsqueeze(1), bgr)
+    return (bgr * 255).round_().clamp_(0, 255)
+
+
+@MODELS.register_module()
+class BatchYOLOXHSVRandomAug(BatchTransform):
+    """Batched ``YOLOXHSVRandomAug`` on BGR images."""
+
+    sample_type = "YOLOXHSVRandomAug"
+
+    def get_params(self, frame: dict) -> np.ndarray:
+        return self.sample_transform._get_hsv_gains()
+
+    def transform(self, results: dict, params: list) -> dict:
+        results = realize(results)
+        img = results["img"]
+        gains = torch.as_tensor(np.stack(params), dtype=torch.long, device=img.device)
+        hsv = _bgr_to_hsv(img) + gains.view(-1, 3, 1, 1)
+        h = hsv[:, 0].remainder(180)
+        s = hsv[:, 1].clamp(0, 255)
+        v = hsv[:, 2].clamp(0, 255)
+        results["img"] = _hsv_to_bgr(torch.stack((h, s, v), 1))
+        return results
+
+
+@MODELS.register_module()
+class BatchRandomResize(BatchTransform):
+    """Batched ``RandomResize``."""
+
+    sample_type = "RandomResize"
+
+    def get_params(self, frame: dict) -> Tuple[int, int]:
+        st = self.sample_transform
+        scale = st._random_scale()
+        height, width = frame["img_shape"]
+        if st.resize.keep_ratio:
+            new_w, new_h = rescale_size((width, height), scale)
+        else:
+            new_w, new_h = scale
+        frame["img_shape"] = (new_h, new_w)
+        return new_h, new_w
+
+    def transform(self, results: dict, params: list) -> dict:
+        results = realize(results)
+        device = results["img"].device
+        scale_factor = [
+            (new_w / w, new_h / h)
+            for (h, w), (new_h, new_w) in zip(results["img_shape"], params)
+        ]
+        scale = torch.as_tensor(scale_factor, dtype=torch.float32, device=device)
+        new_shapes = [tuple(p) for p in params]
+        inv = torch.zeros((len(params), 3, 3), device=device)
+        inv[:, 0, 0] = 1 / scale[:, 0]
+        inv[:, 1, 1] = 1 / scale[:, 1]
+        inv[:, 0, 2] = 0.5 / scale[:, 0] - 0.5
+        inv[:, 1, 2] = 0.5 / scale[:, 1] - 0.5
+        inv[:, 2, 2] = 1
+        _compose_warp(results, inv, _shape_tensor(new_shapes, device))
+        results["img_shape"] = new_shapes
+        results["scale_factor"] = scale_factor
+
+        clip = self.sample_transform.resize.clip_object_border
+        box_shapes = _shape_tensor(new_shapes, device)
+
+        def rescale_boxes(boxes, frame_inds):
+            boxes = boxes * scale[frame_inds].repeat(1, 2)
+            if clip:
+                boxes = _clip(boxes, box_shapes[frame_inds])
+            return boxes, None
+
+        _map_boxes(results, rescale_boxes)
+        return results
+
+
+@MODELS.register_module()
+class BatchRandomCrop(BatchTransform):
+    """Batched ``RandomCrop``; frames are kept when no box is left."""
+
+    sample_type = "RandomCrop"
+
+    def get_params(self, frame: dict) -> Tuple[int, int, int, int]:
+        st = self.sample_transform
+        height, width = frame["img_shape"]
+        crop_h, crop_w = st._get_crop_size((height, width))
+        offset_h, offset_w = st._rand_offset((max(height - crop_h, 0), max(width - crop_w, 0)))
+        crop_h = min(crop_h, height - offset_h)
+        crop_w = min(crop_w, width - offset_w)
+        frame["img_shape"] = (crop_h, crop_w)
+        return offset_h, offset_w, crop_h, crop_w
+
+    def transform(self, results: dict, params: list) -> dict:
+        warp = results.get("warp")
+        if warp is not None and warp["fill"] is not None:
+            results = realize(results)
+        device = results["img"].device
+        params_t = torch.as_tensor(params, dtype=torch.float32, device=device)
+        inv = torch.eye(3, device=device).repeat(len(params), 1, 1)
+        inv[:, 0, 2] = params_t[:, 1]
+        inv[:, 1, 2] = params_t[:, 0]
+        new_shapes = [(crop_h, crop_w) for _, _, crop_h, crop_w in params]
+        box_shapes = _shape_tensor(new_shapes, device)
+        _compose_warp(results, inv, box_shapes)
+        results["img_shape"] = new_shapes
+
+        clip = self.sample_transform.bbox_clip_border
+
+        def crop_boxes(boxes, frame_inds):
+            boxes = boxes - params_t[frame_inds][:, [1, 0]].repeat(1, 2)
+            shapes = box_shapes[frame_inds]
+            if clip:
+                boxes = _clip(boxes, shapes)
+            return boxes, _is_inside(boxes, shapes)
+
+        _map_boxes(results, crop_boxes)
+        return results
+
+
+@MODELS.register_module()
+class BatchRandomFlip(BatchTransform):
+    """Batched ``RandomFlip``."""
+
+    sample_type = "RandomFlip"
+
+    def get_params(self, frame: dict) -> Optional[str]:
+        return self.sample_transform._choose_direction()
+
+    def transform(self, results: dict, params: list) -> dict:
+        warp = results.get("warp")
+        if warp is not None and warp["fill"] is not None:
+            results = realize(results)
+        device = results["img"].device
+        shapes = _shape_tensor(results["img_shape"], device)
+        results["flip"] = [d is not None for d in params]
+        results["flip_direction"] = list(params)
+        if not any(results["flip"]):
+            return results
+
+        inv = torch.eye(3, device=device).repeat(len(params), 1, 1)
+        for i, direction in enumerate(params):
+            if direction in ("horizontal", "diagonal"):
+                inv[i, 0, 0] = -1
+                inv[i, 0, 2] = shapes[i, 1] - 1
+            if direction in ("vertical", "diagonal"):
+                inv[i, 1, 1] = -1
+                inv[i, 1, 2] = shapes[i, 0] - 1
+        _compose_warp(results, inv, shapes)
+
+        def flip_boxes(boxes, frame_inds):
+            directions = [params[i] for i in frame_inds.tolist()]
+            return _flip(boxes, shapes[frame_inds], directions), None
+
+        _map_boxes(results, flip_boxes)
+        return results
+
+
+@MODELS.register_module()
+class BatchPad(BatchTransform):
+    """Batched ``Pad`` (bottom/right padding)."""
+
+    sample_type = "Pad"
+
+    def get_params(self, frame: dict) -> Tuple[int, int]:
+        st = self.sample_transform
+        height, width = frame["img_shape"]
+        size = None
+        if st.pad_to_square:
+            size = (max(height, width),) * 2
+        if st.size_divisor is not None:
+            size = size or (height, width)
+            size = tuple(int(np.ceil(s / st.size_divisor)) * st.size_divisor for s in size)
+        elif st.size is not None:
+            size = tuple(st.size[::-1])
+        frame["img_shape"] = size
+        return size
+
+    def transform(self, results: dict, params: list) -> dict:
+        warp = results.get("warp")
+        if warp is not None and warp["fill"] is not None:
+            results = realize(results)
+        device = results["img"].device
+        shapes = _shape_tensor(results["img_shape"], device)
+        inv = torch.eye(3, device=device).expand(len(params), 3, 3)
+        _compose_warp(results, inv, shapes)
+        results["warp"]["fill"] = self.sample_transform.pad_val.get("img", 0)
+        results["img_shape"] = [tuple(p) for p in params]
+        return results
+
+
+@MODELS.register_module()
+class BatchFilterMatchAnnotations(BatchTransform):
+    """Batched ``FilterMatchAnnotations``; frames are kept when no box is
+    left, whatever ``keep_empty`` says."""
+
+    sample_type = "FilterMatchAnnotations"
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.sample_transform.by_mask:
+            raise NotImplementedError("Masks are not supported by batch transforms.")
+
+    def get_params(self, frame: dict) -> None:
+        return None
+
+    def transform(self, results: dict, params: list) -> dict:
+        min_w, min_h = self.sample_transform.min_gt_bbox_wh
+
+        def filter_boxes(boxes, frame_inds):
+            keep = (boxes[:, 2] - boxes[:, 0] > min_w) & (boxes[:, 3] - boxes[:, 1] > min_h)
+            return boxes, keep
+
+        _map_boxes(results, filter_boxes)
+        return results
+
+
+class BatchCompose:
+    """Compose batch transforms.
+
+    Args:
+        transforms (list[dict | :obj:`BatchTransform`]): The batch
+            transforms, in the order of the per-sample pipeline they replace.
+
+    The ``results`` passed to :meth:`__call__` hold:
+
+    - ``img``: (B, C, H, W) float canvas of B frames with uint8 values.
+    - ``img_shape``: the ``(h, w)`` of every frame in the canvas.
+    - ``gt_instances``, ``ignored_instances``: the InstanceData of every
+      frame, with ``bboxes`` as (N, 4) tensors.
+    - ``mix_img``, ``mix_img_shape``, ``mix_gt_instances``,
+      ``mix_ignored_instances``: raw frames to mix in, and ``mix_inds``, the
+      mix frame of every frame (only needed by :class:`BatchSeqMixUp`).
+
+    The transforms may add ``scale_factor``, ``flip`` and
+    ``flip_direction`` per frame.
+    """
+
+    def __init__(self, transforms: Sequence):
+        self.transforms = [
+            MODELS.build(t) if isinstance(t, dict) else t for t in transforms
+        ]
+
+    def __call__(self, results: dict) -> dict:
+        frames = []
+        for i, shape in enumerate(results["img_shape"]):
+            frame = dict(img_shape=tuple(shape))
+            if "mix_inds" in results:
+                j = results["mix_inds"][i]
+                frame["mix_img_shape"] = tuple(results["mix_img_shape"][j])
+                frame["mix_num_boxes"] = sum(
+                    len(results[key][j])
+                    for key in ("mix_gt_instances", "mix_ignored_instances")
+                    if key in results
+                )
+            frames.append(frame)
+
+        # Draw the parameters frame by frame, like the per-sample pipeline.
+        params = [[] for _ in self.transforms]
+        for frame in frames:
+            for t, p in zip(self.transforms, params):
+                p.append(t.get_params(frame))
+
+        for t, p in zip(self.transforms, params):
+            results = t.transform(results, p)
+        return realize(results)
+
+    def __repr__(self) -> str:
+        format_string = self.__class__.__name__ + "("
+        for t in self.transforms:
+            format_string += f"\n    {t}"
+        format_string += "\n)"
+        return format_string
@@ -0,0 +1,125 @@
+import logging
+from typing import Dict, List, Optional, Sequence
+
+import torch
+from mmdet.models.data_preprocessors import TrackDataPreprocessor
+from mmdet.registry import MODELS
+from mmengine.logging import print_log
+
+from .batch_transforms import BatchCompose
+
+
+@MODELS.register_module()
+class MasaTrackDataPreprocessor(TrackDataPreprocessor):
+    """``TrackDataPreprocessor`` that can run the training augmentations on
+    the batch.
+
+    With ``batch_transforms`` the dataset pipeline only samples and packs the
+    raw frames; in training the frames are then augmented here, on the
+    device, before normalization (see
+    :mod:`masa.models.data_preprocessors.batch_transforms`).
+
+    The batch transforms need a GPU: on the CPU they are about 10x slower
+    than the per-sample pipeline (``tools/check_batch_transforms.py``), and
+    a warning is logged. Train on the CPU with the per-sample pipeline.
+
+    Args:
+        batch_transforms (list[dict], optional): Batch transforms (e.g.
+            ``BatchSeqRandomAffine``) in the order of the per-sample
+            transforms they replace. Defaults to None.
+        **kwargs: Arguments of ``TrackDataPreprocessor``.
+    """
+
+    def __init__(self, batch_transforms: Optional[List[dict]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.batch_transforms = (
+            BatchCompose(batch_transforms) if batch_transforms else None
+        )
+        self._warned_cpu = False
+
+    def forward(self, data: dict, training: bool = False) -> Dict:
+        if training and self.batch_transforms is not None:
+            data = self.cast_data(data)
+            data["inputs"] = self.batch_transform(data["inputs"], data["data_samples"])
+        return super().forward(data, training)
+
+    def batch_transform(
+        self,
+        inputs: Sequence[torch.Tensor],
+        data_samples: Sequence,
+        mix_inds: Optional[Sequence[int]] = None,
+    ) -> List[torch.Tensor]:
+        """Run ``batch_transforms`` on the collated samples.
+
+        Args:
+            inputs (list[Tensor]): The (T, C, H, W) frames of every sample.
+            data_samples (list[:obj:`TrackDataSample`]): Their data samples,
+                updated in place.
+            mix_inds (list[int], optional): For every sample, the sample whose
+                first frame is mixed in by ``BatchSeqMixUp``. Defaults to a
+                random other sample of the batch.
+
+        Returns:
+            list[Tensor]: The transformed (T, C, H, W) frames of every sample.
+        """
+        frames = [img for imgs in inputs for img in imgs]
+        if frames[0].device.type == "cpu" and not self._warned_cpu:
+            print_log(
+                "The batch transforms run on the CPU, where they are much "
+                "slower than the per-sample pipeline; train on a GPU or use "
+                "the per-sample train_pipeline.",
+                logger="current",
+                level=logging.WARNING,
+            )
+            self._warned_cpu = True
+        det_samples = [det for track in data_samples for det in track.video_data_samples]
+        num_frames = [len(imgs) for imgs in inputs]
+        shapes = [tuple(img.shape[-2:]) for img in frames]
+
+        height = max(h for h, _ in shapes)
+        width = max(w for _, w in shapes)
+        canvas = frames[0].new_zeros(
+            (len(frames), frames[0].size(0), height, width), dtype=torch.float32
+        )
+        for canvas_img, img in zip(canvas, frames):
+            canvas_img[:, : img.size(-2), : img.size(-1)] = img
+
+        if mix_inds is None:
+            num_samples = len(inputs)
+            offsets = torch.randint(1, max(num_samples, 2), (num_samples,)).tolist()
+            mix_inds = [(i + o) % num_samples for i, o in enumerate(offsets)]
+        first_frames = [sum(num_frames[:i]) for i in range(len(inputs))]
+        frame_mix_inds = [
+            first_frames[mix_inds[i]] for i, n in enumerate(num_frames) for _ in range(n)
+        ]
+
+        results = dict(
+            img=canvas,
+            img_shape=shapes,
+            gt_instances=[det.gt_instances for det in det_samples],
+            ignored_instances=[det.ignored_instances for det in det_samples],
+            mix_img=canvas,
+            mix_img_shape=shapes,
+            mix_gt_instances=[det.gt_instances for det in det_samples],
+            mix_ignored_instances=[det.ignored_instances for det in det_samples],
+            mix_inds=frame_mix_inds,
+        )
+        results = self.batch_transforms(results)
+
+        for i, det in enumerate(det_samples):
+            det.gt_instances = results["gt_instances"][i]
+            det.ignored_instances = results["ignored_instances"][i]
+            det.set_metainfo(dict(img_shape=results["img_shape"][i]))
+            for key in ("scale_factor", "flip", "flip_direction"):
+                if key in results:
+                    det.set_metainfo({key: results[key][i]})
+
+        outputs = []
+        start = 0
+        for n in num_frames:
+            sample_shapes = results["img_shape"][start : start + n]
+            h = max(s[0] for s in sample_shapes)
+            w = max(s[1] for s in sample_shapes)
+            outputs.append(results["img"][start : start + n, :, :h, :w])
+            start += n
+        return outputs
@@ -1,6 +1,14 @@
-from .detic_masa import DeticMasa
-from .gdino_masa import GroundingDINOMasa
-from .grounding_dino import GroundingDINO
-from .sam_masa import SamMasa
+from ...registry import lazy_dir, lazy_exports
+
+# Imported on first access: DeticMasa pulls in the Detic project.
+_EXPORTS = {
+    "DeticMasa": ".detic_masa",
+    "GroundingDINOMasa": ".gdino_masa",
+    "GroundingDINO": ".grounding_dino",
+    "SamMasa": ".sam_masa",
+}
 
 __all__ = ["GroundingDINO", "DeticMasa", "GroundingDINOMasa", "SamMasa"]
+
+__getattr__ = lazy_exports(__name__, _EXPORTS, globals())
+__dir__ = lazy_dir(globals(), __all__)
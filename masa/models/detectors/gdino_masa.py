@@ -181,6 +181,8 @@ class GroundingDINOMasa(GroundingDINO):
                 results_list = []
 
                 entities = [[item for lst in entities[0] for item in lst]]
+                # chunked prompts are re-encoded per chunk, so nothing is cached
+                self.track_text_dict = None
 
                 for b in range(len(text_prompts[0])):
                     text_prompts_once = [text_prompts[0][b]]
@@ -224,8 +226,9 @@ class GroundingDINOMasa(GroundingDINO):
                         is_rec_tasks.append(True)
                     data_samples.token_positive_map = token_positive_maps[i]
 
-                if self.track_text_dict is None:
-                    self.track_text_dict = text_dict
+                # cache the embeddings of the current prompt; a stale dict from
+                # a previous prompt must not be reused
+                self.track_text_dict = text_dict
 
                 head_inputs_dict = self.forward_transformer(
                     visual_feats, text_dict, batch_data_samples
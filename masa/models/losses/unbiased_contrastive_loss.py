@@ -12,6 +12,10 @@ from mmdet.registry import MODELS
 def multi_pos_cross_entropy(
     pred, label, weight=None, reduction="mean", avg_factor=None, pos_normalize=True,
 ):
+    # The log-sum-exp over hundreds of references loses too much precision
+    # in fp16/bf16, so the loss is always computed in fp32.
+    pred = pred.float()
+    label = label.float()
 
     valid_mask = label.sum(1) != 0
     pred = pred[valid_mask]
@@ -0,0 +1,123 @@
+import hashlib
+import os
+import os.path as osp
+from collections import OrderedDict
+from typing import List, Optional, Sequence
+
+import torch
+from torch import Tensor
+
+
+class FeatureCache:
+    """A bounded on-disk cache of per-sample backbone features.
+
+    With a frozen backbone, the backbone output of a view only depends on the
+    input image. :class:`MASA` can therefore store the multi-level backbone
+    features of every training view here and, when the same input comes
+    back, feed them to the MASA adapter without running the backbone.
+
+    A view is identified by the content, shape (padding included) and dtype
+    of its input tensor, so any change of the pipeline's output (crop, affine,
+    mixup, color jitter, ...) is a miss. The cache only pays off when the
+    training pipeline is deterministic or draws from a fixed set of views;
+    with the random SA-1B augmentations every view misses, and each batch
+    pays for hashing its inputs and writing their features.
+
+    Every view is stored as one file; once the cache exceeds ``max_size`` the
+    least recently used files are deleted. Files found in ``cache_dir`` at
+    start up are reused (oldest first out), so the features computed in the
+    first epoch, or by an earlier run, serve the following ones. Several
+    processes (e.g. the ranks of one job) may share ``cache_dir``; a file
+    deleted by another process reads as a miss.
+
+    Args:
+        cache_dir (str): Directory of the feature files.
+        max_size (float): Maximum size of the cache in GB. Defaults to 50.
+        dtype (str, optional): Dtype of the stored features, e.g.
+            ``"float16"`` to halve the disk usage and the reads; None keeps
+            the backbone's dtype. Defaults to "float16".
+    """
+
+    SUFFIX = ".pt"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_size: float = 50,
+        dtype: Optional[str] = "float16",
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = int(max_size * 2**30)
+        self.dtype = getattr(torch, dtype) if dtype is not None else None
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # key -> file size, least recently used first.
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        entries = [
+            entry
+            for entry in os.scandir(cache_dir)
+            if entry.name.endswith(self.SUFFIX)
+        ]
+        for entry in sorted(entries, key=lambda e: e.stat().st_mtime):
+            self._sizes[entry.name[: -len(self.SUFFIX)]] = entry.stat().st_size
+        self._total = sum(self._sizes.values())
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, img: Tensor) -> str:
+        """Key of an input image (C, H, W): a hash of its shape, dtype and
+        content."""
+        img = img.detach().contiguous()
+        digest = hashlib.sha1(repr((tuple(img.shape), str(img.dtype))).encode("utf-8"))
+        digest.update(img.flatten().view(torch.uint8).cpu().numpy().tobytes())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return osp.join(self.cache_dir, key + self.SUFFIX)
+
+    def get(self, key: str) -> Optional[List[Tensor]]:
+        """The cached features of ``key`` (on the CPU), or None."""
+        if key not in self._sizes:
+            self.misses += 1
+            return None
+        try:
+            feats = torch.load(self._path(key), map_location="cpu")
+        except FileNotFoundError:
+            self._total -= self._sizes.pop(key)
+            self.misses += 1
+            return None
+        self._sizes.move_to_end(key)
+        self.hits += 1
+        return feats
+
+    def put(self, key: str, feats: Sequence[Tensor]) -> None:
+        """Store the features of one view."""
+        feats = [
+            feat.detach().to("cpu", self.dtype or feat.dtype).contiguous()
+            for feat in feats
+        ]
+        path = self._path(key)
+        # Write then rename, so that readers never see a partial file.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        torch.save(feats, tmp_path)
+        os.replace(tmp_path, path)
+        size = osp.getsize(path)
+        self._total += size - self._sizes.pop(key, 0)
+        self._sizes[key] = size
+        while self._total > self.max_bytes and len(self._sizes) > 1:
+            old_key, old_size = self._sizes.popitem(last=False)
+            self._total -= old_size
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    def __repr__(self) -> str:
+        return (
+            f"{self.__class__.__name__}(cache_dir={self.cache_dir!r}, "
+            f"entries={len(self)}, size={self._total / 2**30:.2f}GB, "
+            f"hits={self.hits}, misses={self.misses})"
+        )
@@ -17,6 +17,8 @@ from mmdet.utils import OptConfigType, OptMultiConfig
 from mmengine.structures import InstanceData
 from torch import Tensor
 
+from .feature_cache import FeatureCache
+
 
 @MODELS.register_module()
 class MASA(BaseMOTModel):
@@ -51,6 +53,9 @@ class MASA(BaseMOTModel):
         unified_backbone (bool): If True, use a unified backbone. Defaults to False.
         use_masa_backbone (bool): If True, use the MASA backbone. Defaults to False.
         benchmark (str): Benchmark for evaluation. Defaults to 'tao'.
+        feature_cache (dict, optional): Arguments of a :class:`FeatureCache`
+            storing the backbone features of the training views, so that
+            repeated views skip the (frozen) backbone. Defaults to None.
     """
 
     def __init__(
@@ -78,6 +83,7 @@ class MASA(BaseMOTModel):
         unified_backbone=False,
         use_masa_backbone=False,
         benchmark="tao",
+        feature_cache: Optional[dict] = None,
     ) -> None:
         super().__init__(data_preprocessor, init_cfg)
 
@@ -182,6 +188,15 @@ class MASA(BaseMOTModel):
 
         self.unified_backbone = unified_backbone
 
+        self.feature_cache = None
+        if feature_cache is not None:
+            assert (
+                self.freeze_masa_backbone
+                if use_masa_backbone
+                else self.freeze_detector
+            ), "feature_cache needs a frozen backbone."
+            self.feature_cache = FeatureCache(**feature_cache)
+
     @property
     def with_rpn(self) -> bool:
         """bool: whether the detector has RPN"""
@@ -192,6 +207,66 @@ class MASA(BaseMOTModel):
         """bool: whether the detector has a RoI head"""
         return hasattr(self, "roi_head") and self.roi_head is not None
 
+    def extract_masa_feats(self, img: Tensor) -> List[Tensor]:
+        """Extract the MASA adapter features of a single frame without running
+        the detection head.
+
+        Args:
+            img (Tensor): of shape (N, C, H, W) encoding input images.
+
+        Returns:
+            list[Tensor]: Multi level feature maps from the MASA adapter.
+        """
+        if self.unified_backbone:
+            if hasattr(self.detector.backbone, "with_text_model"):
+                x = self.detector.backbone.forward_image(img)
+            elif self.detector.__class__.__name__ == "SamMasa":
+                x = self.detector.backbone.forward_base_multi_level(img)
+            else:
+                x = self.detector.backbone(img)
+        elif self.use_masa_backbone:
+            x = self.backbone.forward(img)
+        return self.masa_adapter(x)
+
+    def _backbone_forward(self, imgs: Tensor) -> Tuple[Tensor]:
+        if self.use_masa_backbone:
+            return self.backbone.forward(imgs)
+        if hasattr(self.detector.backbone, "with_text_model"):
+            return self.detector.backbone.forward_image(imgs)
+        if self.detector.__class__.__name__ == "SamMasa":
+            return self.detector.backbone.forward_base_multi_level(imgs)
+        return self.detector.backbone.forward(imgs)
+
+    def extract_backbone_feats(self, imgs: Tensor) -> Tuple[Tensor]:
+        """Extract the backbone features fed to the MASA adapter in training.
+
+        With a ``feature_cache``, the features of the images found in the
+        cache (by content) are loaded and the backbone only runs on the
+        others, whose features are then stored.
+
+        Args:
+            imgs (Tensor): of shape (N, C, H, W) encoding input images.
+
+        Returns:
+            tuple[Tensor]: Multi level feature maps of the backbone.
+        """
+        if self.feature_cache is None:
+            return self._backbone_forward(imgs)
+
+        keys = [self.feature_cache.key(img) for img in imgs]
+        feats = [self.feature_cache.get(key) for key in keys]
+        missing = [i for i, feat in enumerate(feats) if feat is None]
+        if missing:
+            with torch.no_grad():
+                new_feats = self._backbone_forward(imgs[missing])
+            for j, i in enumerate(missing):
+                feats[i] = [level[j] for level in new_feats]
+                self.feature_cache.put(keys[i], feats[i])
+        return tuple(
+            torch.stack([feat[level].to(imgs.device, imgs.dtype) for feat in feats])
+            for level in range(len(feats[0]))
+        )
+
     def predict(
         self,
         inputs: Tensor,
@@ -269,16 +344,7 @@ class MASA(BaseMOTModel):
 
                 img_data_sample.pred_instances = det_results
 
-                if self.unified_backbone:
-                    if hasattr(self.detector.backbone, "with_text_model"):
-                        x = self.detector.backbone.forward_image(single_img)
-                    elif self.detector.__class__.__name__ == "SamMasa":
-                        x = self.detector.backbone.forward_base_multi_level(single_img)
-                    else:
-                        x = self.detector.backbone(single_img)
-                elif self.use_masa_backbone:
-                    x = self.backbone.forward(single_img)
-                x_m = self.masa_adapter(x)
+                x_m = self.extract_masa_feats(single_img)
 
             elif self.given_dets:
                 assert (
@@ -305,16 +371,7 @@ class MASA(BaseMOTModel):
 
                 img_data_sample.pred_instances = det_results
 
-                if self.unified_backbone:
-                    if hasattr(self.detector.backbone, "with_text_model"):
-                        x = self.detector.backbone.forward_image(single_img)
-                    elif self.detector.__class__.__name__ == "SamMasa":
-                        x = self.detector.backbone.forward_base_multi_level(single_img)
-                    else:
-                        x = self.detector.backbone(single_img)
-                elif self.use_masa_backbone:
-                    x = self.backbone.forward(single_img)
-                x_m = self.masa_adapter(x)
+                x_m = self.extract_masa_feats(single_img)
             else:
                 if self.unified_backbone:
                     if hasattr(self.detector.backbone, "with_text_model"):
@@ -433,20 +490,8 @@ class MASA(BaseMOTModel):
         key_imgs = inputs[batch_inds, key_frame_inds].contiguous()
         ref_imgs = inputs[batch_inds, ref_frame_inds].contiguous()
 
-        if self.use_masa_backbone:
-            x = self.backbone.forward(key_imgs)
-            ref_x = self.backbone.forward(ref_imgs)
-
-        else:
-            if hasattr(self.detector.backbone, "with_text_model"):
-                x = self.detector.backbone.forward_image(key_imgs)
-                ref_x = self.detector.backbone.forward_image(ref_imgs)
-            elif self.detector.__class__.__name__ == "SamMasa":
-                x = self.detector.backbone.forward_base_multi_level(key_imgs)
-                ref_x = self.detector.backbone.forward_base_multi_level(ref_imgs)
-            else:
-                x = self.detector.backbone.forward(key_imgs)
-                ref_x = self.detector.backbone.forward(ref_imgs)
+        x = self.extract_backbone_feats(key_imgs)
+        ref_x = self.extract_backbone_feats(ref_imgs)
 
         x_m = self.masa_adapter(x)
         ref_x_m = self.masa_adapter(ref_x)
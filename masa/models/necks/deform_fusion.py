@@ -3,13 +3,16 @@ Author: Siyuan Li
 Licensed: Apache-2.0 License
 """
 
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch.utils.checkpoint as cp
 from einops import rearrange
 from mmcv.cnn import build_norm_layer
 from mmcv.ops.modulated_deform_conv import ModulatedDeformConv2d
 from mmdet.registry import MODELS
 from mmengine.model import BaseModule, constant_init, normal_init
+from mmengine.runner.amp import autocast
 
 # Reference:
 # https://github.com/microsoft/DynamicHead
@@ -40,6 +43,9 @@ class DyDCNv2(nn.Module):
             Default: 1.
         norm_cfg (dict, optional): Config dict for normalization layer.
             Default: dict(type='GN', num_groups=16, requires_grad=True).
+        fp32_dcn (bool): Run the deformable convolution and the norm in fp32
+            under autocast. The DCN kernels of mmcv have no bf16 version.
+            Default: False.
     """
 
     def __init__(
@@ -48,8 +54,10 @@ class DyDCNv2(nn.Module):
         out_channels,
         stride=1,
         norm_cfg=dict(type="GN", num_groups=16, requires_grad=True),
+        fp32_dcn=False,
     ):
         super().__init__()
+        self.fp32_dcn = fp32_dcn
         self.with_norm = norm_cfg is not None
         bias = not self.with_norm
         self.conv = ModulatedDeformConv2d(
@@ -60,6 +68,12 @@ class DyDCNv2(nn.Module):
 
     def forward(self, x, offset, mask):
         """Forward function."""
+        if self.fp32_dcn:
+            with autocast(enabled=False):
+                return self._forward(x.float(), offset.float(), mask.float())
+        return self._forward(x, offset, mask)
+
+    def _forward(self, x, offset, mask):
         x = self.conv(x.contiguous(), offset, mask)
         if self.with_norm:
             x = self.norm(x)
@@ -78,10 +92,17 @@ class DyHeadBlock(nn.Module):
         out_channels (int): Number of output channels.
         zero_init_offset (bool, optional): Whether to use zero init for
             `spatial_conv_offset`. Default: True.
+        fp32_dcn (bool): Whether to run the DCNv2 layers in fp32 under
+            autocast. Default: False.
     """
 
     def __init__(
-        self, in_channels, out_channels, zero_init_offset=True, fix_upsample=False,
+        self,
+        in_channels,
+        out_channels,
+        zero_init_offset=True,
+        fix_upsample=False,
+        fp32_dcn=False,
     ):
         super().__init__()
         self.zero_init_offset = zero_init_offset
@@ -93,9 +114,11 @@ class DyHeadBlock(nn.Module):
         self.spatial_conv_offset = nn.Conv2d(
             in_channels, self.offset_and_mask_dim, 3, padding=1
         )
-        self.spatial_conv_high = DyDCNv2(in_channels, out_channels)
-        self.spatial_conv_mid = DyDCNv2(in_channels, out_channels)
-        self.spatial_conv_low = DyDCNv2(in_channels, out_channels, stride=2)
+        self.spatial_conv_high = DyDCNv2(in_channels, out_channels, fp32_dcn=fp32_dcn)
+        self.spatial_conv_mid = DyDCNv2(in_channels, out_channels, fp32_dcn=fp32_dcn)
+        self.spatial_conv_low = DyDCNv2(
+            in_channels, out_channels, stride=2, fp32_dcn=fp32_dcn
+        )
 
         self._init_weights()
 
@@ -149,9 +172,31 @@ class DyHeadBlock(nn.Module):
 
         return outs
 
+
+def _block_forward(block, *feats):
+    return block(list(feats))
+
+
 @MODELS.register_module()
 class DeformFusion(BaseModule):
-    """Deformable Fusion Module for MASA."""
+    """Deformable Fusion Module for MASA.
+
+    Args:
+        in_channels (int): Number of input channels.
+        out_channels (int): Number of output channels.
+        num_blocks (int): Number of DyHead blocks. Default: 6.
+        zero_init_offset (bool): Whether to use zero init for the offsets.
+            Default: True.
+        fix_upsample (bool): Whether to upsample before the high-level DCN.
+            Default: False.
+        with_cp (bool): Use checkpoint or not. Using checkpoint will save
+            some memory while slowing down the training speed: the
+            activations of every DyHead block are recomputed in the backward
+            pass instead of being stored. Default: False.
+        fp32_dcn (bool): Whether to run the DCNv2 layers in fp32 under
+            autocast, required for bf16 training. Default: False.
+        init_cfg (dict, optional): Must be None.
+    """
 
     def __init__(
         self,
@@ -160,6 +205,8 @@ class DeformFusion(BaseModule):
         num_blocks=6,
         zero_init_offset=True,
         fix_upsample=False,
+        with_cp=False,
+        fp32_dcn=False,
         init_cfg=None,
     ):
         assert init_cfg is None, (
@@ -171,6 +218,7 @@ class DeformFusion(BaseModule):
         self.out_channels = out_channels
         self.num_blocks = num_blocks
         self.zero_init_offset = zero_init_offset
+        self.with_cp = with_cp
 
         dyhead_blocks = []
         for i in range(num_blocks):
@@ -181,6 +229,7 @@ class DeformFusion(BaseModule):
                     self.out_channels,
                     zero_init_offset=zero_init_offset,
                     fix_upsample=fix_upsample,
+                    fp32_dcn=fp32_dcn,
                 )
             )
         self.dyhead_blocks = nn.Sequential(*dyhead_blocks)
@@ -188,5 +237,9 @@ class DeformFusion(BaseModule):
     def forward(self, inputs):
         """Forward function."""
         assert isinstance(inputs, (tuple, list))
-        outs = self.dyhead_blocks(inputs)
+        if not (self.with_cp and torch.is_grad_enabled()):
+            return tuple(self.dyhead_blocks(inputs))
+        outs = list(inputs)
+        for block in self.dyhead_blocks:
+            outs = cp.checkpoint(_block_forward, block, *outs, use_reentrant=False)
         return tuple(outs)
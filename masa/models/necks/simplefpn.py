@@ -1,5 +1,7 @@
+import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch.utils.checkpoint as cp
 from mmcv.cnn import ConvModule
 from mmdet.registry import MODELS
 from mmengine.model import BaseModule
@@ -50,6 +52,10 @@ class SimpleFPN(BaseModule):
             Default: None.
         upsample_cfg (dict): Config dict for interpolate layer.
             Default: `dict(mode='nearest')`
+        with_cp (bool): Use checkpoint or not. Using checkpoint will save
+            some memory while slowing down the training speed: the scale
+            branches and the lateral and output convs recompute their
+            activations in the backward pass. Default: False.
         init_cfg (dict or list[dict], optional): Initialization config dict.
 
     Example:
@@ -83,6 +89,7 @@ class SimpleFPN(BaseModule):
         act_cfg=None,
         use_residual=True,
         upsample_cfg=dict(mode="nearest"),
+        with_cp=False,
         init_cfg=dict(type="Xavier", layer="Conv2d", distribution="uniform"),
     ):
         super(SimpleFPN, self).__init__(init_cfg)
@@ -96,6 +103,7 @@ class SimpleFPN(BaseModule):
         self.fp16_enabled = False
         self.upsample_cfg = upsample_cfg.copy()
         self.use_residual = use_residual
+        self.with_cp = with_cp
 
         if end_level == -1:
             self.backbone_end_level = self.num_ins
@@ -138,9 +146,6 @@ class SimpleFPN(BaseModule):
                 act_cfg=act_cfg,
                 inplace=False,
             )
-            # l_conv = checkpoint_wrapper(l_conv)
-            # fpn_conv = checkpoint_wrapper(fpn_conv)
-
             self.lateral_convs.append(l_conv)
             self.fpn_convs.append(fpn_conv)
 
@@ -184,6 +189,13 @@ class SimpleFPN(BaseModule):
         self.fpn3 = nn.Identity()
         self.fpn4 = nn.MaxPool2d(kernel_size=2, stride=2)
 
+    def _run(self, module, x):
+        """Run ``module``, recomputing its activations in the backward pass
+        if ``with_cp`` is set."""
+        if self.with_cp and torch.is_grad_enabled():
+            return cp.checkpoint(module, x, use_reentrant=False)
+        return module(x)
+
     def forward(self, inputs):
         """Forward function."""
         features = []
@@ -191,16 +203,16 @@ class SimpleFPN(BaseModule):
         if isinstance(inputs, list):
             assert len(inputs) == len(ops)
             for i in range(len(ops)):
-                features.append(ops[i](inputs[i]))
+                features.append(self._run(ops[i], inputs[i]))
         else:
             for i in range(len(ops)):
-                features.append(ops[i](inputs))
+                features.append(self._run(ops[i], inputs))
 
         assert len(features) == len(self.in_channels)
 
         # build laterals
         laterals = [
-            lateral_conv(features[i + self.start_level])
+            self._run(lateral_conv, features[i + self.start_level])
             for i, lateral_conv in enumerate(self.lateral_convs)
         ]
 
@@ -223,7 +235,10 @@ class SimpleFPN(BaseModule):
 
         # build outputs
         # part 1: from original levels
-        outs = [self.fpn_convs[i](laterals[i]) for i in range(used_backbone_levels)]
+        outs = [
+            self._run(self.fpn_convs[i], laterals[i])
+            for i in range(used_backbone_levels)
+        ]
         # part 2: add extra levels
         if self.num_outs > len(outs):
             # use max pool to get more levels on top of outputs
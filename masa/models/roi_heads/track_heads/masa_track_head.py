@@ -1,16 +1,75 @@
 from typing import List, Optional
 
+import torch
 from mmdet.registry import MODELS, TASK_UTILS
 from mmdet.structures import TrackSampleList
 from mmdet.structures.bbox import bbox2roi
 from mmdet.utils import InstanceList
 from mmengine.model import BaseModule
+from mmengine.runner.amp import autocast
 from torch import Tensor
 
 
+def match_instance_ids(
+    ins_ids_list: List[Tensor], ref_ins_ids_list: List[Tensor]
+) -> List[Tensor]:
+    """Match the instance ids of key and reference frames.
+
+    For every key instance, finds the index of the reference instance of the
+    same image with the same (positive) id, the first one if the id repeats,
+    or -1. All images are matched at once: the ids are offset per image so
+    that they are unique across the batch, the reference ids are sorted once
+    and every key id is looked up with a binary search.
+
+    Args:
+        ins_ids_list (list[Tensor]): Instance ids of the key frames.
+        ref_ins_ids_list (list[Tensor]): Instance ids of the reference frames.
+
+    Returns:
+        list[Tensor]: The index of the matching reference instance (int64) of
+        every key instance, per image.
+    """
+    num_keys = [len(ids) for ids in ins_ids_list]
+    num_refs = [len(ids) for ids in ref_ins_ids_list]
+    key_ids = torch.cat(ins_ids_list).long()
+    ref_ids = torch.cat(ref_ins_ids_list).long().to(key_ids.device)
+    if key_ids.numel() == 0 or ref_ids.numel() == 0:
+        return list(torch.full_like(key_ids, -1).split(num_keys))
+
+    device = key_ids.device
+    key_counts = torch.tensor(num_keys, device=device)
+    ref_counts = torch.tensor(num_refs, device=device)
+    img_inds = torch.arange(len(num_keys), device=device)
+    key_imgs = img_inds.repeat_interleave(key_counts, output_size=len(key_ids))
+    ref_imgs = img_inds.repeat_interleave(ref_counts, output_size=len(ref_ids))
+    min_id = torch.minimum(key_ids.min(), ref_ids.min())
+    span = torch.maximum(key_ids.max(), ref_ids.max()) - min_id + 1
+    key_codes = key_imgs * span + key_ids - min_id
+    ref_codes = ref_imgs * span + ref_ids - min_id
+
+    # A stable sort keeps repeated ids in order, so the binary search finds
+    # the first of them, like ``list.index``.
+    sorted_codes, order = torch.sort(ref_codes, stable=True)
+    pos = torch.searchsorted(sorted_codes, key_codes)
+    pos.clamp_(max=len(ref_ids) - 1)
+    found = (sorted_codes[pos] == key_codes) & (key_ids > 0)
+    ref_starts = ref_counts.cumsum(0) - ref_counts
+    match_indices = torch.where(
+        found, order[pos] - ref_starts[key_imgs], key_ids.new_tensor(-1)
+    )
+    return list(match_indices.split(num_keys))
+
+
 @MODELS.register_module()
 class MasaTrackHead(BaseModule):
-    """The masa track head. This takes the features from masa adapter to produce the final """
+    """The masa track head. This takes the features from masa adapter to produce the final
+
+    Args:
+        fp32_embed (bool): Extract the RoI features and run the embed head and
+            its losses in fp32 under autocast. The similarities of the
+            (unnormalized) embeddings overflow fp16 and the RoIAlign kernels
+            of mmcv have no bf16 version. Defaults to False.
+    """
 
     def __init__(
         self,
@@ -20,11 +79,13 @@ class MasaTrackHead(BaseModule):
         train_cfg: Optional[dict] = None,
         test_cfg: Optional[dict] = None,
         init_cfg: Optional[dict] = None,
+        fp32_embed: bool = False,
         **kwargs
     ):
         super().__init__(init_cfg=init_cfg)
         self.train_cfg = train_cfg
         self.test_cfg = test_cfg
+        self.fp32_embed = fp32_embed
 
         if embed_head is not None:
             self.init_embed_head(roi_extractor, embed_head)
@@ -105,7 +166,7 @@ class MasaTrackHead(BaseModule):
         batch_gt_instances = []
         ref_batch_gt_instances = []
         batch_gt_instances_ignore = []
-        gt_match_indices_list = []
+        ins_ids_list, ref_ins_ids_list = [], []
         for track_data_sample in data_samples:
             key_data_sample = track_data_sample.get_key_frames()[0]
             ref_data_sample = track_data_sample.get_ref_frames()[0]
@@ -115,16 +176,12 @@ class MasaTrackHead(BaseModule):
                 batch_gt_instances_ignore.append(key_data_sample.ignored_instances)
             else:
                 batch_gt_instances_ignore.append(None)
-            # get gt_match_indices
-            ins_ids = key_data_sample.gt_instances.instances_ids.tolist()
-            ref_ins_ids = ref_data_sample.gt_instances.instances_ids.tolist()
-            match_indices = Tensor(
-                [
-                    ref_ins_ids.index(i) if (i in ref_ins_ids and i > 0) else -1
-                    for i in ins_ids
-                ]
-            ).to(key_feats[0].device)
-            gt_match_indices_list.append(match_indices)
+            ins_ids_list.append(
+                key_data_sample.gt_instances.instances_ids.to(key_feats[0].device)
+            )
+            ref_ins_ids_list.append(ref_data_sample.gt_instances.instances_ids)
+        # get gt_match_indices
+        gt_match_indices_list = match_instance_ids(ins_ids_list, ref_ins_ids_list)
 
         key_sampling_results, ref_sampling_results = [], []
         for i in range(num_imgs):
@@ -157,12 +214,39 @@ class MasaTrackHead(BaseModule):
             )
             ref_sampling_results.append(ref_sampling_result)
 
+        if self.fp32_embed:
+            with autocast(enabled=False):
+                return self._embed_loss(
+                    [feat.float() for feat in key_feats],
+                    [feat.float() for feat in ref_feats],
+                    key_sampling_results,
+                    ref_sampling_results,
+                    gt_match_indices_list,
+                )
+        return self._embed_loss(
+            key_feats,
+            ref_feats,
+            key_sampling_results,
+            ref_sampling_results,
+            gt_match_indices_list,
+        )
+
+    def _embed_loss(
+        self,
+        key_feats: List[Tensor],
+        ref_feats: List[Tensor],
+        key_sampling_results: List,
+        ref_sampling_results: List,
+        gt_match_indices_list: List[Tensor],
+    ) -> dict:
+        """Extract the RoI features of the sampled boxes and compute the
+        losses of the embed head."""
         key_bboxes = [res.pos_bboxes for res in key_sampling_results]
         key_roi_feats = self.extract_roi_feats(key_feats, key_bboxes)
         ref_bboxes = [res.bboxes for res in ref_sampling_results]
         ref_roi_feats = self.extract_roi_feats(ref_feats, ref_bboxes)
 
-        loss_track = self.embed_head.loss(
+        return self.embed_head.loss(
             key_roi_feats,
             ref_roi_feats,
             key_sampling_results,
@@ -170,8 +254,6 @@ class MasaTrackHead(BaseModule):
             gt_match_indices_list,
         )
 
-        return loss_track
-
     def predict(self, feats: List[Tensor], rescaled_bboxes: List[Tensor]) -> Tensor:
         """Perform forward propagation of the tracking head and predict
         tracking results on the features of the upstream network.
@@ -0,0 +1,128 @@
+"""Lazy registration of masa modules.
+
+Importing ``masa`` no longer imports (and registers) every model, dataset
+and transform. The modules below are imported on demand: either for the
+``type`` names that appear in a config (:func:`register_modules`) or all at
+once (:func:`register_all_modules`, used by the training/testing tools).
+"""
+import importlib
+from typing import Any, Dict, Iterable, List, Set
+
+# Registered type name -> module that registers it.
+MODULE_OF_TYPE: Dict[str, str] = {
+    # models
+    "MASA": "masa.models.mot.masa",
+    "GroundingDINO": "masa.models.detectors.grounding_dino",
+    "GroundingDINOMasa": "masa.models.detectors.gdino_masa",
+    "DeticMasa": "masa.models.detectors.detic_masa",
+    "SamMasa": "masa.models.detectors.sam_masa",
+    "UnbiasedContrastLoss": "masa.models.losses.unbiased_contrastive_loss",
+    "SimpleFPN": "masa.models.necks.simplefpn",
+    "DeformFusion": "masa.models.necks.deform_fusion",
+    "MasaTrackHead": "masa.models.roi_heads.track_heads.masa_track_head",
+    "MasaBDDTracker": "masa.models.tracker.masa_bdd_tracker",
+    "MasaTaoTracker": "masa.models.tracker.masa_tao_tracker",
+    "MasaTrackDataPreprocessor": "masa.models.data_preprocessors.track_data_preprocessor",
+    "BatchSeqRandomAffine": "masa.models.data_preprocessors.batch_transforms",
+    "BatchSeqMixUp": "masa.models.data_preprocessors.batch_transforms",
+    "BatchYOLOXHSVRandomAug": "masa.models.data_preprocessors.batch_transforms",
+    "BatchRandomResize": "masa.models.data_preprocessors.batch_transforms",
+    "BatchRandomCrop": "masa.models.data_preprocessors.batch_transforms",
+    "BatchRandomFlip": "masa.models.data_preprocessors.batch_transforms",
+    "BatchPad": "masa.models.data_preprocessors.batch_transforms",
+    "BatchFilterMatchAnnotations": "masa.models.data_preprocessors.batch_transforms",
+    "Sam": "masa.models.sam.sam",
+    "ImageEncoderViT": "masa.models.sam.image_encoder",
+    "MaskDecoder": "masa.models.sam.mask_decoder",
+    "PromptEncoder": "masa.models.sam.prompt_encoder",
+    # datasets
+    "MASADataset": "masa.datasets.masa_dataset",
+    "BDDVideoDataset": "masa.datasets.bdd_masa_dataset",
+    "Taov05Dataset": "masa.datasets.tao_masa_dataset",
+    "Taov1Dataset": "masa.datasets.tao_masa_dataset",
+    "RandomSampleConcatDataset": "masa.datasets.rsconcat_dataset",
+    "RandomSampleJointVideoConcatDataset": "masa.datasets.rsconcat_dataset",
+    "SeqMultiImageMixDataset": "masa.datasets.dataset_wrappers",
+    "SeqRandomMultiImageVideoMixDataset": "masa.datasets.dataset_wrappers",
+    "HybridVideoImgSampler": "masa.datasets.samplers.hybrid_video_img_sampler",
+    "yolow_collate": "masa.datasets.utils",
+    "BDDTETAMetric": "masa.datasets.evaluation.bdd_teta_metric",
+    "TaoTETAMetric": "masa.datasets.evaluation.tao_teta_metric",
+    # transforms
+    "PackMatchInputs": "masa.datasets.pipelines.formatting",
+    "MixUniformRefFrameSample": "masa.datasets.pipelines.framesample",
+    "LoadMatchAnnotations": "masa.datasets.pipelines.loading",
+    "LoadImageFromCache": "masa.datasets.pipelines.loading",
+    "MasaTransformBroadcaster": "masa.datasets.pipelines.wrappers",
+    "SeqMosaic": "masa.datasets.pipelines.transforms",
+    "SeqMixUp": "masa.datasets.pipelines.transforms",
+    "SeqCopyPaste": "masa.datasets.pipelines.transforms",
+    "SeqRandomAffine": "masa.datasets.pipelines.transforms",
+    "FilterMatchAnnotations": "masa.datasets.pipelines.transforms",
+    # visualization
+    "MasaTrackLocalVisualizer": "masa.visualization.visualizer",
+}
+
+
+def _collect_types(cfg: Any, types: Set[str]) -> None:
+    if isinstance(cfg, dict):
+        for key, value in cfg.items():
+            if key == "type" and isinstance(value, str):
+                # Strip an optional scope prefix such as ``mmdet.``.
+                types.add(value.rsplit(".", 1)[-1])
+            else:
+                _collect_types(value, types)
+    elif isinstance(cfg, (list, tuple)):
+        for item in cfg:
+            _collect_types(item, types)
+
+
+def register_modules(cfg: Any) -> List[str]:
+    """Import the masa modules needed by the ``type`` names in ``cfg``.
+
+    Args:
+        cfg (dict | list | :obj:`mmengine.Config`): A (part of a) config.
+
+    Returns:
+        list[str]: The modules that were imported.
+    """
+    types: Set[str] = set()
+    _collect_types(cfg, types)
+    modules = sorted({MODULE_OF_TYPE[t] for t in types if t in MODULE_OF_TYPE})
+    for module in modules:
+        importlib.import_module(module)
+    return modules
+
+
+def register_all_modules() -> None:
+    """Import every masa module so that all of them are registered."""
+    for module in sorted(set(MODULE_OF_TYPE.values())):
+        importlib.import_module(module)
+
+
+def lazy_exports(package: str, exports: Dict[str, str], namespace: Dict[str, Any]):
+    """Build a module-level ``__getattr__`` (PEP 562) for a package.
+
+    ``exports`` maps an exported name to the submodule (relative to
+    ``package``) that defines it. The submodule is imported on first access
+    and the value is cached in ``namespace``.
+    """
+
+    def __getattr__(name: str) -> Any:
+        module = exports.get(name)
+        if module is None:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        value = getattr(importlib.import_module(module, package), name)
+        namespace[name] = value
+        return value
+
+    return __getattr__
+
+
+def lazy_dir(namespace: Dict[str, Any], exports: Iterable[str]):
+    """Build a module-level ``__dir__`` that lists the lazy exports."""
+
+    def __dir__() -> List[str]:
+        return sorted(set(namespace) | set(exports))
+
+    return __dir__
@@ -1,3 +1,8 @@
-from .visualizer import MasaTrackLocalVisualizer
+from ..registry import lazy_dir, lazy_exports
+
+_EXPORTS = {"MasaTrackLocalVisualizer": ".visualizer"}
 
 __all__ = ["MasaTrackLocalVisualizer"]
+
+__getattr__ = lazy_exports(__name__, _EXPORTS, globals())
+__dir__ = lazy_dir(globals(), __all__)
@@ -0,0 +1,105 @@
+"""Benchmark the backbone feature cache of MASA on the CPU.
+
+Runs a small ResNet over a fixed set of views for a few epochs, once with
+the backbone every time and once through a :class:`FeatureCache` (misses run
+the backbone and fill the cache, hits load the stored features), and reports
+the time per batch of both and the largest difference of the features.
+
+Example:
+    python tools/benchmark_feature_cache.py --num-views 64 --epochs 3
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import torch
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from mmdet.registry import MODELS  # noqa: E402
+from mmdet.utils import register_all_modules  # noqa: E402
+
+from masa.models.mot.feature_cache import FeatureCache  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the backbone feature cache')
+    parser.add_argument('--num-views', type=int, default=64)
+    parser.add_argument('--batch-size', type=int, default=4)
+    parser.add_argument('--img-size', type=int, default=512)
+    parser.add_argument('--epochs', type=int, default=3)
+    parser.add_argument('--depth', type=int, default=18)
+    parser.add_argument('--base-channels', type=int, default=16)
+    parser.add_argument('--dtype', default='float16')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    register_all_modules()
+    torch.manual_seed(0)
+    backbone = MODELS.build(
+        dict(
+            type='ResNet',
+            depth=args.depth,
+            base_channels=args.base_channels,
+            out_indices=(1, 2, 3),
+            norm_cfg=dict(type='BN', requires_grad=False),
+            norm_eval=True))
+    backbone.eval()
+    for param in backbone.parameters():
+        param.requires_grad = False
+
+    imgs = torch.randn(args.num_views, 3, args.img_size, args.img_size)
+    batches = [
+        list(range(i, min(i + args.batch_size, args.num_views)))
+        for i in range(0, args.num_views, args.batch_size)
+    ]
+
+    def run_backbone(inds):
+        with torch.no_grad():
+            return backbone(imgs[inds])
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = FeatureCache(cache_dir, dtype=args.dtype)
+
+        def run_cached(inds):
+            keys = [cache.key(imgs[i]) for i in inds]
+            feats = [cache.get(key) for key in keys]
+            missing = [j for j, feat in enumerate(feats) if feat is None]
+            if missing:
+                new_feats = run_backbone([inds[j] for j in missing])
+                for k, j in enumerate(missing):
+                    feats[j] = [level[k] for level in new_feats]
+                    cache.put(keys[j], feats[j])
+            return tuple(
+                torch.stack([feat[level].float() for feat in feats])
+                for level in range(len(feats[0])))
+
+        for epoch in range(args.epochs):
+            times = {}
+            max_diff = 0.0
+            for name, fn in (('backbone', run_backbone), ('cached',
+                                                          run_cached)):
+                start = time.perf_counter()
+                outputs = [fn(inds) for inds in batches]
+                times[name] = (time.perf_counter() - start) / len(batches)
+                if name == 'backbone':
+                    expected = outputs
+            for out, ref in zip(outputs, expected):
+                for level, ref_level in zip(out, ref):
+                    max_diff = max(max_diff,
+                                   (level - ref_level).abs().max().item())
+            print(f'epoch {epoch}: backbone {times["backbone"] * 1000:.1f} '
+                  f'ms/batch, cached {times["cached"] * 1000:.1f} ms/batch '
+                  f'(x{times["backbone"] / times["cached"]:.1f}), '
+                  f'max |diff| {max_diff:.2e}')
+        print(cache)
+
+
+if __name__ == '__main__':
+    main()
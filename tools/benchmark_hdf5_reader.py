@@ -0,0 +1,134 @@
+"""Benchmark annotation reads from an SA-1B style HDF5 file.
+
+Writes a synthetic HDF5 file with one pickled annotation list per image
+(``sa_<id>.pkl`` -> list of dicts with RLE masks, like MASADataset expects)
+and compares:
+
+    reopen       open the file for every record (the former
+                 ``MASADataset.read_dicts_from_hdf5``)
+    h5py         one persistent h5py handle, one dataset lookup per record
+    offsets      HDF5RecordReader, one ``os.pread`` per record
+    offsets-bulk HDF5RecordReader.load_many in batches
+
+Example:
+    python tools/benchmark_hdf5_reader.py --num-records 20000 --batch-size 64
+"""
+import argparse
+import os
+import os.path as osp
+import pickle
+import random
+import sys
+import tempfile
+import time
+
+import h5py
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from masa.datasets.hdf5_reader import HDF5RecordReader  # noqa: E402
+
+
+def make_record(rng, num_anns):
+    return [
+        dict(
+            id=i,
+            bbox=rng.uniform(0, 1000, 4).round(1).tolist(),
+            area=float(rng.uniform(10, 1e5)),
+            segmentation=dict(
+                size=[1500, 2250],
+                counts=rng.bytes(int(rng.integers(40, 400))).hex()),
+            predicted_iou=float(rng.uniform()),
+            stability_score=float(rng.uniform()),
+        ) for i in range(num_anns)
+    ]
+
+
+def write_file(path, num_records, anns_per_record, seed=0):
+    rng = np.random.default_rng(seed)
+    with h5py.File(path, 'w') as hf:
+        for i in range(num_records):
+            record = make_record(rng, int(rng.integers(1, anns_per_record * 2)))
+            hf.create_dataset(f'sa_{i}.pkl', data=np.void(pickle.dumps(record)))
+
+
+def read_reopen(path, key):
+    with h5py.File(path, 'r') as hf:
+        return pickle.loads(hf[key][()])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark HDF5 annotation reads')
+    parser.add_argument('--num-records', type=int, default=20000)
+    parser.add_argument('--anns-per-record', type=int, default=30)
+    parser.add_argument(
+        '--num-reads', type=int, default=5000, help='Random records read')
+    parser.add_argument('--batch-size', type=int, default=64)
+    parser.add_argument(
+        '--file', default=None, help='Reuse/keep the HDF5 file at this path')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    tmp_dir = None
+    path = args.file
+    if path is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        path = osp.join(tmp_dir.name, 'annotations.h5')
+    if not osp.exists(path):
+        elapsed, _ = timed(lambda: write_file(path, args.num_records, args.
+                                              anns_per_record, args.seed))
+        print(f'wrote {args.num_records} records to {path} '
+              f'({osp.getsize(path) / 2**20:.1f} MB) in {elapsed:.1f} s')
+
+    with h5py.File(path, 'r') as hf:
+        all_keys = list(hf.keys())
+    random.seed(args.seed)
+    keys = [random.choice(all_keys) for _ in range(args.num_reads)]
+
+    index_path = path + '.offsets.pkl'
+    if osp.exists(index_path):
+        os.remove(index_path)
+    build_time, _ = timed(lambda: HDF5RecordReader(path).offsets)
+    cached_time, _ = timed(lambda: HDF5RecordReader(path).offsets)
+    print(f'offset index: build {build_time * 1000:.0f} ms, '
+          f'cached open {cached_time * 1000:.0f} ms')
+
+    results = {}
+    results['reopen'] = timed(lambda: [read_reopen(path, k) for k in keys])
+    with h5py.File(path, 'r') as hf:
+        results['h5py'] = timed(
+            lambda: [pickle.loads(hf[k][()]) for k in keys])
+    reader = HDF5RecordReader(path)
+    reader.offsets
+    results['offsets'] = timed(lambda: [reader.load(k) for k in keys])
+    results['offsets-bulk'] = timed(lambda: [
+        record for i in range(0, len(keys), args.batch_size)
+        for record in reader.load_many(keys[i:i + args.batch_size])
+    ])
+    reader.close()
+
+    expected = results['reopen'][1]
+    baseline = results['reopen'][0]
+    for name, (elapsed, records) in results.items():
+        assert records == expected, f'{name} returned different records'
+        print(f'{name:>13}: {elapsed / len(keys) * 1e6:8.1f} us/record '
+              f'(x{baseline / elapsed:.1f})')
+
+    if tmp_dir is not None:
+        tmp_dir.cleanup()
+
+
+if __name__ == '__main__':
+    main()
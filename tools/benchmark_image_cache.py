@@ -0,0 +1,116 @@
+"""Benchmark image loading from JPEG files and from an ImageCache.
+
+Writes synthetic SA-1B sized JPEGs (2250x1500 by default), caches them
+shrunk to ``--max-size`` and times random reads:
+
+    jpeg         decode the JPEG (what LoadImageFromFile does)
+    jpeg+shrink  decode and shrink to --max-size (the cache's content)
+    cache        ImageCache.get (a copy out of the memory-mapped file)
+
+Example:
+    python tools/benchmark_image_cache.py --num-images 200 --num-reads 1000
+"""
+import argparse
+import os
+import os.path as osp
+import random
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from masa.datasets.image_cache import ImageCache, load_resized  # noqa: E402
+
+
+def write_images(img_dir, num_images, width, height, seed=0):
+    rng = np.random.default_rng(seed)
+    keys = []
+    for i in range(num_images):
+        # Smooth noise compresses like a photo rather than like pure noise.
+        small = rng.integers(0, 256, (height // 16, width // 16, 3))
+        img = cv2.resize(
+            small.astype(np.uint8), (width, height),
+            interpolation=cv2.INTER_CUBIC)
+        img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+        key = f'sa_{i}.jpg'
+        cv2.imwrite(osp.join(img_dir, key), img,
+                    [cv2.IMWRITE_JPEG_QUALITY, 90])
+        keys.append(key)
+    return keys
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark JPEG decoding against the image cache')
+    parser.add_argument('--num-images', type=int, default=200)
+    parser.add_argument('--num-reads', type=int, default=1000)
+    parser.add_argument('--width', type=int, default=2250)
+    parser.add_argument('--height', type=int, default=1500)
+    parser.add_argument('--max-size', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    cv2.setNumThreads(1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        img_dir = osp.join(tmp_dir, 'images')
+        cache_dir = osp.join(tmp_dir, 'cache')
+        os.makedirs(img_dir)
+        elapsed, keys = timed(lambda: write_images(
+            img_dir, args.num_images, args.width, args.height, args.seed))
+        jpeg_size = sum(
+            osp.getsize(osp.join(img_dir, key)) for key in keys)
+        print(f'wrote {len(keys)} JPEGs ({jpeg_size / 2**20:.0f} MB) '
+              f'in {elapsed:.1f} s')
+
+        items = [(key, osp.join(img_dir, key)) for key in keys]
+        elapsed, cache = timed(
+            lambda: ImageCache.build(cache_dir, items, args.max_size))
+        cache_size = osp.getsize(osp.join(cache_dir, ImageCache.DATA_FILE))
+        print(f'built the cache ({cache_size / 2**20:.0f} MB) '
+              f'in {elapsed:.1f} s')
+
+        random.seed(args.seed)
+        reads = [random.choice(keys) for _ in range(args.num_reads)]
+        paths = {key: osp.join(img_dir, key) for key in keys}
+        cache = ImageCache(cache_dir)
+        cache.get(reads[0])
+
+        for key in reads[:20]:
+            assert np.array_equal(
+                cache.get(key)[0],
+                load_resized(paths[key], args.max_size)[0]), key
+
+        # Images are dropped right away: a few hundred decoded SA-1B images
+        # do not fit in memory.
+        results = {}
+        results['jpeg'] = timed(lambda: [
+            cv2.imread(paths[k], cv2.IMREAD_COLOR).shape for k in reads
+        ])
+        results['jpeg+shrink'] = timed(lambda: [
+            load_resized(paths[k], args.max_size)[0].shape for k in reads
+        ])
+        results['cache'] = timed(lambda: [cache.get(k)[0].shape for k in reads])
+
+        baseline = results['jpeg'][0]
+        for name, (elapsed, _) in results.items():
+            print(f'{name:>12}: {elapsed / len(reads) * 1000:7.2f} ms/image, '
+                  f'{len(reads) / elapsed:8.1f} img/s '
+                  f'(x{baseline / elapsed:.1f})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Benchmark and check the matching of instance ids in MasaTrackHead.loss.
+
+Builds a batch of key/reference frames with random, partly shared instance
+ids (including repeated and non-positive ids), matches them with the former
+per-instance ``list.index`` lookup and with the batched
+:func:`match_instance_ids`, checks that the match indices and the track
+targets of ``QuasiDenseEmbedHead.get_targets`` are identical, and reports the
+time of both for several instance counts.
+
+Example:
+    python tools/benchmark_track_targets.py --num-instances 10 100 500 1000
+"""
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import torch
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from mmdet.models.tracking_heads import QuasiDenseEmbedHead  # noqa: E402
+
+from masa.models.roi_heads.track_heads.masa_track_head import \
+    match_instance_ids  # noqa: E402
+
+
+def match_instance_ids_loop(ins_ids_list, ref_ins_ids_list):
+    """The former implementation, one ``list.index`` per instance."""
+    match_indices_list = []
+    for ins_ids, ref_ins_ids in zip(ins_ids_list, ref_ins_ids_list):
+        ins_ids = ins_ids.tolist()
+        ref_ins_ids = ref_ins_ids.tolist()
+        match_indices_list.append(
+            torch.Tensor([
+                ref_ins_ids.index(i) if (i in ref_ins_ids and i > 0) else -1
+                for i in ins_ids
+            ]))
+    return match_indices_list
+
+
+def make_batch(batch_size, num_instances, generator):
+    ins_ids_list, ref_ins_ids_list, key_results, ref_results = [], [], [], []
+    for _ in range(batch_size):
+        num_key = int(torch.randint(0, num_instances + 1, (1, ),
+                                    generator=generator))
+        num_ref = int(torch.randint(0, num_instances + 1, (1, ),
+                                    generator=generator))
+        # Ids drawn from a range a bit larger than the instance count, so
+        # that some ids repeat, some are missing and some are <= 0.
+        high = num_instances * 2 + 2
+        ins_ids = torch.randint(-1, high, (num_key, ), generator=generator)
+        ref_ins_ids = torch.randint(-1, high, (num_ref, ), generator=generator)
+        ins_ids_list.append(ins_ids)
+        ref_ins_ids_list.append(ref_ins_ids)
+
+        # Sampling results: positives assigned to random gts, plus negatives
+        # on the reference side.
+        num_pos = int(torch.randint(0, 4 * num_key + 1, (1, ),
+                                    generator=generator)) if num_key else 0
+        num_ref_pos = int(torch.randint(0, 4 * num_ref + 1, (1, ),
+                                        generator=generator)) if num_ref else 0
+        key_results.append(
+            SimpleNamespace(
+                pos_bboxes=torch.zeros(num_pos, 4),
+                pos_assigned_gt_inds=torch.randint(
+                    0, max(num_key, 1), (num_pos, ), generator=generator)))
+        ref_results.append(
+            SimpleNamespace(
+                bboxes=torch.zeros(4 * num_ref_pos, 4),
+                pos_assigned_gt_inds=torch.randint(
+                    0, max(num_ref, 1), (num_ref_pos, ),
+                    generator=generator)))
+    return ins_ids_list, ref_ins_ids_list, key_results, ref_results
+
+
+def timeit(fn, *args, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(*args)
+    return out, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--num-instances', type=int, nargs='+', default=[10, 100, 300, 1000])
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    generator = torch.Generator().manual_seed(args.seed)
+    for num_instances in args.num_instances:
+        ins_ids, ref_ins_ids, key_results, ref_results = make_batch(
+            args.batch_size, num_instances, generator)
+        expected, loop_time = timeit(
+            match_instance_ids_loop, ins_ids, ref_ins_ids, repeat=args.repeat)
+        results, batch_time = timeit(
+            match_instance_ids, ins_ids, ref_ins_ids, repeat=args.repeat)
+
+        for exp, res in zip(expected, results):
+            assert torch.equal(exp.long(), res), (exp, res)
+        exp_targets, exp_weights = QuasiDenseEmbedHead.get_targets(
+            None, expected, key_results, ref_results)
+        targets, weights = QuasiDenseEmbedHead.get_targets(
+            None, results, key_results, ref_results)
+        for a, b in zip(exp_targets + exp_weights, targets + weights):
+            assert torch.equal(a, b)
+
+        print(f'{num_instances:5d} instances/frame: list.index '
+              f'{loop_time * 1000:8.2f} ms, batched {batch_time * 1000:6.2f} '
+              f'ms (x{loop_time / batch_time:.1f}), targets identical')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Build an :class:`ImageCache` of pre-decoded, shrunk training images.
+
+The images are listed by a COCO style annotation file (``images`` ->
+``file_name``) or, without one, by globbing ``--img-prefix``. Cache keys are
+the paths relative to ``--img-prefix``; pass the same prefix to
+``LoadImageFromCache``:
+
+    python tools/build_image_cache.py \
+        --ann-file data/sam/sam_annotations/jsons/sa1b_coco_fmt_500k_bbox_anno.json \
+        --img-prefix data/sam/batch0/ --out data/sam/image_cache_1024 \
+        --max-size 1024 --num-workers 16
+
+and in the dataset pipeline:
+
+    pipeline=[
+        dict(type='LoadMatchAnnotations'),
+        dict(type='LoadImageFromCache',
+             cache_dir='data/sam/image_cache_1024',
+             img_prefix='data/sam/batch0/'),
+    ]
+"""
+import argparse
+import glob
+import json
+import os
+import os.path as osp
+import sys
+import time
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from masa.datasets.image_cache import ImageCache  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Build a cache of pre-decoded training images')
+    parser.add_argument('--img-prefix', required=True)
+    parser.add_argument('--out', required=True, help='Cache directory')
+    parser.add_argument(
+        '--ann-file', default=None, help='COCO style file listing the images')
+    parser.add_argument(
+        '--pattern',
+        default='**/*.jpg',
+        help='Glob under --img-prefix when there is no --ann-file')
+    parser.add_argument(
+        '--max-size',
+        type=int,
+        default=1024,
+        help='Long side of the cached images, 0 keeps the full size')
+    parser.add_argument('--num-workers', type=int, default=8)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.ann_file is not None:
+        with open(args.ann_file) as f:
+            keys = [img['file_name'] for img in json.load(f)['images']]
+    else:
+        keys = sorted(
+            osp.relpath(path, args.img_prefix) for path in glob.glob(
+                osp.join(args.img_prefix, args.pattern), recursive=True))
+    items = [(key, osp.join(args.img_prefix, key)) for key in keys]
+
+    start = time.perf_counter()
+
+    def progress(done):
+        if done % 1000 == 0 or done == len(items):
+            elapsed = time.perf_counter() - start
+            print(f'{done}/{len(items)} images, {done / elapsed:.1f} img/s',
+                  flush=True)
+
+    cache = ImageCache.build(
+        args.out,
+        items,
+        max_size=args.max_size or None,
+        num_workers=args.num_workers,
+        progress=progress)
+    size = osp.getsize(osp.join(args.out, ImageCache.DATA_FILE))
+    print(f'cached {len(cache)} of {len(items)} images in {args.out} '
+          f'({size / 2**30:.2f} GB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Compare the batch transforms with the per-sample training transforms.
+
+Builds synthetic frames with boxes, runs the SA-1B training transforms
+(``configs/datasets/masa_dataset.py``) on every frame with numpy/OpenCV and
+their ``Batch*`` counterparts on the whole batch with torch, both under the
+same numpy seed, and reports how far images and boxes are apart.
+
+RandomCrop runs with ``allow_negative_crop=True``: otherwise the per-sample
+transform drops a frame whose crop holds no box, stops drawing random numbers
+for it and the two runs fall out of step.
+
+Example:
+    python tools/check_batch_transforms.py --num-samples 8 --device cuda
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+import torch
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from mmdet.registry import TRANSFORMS  # noqa: E402
+from mmdet.structures.bbox import HorizontalBoxes  # noqa: E402
+from mmdet.utils import register_all_modules as register_mmdet_modules  # noqa: E402
+from mmengine.structures import InstanceData  # noqa: E402
+
+from masa.models.data_preprocessors import BatchCompose  # noqa: E402
+from masa.registry import register_all_modules  # noqa: E402
+
+img_scale = (1024, 1024)
+TRANSFORM_CFGS = [
+    dict(type='SeqRandomAffine'),
+    dict(
+        type='SeqMixUp',
+        img_scale=img_scale,
+        ratio_range=(0.8, 1.6),
+        pad_val=114.0,
+        bbox_clip_border=False),
+    dict(type='YOLOXHSVRandomAug'),
+    dict(
+        type='RandomResize',
+        scale=img_scale,
+        ratio_range=(0.1, 2.0),
+        keep_ratio=True,
+        clip_object_border=False),
+    dict(
+        type='RandomCrop',
+        crop_size=img_scale,
+        bbox_clip_border=False,
+        allow_negative_crop=True),
+    dict(type='RandomFlip', prob=0.5),
+    dict(type='Pad', size=img_scale, pad_val=114),
+    dict(type='FilterMatchAnnotations', min_gt_bbox_wh=(1, 1), keep_empty=False),
+]
+
+
+def make_frame(rng, index):
+    """A smooth random image with boxes; smooth so that interpolation
+    differences stay small."""
+    height, width = rng.integers(360, 1400, size=2)
+    small = rng.integers(0, 256, size=(height // 32 + 2, width // 32 + 2, 3))
+    img = cv2.resize(small.astype(np.uint8), (int(width), int(height)),
+                     interpolation=cv2.INTER_CUBIC)
+    num_boxes = int(rng.integers(0, 30))
+    xy = rng.uniform(0, 1, size=(num_boxes, 2)) * [width, height]
+    wh = rng.uniform(4, 300, size=(num_boxes, 2))
+    boxes = np.concatenate((xy, np.minimum(xy + wh, [width, height])), 1)
+    return dict(
+        img=img,
+        img_shape=img.shape[:2],
+        gt_bboxes=HorizontalBoxes(boxes.astype(np.float32)),
+        gt_bboxes_labels=np.zeros(num_boxes, dtype=np.int64),
+        gt_ignore_flags=rng.uniform(size=num_boxes) < 0.1,
+        gt_instances_ids=np.arange(num_boxes) + index * 1000,
+    )
+
+
+def split_instances(frame):
+    ignore = torch.as_tensor(frame['gt_ignore_flags'], dtype=torch.bool)
+    instances = InstanceData(
+        bboxes=frame['gt_bboxes'].tensor,
+        labels=torch.as_tensor(frame['gt_bboxes_labels']),
+        instances_ids=torch.as_tensor(frame['gt_instances_ids']))
+    return instances[~ignore], instances[ignore]
+
+
+def run_per_sample(frames, mix_inds, seed):
+    transforms = [TRANSFORMS.build(cfg) for cfg in TRANSFORM_CFGS]
+    np.random.seed(seed)
+    outputs = []
+    start = time.perf_counter()
+    for frame, mix_ind in zip(frames, mix_inds):
+        results = dict(frame, mixup_mix_results=[frames[mix_ind]])
+        results['gt_bboxes'] = frame['gt_bboxes'].clone()
+        for t in transforms:
+            results = t(results)
+            assert results is not None
+        outputs.append(results)
+    return outputs, time.perf_counter() - start
+
+
+def run_batched(frames, mix_inds, seed, device):
+    transforms = BatchCompose(
+        [dict(cfg, type='Batch' + cfg['type']) for cfg in TRANSFORM_CFGS])
+    shapes = [f['img_shape'] for f in frames]
+    height = max(s[0] for s in shapes)
+    width = max(s[1] for s in shapes)
+    canvas = torch.zeros((len(frames), 3, height, width), device=device)
+    for i, f in enumerate(frames):
+        img = torch.from_numpy(f['img']).permute(2, 0, 1)
+        canvas[i, :, :img.shape[1], :img.shape[2]] = img.to(device)
+    gt, ignored = zip(*[split_instances(f) for f in frames])
+    gt = [g.to(device) for g in gt]
+    ignored = [g.to(device) for g in ignored]
+    results = dict(
+        img=canvas,
+        img_shape=shapes,
+        gt_instances=gt,
+        ignored_instances=ignored,
+        mix_img=canvas,
+        mix_img_shape=shapes,
+        mix_gt_instances=gt,
+        mix_ignored_instances=ignored,
+        mix_inds=list(mix_inds))
+    np.random.seed(seed)
+    if device != 'cpu':
+        torch.cuda.synchronize()
+    start = time.perf_counter()
+    results = transforms(results)
+    if device != 'cpu':
+        torch.cuda.synchronize()
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--num-samples', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--device', default='cpu')
+    args = parser.parse_args()
+
+    register_mmdet_modules()
+    register_all_modules()
+
+    rng = np.random.default_rng(args.seed)
+    frames = [make_frame(rng, i) for i in range(args.num_samples)]
+    mix_inds = [(i + 1) % len(frames) for i in range(len(frames))]
+
+    expected, per_sample_time = run_per_sample(frames, mix_inds, args.seed)
+    results, batch_time = run_batched(frames, mix_inds, args.seed, args.device)
+
+    worst_img, worst_box = 0.0, 0.0
+    for i, exp in enumerate(expected):
+        h, w = exp['img_shape']
+        assert tuple(results['img_shape'][i]) == (h, w), (
+            i, results['img_shape'][i], (h, w))
+        img = results['img'][i, :, :h, :w].permute(1, 2, 0).cpu().numpy()
+        diff = np.abs(img - exp['img'].astype(np.float32))
+        gt, ignored = split_instances(exp)
+        for key, ref in (('gt_instances', gt), ('ignored_instances', ignored)):
+            boxes = results[key][i].bboxes.cpu()
+            assert boxes.shape == ref.bboxes.shape, (i, key, boxes.shape,
+                                                     ref.bboxes.shape)
+            assert torch.equal(results[key][i].instances_ids.cpu(),
+                               ref.instances_ids), (i, key)
+            if len(boxes):
+                worst_box = max(worst_box,
+                                (boxes - ref.bboxes).abs().max().item())
+        worst_img = max(worst_img, diff.mean())
+        print(f'frame {i}: {h}x{w}, {len(gt)} boxes, '
+              f'mean |diff| {diff.mean():.3f}, '
+              f'pixels off by > 2: {(diff > 2).mean():.4%}')
+
+    print(f'worst mean pixel difference: {worst_img:.3f}')
+    print(f'worst box difference: {worst_box:.5f}')
+    print(f'per-sample: {per_sample_time * 1000:.1f} ms, '
+          f'batched ({args.device}): {batch_time * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
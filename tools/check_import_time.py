@@ -0,0 +1,132 @@
+"""Import-time regression check based on ``python -X importtime``.
+
+Imports a target in a fresh interpreter and fails if a forbidden heavy
+module (torch, mmdet, ...) is pulled in, or if the cumulative import time
+exceeds the budget.
+
+Targets:
+    masa  ``import masa`` must not import torch / OpenMMLab.
+    app   the annotation app's main widget must not import torch /
+          OpenMMLab / masa before its window is shown.
+
+Example:
+    python tools/check_import_time.py masa app --repeat 3
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+app_dir = os.path.join(project_root, 'AutoAnnotationTool', 'src',
+                       'MASAAnnotationApp')
+
+HEAVY_MODULES = ('torch', 'torchvision', 'mmcv', 'mmdet', 'mmengine',
+                 'transformers')
+
+# name -> (statement, working directory, forbidden top-level packages,
+#          default budget in ms)
+TARGETS = {
+    'masa': ('import masa', project_root, HEAVY_MODULES, 300),
+    'app': ('import MASAAnnotationWidget', app_dir, HEAVY_MODULES + ('masa', ),
+            3000),
+}
+
+LINE_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def measure(statement, cwd):
+    """Run ``statement`` with ``-X importtime``.
+
+    Returns:
+        tuple[int, dict]: Total cumulative time (us) of the top-level
+        imports and the cumulative time (us) of every imported module.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           statement],
+                          cwd=cwd,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE,
+                          universal_newlines=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'`{statement}` failed:\n{proc.stderr}')
+    total = 0
+    modules = {}
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match is None:
+            continue
+        cumulative, indent, name = int(match.group(2)), match.group(3), \
+            match.group(4)
+        modules[name] = cumulative
+        if len(indent) == 1:
+            total += cumulative
+    return total, modules
+
+
+def check(name, repeat, budget_ms=None, top=10):
+    statement, cwd, forbidden, default_budget = TARGETS[name]
+    budget_ms = default_budget if budget_ms is None else budget_ms
+    # The fastest run is the least noisy one.
+    try:
+        runs = [measure(statement, cwd) for _ in range(repeat)]
+    except RuntimeError as e:
+        print(f'[{name}] FAIL: {e}')
+        return False
+    total, modules = min(runs, key=lambda run: run[0])
+
+    print(f'[{name}] `{statement}`: {total / 1000:.1f} ms '
+          f'(budget {budget_ms} ms, best of {repeat})')
+    slowest = sorted(modules.items(), key=lambda item: -item[1])[:top]
+    for module, cumulative in slowest:
+        print(f'    {cumulative / 1000:8.1f} ms  {module}')
+
+    ok = True
+    heavy = sorted(module for module in modules
+                   if module.split('.')[0] in forbidden)
+    if heavy:
+        print(f'[{name}] FAIL: imports {", ".join(heavy[:10])}'
+              + (' ...' if len(heavy) > 10 else ''))
+        ok = False
+    if total / 1000 > budget_ms:
+        print(f'[{name}] FAIL: {total / 1000:.1f} ms exceeds the budget')
+        ok = False
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Check import time and heavy imports')
+    parser.add_argument(
+        'targets',
+        nargs='*',
+        metavar='TARGET',
+        help=f'Targets to check: {", ".join(sorted(TARGETS))} '
+        '(default: all)')
+    parser.add_argument(
+        '--budget-ms',
+        type=float,
+        default=None,
+        help='Override the cumulative import time budget of every target')
+    parser.add_argument(
+        '--repeat', type=int, default=3, help='Number of measurements')
+    parser.add_argument(
+        '--top', type=int, default=10, help='Number of slowest modules shown')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    unknown = [name for name in args.targets if name not in TARGETS]
+    if unknown:
+        raise SystemExit(f'Unknown targets: {", ".join(unknown)}')
+    results = [
+        check(name, max(1, args.repeat), args.budget_ms, args.top)
+        for name in args.targets or sorted(TARGETS)
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,134 @@
+"""Convert SA-1B (SAM) annotations to COCO format.
+
+SA-1B stores one JSON file per image. The files are split into shards of
+``--shard_size`` images that worker processes convert in parallel; the main
+process writes the converted shards out in order as they arrive, with at most
+two shards per worker in flight, so the memory use does not depend on the
+number of images.
+
+Outputs (``--formats``), written to ``--output_folder``:
+
+- ``json``: ``sa1b_coco_fmt_500k_mask_anno.json`` (with the segmentation
+  RLEs) and ``sa1b_coco_fmt_500k_bbox_anno.json`` (boxes only). Images and
+  annotations are streamed to the files.
+- ``columnar``: a ``ColumnarDataList``, the data list that ``MASADataset``
+  would parse and filter from the COCO json. With ``--config``, the dataset
+  settings (``data_root``, ``data_prefix``, ``filter_cfg``, ``metainfo``,
+  ...) are those of the ``MASADataset`` of ``train_dataloader`` that sets
+  ``columnar_cache``, and the list is written to that ``columnar_cache``.
+  Otherwise it goes to ``sa1b_columnar/`` with the default settings and
+  ``data_prefix=dict(img=<--img_prefix>)``. Use it with ``ann_file=''``;
+  the dataset refuses a list built with other settings.
+- ``hdf5``: ``sa1b_anno.h5``, the COCO annotations of every image pickled
+  under ``<file_name>.pkl``, as read by ``MASADataset(anno_hdf5_path=...)``.
+
+With ``--bbox_only`` the segmentation RLEs, by far the largest part of the
+annotations, are dropped from every output.
+
+Example:
+    python tools/format_conversion/convert_sam_2_cocofmt.py \\
+        --img_list data/sam/sam_annotations/jsons/sa1b_coco_fmt_iminfo_500k.json \\
+        --input_directory data/sam/batch0 \\
+        --output_folder data/sam/sam_annotations/jsons/ \\
+        --formats json columnar --num_workers 16 \
+        --config configs/masa-gdino/masa_gdino_swinb_train.py
+"""
+import argparse
+import contextlib
+import io
 import json
 import os
-import argparse
+import os.path as osp
+import pickle
+import shutil
+import sys
+import tempfile
+from collections import deque
+from itertools import islice
 from multiprocessing import Pool, cpu_count
+
 from tqdm import tqdm
 
+project_root = osp.abspath(osp.join(osp.dirname(__file__), '..', '..'))
+sys.path.insert(0, project_root)
+
+from mmengine.config import Config  # noqa: E402
+
+from masa.datasets.columnar_data_list import \
+    ColumnarDataListWriter  # noqa: E402
+from masa.datasets.masa_dataset import MASADataset  # noqa: E402
+
+CATEGORIES = [{'id': 1, 'name': 'object'}]
+# Arguments of the dataset config that do not change the data list.
+IGNORED_DATASET_KEYS = ('type', 'ann_file', 'pipeline', 'columnar_cache',
+                        'serialize_data', 'lazy_init', 'anno_hdf5_path',
+                        'img_prefix')
+MASK_JSON = 'sa1b_coco_fmt_500k_mask_anno.json'
+BBOX_JSON = 'sa1b_coco_fmt_500k_bbox_anno.json'
+COLUMNAR_DIR = 'sa1b_columnar'
+HDF5_FILE = 'sa1b_anno.h5'
+
 
 def parse_args():
-    parser = argparse.ArgumentParser(description="Convert SAM annotations to COCO format")
-    parser.add_argument('--img_list', type=str, required=True, help='Path to the image list JSON file')
-    parser.add_argument('--input_directory', type=str, required=True, help='Directory containing the input JSON files')
-    parser.add_argument('--output_folder', type=str, required=True,
-                        help='Path to the output JSON file with full annotations')
+    parser = argparse.ArgumentParser(
+        description='Convert SAM annotations to COCO format')
+    parser.add_argument(
+        '--img_list',
+        type=str,
+        default=None,
+        help='Path to the image list JSON file. Defaults to every JSON file '
+        'of the input directory.')
+    parser.add_argument(
+        '--input_directory',
+        type=str,
+        required=True,
+        help='Directory containing the input JSON files')
+    parser.add_argument(
+        '--output_folder',
+        type=str,
+        required=True,
+        help='Output directory')
+    parser.add_argument(
+        '--formats',
+        nargs='+',
+        choices=['json', 'columnar', 'hdf5'],
+        default=['json'],
+        help='Output formats')
+    parser.add_argument(
+        '--bbox_only',
+        action='store_true',
+        help='Drop the segmentation RLEs')
+    parser.add_argument(
+        '--config',
+        type=str,
+        default=None,
+        help='Training config whose columnar MASADataset settings and '
+        'columnar_cache the columnar output follows')
+    parser.add_argument(
+        '--img_prefix',
+        type=str,
+        default='data/sam/batch0/',
+        help='data_prefix[\'img\'] of the columnar data list when --config '
+        'is not given')
+    parser.add_argument(
+        '--num_workers',
+        type=int,
+        default=cpu_count(),
+        help='Number of conversion processes')
+    parser.add_argument(
+        '--shard_size',
+        type=int,
+        default=100,
+        help='Number of images converted by a worker at a time')
     return parser.parse_args()
 
 
-def process_file(file):
+def process_file(file, keep_masks=True):
+    """Read the SA-1B annotations of one image.
+
+    Returns:
+        tuple[dict, list[dict]]: The COCO image and annotations.
+    """
     with open(file, 'r') as f:
         json_data = json.load(f)
     image = json_data['image']
@@ -28,19 +142,8 @@ def process_file(file):
     }
 
     coco_annotations = []
-    coco_annotations_bbox_only = []
     for annotation in annotations:
         coco_annotation = {
-            'bbox': annotation['bbox'],
-            'area': annotation['area'],
-            'segmentation': annotation['segmentation'],
-            'id': annotation['id'],
-            'image_id': image['image_id'],
-            'category_id': 1,
-            'iscrowd': 0
-        }
-
-        coco_annotation_bbox = {
             'bbox': annotation['bbox'],
             'area': annotation['area'],
             'id': annotation['id'],
@@ -48,50 +151,266 @@ def process_file(file):
             'category_id': 1,
             'iscrowd': 0
         }
+        if keep_masks:
+            coco_annotation['segmentation'] = annotation['segmentation']
         coco_annotations.append(coco_annotation)
-        coco_annotations_bbox_only.append(coco_annotation_bbox)
 
-    return coco_image, coco_annotations, coco_annotations_bbox_only
+    return coco_image, coco_annotations
 
 
-def initializer():
-    print(f'Initializing process {os.getpid()}')
+def find_columnar_dataset(cfg):
+    """The first ``MASADataset`` config with a ``columnar_cache`` in
+    ``cfg`` (wrappers included), or None."""
+    if isinstance(cfg, dict):
+        if cfg.get('type') == 'MASADataset' and cfg.get('columnar_cache'):
+            return cfg
+        values = cfg.values()
+    elif isinstance(cfg, (list, tuple)):
+        values = cfg
+    else:
+        return None
+    for value in values:
+        found = find_columnar_dataset(value)
+        if found is not None:
+            return found
+    return None
 
 
-if __name__ == '__main__':
-    args = parse_args()
+def get_dataset_settings(args):
+    """The ``MASADataset`` arguments of the columnar data list and its
+    output directory."""
+    if args.config is None:
+        return dict(data_prefix=dict(img=args.img_prefix)), osp.join(
+            args.output_folder, COLUMNAR_DIR)
+    cfg = Config.fromfile(args.config)
+    dataset_cfg = find_columnar_dataset(cfg.train_dataloader.to_dict())
+    if dataset_cfg is None:
+        raise ValueError(f'No MASADataset with a columnar_cache in the '
+                         f'train_dataloader of {args.config}')
+    settings = {
+        key: value
+        for key, value in dataset_cfg.items()
+        if key not in IGNORED_DATASET_KEYS
+    }
+    if settings.get('indices') is not None:
+        raise ValueError('indices cannot be applied to a prebuilt columnar '
+                         'data list')
+    return settings, dataset_cfg['columnar_cache']
 
-    img_list = json.load(open(args.img_list))
-    input_directory = args.input_directory
-    output_folder = args.output_folder
-    os.makedirs(output_folder, exist_ok=True)
 
-    files = [os.path.join(input_directory, img['file_name'].replace('.jpg', '.json')) for img in img_list['images']]
+def build_dataset(settings):
+    """A ``MASADataset`` with the given settings and no annotation file,
+    used to parse and filter the shards and for the cache signature."""
+    return MASADataset(
+        ann_file='', pipeline=[], lazy_init=True, **settings)
 
-    coco_format_full_anno = {
-        'images': [],
-        'annotations': [],
-        'categories': [{'id': 1, 'name': 'object'}]
-    }
 
-    coco_format_bbox_anno = {
-        'images': [],
-        'annotations': [],
-        'categories': [{'id': 1, 'name': 'object'}]
-    }
+_dataset = None
+
+
+def init_worker(settings):
+    global _dataset
+    if settings is not None:
+        _dataset = build_dataset(settings)
+
+
+def parse_shard(images, annotations):
+    """Parse and filter the images of a shard the way ``MASADataset``
+    loads ``ann_file``."""
+    coco = MASADataset.COCOAPI()
+    coco.dataset = dict(
+        images=images, annotations=annotations, categories=CATEGORIES)
+    with contextlib.redirect_stdout(io.StringIO()):
+        coco.createIndex()
+    # The snake case aliases are bound in __init__, before the index.
+    coco.img_ann_map = coco.imgToAnns
+    coco.cat_img_map = coco.catToImgs
+    _dataset.data_list = _dataset.load_coco_data_list(coco, verbose=False)
+    data_infos = _dataset.filter_data()
+    _dataset.data_list = []
+    return data_infos
+
+
+def json_fragment(items):
+    """``items`` as the body of a JSON list, without the brackets."""
+    return json.dumps(items)[1:-1]
+
+
+def process_shard(task):
+    """Convert a shard of images for the requested outputs."""
+    files, formats, keep_masks = task
+    images, annotations, bbox_annotations = [], [], []
+    columnar_images, columnar_annotations = [], []
+    data_infos, records = [], []
+    for file in files:
+        image, anns = process_file(file, keep_masks)
+        if 'json' in formats:
+            images.append(image)
+            annotations.extend(anns)
+            if keep_masks:
+                bbox_annotations.extend({
+                    key: value
+                    for key, value in ann.items() if key != 'segmentation'
+                } for ann in anns)
+        if 'columnar' in formats:
+            columnar_images.append(image)
+            columnar_annotations.extend(anns)
+        if 'hdf5' in formats:
+            records.append(
+                (image['file_name'].replace('.jpg', '.pkl'),
+                 pickle.dumps(anns, pickle.HIGHEST_PROTOCOL)))
+    if columnar_images:
+        data_infos = parse_shard(columnar_images, columnar_annotations)
+    result = dict(num_images=len(files), data_infos=data_infos, records=records)
+    if 'json' in formats:
+        result['images'] = json_fragment(images)
+        if keep_masks:
+            result['annotations'] = json_fragment(annotations)
+            result['bbox_annotations'] = json_fragment(bbox_annotations)
+        else:
+            result['bbox_annotations'] = json_fragment(annotations)
+    return result
+
+
+class CocoJsonWriter:
+    """Stream a COCO annotation file.
+
+    The images go to the output file as they come, the annotations to a
+    temporary file that is appended to it by :meth:`close`. The output is
+    written as ``<path>.tmp`` and renamed when complete.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path + '.tmp', 'w')
+        self._file.write('{"images": [')
+        self._annotations = tempfile.TemporaryFile(
+            'w+', dir=osp.dirname(osp.abspath(path)))
+        self._has_images = False
+        self._has_annotations = False
 
-    with Pool(processes=cpu_count(), initializer=initializer) as pool:
-        results = list(tqdm(pool.imap(process_file, files), total=len(files)))
+    def write(self, images, annotations):
+        if images:
+            if self._has_images:
+                self._file.write(', ')
+            self._file.write(images)
+            self._has_images = True
+        if annotations:
+            if self._has_annotations:
+                self._annotations.write(', ')
+            self._annotations.write(annotations)
+            self._has_annotations = True
 
-    for image, annotations, annotation_bbox in results:
-        coco_format_full_anno['images'].append(image)
-        coco_format_full_anno['annotations'].extend(annotations)
+    def close(self):
+        self._file.write('], "annotations": [')
+        self._annotations.seek(0)
+        shutil.copyfileobj(self._annotations, self._file, 2**20)
+        self._annotations.close()
+        self._file.write(f'], "categories": {json.dumps(CATEGORIES)}}}')
+        self._file.close()
+        os.replace(self.path + '.tmp', self.path)
 
-        coco_format_bbox_anno['images'].append(image)
-        coco_format_bbox_anno['annotations'].extend(annotation_bbox)
 
-    with open(os.path.join(output_folder, 'sa1b_coco_fmt_500k_mask_anno.json'), 'w') as f:
-        json.dump(coco_format_full_anno, f)
+def iter_files(args):
+    if args.img_list is not None:
+        with open(args.img_list) as f:
+            img_list = json.load(f)
+        for img in img_list['images']:
+            yield osp.join(args.input_directory,
+                           img['file_name'].replace('.jpg', '.json'))
+    else:
+        # scandir streams the directory instead of listing it at once.
+        for entry in os.scandir(args.input_directory):
+            if entry.name.endswith('.json'):
+                yield entry.path
 
-    with open(os.path.join(output_folder, 'sa1b_coco_fmt_500k_bbox_anno.json'), 'w') as f:
-        json.dump(coco_format_bbox_anno, f)
+
+def iter_shards(files, shard_size):
+    files = iter(files)
+    while True:
+        shard = list(islice(files, shard_size))
+        if not shard:
+            return
+        yield shard
+
+
+def imap_bounded(pool, func, tasks, max_pending):
+    """``pool.imap`` with at most ``max_pending`` results waiting: a plain
+    ``imap`` queues every finished result when the consumer is slower than
+    the workers."""
+    pending = deque()
+    for task in tasks:
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+        pending.append(pool.apply_async(func, (task, )))
+    while pending:
+        yield pending.popleft().get()
+
+
+def main():
+    args = parse_args()
+    formats = set(args.formats)
+    keep_masks = not args.bbox_only
+    os.makedirs(args.output_folder, exist_ok=True)
+
+    json_writers = {}
+    if 'json' in formats:
+        if keep_masks:
+            json_writers['annotations'] = CocoJsonWriter(
+                osp.join(args.output_folder, MASK_JSON))
+        json_writers['bbox_annotations'] = CocoJsonWriter(
+            osp.join(args.output_folder, BBOX_JSON))
+    columnar_writer = None
+    dataset_settings = None
+    if 'columnar' in formats:
+        dataset_settings, columnar_dir = get_dataset_settings(args)
+        # Checked by MASADataset(ann_file='', columnar_cache=...).
+        signature = build_dataset(dataset_settings).columnar_signature()
+        columnar_writer = ColumnarDataListWriter(columnar_dir, signature)
+    h5_file = None
+    if 'hdf5' in formats:
+        import h5py
+        import numpy as np
+        h5_path = osp.join(args.output_folder, HDF5_FILE)
+        h5_file = h5py.File(h5_path + '.tmp', 'w')
+
+    tasks = ((shard, formats, keep_masks)
+             for shard in iter_shards(iter_files(args), args.shard_size))
+    num_workers = max(args.num_workers, 1)
+    progress = tqdm(unit='img')
+    try:
+        with Pool(
+                processes=num_workers,
+                initializer=init_worker,
+                initargs=(dataset_settings, )) as pool:
+            for result in imap_bounded(pool, process_shard, tasks,
+                                       2 * num_workers):
+                for key, writer in json_writers.items():
+                    writer.write(result['images'], result[key])
+                if columnar_writer is not None:
+                    for data_info in result['data_infos']:
+                        columnar_writer.append(data_info)
+                if h5_file is not None:
+                    # Contiguous byte records, read through the offset
+                    # index of HDF5RecordReader.
+                    for key, data in result['records']:
+                        h5_file.create_dataset(key, data=np.void(data))
+                progress.update(result['num_images'])
+    except BaseException:
+        if columnar_writer is not None:
+            columnar_writer.abort()
+        raise
+    progress.close()
+
+    for writer in json_writers.values():
+        writer.close()
+    if columnar_writer is not None:
+        data_list = columnar_writer.close()
+        print(f'{len(data_list)} images in {data_list.cache_dir}')
+    if h5_file is not None:
+        h5_file.close()
+        os.replace(h5_path + '.tmp', h5_path)
+
+
+if __name__ == '__main__':
+    main()